@@ -0,0 +1,492 @@
+"""
+Offline benchmark for the automod message filters.
+
+Generates a seeded, labeled corpus (clean chat with near-miss negatives, caps,
+emoji spam, mass mentions, links, invites and repeated-message bursts) and
+replays it through the six automod ``on_message`` listeners on a stub bot.
+Each listener runs against a throwaway SQLite setup; punishments go to a
+recorder instead of Discord, so nothing leaves the process.
+
+Per rule it reports precision / recall against the corpus labels, handler
+latency (p50 / p99) and database work per message (connections opened and
+statements executed). Results are written as JSON and can be compared with a
+stored baseline:
+
+    python -m benchmarks.automod_bench --save benchmarks/automod_baseline.json
+    python -m benchmarks.automod_bench --baseline benchmarks/automod_baseline.json
+
+Detection and database numbers are deterministic for a seed; latency depends
+on the machine and is only flagged when it grows past ``--latency-tolerance``.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, FrozenSet, List, NamedTuple, Optional
+
+import aiosqlite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+GUILD_ID = 700000000000000000
+OWN_INVITE = "ourserver"
+EPOCH = 1_760_000_000.0
+
+# cog module -> (class name, event reported to the coalescer, punishment event in automod_punishments)
+COGS = {
+    "antispam": ("AntiSpam", "Anti-Spam", "Anti spam"),
+    "anticaps": ("AntiCaps", "Anti-Caps", "Anti caps"),
+    "antilink": ("AntiLink", "Anti-Link", "Anti link"),
+    "anti_invites": ("AntiInvite", "Anti-Invite", "Anti invites"),
+    "anti_mass_mention": ("AntiMassMention", "Anti Mass Mention", "Anti mass mention"),
+    "anti_emoji_spam": ("AntiEmojiSpam", "Anti Emoji Spam", "Anti emoji spam"),
+}
+
+# label -> rule that should fire for it
+LABEL_RULES = {
+    "clean": None,
+    "caps": "Anti-Caps",
+    "emoji": "Anti Emoji Spam",
+    "mentions": "Anti Mass Mention",
+    "link": "Anti-Link",
+    "invite": "Anti-Invite",
+    "repeat": "Anti-Spam",
+}
+
+
+class CorpusMessage(NamedTuple):
+    id: int
+    offset: float  # seconds since the start of the corpus
+    author_id: int
+    channel_id: int
+    content: str
+    label: str
+    expected: FrozenSet[str]
+
+
+# ---- corpus -------------------------------------------------------------
+
+_WORDS = (
+    "the a to and is it that for you was on are with this have be at what so just like but not "
+    "game tonight anyone play later lol honestly think update server role voice music stream "
+    "pretty good bad fun new weekend match team win lost ranked patch bot meme thanks hello"
+).split()
+_EMOJIS = ["😀", "😂", "🔥", "🎉", "💀", "👀", "🚀", "🤔", "🥳", "🧠", "✨", "🍕", "🇺🇸", "🃏"]
+_CUSTOM_EMOJIS = ["<:pepe:112233445566778899>", "<a:dance:998877665544332211>", "<:kek:123456789012345678>"]
+_DOMAINS = ["example.com", "free-nitro.gift", "clips.gg", "news.site", "shop.example.org", "bit.ly", "steamcommunity.ru"]
+_ALLOWED_LINKS = [
+    "https://tenor.com/view/cat-dance-{n}",
+    "https://media.discordapp.net/attachments/1/{n}/image.png",
+    "https://open.spotify.com/track/{n}",
+    "https://example.com/reaction{n}.gif",
+]
+_INVITE_FORMS = [
+    "discord.gg/{code}",
+    "https://discord.gg/{code}",
+    "https://discord.com/invite/{code}",
+    "discord . gg / {code}",
+    "discord[.]gg/{code}",
+    "dsc.gg/{code}",
+]
+
+
+def _sentence(rng: random.Random, low: int = 3, high: int = 14) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _mention(rng: random.Random) -> str:
+    return f"<@{rng.randint(10**17, 10**18 - 1)}>"
+
+
+def _code(rng: random.Random) -> str:
+    return "".join(rng.choices("abcdefghijkmnpqrstuvwxyzABCDEFGH23456789", k=rng.randint(6, 10)))
+
+
+def _clean(rng: random.Random) -> str:
+    """Ordinary chat, including messages that sit just under a rule's threshold"""
+    roll = rng.random()
+    if roll < 0.06:
+        return rng.choice(["LMAO NO WAY", "GG EZ", "WHAT", "OK OK OK", "LETS GOOO"])
+    if roll < 0.10:
+        return f"{_sentence(rng, 2, 5)} " + " ".join(rng.choice(_EMOJIS) for _ in range(5))
+    if roll < 0.18:
+        return f"{_sentence(rng)} {rng.choice(_EMOJIS)}"
+    if roll < 0.22:
+        return " ".join(_mention(rng) for _ in range(4)) + f" {_sentence(rng, 2, 6)}"
+    if roll < 0.30:
+        return f"{_mention(rng)} {_sentence(rng)}"
+    if roll < 0.35:
+        return f"{_sentence(rng, 1, 4)} {rng.choice(_ALLOWED_LINKS).format(n=rng.randint(1, 10**6))}"
+    if roll < 0.37:
+        return f"invite your friends: discord.gg/{OWN_INVITE}"
+    if roll < 0.40:
+        return f"{_sentence(rng, 8, 14).capitalize()}. {_sentence(rng, 6, 10).upper()[:20]}"
+    return _sentence(rng)
+
+
+def _caps(rng: random.Random) -> str:
+    text = _sentence(rng, 8, 16).upper()
+    while len(text) < 45:
+        text += " " + rng.choice(_WORDS).upper()
+    return text + rng.choice(["", "!!!", "!!", " ???"])
+
+
+def _emoji(rng: random.Random) -> str:
+    pool = _EMOJIS + _CUSTOM_EMOJIS
+    emojis = " ".join(rng.choice(pool) for _ in range(rng.randint(6, 14)))
+    return emojis if rng.random() < 0.5 else f"{_sentence(rng, 1, 4)} {emojis}"
+
+
+def _mentions(rng: random.Random) -> str:
+    return " ".join(_mention(rng) for _ in range(rng.randint(5, 10))) + f" {_sentence(rng, 1, 5)}"
+
+
+def _link(rng: random.Random) -> str:
+    domain = rng.choice(_DOMAINS)
+    url = f"https://{'www.' if rng.random() < 0.3 else ''}{domain}/{_code(rng)}"
+    roll = rng.random()
+    if roll < 0.2:
+        return f"[{_sentence(rng, 1, 3)}]({url})"
+    if roll < 0.3:
+        return f"check https://{domain.replace('.', '[.]')}/{_code(rng)} now"
+    return f"{_sentence(rng, 1, 6)} {url}"
+
+
+def _invite(rng: random.Random) -> str:
+    return f"{_sentence(rng, 0, 4)} {rng.choice(_INVITE_FORMS).format(code=_code(rng))}".strip()
+
+
+_GENERATORS = {"clean": _clean, "caps": _caps, "emoji": _emoji, "mentions": _mentions, "link": _link, "invite": _invite}
+_WEIGHTS = {"clean": 0.72, "caps": 0.05, "emoji": 0.05, "mentions": 0.04, "link": 0.05, "invite": 0.04,
+            "repeat": 0.02, "fast": 0.03}
+
+
+def generate_corpus(seed: int = 1, size: int = 2000, users: int = 400, channels: int = 8,
+                    rate: float = 4.0) -> List[CorpusMessage]:
+    """
+    Build a labeled corpus of about ``size`` messages arriving at ``rate`` per second.
+
+    ``repeat`` starts a burst of 7-12 near-identical messages from one account,
+    all labeled as spam. ``fast`` is a chatty user sending up to five quick
+    messages - clean, and the near miss for Anti-Spam.
+    """
+    rng = random.Random(seed)
+    labels, weights = zip(*_WEIGHTS.items())
+    next_spammer = 9_000
+    drafts = []
+    t = 0.0
+    while len(drafts) < size:
+        t += rng.expovariate(rate)
+        kind = rng.choices(labels, weights)[0]
+        channel = rng.randrange(channels)
+        if kind == "repeat":
+            next_spammer += 1
+            text = _sentence(rng, 1, 4)
+            at = t
+            for _ in range(rng.randint(7, 12)):
+                drafts.append((at, next_spammer, channel, text if rng.random() < 0.7 else _sentence(rng, 1, 4), "repeat"))
+                at += rng.uniform(0.3, 1.2)
+        elif kind == "fast":
+            author = rng.randrange(users)
+            at = t
+            for _ in range(rng.randint(3, 5)):
+                drafts.append((at, author, channel, _sentence(rng), "clean"))
+                at += rng.uniform(1.0, 2.5)
+        else:
+            drafts.append((t, rng.randrange(users), channel, _GENERATORS[kind](rng), kind))
+
+    drafts.sort(key=lambda draft: draft[0])
+    corpus = []
+    for index, (offset, author, channel, content, label) in enumerate(drafts[:size]):
+        rule = LABEL_RULES[label]
+        corpus.append(CorpusMessage(index + 1, round(offset, 3), 1000 + author, 50 + channel, content, label,
+                                    frozenset((rule,) if rule else ())))
+    return corpus
+
+
+# ---- stub bot -----------------------------------------------------------
+
+class StubMember:
+    def __init__(self, user_id: int, bot: bool = False):
+        self.id = user_id
+        self.bot = bot
+        self.roles = []
+        self.mention = f"<@{user_id}>"
+        self.avatar = None
+
+    def is_timed_out(self):
+        return False
+
+
+class StubChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.mention = f"<#{channel_id}>"
+
+
+class StubInvite:
+    def __init__(self, code: str):
+        self.code = code
+
+
+class StubGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.owner = StubMember(1)
+        self.vanity_url_code = None
+        self.rest_calls = 0
+
+    async def invites(self):
+        self.rest_calls += 1
+        return [StubInvite(OWN_INVITE)]
+
+    def get_channel(self, channel_id):
+        return None
+
+
+class StubMessage:
+    def __init__(self, entry: CorpusMessage, author: StubMember, guild: StubGuild, channel: StubChannel):
+        self.id = entry.id
+        self.content = entry.content
+        self.author = author
+        self.guild = guild
+        self.channel = channel
+        self.created_at = datetime.fromtimestamp(EPOCH + entry.offset, tz=timezone.utc)
+
+
+class StubBot:
+    def __init__(self):
+        self.user = StubMember(2, bot=True)
+
+    def get_cog(self, name):
+        return None
+
+
+class DetectionRecorder:
+    """Takes the place of the action coalescer and remembers what fired on which message"""
+
+    def __init__(self):
+        self.detections: Dict[int, set] = defaultdict(set)
+
+    async def handle(self, message, *, event, **kwargs):
+        self.detections[message.id].add(event)
+        return None
+
+
+class VirtualClock:
+    """``time`` replacement for Anti-Spam so its ten second window follows the corpus timestamps"""
+
+    def __init__(self):
+        self.now = EPOCH
+
+    def time(self):
+        return self.now
+
+
+class DBCounter:
+    """Counts aiosqlite connections and statements while active"""
+
+    def __init__(self):
+        self.connects = 0
+        self.statements = 0
+        self._originals = None
+
+    def __enter__(self):
+        connect, execute = aiosqlite.connect, aiosqlite.Connection.execute
+        self._originals = (connect, execute)
+
+        def counting_connect(*args, **kwargs):
+            self.connects += 1
+            return connect(*args, **kwargs)
+
+        def counting_execute(conn, *args, **kwargs):
+            self.statements += 1
+            return execute(conn, *args, **kwargs)
+
+        aiosqlite.connect = counting_connect
+        aiosqlite.Connection.execute = counting_execute
+        return self
+
+    def __exit__(self, *exc):
+        aiosqlite.connect, aiosqlite.Connection.execute = self._originals
+
+
+def _setup_databases():
+    os.makedirs("db", exist_ok=True)
+    with sqlite3.connect("db/automod.db") as db:
+        db.executescript("""
+            CREATE TABLE automod (guild_id INTEGER PRIMARY KEY, enabled INTEGER DEFAULT 0);
+            CREATE TABLE automod_punishments (guild_id INTEGER, event TEXT, punishment TEXT, PRIMARY KEY (guild_id, event));
+            CREATE TABLE automod_ignored (guild_id INTEGER, type TEXT, id INTEGER, PRIMARY KEY (guild_id, type, id));
+            CREATE TABLE automod_logging (guild_id INTEGER, log_channel INTEGER, PRIMARY KEY (guild_id));
+            CREATE TABLE automod_link_rules (guild_id INTEGER, domain TEXT, action TEXT, PRIMARY KEY (guild_id, domain));
+        """)
+        db.execute("INSERT INTO automod VALUES (?, 1)", (GUILD_ID,))
+        db.executemany("INSERT INTO automod_punishments VALUES (?, ?, 'Mute')",
+                       [(GUILD_ID, punishment_event) for _, _, punishment_event in COGS.values()])
+    with sqlite3.connect("db/antispam.db") as db:
+        db.execute("CREATE TABLE recent_messages (user_id INTEGER, guild_id INTEGER, timestamp REAL)")
+
+
+def _load_cogs(bot, recorder: DetectionRecorder, clock: VirtualClock):
+    # Loaded by path: importing cogs.automod would run cogs/__init__.py, which pulls in every cog of the bot
+    cogs = {}
+    for module_name, (class_name, event, _) in COGS.items():
+        path = os.path.join(ROOT, "cogs", "automod", f"{module_name}.py")
+        spec = importlib.util.spec_from_file_location(f"automod_bench_{module_name}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        if hasattr(module, "time"):
+            module.time = clock
+        cog = getattr(module, class_name)(bot)
+        cog.coalescer = recorder
+        cogs[event] = cog
+    return cogs
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+async def run_benchmark(corpus: List[CorpusMessage]) -> dict:
+    """Replay ``corpus`` through the automod listeners in a temporary directory"""
+    cwd = os.getcwd()
+    workdir = tempfile.TemporaryDirectory(prefix="automod_bench_")
+    os.chdir(workdir.name)
+    try:
+        _setup_databases()
+        bot, recorder, clock = StubBot(), DetectionRecorder(), VirtualClock()
+        guild = StubGuild(GUILD_ID)
+        cogs = _load_cogs(bot, recorder, clock)
+        members, channels = {}, {}
+        latencies = {rule: [] for rule in cogs}
+        connects, statements = Counter(), Counter()
+
+        started = time.perf_counter()
+        with DBCounter() as counter:
+            for entry in corpus:
+                author = members.get(entry.author_id) or members.setdefault(entry.author_id, StubMember(entry.author_id))
+                channel = channels.get(entry.channel_id) or channels.setdefault(entry.channel_id, StubChannel(entry.channel_id))
+                message = StubMessage(entry, author, guild, channel)
+                clock.now = EPOCH + entry.offset
+                for rule, cog in cogs.items():
+                    before = (counter.connects, counter.statements)
+                    start = time.perf_counter()
+                    await cog.on_message(message)
+                    latencies[rule].append(time.perf_counter() - start)
+                    connects[rule] += counter.connects - before[0]
+                    statements[rule] += counter.statements - before[1]
+        elapsed = time.perf_counter() - started
+    finally:
+        os.chdir(cwd)
+        workdir.cleanup()
+
+    total = len(corpus)
+    rules = {}
+    for rule in cogs:
+        expected = {entry.id for entry in corpus if rule in entry.expected}
+        detected = {message_id for message_id, events in recorder.detections.items() if rule in events}
+        tp, fp, fn = len(expected & detected), len(detected - expected), len(expected - detected)
+        rules[rule] = {
+            "true_positives": tp,
+            "false_positives": fp,
+            "false_negatives": fn,
+            "precision": round(tp / (tp + fp), 4) if tp + fp else 1.0,
+            "recall": round(tp / (tp + fn), 4) if tp + fn else 1.0,
+            "p50_ms": round(_percentile(latencies[rule], 50) * 1000, 3),
+            "p99_ms": round(_percentile(latencies[rule], 99) * 1000, 3),
+            "connects_per_message": round(connects[rule] / total, 3),
+            "statements_per_message": round(statements[rule] / total, 3),
+        }
+    return {
+        "corpus": {"messages": total, "labels": dict(sorted(Counter(entry.label for entry in corpus).items()))},
+        "messages_per_sec": round(total / elapsed, 1),
+        "invite_lookups": guild.rest_calls,
+        "rules": rules,
+    }
+
+
+# ---- baseline comparison ------------------------------------------------
+
+def compare_results(baseline: dict, current: dict, latency_tolerance: float = 0.5) -> List[str]:
+    """
+    Return the regressions of ``current`` against ``baseline``.
+
+    Precision, recall and database work per message are exact for a given
+    corpus, so any drop / increase counts. Latency only counts when p50 or p99
+    grows by more than ``latency_tolerance`` (relative).
+    """
+    if baseline.get("corpus") != current.get("corpus"):
+        return ["corpus differs from the baseline (different seed or size) - results are not comparable"]
+
+    regressions = []
+    for rule, now in current["rules"].items():
+        before = baseline["rules"].get(rule)
+        if before is None:
+            continue
+        for key in ("precision", "recall"):
+            if now[key] < before[key]:
+                regressions.append(f"{rule}: {key} {before[key]:.4f} -> {now[key]:.4f}")
+        for key in ("connects_per_message", "statements_per_message"):
+            if now[key] > before[key]:
+                regressions.append(f"{rule}: {key} {before[key]} -> {now[key]}")
+        for key in ("p50_ms", "p99_ms"):
+            if before[key] > 0 and now[key] > before[key] * (1 + latency_tolerance):
+                regressions.append(f"{rule}: {key} {before[key]:.3f} -> {now[key]:.3f}")
+    if current.get("invite_lookups", 0) > baseline.get("invite_lookups", 0):
+        regressions.append(f"invite lookups {baseline.get('invite_lookups', 0)} -> {current['invite_lookups']}")
+    return regressions
+
+
+def _format(result: dict) -> str:
+    lines = [f"{result['corpus']['messages']} messages {result['corpus']['labels']}, "
+             f"{result['messages_per_sec']} msg/s through all listeners, {result['invite_lookups']} invite lookups",
+             f"{'rule':<18} {'prec':>6} {'recall':>6} {'tp':>5} {'fp':>4} {'fn':>4} "
+             f"{'p50 ms':>7} {'p99 ms':>7} {'conn/msg':>8} {'stmt/msg':>8}"]
+    for rule, stats in result["rules"].items():
+        lines.append(f"{rule:<18} {stats['precision']:>6.3f} {stats['recall']:>6.3f} {stats['true_positives']:>5} "
+                     f"{stats['false_positives']:>4} {stats['false_negatives']:>4} {stats['p50_ms']:>7.3f} "
+                     f"{stats['p99_ms']:>7.3f} {stats['connects_per_message']:>8.3f} {stats['statements_per_message']:>8.3f}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a stored result, exit 1 on regressions")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.seed, args.messages)
+    result = asyncio.run(run_benchmark(corpus))
+    result["corpus"]["seed"] = args.seed
+    print(_format(result))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, result, args.latency_tolerance)
+        print("\n".join(regressions) if regressions else "No regressions against the baseline.")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Benchmark for chart rendering through the process pool.
+
+Renders ``--charts`` message-trend charts (the figure StatBotStyleGenerator
+draws for ``s.`` - 12x6 in at 150 dpi) four ways, with a probe measuring how
+late the event loop wakes from a 10 ms sleep meanwhile:
+
+* inline on the event loop, as the stats commands did before the service,
+* through ChartRenderService with a distinct key per chart,
+* with every request for the same key (single-flight: one render),
+* again for the distinct keys, now served from the TTL cache.
+
+    python -m benchmarks.chart_bench --charts 16 --workers 2
+
+Reported per run: total time, charts rendered, and event-loop lag p50/max.
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from utils.chart_service import ChartJob, ChartRenderService  # noqa: E402
+
+TREND = {"daily_messages": [120, 150, 180, 200, 170, 160, 140]}
+
+
+class TrendChart:
+    """The message trends figure of StatBotStyleGenerator, without the cog's imports"""
+
+    async def draw(self, guild_name: str, trend_data: dict):
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=(12, 6), facecolor="#000000")
+        ax.set_facecolor("#000000")
+        fig.suptitle(f"{guild_name} - Message Trends", fontsize=18, color="#ffffff", fontweight="bold", y=0.95)
+        days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+        messages = trend_data["daily_messages"]
+        bars = ax.bar(days, messages, color="#20b2aa", alpha=0.8, edgecolor="#14b8a6", linewidth=2)
+        ax.set_xlabel("Day of Week", color="#a1a1aa", fontsize=12)
+        ax.set_ylabel("Messages", color="#a1a1aa", fontsize=12)
+        ax.tick_params(colors="#a1a1aa")
+        for spine in ax.spines.values():
+            spine.set_color("#374151")
+        for bar, value in zip(bars, messages):
+            ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 5, f"{value}", ha="center", va="bottom",
+                    color="#ffffff", fontweight="bold")
+        ax.grid(True, alpha=0.3, color="#374151")
+        plt.tight_layout()
+        buffer = io.BytesIO()
+        plt.savefig(buffer, format="png", facecolor="#000000", bbox_inches="tight", dpi=150)
+        plt.close(fig)
+        return buffer
+
+
+def job(guild: int) -> ChartJob:
+    return ChartJob("benchmarks.chart_bench:TrendChart", "draw", (f"Guild {guild}", TREND))
+
+
+async def _probe(stop: asyncio.Event, lags: List[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append((time.perf_counter() - started - 0.01) * 1000)
+
+
+async def measure(label: str, requests) -> None:
+    stop, lags = asyncio.Event(), []
+    probe = asyncio.create_task(_probe(stop, lags))
+    await asyncio.sleep(0.02)
+    started = time.perf_counter()
+    results = await asyncio.gather(*requests)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    drawn = sum(1 for result in results if result is not None)
+    print(f"{label:34} {elapsed:6.2f}s  {drawn:3} charts  loop lag p50 {statistics.median(lags):7.1f} ms  "
+          f"max {max(lags):7.1f} ms")
+
+
+async def run(charts: int, workers: int):
+    inline = TrendChart()
+    await measure("inline on the event loop", (inline.draw(f"Guild {guild}", TREND) for guild in range(charts)))
+
+    service = ChartRenderService(workers=workers)
+    try:
+        # Start the workers (imports and font cache) outside the timings
+        await service.render("warm", job(-1))
+        await measure("pool, distinct keys", (service.render((guild, "trends"), job(guild)) for guild in range(charts)))
+        await measure("pool, one key (single-flight)", (service.render((-2, "trends"), job(-2)) for _ in range(charts)))
+        await measure("pool, cached keys", (service.render((guild, "trends"), job(guild)) for guild in range(charts)))
+        print(f"service stats: {service.stats}")
+    finally:
+        service.shutdown()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--charts", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.charts, args.workers))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
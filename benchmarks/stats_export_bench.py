@@ -0,0 +1,163 @@
+"""
+Benchmark for the streaming stats export (``s.e``).
+
+Builds (or reuses) a stats database holding one guild's hourly message rows,
+then exports them through ``export_stats`` the way the command does, holding
+each part for ``--upload-seconds`` as if it were being sent to Discord. A
+stats aggregator flushes into the same database throughout, like the live
+bot, so the report shows whether the export holds writers off.
+
+Reported: rows/s, parts and their sizes, peak RSS against the RSS before the
+export, and the stats flush latency (max, plus flushes that failed):
+
+    python -m benchmarks.stats_export_bench --rows 10000000 --db /tmp/stats_bench.db
+
+Generating 10M rows takes a minute or two; pass the same ``--db`` again to
+reuse them.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import aclosing, closing
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import aiosqlite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.stats_aggregator import StatsAggregator  # noqa: E402
+from utils.stats_export import export_stats  # noqa: E402
+from utils.stats_rollup import StatsRollup  # noqa: E402
+
+GUILD_ID = 42
+USERS = 5000
+CHANNELS = 40
+
+
+def generate(path: str, rows: int):
+    """``rows`` hourly message rows for GUILD_ID: USERS x CHANNELS x hours, day by day"""
+    with closing(sqlite3.connect(path)) as db:
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS message_stats (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                channel_id INTEGER NOT NULL,
+                date DATE NOT NULL,
+                hour INTEGER NOT NULL,
+                count INTEGER DEFAULT 0,
+                characters INTEGER DEFAULT 0,
+                words INTEGER DEFAULT 0,
+                attachments INTEGER DEFAULT 0,
+                mentions INTEGER DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id, channel_id, date, hour)
+            );
+            CREATE TABLE IF NOT EXISTS voice_stats (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                channel_id INTEGER NOT NULL,
+                date DATE NOT NULL,
+                hour INTEGER NOT NULL,
+                duration INTEGER DEFAULT 0,
+                duration_minutes REAL DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id, channel_id, date, hour)
+            );
+        """)
+        db.execute(f"""
+            WITH RECURSIVE r(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM r WHERE i < {rows - 1})
+            INSERT INTO message_stats
+            SELECT {GUILD_ID}, 100000000000000000 + i % {USERS},
+                   900000000000000000 + (i / {USERS}) % {CHANNELS},
+                   date('2023-01-01', '+' || (i / ({USERS} * {CHANNELS} * 24)) || ' days'),
+                   (i / ({USERS} * {CHANNELS})) % 24, 1 + i % 17, i % 900, i % 150, i % 3, i % 2
+            FROM r
+        """)
+        db.commit()
+
+    async def tiers():
+        async with aiosqlite.connect(path) as db:
+            await StatsRollup.ensure_tables(db)
+            await db.commit()
+
+    asyncio.run(tiers())
+
+
+async def run_export(path: str, fmt: str, part_limit: int, upload_seconds: float, flush_interval: float):
+    aggregator = StatsAggregator(path)
+    flush_times: List[float] = []
+    failures = 0
+    done = asyncio.Event()
+
+    async def writer():
+        nonlocal failures
+        user = 0
+        while not done.is_set():
+            user += 1
+            aggregator.add_message(GUILD_ID, user, 1, datetime.now(timezone.utc), characters=10)
+            started = time.perf_counter()
+            try:
+                await aggregator.flush()
+            except Exception:
+                failures += 1
+            flush_times.append(time.perf_counter() - started)
+            await asyncio.sleep(flush_interval)
+
+    writing = asyncio.create_task(writer())
+    parts = rows = total = biggest = 0
+    started = time.perf_counter()
+    try:
+        async with aclosing(export_stats(path, "message", GUILD_ID, fmt, part_limit=part_limit)) as exported:
+            async for part in exported:
+                parts += 1
+                rows += part.rows
+                total += part.size
+                biggest = max(biggest, part.size)
+                await asyncio.sleep(upload_seconds)
+    finally:
+        elapsed = time.perf_counter() - started
+        done.set()
+        await writing
+    return {"rows": rows, "parts": parts, "bytes": total, "largest_part": biggest, "seconds": elapsed,
+            "flushes": len(flush_times), "flush_failures": failures,
+            "flush_max": max(flush_times, default=0.0)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--db", metavar="PATH", help="stats database to reuse (generated when missing)")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--part-mib", type=int, default=25)
+    parser.add_argument("--upload-seconds", type=float, default=0.5, help="time each part is held, as if uploading")
+    parser.add_argument("--flush-interval", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="stats_bench_"), "stats.db")
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        generate(path, args.rows)
+        print(f"generated {args.rows:,} rows in {time.perf_counter() - started:.0f}s")
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result = asyncio.run(run_export(path, args.format, args.part_mib * 1024 * 1024,
+                                    args.upload_seconds, args.flush_interval))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{args.format}: {result['rows']:,} rows in {result['seconds']:.1f}s "
+          f"({result['rows'] / result['seconds']:,.0f} rows/s including uploads), {result['parts']} parts, "
+          f"{result['bytes'] / 1e6:.0f} MB, largest {result['largest_part'] / 1e6:.2f} MB "
+          f"(limit {args.part_mib} MiB)")
+    print(f"peak RSS {peak / 1024:.0f} MB (before the export {before / 1024:.0f} MB)")
+    print(f"stats flushes during the export: {result['flushes']}, failed {result['flush_failures']}, "
+          f"slowest {result['flush_max'] * 1000:.0f} ms")
+    return 1 if result["flush_failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
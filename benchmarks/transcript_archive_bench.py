@@ -0,0 +1,207 @@
+"""
+Benchmark for the ticket transcript archive.
+
+Ingests ``--transcripts`` seeded tickets (a shared welcome message, chat in a
+small vocabulary, now and then the same pasted image) spread over 20 guilds,
+then times searches, checks every stored document, and prunes one guild.
+Finally one ``--large-messages`` ticket with attachments up to the per-ticket
+cap is archived from a fake channel through ``archive_channel``, the way a
+closing ticket is, with its peak traced memory reported:
+
+    python -m benchmarks.transcript_archive_bench --transcripts 100000
+
+Reported: tickets/s and per-ticket latency (p50 / p99), raw size against the
+database size, search latency per query, prune time, and the large ticket's
+time and peak memory against the raw bytes it held.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.transcript_archive import (  # noqa: E402
+    MAX_ATTACHMENT_BYTES, MAX_TICKET_ATTACHMENT_BYTES, ZSTD_AVAILABLE, TranscriptArchive, _decompress
+)
+
+GUILDS = 20
+WORDS = ("refund order payment account login error crash discord server role ban appeal verify email password "
+         "bot command premium subscription invoice billing support staff help please thanks hello issue bug report "
+         "screenshot attached urgent delay shipping tracking number cancel upgrade downgrade").split()
+WELCOME = ("Thank you for creating a ticket! A staff member will be with you shortly. " * 8).strip()
+QUERIES = (("refund invoice", None), ("needle7", None), ("crash", 1021), ("payment error screenshot", None))
+
+
+def transcript(ticket: int, rng: random.Random, logo: bytes):
+    """One ticket's records and their raw size"""
+    ts = 1.7e9 + ticket * 600
+    records = [{"id": ticket * 100, "author_id": 1, "author": "TicketBot#0001", "ts": ts, "content": WELCOME,
+                "attachments": [], "embeds": []}]
+    for i in range(rng.randint(8, 30)):
+        content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 25)))
+        if rng.random() < 0.01:
+            content += f" needle{ticket % 1000}"
+        attachments = []
+        if rng.random() < 0.02:
+            attachments.append({"filename": "logo.png", "url": "https://cdn.example/logo.png", "size": len(logo),
+                                "data": logo})
+        records.append({"id": ticket * 100 + i + 1, "author_id": 1000 + (ticket * 7 + i % 2) % 5000,
+                        "author": f"user{i % 2}", "ts": ts + i * 30, "content": content,
+                        "attachments": attachments, "embeds": []})
+    return records, sum(len(record["content"]) + sum(att["size"] for att in record["attachments"])
+                        for record in records)
+
+
+async def _records(records):
+    for record in records:
+        yield record
+
+
+async def run_bulk(archive: TranscriptArchive, transcripts: int, seed: int):
+    rng = random.Random(seed)
+    logo = rng.randbytes(40_000)
+    raw = messages = 0
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for ticket in range(transcripts):
+        records, size = transcript(ticket, rng, logo)
+        raw += size
+        began = time.perf_counter()
+        messages += await archive.ingest(100 + ticket % GUILDS, ticket, f"ticket-{ticket:05d}", _records(records),
+                                         opener_id=1000 + ticket % 5000, closed_by=1)
+        latencies.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    searches = {}
+    for query, author_id in QUERIES:
+        times = []
+        for guild_id in range(100, 100 + GUILDS):
+            began = time.perf_counter()
+            await archive.search(guild_id, query, author_id=author_id)
+            times.append(time.perf_counter() - began)
+        searches[query] = (statistics.median(times), max(times))
+
+    with closing(sqlite3.connect(archive.db_path)) as db:
+        broken = sum(len(_decompress(codec, data).splitlines()) != count for count, codec, data in db.execute("""
+            SELECT t.message_count, b.codec, b.data
+            FROM archived_transcripts t JOIN archive_blobs b ON b.hash = t.document_hash
+        """))
+
+    await archive.set_retention(100, 1)
+    began = time.perf_counter()
+    pruned = await archive.prune(now=time.time() + 2 * 86400)
+    prune_seconds = time.perf_counter() - began
+    size = sum(os.path.getsize(archive.db_path + suffix) for suffix in ("", "-wal")
+               if os.path.exists(archive.db_path + suffix))
+    return {"seconds": elapsed, "messages": messages, "p50": latencies[len(latencies) // 2],
+            "p99": latencies[int(len(latencies) * 0.99)], "raw": raw, "size": size, "searches": searches,
+            "broken": broken, "pruned": pruned, "prune_seconds": prune_seconds}
+
+
+# ---------- a closing ticket, read from a fake channel ----------
+
+class FakeAuthor:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+    def __str__(self):
+        return f"member{self.id}"
+
+
+class FakeAttachment:
+    def __init__(self, filename: str, data: bytes):
+        self.filename = filename
+        self.url = f"https://cdn.example/{filename}"
+        self.size = len(data)
+        self._data = data
+
+    async def read(self) -> bytes:
+        return self._data
+
+
+class FakeMessage:
+    def __init__(self, message_id: int, author_id: int, created_at: float, content: str, attachments):
+        self.id = message_id
+        self.author = FakeAuthor(author_id)
+        self.created_at = datetime.fromtimestamp(created_at, timezone.utc)
+        self.content = content
+        self.attachments = attachments
+        self.embeds = []
+
+
+class FakeChannel:
+    """A ticket channel whose history is produced page by page, like the API returns it"""
+
+    def __init__(self, messages: int, seed: int):
+        self.name = "ticket-large"
+        self.messages = messages
+        self.seed = seed
+        self.raw = 0
+
+    async def history(self, limit=None, oldest_first=False):
+        rng = random.Random(self.seed)
+        for i in range(self.messages):
+            attachments = []
+            # Distinct screenshots until the per-ticket cap is spent, then links only
+            if i % 500 == 0:
+                attachments.append(FakeAttachment(f"screenshot{i}.png", rng.randbytes(MAX_ATTACHMENT_BYTES // 4)))
+            content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 40)))
+            self.raw += len(content) + sum(att.size for att in attachments)
+            yield FakeMessage(i, 1000 + i % 7, 1.7e9 + i, content, attachments)
+            if i % 100 == 99:
+                await asyncio.sleep(0)
+
+
+async def run_large(archive: TranscriptArchive, messages: int, seed: int):
+    channel = FakeChannel(messages, seed)
+    tracemalloc.start()
+    started = time.perf_counter()
+    archived = await archive.archive_channel(1, 10_000_000, channel, opener_id=1000, closed_by=1)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"messages": archived, "seconds": elapsed, "peak": peak, "raw": channel.raw}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--transcripts", type=int, default=100_000)
+    parser.add_argument("--large-messages", type=int, default=50_000)
+    parser.add_argument("--db", metavar="PATH", help="archive database (a fresh temporary one by default)")
+    args = parser.parse_args(argv)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="archive_bench_"), "ticket_archive.db")
+    archive = TranscriptArchive(path)
+    bulk = asyncio.run(run_bulk(archive, args.transcripts, args.seed))
+    print(f"codec {'zstd' if ZSTD_AVAILABLE else 'zlib'}: {args.transcripts:,} transcripts / "
+          f"{bulk['messages']:,} messages in {bulk['seconds']:.0f}s "
+          f"({args.transcripts / bulk['seconds']:,.0f} tickets/s, p50 {bulk['p50'] * 1000:.1f} ms, "
+          f"p99 {bulk['p99'] * 1000:.1f} ms); raw {bulk['raw'] / 1e6:.0f} MB -> database {bulk['size'] / 1e6:.0f} MB")
+    for query, (median, slowest) in bulk["searches"].items():
+        print(f"search {query!r}: median {median * 1000:.1f} ms, max {slowest * 1000:.1f} ms")
+    print(f"documents with a wrong message count: {bulk['broken']}; "
+          f"prune removed {bulk['pruned']:,} transcripts in {bulk['prune_seconds']:.1f}s")
+
+    large = asyncio.run(run_large(archive, args.large_messages, args.seed))
+    print(f"large ticket: {large['messages']:,} messages ({large['raw'] / 1e6:.0f} MB raw, attachments capped at "
+          f"{MAX_TICKET_ATTACHMENT_BYTES / 2 ** 20:.0f} MiB stored) in {large['seconds']:.1f}s, "
+          f"peak traced memory {large['peak'] / 1e6:.0f} MB")
+    return 1 if bulk["broken"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Benchmark for streaming ticket transcripts.
+
+Builds the transcript of one ``--messages`` ticket from a seeded fake channel
+whose history is produced page by page, like the API returns it, first the way
+the tickets cog did before utils.ticket_transcript (every message collected in
+a list, the text grown with ``+=`` and encoded once more for the upload), then
+through ``build_transcript`` for each format:
+
+    python -m benchmarks.transcript_bench --messages 50000
+
+Reported per run: time, peak traced memory and output size. The streamed JSON
+is parsed back with ``json.load`` and its message count checked.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.ticket_transcript import TRANSCRIPT_FORMATS, build_transcript  # noqa: E402
+
+WORDS = ("refund order payment account login error crash discord server role ban appeal verify email password "
+         "bot command premium subscription invoice billing support staff help please thanks hello issue bug report "
+         "screenshot attached urgent delay shipping tracking number cancel upgrade downgrade <b> & \"quoted\"").split()
+
+
+class FakeAuthor:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.display_name = f"Member {user_id}"
+
+    def __str__(self):
+        return f"member{self.id}"
+
+
+class FakeAttachment:
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.url = f"https://cdn.example/attachments/{filename}"
+
+
+class FakeEmbed:
+    def __init__(self, title: str, description: str):
+        self.title = title
+        self.description = description
+
+
+class FakeMessage:
+    def __init__(self, message_id: int, author: FakeAuthor, ts: float, content: str, attachments, embeds):
+        self.id = message_id
+        self.author = author
+        self.created_at = datetime.fromtimestamp(ts, timezone.utc)
+        self.content = content
+        self.attachments = attachments
+        self.embeds = embeds
+
+
+class FakeChannel:
+    """A ticket channel whose history is produced page by page, like the API returns it"""
+
+    def __init__(self, messages: int, seed: int):
+        self.name = "ticket-large"
+        self.messages = messages
+        self.seed = seed
+
+    async def history(self, limit=None, oldest_first=False):
+        rng = random.Random(self.seed)
+        authors = [FakeAuthor(1000 + i) for i in range(7)]
+        for i in range(self.messages):
+            attachments = [FakeAttachment(f"screenshot{i}.png")] if i % 50 == 0 else []
+            embeds = [FakeEmbed("Ticket claimed", "A staff member will help you shortly.")] if i % 200 == 0 else []
+            content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 40)))
+            yield FakeMessage(i, authors[i % 7], 1.7e9 + i, content, attachments, embeds)
+            if i % 100 == 99:
+                await asyncio.sleep(0)
+
+
+async def format_datetime_for_user_custom(dt: datetime, user, fmt: str) -> str:
+    """Stands in for tz_helpers: the old path awaited it once per message"""
+    return dt.strftime(fmt)
+
+
+async def old_transcript(channel: FakeChannel):
+    """The tickets cog before streaming, minus the Discord upload"""
+    messages = []
+    async for message in channel.history(limit=None, oldest_first=True):
+        messages.append(message)
+    transcript_content = f"Ticket Transcript - {channel.name}\n"
+    transcript_content += f"Channel: #{channel.name}\n"
+    transcript_content += "=" * 50 + "\n\n"
+    for message in messages:
+        timestamp = await format_datetime_for_user_custom(message.created_at, None, '%Y-%m-%d %H:%M:%S %Z')
+        author = f"{message.author.display_name} ({message.author})"
+        content = message.content or "[No content]"
+        if message.attachments:
+            content += f" [Attachments: {', '.join(att.filename for att in message.attachments)}]"
+        transcript_content += f"[{timestamp}] {author}: {content}\n"
+    data = io.BytesIO(transcript_content.encode('utf-8'))
+    upload = io.BytesIO(transcript_content.encode('utf-8'))
+    return upload, len(messages), data.getbuffer().nbytes
+
+
+async def streamed_transcript(channel: FakeChannel, fmt: str):
+    sink, extension, count = await build_transcript(channel, fmt)
+    return sink, count, sink.seek(0, io.SEEK_END)
+
+
+async def measure(label: str, build, json_output: bool = False):
+    tracemalloc.start()
+    started = time.perf_counter()
+    output, count, size = await build
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if json_output:
+        # Checked outside the traced window: parsing holds the whole document
+        output.seek(0)
+        assert json.load(output)["message_count"] == count
+    output.close()
+    print(f"{label:18} {count:7,} messages  {elapsed:6.2f}s  peak {peak / 1e6:7.1f} MB  output {size / 1e6:6.1f} MB")
+
+
+async def run(messages: int, seed: int):
+    await measure("old (+=, list)", old_transcript(FakeChannel(messages, seed)))
+    # "text" is an alias of txt
+    for fmt in (fmt for fmt in TRANSCRIPT_FORMATS if fmt != "text"):
+        await measure(f"streamed {fmt}", streamed_transcript(FakeChannel(messages, seed), fmt),
+                      fmt == "json")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--messages", type=int, default=50_000)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.messages, args.seed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
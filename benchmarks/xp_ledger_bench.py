@@ -0,0 +1,159 @@
+"""
+Benchmark for the write-behind XP ledger and its journal replay.
+
+Sends ``--messages`` XP gains from a seeded population of members through
+``XPLedger.add_xp`` without flushing, drops the ledger as a crash would, and
+times the journal replay of the next ``start()``. The replayed table is
+checked against the gains that were sent. For comparison, ``--baseline``
+messages go through the per-message read + UPDATE the ledger replaced:
+
+    python -m benchmarks.xp_ledger_bench --messages 1000000
+
+Reported: gains/s through the ledger, journal size, replay time and peak
+RSS, and messages/s for the per-message path.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import aiosqlite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.xp_ledger import XPLedger  # noqa: E402
+
+GUILDS = 20
+MEMBERS = 5000
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS user_levels (
+        user_id INTEGER,
+        guild_id INTEGER,
+        xp INTEGER DEFAULT 0,
+        level INTEGER DEFAULT 0,
+        total_xp INTEGER DEFAULT 0,
+        messages_sent INTEGER DEFAULT 0,
+        last_xp_gain TEXT,
+        PRIMARY KEY (user_id, guild_id)
+    );
+    CREATE TABLE IF NOT EXISTS guild_level_settings (
+        guild_id INTEGER PRIMARY KEY,
+        level_formula TEXT DEFAULT 'default'
+    );
+"""
+
+
+# The default formula of LevelingSystem.calculate_level_from_xp / calculate_xp_for_level
+def level_from_xp(xp: int, formula: str = "default") -> int:
+    return int(math.sqrt(xp / 1000)) if xp > 0 else 0
+
+
+def xp_for_level(level: int, formula: str = "default") -> int:
+    return int(level ** 2 * 1000) if level > 0 else 0
+
+
+def gains(messages: int, seed: int):
+    """(guild_id, user_id, xp_gain, timestamp); member activity is skewed like a real server"""
+    rng = random.Random(seed)
+    now = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    for _ in range(messages):
+        now += timedelta(milliseconds=rng.randint(1, 500))
+        yield (rng.randint(1, GUILDS), int(rng.paretovariate(1.2)) % MEMBERS + 1,
+               rng.randint(15, 25), now.isoformat())
+
+
+async def create(path: str):
+    async with aiosqlite.connect(path) as db:
+        await db.executescript(SCHEMA)
+        await db.commit()
+
+
+async def run_ledger(path: str, messages: int, seed: int):
+    await create(path)
+    ledger = XPLedger(path, level_from_xp, xp_for_level, flush_interval=1e9)
+    await ledger.start()
+    started = time.perf_counter()
+    xp = 0
+    for guild_id, user_id, xp_gain, timestamp in gains(messages, seed):
+        await ledger.add_xp(guild_id, user_id, xp_gain, "default", timestamp)
+        xp += xp_gain
+    sending = time.perf_counter() - started
+    # Crash: nothing was flushed, every gain is only in the journal
+    ledger._flush_task.cancel()
+    ledger._journal.close()
+    journal_bytes = os.path.getsize(ledger.journal_path)
+
+    replayed = XPLedger(path, level_from_xp, xp_for_level, flush_interval=1e9)
+    started = time.perf_counter()
+    await replayed.start()
+    replay = time.perf_counter() - started
+    await replayed.stop()
+
+    async with aiosqlite.connect(path) as db:
+        async with db.execute("SELECT COUNT(*), SUM(messages_sent), SUM(total_xp) FROM user_levels") as cursor:
+            members, sent, total_xp = await cursor.fetchone()
+    return {"sending": sending, "journal_bytes": journal_bytes, "replay": replay, "members": members,
+            "consistent": sent == messages and total_xp == xp}
+
+
+async def run_per_message(path: str, messages: int, seed: int) -> float:
+    """LevelingSystem.get_user_data + update_user_xp as they were before the ledger"""
+    await create(path)
+    started = time.perf_counter()
+    for guild_id, user_id, xp_gain, timestamp in gains(messages, seed):
+        async with aiosqlite.connect(path) as db:
+            async with db.execute("SELECT * FROM user_levels WHERE guild_id = ? AND user_id = ?",
+                                  (guild_id, user_id)) as cursor:
+                row = await cursor.fetchone()
+            if not row:
+                await db.execute("INSERT OR IGNORE INTO user_levels (user_id, guild_id) VALUES (?, ?)", (user_id, guild_id))
+                await db.commit()
+                total_xp = 0
+            else:
+                total_xp = row[4]
+        new_total_xp = total_xp + xp_gain
+        level = level_from_xp(new_total_xp)
+        async with aiosqlite.connect(path) as db:
+            await db.execute("""
+                UPDATE user_levels
+                SET xp = ?, level = ?, total_xp = ?, messages_sent = messages_sent + 1, last_xp_gain = ?
+                WHERE user_id = ? AND guild_id = ?
+            """, (new_total_xp - xp_for_level(level), level, new_total_xp, timestamp, user_id, guild_id))
+            await db.commit()
+    return time.perf_counter() - started
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--baseline", type=int, default=5000, metavar="MESSAGES",
+                        help="messages sent through the per-message path (0 to skip)")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="xp_ledger_bench_")
+    result = asyncio.run(run_ledger(os.path.join(directory, "leveling.db"), args.messages, args.seed))
+    print(f"ledger: {args.messages:,} gains in {result['sending']:.1f}s "
+          f"({args.messages / result['sending']:,.0f}/s), journal {result['journal_bytes'] / 1e6:.0f} MB")
+    print(f"replay: {result['members']:,} members in {result['replay']:.2f}s "
+          f"({args.messages / result['replay']:,.0f} entries/s), "
+          f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB, "
+          f"{'consistent' if result['consistent'] else 'MISMATCH'}")
+    if args.baseline:
+        seconds = asyncio.run(run_per_message(os.path.join(directory, "per_message.db"), args.baseline, args.seed))
+        print(f"per-message: {args.baseline:,} messages in {seconds:.1f}s ({args.baseline / seconds:,.0f}/s)")
+    return 0 if result["consistent"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,13 @@
-import discord
 from discord.ext import commands
 import aiosqlite
 import re
-from datetime import timedelta
+from utils.automod_actions import get_automod_coalescer
 import asyncio
 
 class AntiEmojiSpam(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.coalescer = get_automod_coalescer(bot)
         self.emoji_threshold = 5  
 
     async def is_automod_enabled(self, guild_id):
@@ -38,25 +38,6 @@ class AntiEmojiSpam(commands.Cog):
             result = await cursor.fetchone()
             return result[0] if result else None
 
-    async def log_action(self, guild, user, channel, action, reason):
-        async with aiosqlite.connect("db/automod.db") as db:
-            cursor = await db.execute("SELECT log_channel FROM automod_logging WHERE guild_id = ?", (guild.id,))
-            log_channel_id = await cursor.fetchone()
-
-        if log_channel_id and log_channel_id[0]:
-            log_channel = guild.get_channel(log_channel_id[0])
-            if log_channel:
-                embed = discord.Embed(title="Automod Log: Anti Emoji Spam", color=0xff0000)
-                embed.add_field(name="User", value=user.mention, inline=False)
-                embed.add_field(name="Action", value=action, inline=False)
-                embed.add_field(name="Channel", value=channel.mention, inline=False)
-                embed.add_field(name="Reason", value=reason, inline=False)
-                embed.set_footer(text=f"User ID: {user.id}")
-                avatar_url = user.avatar.url if user.avatar else user.default_avatar.url
-                embed.set_thumbnail(url=avatar_url)
-                embed.timestamp=discord.utils.utcnow()
-                await log_channel.send(embed=embed)
-
     @commands.Cog.listener()
     async def on_message(self, message):
         if message.author.bot:
@@ -110,38 +91,13 @@ class AntiEmojiSpam(commands.Cog):
 
         if emoji_count > self.emoji_threshold:
             punishment = await self.get_punishment(guild_id)
-            action_taken = None
             reason = f"Emoji Spam ({emoji_count} emojis)"
 
-            try:
-                if punishment == "Mute":
-                    timeout_duration = discord.utils.utcnow() + timedelta(minutes=1)
-                    await user.edit(timed_out_until=timeout_duration, reason=reason)
-                    action_taken = "Muted for 1 minute"
-                elif punishment == "Kick":
-                    await user.kick(reason=reason)
-                    action_taken = "Kicked"
-                elif punishment == "Ban":
-                    await user.ban(reason=reason)
-                    action_taken = "Banned"
-
-                await message.delete()
-                
-                simple_embed = discord.Embed(title="Automod Anti Emoji Spam", color=0xff0000)
-                simple_embed.description = f"<:feast_tick:1400143469892210753> | {user.mention} has been successfully **{action_taken}** for **Spamming Emojis.**"
-                
-                simple_embed.set_footer(text="Use the “automod logging” command to get automod logs if it is not enabled.", icon_url=self.bot.user.avatar.url)
-                await channel.send(embed=simple_embed, delete_after=30)
-
-                
-                await self.log_action(guild, user, channel, action_taken, reason)
-
-            except discord.Forbidden:
-                pass
-            except discord.HTTPException:
-                pass
-            except Exception:
-                pass
+            await self.coalescer.handle(
+                message, event="Anti Emoji Spam", punishment=punishment, reason=reason,
+                timeout_minutes=1, mute_label="Muted for 1 minute",
+                notice_title="Automod Anti Emoji Spam", notice_text="Spamming Emojis."
+            )
 
     @commands.Cog.listener()
     async def on_rate_limit(self, message):
@@ -2,13 +2,13 @@ import discord
 from discord.ext import commands
 import aiosqlite
 import asyncio
-from datetime import timedelta
-import re
+from utils.automod_actions import get_automod_coalescer
+from utils.link_scanner import scan_links
 
 class AntiInvite(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.invite_pattern = re.compile(r'(https?://)?(www\.)?(discord\.gg|discordapp\.com/invite|discord\.com/invite)/\S+')
+        self.coalescer = get_automod_coalescer(bot)
 
     async def is_automod_enabled(self, guild_id):
         async with aiosqlite.connect("db/automod.db") as db:
@@ -38,25 +38,6 @@ class AntiInvite(commands.Cog):
             result = await cursor.fetchone()
             return result[0] if result else None
 
-    async def log_action(self, guild, user, channel, action, reason):
-        async with aiosqlite.connect("db/automod.db") as db:
-            cursor = await db.execute("SELECT log_channel FROM automod_logging WHERE guild_id = ?", (guild.id,))
-            log_channel_id = await cursor.fetchone()
-
-        if log_channel_id and log_channel_id[0]:
-            log_channel = guild.get_channel(log_channel_id[0])
-            if log_channel:
-                embed = discord.Embed(title="Automod Log: Anti-Invite", color=0xff0000)
-                embed.add_field(name="User", value=user.mention, inline=False)
-                embed.add_field(name="Action", value=action, inline=False)
-                embed.add_field(name="Channel", value=channel.mention, inline=False)
-                embed.add_field(name="Reason", value=reason, inline=False)
-                embed.set_footer(text=f"User ID: {user.id}")
-                avatar_url = user.avatar.url if user.avatar else user.default_avatar.url
-                embed.set_thumbnail(url=avatar_url)
-                embed.timestamp=discord.utils.utcnow()
-                await log_channel.send(embed=embed)
-
     @commands.Cog.listener()
     async def on_message(self, message):
         if message.author.bot:
@@ -70,6 +51,10 @@ class AntiInvite(commands.Cog):
         channel = message.channel
         guild_id = guild.id
 
+        invite_codes = {token.code for token in scan_links(message.content) if token.kind == "invite"}
+        if not invite_codes:
+            return
+
         if not await self.is_automod_enabled(guild_id) or not await self.is_anti_invites_enabled(guild_id):
             return
 
@@ -84,48 +69,22 @@ class AntiInvite(commands.Cog):
         if any(role.id in ignored_roles for role in user.roles):
             return
 
-        match = self.invite_pattern.search(message.content)
-        if match:
-            invite_link = match.group(0)
-            invite_code = invite_link.split('/')[-1]
-
+        if invite_codes:
             try:
-                invite = await guild.invites()
-                if any(invite.code == invite_code for invite in invite):
-                    return  
+                own_codes = {invite.code for invite in await guild.invites()}
+                if guild.vanity_url_code:
+                    own_codes.add(guild.vanity_url_code)
+                if invite_codes <= own_codes:
+                    return
 
                 punishment = await self.get_punishment(guild_id)
-                action_taken = None
                 reason = "Posted an invite link"
 
-                try:
-                    if punishment == "Mute":
-                        timeout_duration = discord.utils.utcnow() + timedelta(minutes=12)
-                        await user.edit(timed_out_until=timeout_duration, reason="Posted an invite link")
-                        action_taken = "Muted for 12 minutes"
-                    elif punishment == "Kick":
-                        await user.kick(reason="Posted an invite link")
-                        action_taken = "Kicked"
-                    elif punishment == "Ban":
-                        await user.ban(reason="Posted an invite link")
-                        action_taken = "Banned"
-                        
-                    await message.delete()
-
-                    simple_embed = discord.Embed(title="Automod Anti-Invite", color=0xff0000)
-                    simple_embed.description = f"<:feast_tick:1400143469892210753> | {user.mention} has been successfully **{action_taken}** for **posting an invite link.**"
-                    
-                    simple_embed.set_footer(text="Use the “automod logging” command to get automod logs if it is not enabled.", icon_url=self.bot.user.avatar.url)
-                    await channel.send(embed=simple_embed, delete_after=30)
-
-                    await self.log_action(guild, user, channel, action_taken, reason)
-
-                except discord.Forbidden:
-                    pass
-                except discord.HTTPException:
-                    pass
-                except Exception:
-                    pass
+                await self.coalescer.handle(
+                    message, event="Anti-Invite", punishment=punishment, reason=reason,
+                    timeout_minutes=12, mute_label="Muted for 12 minutes",
+                    notice_title="Automod Anti-Invite", notice_text="posting an invite link."
+                )
 
             except discord.Forbidden:
                 pass
@@ -1,15 +1,15 @@
 # Extension loader for Discord.py
 async def setup(bot):
     await bot.add_cog(AntiCaps(bot))
-import discord
 from discord.ext import commands
 import aiosqlite
 import asyncio
-from datetime import timedelta
+from utils.automod_actions import get_automod_coalescer
 
 class AntiCaps(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.coalescer = get_automod_coalescer(bot)
         self.caps_threshold = 70
         self.mute_duration = 2 * 60
 
@@ -41,25 +41,6 @@ class AntiCaps(commands.Cog):
             result = await cursor.fetchone()
             return result[0] if result else None
 
-    async def log_action(self, guild, user, channel, action, reason):
-        async with aiosqlite.connect("db/automod.db") as db:
-            cursor = await db.execute("SELECT log_channel FROM automod_logging WHERE guild_id = ?", (guild.id,))
-            log_channel_id = await cursor.fetchone()
-
-        if log_channel_id and log_channel_id[0]:
-            log_channel = guild.get_channel(log_channel_id[0])
-            if log_channel:
-                embed = discord.Embed(title="Automod Log: Anti-Caps", color=0xff0000)
-                embed.add_field(name="User", value=user.mention, inline=False)
-                embed.add_field(name="Action", value=action, inline=False)
-                embed.add_field(name="Channel", value=channel.mention, inline=False)
-                embed.add_field(name="Reason", value=reason, inline=False)
-                embed.set_footer(text=f"User ID: {user.id}")
-                avatar_url = user.avatar.url if user.avatar else user.default_avatar.url
-                embed.set_thumbnail(url=avatar_url)
-                embed.timestamp=discord.utils.utcnow()
-                await log_channel.send(embed=embed)
-
     @commands.Cog.listener()
     async def on_message(self, message):
         if len(message.content) < 45:
@@ -97,36 +78,13 @@ class AntiCaps(commands.Cog):
 
             if caps_percentage > self.caps_threshold:
                 punishment = await self.get_punishment(guild_id)
-                action_taken = None
                 reason = "Excessive Caps"
 
-                try:
-                    if punishment == "Mute":
-                        timeout_duration = discord.utils.utcnow() + timedelta(minutes=1)
-                        await user.edit(timed_out_until=timeout_duration, reason="Excessive Caps")
-                        action_taken = "Muted for 1 minutes"
-                    elif punishment == "Kick":
-                        await user.kick(reason="Excessive Caps")
-                        action_taken = "Kicked"
-                    elif punishment == "Ban":
-                        await user.ban(reason="Excessive Caps")
-                        action_taken = "Banned"
-                    await message.delete()
-
-                    simple_embed = discord.Embed(title="Automod Anti-Caps", color=0xff0000)
-                    simple_embed.description = f"<:feast_tick:1400143469892210753> | {user.mention} has been successfully **{action_taken}** for **Excessive caps.**"
-                    
-                    simple_embed.set_footer(text="Use the “automod logging” command to get automod logs if it is not enabled.", icon_url=self.bot.user.avatar.url)
-                    await channel.send(embed=simple_embed, delete_after=30)
-
-                    await self.log_action(guild, user, channel, action_taken, reason)
-
-                except discord.Forbidden:
-                    pass
-                except discord.HTTPException:
-                    pass
-                except Exception:
-                    pass
+                await self.coalescer.handle(
+                    message, event="Anti-Caps", punishment=punishment, reason=reason,
+                    timeout_minutes=1, mute_label="Muted for 1 minutes",
+                    notice_title="Automod Anti-Caps", notice_text="Excessive caps."
+                )
 
     @commands.Cog.listener()
     async def on_rate_limit(self, message):
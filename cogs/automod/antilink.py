@@ -1,17 +1,32 @@
-import discord
 from discord.ext import commands
 import aiosqlite
 import asyncio
-from datetime import timedelta
-import re
+from utils.automod_actions import get_automod_coalescer
+from utils.link_scanner import scan_links, compile_link_rules, is_link_allowed
 
 class AntiLink(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.link_pattern = re.compile(r'http[s]?://\S+')
-        self.invite_pattern = re.compile(r'(https?://)?(www\.)?(discord\.(gg|io|me|li)|discordapp\.com/invite)/\S+')
-        self.gif_pattern = re.compile(r'(\.gif$|^https://(tenor\.com|giphy\.com/gifs|cdn\.discordapp\.com|media\.discordapp\.net))')
-        self.spotify_pattern = re.compile(r'^https://open\.spotify\.com/track/\S+')
+        self.coalescer = get_automod_coalescer(bot)
+        # guild_id -> compiled DomainTrie, dropped by the automod link commands on change
+        self.link_rules = {}
+
+    async def get_link_rules(self, guild_id):
+        rules = self.link_rules.get(guild_id)
+        if rules is None:
+            rows = []
+            try:
+                async with aiosqlite.connect("db/automod.db") as db:
+                    cursor = await db.execute("SELECT domain, action FROM automod_link_rules WHERE guild_id = ?", (guild_id,))
+                    rows = await cursor.fetchall()
+            except aiosqlite.OperationalError:
+                pass
+            rules = compile_link_rules(rows)
+            self.link_rules[guild_id] = rules
+        return rules
+
+    def invalidate_link_rules(self, guild_id):
+        self.link_rules.pop(guild_id, None)
 
     async def is_automod_enabled(self, guild_id):
         async with aiosqlite.connect("db/automod.db") as db:
@@ -41,25 +56,6 @@ class AntiLink(commands.Cog):
             result = await cursor.fetchone()
             return result[0] if result else None
 
-    async def log_action(self, guild, user, channel, action, reason):
-        async with aiosqlite.connect("db/automod.db") as db:
-            cursor = await db.execute("SELECT log_channel FROM automod_logging WHERE guild_id = ?", (guild.id,))
-            log_channel_id = await cursor.fetchone()
-
-        if log_channel_id and log_channel_id[0]:
-            log_channel = guild.get_channel(log_channel_id[0])
-            if log_channel:
-                embed = discord.Embed(title="Automod Log: Anti-Link", color=0xff0000)
-                embed.add_field(name="User", value=user.mention, inline=False)
-                embed.add_field(name="Action", value=action, inline=False)
-                embed.add_field(name="Channel", value=channel.mention, inline=False)
-                embed.add_field(name="Reason", value=reason, inline=False)
-                embed.set_footer(text=f"User ID: {user.id}")
-                avatar_url = user.avatar.url if user.avatar else user.default_avatar.url
-                embed.set_thumbnail(url=avatar_url)
-                embed.timestamp=discord.utils.utcnow()
-                await log_channel.send(embed=embed)
-
     @commands.Cog.listener()
     async def on_message(self, message):
         if message.author.bot:
@@ -73,6 +69,12 @@ class AntiLink(commands.Cog):
         channel = message.channel
         guild_id = guild.id
 
+        # Scan before touching the database - most messages carry no link at all.
+        # Messages with invites are left to Anti Invites.
+        tokens = scan_links(message.content)
+        if not tokens or any(token.kind == "invite" for token in tokens):
+            return
+
         if not await self.is_automod_enabled(guild_id) or not await self.is_anti_link_enabled(guild_id):
             return
 
@@ -87,45 +89,16 @@ class AntiLink(commands.Cog):
         if any(role.id in ignored_roles for role in user.roles):
             return
 
-        if self.link_pattern.search(message.content):
-            if self.invite_pattern.search(message.content):
-                return
-            if self.gif_pattern.search(message.content): 
-                return
-            if self.spotify_pattern.search(message.content):
-                return
-
+        rules = await self.get_link_rules(guild_id)
+        if not all(is_link_allowed(token, rules) for token in tokens):
             punishment = await self.get_punishment(guild_id)
-            action_taken = None
             reason = "Posted a link"
 
-            try:
-                if punishment == "Mute":
-                    timeout_duration = discord.utils.utcnow() + timedelta(minutes=7)
-                    await user.edit(timed_out_until=timeout_duration, reason=reason)
-                    action_taken = "Muted for 7 minutes"
-                elif punishment == "Kick":
-                    await user.kick(reason=reason)
-                    action_taken = "Kicked"
-                elif punishment == "Ban":
-                    await user.ban(reason=reason)
-                    action_taken = "Banned"
-                await message.delete()
-
-                simple_embed = discord.Embed(title="Automod Anti-Link", color=0xff0000)
-                simple_embed.description = f"<:feast_tick:1400143469892210753> | {user.mention} has been successfully **{action_taken}** for **Posting a link.**"
-                
-                simple_embed.set_footer(text="Use the “automod logging” command to get automod logs if it is not enabled.", icon_url=self.bot.user.avatar.url)
-                await channel.send(embed=simple_embed, delete_after=30)
-
-                await self.log_action(guild, user, channel, action_taken, reason)
-
-            except discord.Forbidden:
-                pass
-            except discord.HTTPException:
-                pass
-            except Exception:
-                pass
+            await self.coalescer.handle(
+                message, event="Anti-Link", punishment=punishment, reason=reason,
+                timeout_minutes=7, mute_label="Muted for 7 minutes",
+                notice_title="Automod Anti-Link", notice_text="Posting a link."
+            )
 
     @commands.Cog.listener()
     async def on_rate_limit(self, message):
@@ -3,6 +3,7 @@ from discord.ext import commands
 import aiosqlite
 from utils.Tools import *
 from utils.dynamic_dropdowns import PaginatedChannelView
+from utils.link_scanner import normalize_domain, ALLOW, DENY
 
 from utils.error_helpers import StandardErrorHandler
 class ShowRules(discord.ui.View):
@@ -20,7 +21,7 @@ class ShowRules(discord.ui.View):
         rules = {
             "Anti NSFW link": "__**Anti NSFW Link**__:\n• Takes action if the message contains a NSFW link.\n• Default punishment: Block message (unchangeable)",
             "Anti caps": "__**Anti Caps**__:\n• Takes action if the message contains >70% caps.\n• Messages under 45 characters are bypassed\n• Default punishment: Mute (1 minutes)",
-            "Anti link": "__**Anti Link**__:\n• Takes action if the message contains a link.\n• Server invites, Spotify Music and GIF links are bypassed\n• Default punishment: Mute (7 minutes)",
+            "Anti link": "__**Anti Link**__:\n• Takes action if the message contains a link.\n• Server invites, Spotify Music, GIF links and domains allowed with `automod links` are bypassed\n• Default punishment: Mute (7 minutes)",
             "Anti invites": "__**Anti Invites**__:\n• Takes action if the message contains a Discord server invite.\n• Invites from the current server are bypassed\n• Default punishment: Mute (12 minutes)",
             "Anti emoji spam": "__**Anti Emoji Spam**__:\n• Takes action if a message contains more than 5 emojis.\n• Default punishment: Mute (1 minute)",
             "Anti mass mention": "__**Anti Mass Mention**__:\n• Takes action if a message contains more than 4 mentions.\n• Default punishment: Mute (3 minutes)",
@@ -141,8 +142,21 @@ class Automod(commands.Cog):
                     PRIMARY KEY (guild_id)
                 )
             """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS automod_link_rules (
+                    guild_id INTEGER,
+                    domain TEXT,
+                    action TEXT,
+                    PRIMARY KEY (guild_id, domain)
+                )
+            """)
             await db.commit()
 
+    def invalidate_link_rules(self, guild_id):
+        antilink = self.bot.get_cog("AntiLink")
+        if antilink:
+            antilink.invalidate_link_rules(guild_id)
+
     @commands.hybrid_group(invoke_without_command=True)
     @blacklist_check()
     @ignore_check()
@@ -766,6 +780,113 @@ class Automod(commands.Cog):
             await ctx.send(embed=embed)
     
 
+    @automod.group(name="links", aliases=["linkrules"], invoke_without_command=True, help="Manage allowed and denied domains for Anti Link.")
+    @blacklist_check()
+    @ignore_check()
+    @commands.cooldown(1, 4, commands.BucketType.user)
+    async def links(self, ctx):
+        if ctx.subcommand_passed is None:
+            await ctx.send_help(ctx.command)
+            ctx.command.reset_cooldown(ctx)
+
+    async def set_link_rule(self, ctx, domain, action):
+        guild_id = ctx.guild.id
+        if not await self.is_automod_enabled(guild_id):
+            embed=discord.Embed(title=f"Automod Settings for {ctx.guild.name}", description=f"Uhh, looks like your server hasn't enabled Automoderation.\n\nCurrent Status:  <a:disabled1:1329022921427128321> Disabled\nTo Enable use `{ctx.prefix}automod enable`", color=0x006fb9)
+            embed.set_thumbnail(url=self.bot.user.avatar.url)
+            embed.set_footer(text=f"“{ctx.command.qualified_name}” Command executed by {ctx.author}",
+                   icon_url=ctx.author.avatar.url if ctx.author.avatar else ctx.author.default_avatar.url)
+            await ctx.send(embed=embed)
+            return
+
+        domain = normalize_domain(domain.split("://")[-1].split("/")[0])
+        if not domain or domain == "*" or " " in domain:
+            await ctx.send("Please provide a domain such as `example.com` or `*.example.com`.")
+            return
+
+        async with aiosqlite.connect("db/automod.db") as db:
+            # Switching an existing rule between allow and deny doesn't count towards the limit
+            existing_cursor = await db.execute("SELECT 1 FROM automod_link_rules WHERE guild_id = ? AND domain = ?", (guild_id, domain))
+            if not await existing_cursor.fetchone():
+                count_cursor = await db.execute("SELECT COUNT(*) FROM automod_link_rules WHERE guild_id = ?", (guild_id,))
+                count = await count_cursor.fetchone()
+                if count and count[0] >= 500:
+                    await ctx.send("You can only add up to 500 link rules.")
+                    return
+
+            await db.execute("INSERT OR REPLACE INTO automod_link_rules (guild_id, domain, action) VALUES (?, ?, ?)", (guild_id, domain, action))
+            await db.commit()
+        self.invalidate_link_rules(guild_id)
+
+        verb = "allowed" if action == ALLOW else "denied"
+        embed = discord.Embed(title="<:feast_tick:1400143469892210753> Success", description=f"`{domain}` is now **{verb}** by Anti Link.\n\n➜ Use `*.{domain.lstrip('*.')}` to cover its subdomains.", color=0x006fb9)
+        embed.set_footer(text=f"“{ctx.command.qualified_name}” Command executed by {ctx.author}",
+               icon_url=ctx.author.avatar.url if ctx.author.avatar else ctx.author.default_avatar.url)
+        await ctx.send(embed=embed)
+
+    @links.command(name="allow", help="Allow a domain (use *.domain for subdomains).")
+    @blacklist_check()
+    @ignore_check()
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def links_allow(self, ctx, domain: str):
+        await self.set_link_rule(ctx, domain, ALLOW)
+
+    @links.command(name="deny", help="Deny a domain, overriding a broader allow rule.")
+    @blacklist_check()
+    @ignore_check()
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def links_deny(self, ctx, domain: str):
+        await self.set_link_rule(ctx, domain, DENY)
+
+    @links.command(name="remove", aliases=["delete"], help="Remove a domain rule.")
+    @blacklist_check()
+    @ignore_check()
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def links_remove(self, ctx, domain: str):
+        domain = normalize_domain(domain)
+        async with aiosqlite.connect("db/automod.db") as db:
+            result = await db.execute("DELETE FROM automod_link_rules WHERE guild_id = ? AND domain = ?", (ctx.guild.id, domain))
+            await db.commit()
+        self.invalidate_link_rules(ctx.guild.id)
+
+        if result.rowcount > 0:
+            embed = discord.Embed(title="<:feast_tick:1400143469892210753> Success", description=f"The rule for `{domain}` has been removed.", color=0x006fb9)
+        else:
+            embed = discord.Embed(title="<:feast_cross:1400143488695144609> Error", description=f"There is no rule for `{domain}`.", color=0x006fb9)
+        embed.set_footer(text=f"“{ctx.command.qualified_name}” Command executed by {ctx.author}",
+               icon_url=ctx.author.avatar.url if ctx.author.avatar else ctx.author.default_avatar.url)
+        await ctx.send(embed=embed)
+
+    @links.command(name="show", aliases=["view", "list"], help="Show the Anti Link domain rules.")
+    @blacklist_check()
+    @ignore_check()
+    @commands.cooldown(1, 5, commands.BucketType.user)
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def links_show(self, ctx):
+        async with aiosqlite.connect("db/automod.db") as db:
+            cursor = await db.execute("SELECT domain, action FROM automod_link_rules WHERE guild_id = ? ORDER BY domain", (ctx.guild.id,))
+            rows = await cursor.fetchall()
+
+        if not rows:
+            await ctx.reply("No link rules found. GIF and Spotify links are always allowed.")
+            return
+
+        allowed = [f"`{domain}`" for domain, action in rows if action == ALLOW]
+        denied = [f"`{domain}`" for domain, action in rows if action == DENY]
+
+        embed = discord.Embed(title="Anti Link Domain Rules", color=0x006fb9)
+        embed.add_field(name="__Allowed:__", value=", ".join(allowed)[:1024] if allowed else "None", inline=False)
+        embed.add_field(name="__Denied:__", value=", ".join(denied)[:1024] if denied else "None", inline=False)
+        await ctx.send(embed=embed)
+    
+
     @automod.command(name="disable", help="Disable Automod in the server.")
     @blacklist_check()
     @ignore_check()
@@ -988,7 +1109,9 @@ class Automod(commands.Cog):
             await db.execute("DELETE FROM automod_punishments WHERE guild_id = ?", (guild_id,))
             await db.execute("DELETE FROM automod_ignored WHERE guild_id = ?", (guild_id,))
             await db.execute("DELETE FROM automod_logging WHERE guild_id = ?", (guild_id,))
+            await db.execute("DELETE FROM automod_link_rules WHERE guild_id = ?", (guild_id,))
             await db.commit()
+        self.invalidate_link_rules(guild_id)
 
 """
 @Author: Frosty
@@ -2,6 +2,7 @@ import discord
 from discord.ext import commands, tasks
 import aiosqlite
 import asyncio
+import contextlib
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 import os
@@ -19,6 +20,11 @@ except ImportError:
 
 # Import custom checks
 from utils.Tools import blacklist_check, ignore_check
+from utils.stats_aggregator import StatsAggregator
+from utils.chart_service import ChartJob, get_chart_service
+from utils.stats_rollup import StatsRollup
+from utils.stats_export import EXPORT_FORMATS, PARQUET_AVAILABLE, export_stats
+from utils.voice_sessions import get_voice_session_engine
 
 # Import professional canvas generator (cv2-based for better quality)
 try:
@@ -28,20 +34,7 @@ except ImportError:
     CANVAS_AVAILABLE = False
     print("[STATS] Professional canvas generator not available")
 
-
-class DummyChartGenerator:
-    """Dummy chart generator when matplotlib is not available"""
-    async def generate_server_overview(self, *args, **kwargs):
-        return None
-    
-    async def generate_user_stats(self, *args, **kwargs):
-        return None
-    
-    async def generate_message_stats(self, *args, **kwargs):
-        return None
-    
-    async def generate_voice_stats(self, *args, **kwargs):
-        return None
+CANVAS_GENERATOR = "utils.statbot_canvas_cv2:StatBotCanvasCV2"
 
 
 class StatBotStyleGenerator:
@@ -404,12 +397,15 @@ class ComprehensiveStats(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.stats_db = "databases/stats.db"
+        # Hourly message/voice increments, flushed to the stats db in batches
+        self.aggregator = StatsAggregator(self.stats_db)
+        # Hourly rows roll up into daily/monthly tables; queries go through rollup.source()
+        self.rollup = StatsRollup(self.stats_db)
+        # Voice sessions are tracked by the shared engine, which publishes their durations
+        self.voice_engine = get_voice_session_engine(bot)
         
-        # Initialize chart generator
-        if CHARTS_AVAILABLE:
-            self.chart_generator = StatBotStyleGenerator()
-        else:
-            self.chart_generator = DummyChartGenerator()
+        # Charts and canvases render in worker processes, cached per (guild, query, period, theme)
+        self.chart_service = get_chart_service()
         
         # Initialize professional canvas generator with timezone (cv2-based)
         if CANVAS_AVAILABLE:
@@ -422,11 +418,18 @@ class ComprehensiveStats(commands.Cog):
     async def cog_load(self):
         """Called when the cog is loaded"""
         await self.init_database()
+        await self.rollup.start()
+        self.aggregator.start()
+        self.voice_engine.subscribe(self.on_voice_segments)
+        await self.voice_engine.start()
     
     async def cog_unload(self):
-        """Called when the cog is unloaded - cleanup database connections"""
-        # Any cleanup code if needed
-        pass
+        """Called when the cog is unloaded - write out buffered stats"""
+        # Leaving the engine credits open voice sessions up to now
+        await self.voice_engine.unsubscribe(self.on_voice_segments)
+        await self.aggregator.stop()
+        await self.rollup.stop()
+        self.chart_service.shutdown()
     
     async def init_database(self):
         """Initialize the statistics database"""
@@ -505,73 +508,24 @@ class ComprehensiveStats(commands.Cog):
         
         try:
             current_time = datetime.now(timezone.utc)
-            date_str = current_time.strftime("%Y-%m-%d")
-            hour = current_time.hour
             
-            # Count message properties
-            char_count = len(message.content)
-            word_count = len(message.content.split())
-            attachment_count = len(message.attachments)
-            mention_count = len(message.mentions)
-            
-            async with aiosqlite.connect(self.stats_db) as db:
-                await db.execute("""
-                    INSERT OR REPLACE INTO message_stats 
-                    (guild_id, user_id, channel_id, date, hour, count, characters, words, attachments, mentions)
-                    VALUES (?, ?, ?, ?, ?, 
-                           COALESCE((SELECT count FROM message_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + 1,
-                           COALESCE((SELECT characters FROM message_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?,
-                           COALESCE((SELECT words FROM message_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?,
-                           COALESCE((SELECT attachments FROM message_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?,
-                           COALESCE((SELECT mentions FROM message_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?)
-                """, (
-                    message.guild.id, message.author.id, message.channel.id, date_str, hour,
-                    message.guild.id, message.author.id, message.channel.id, date_str, hour,
-                    message.guild.id, message.author.id, message.channel.id, date_str, hour, char_count,
-                    message.guild.id, message.author.id, message.channel.id, date_str, hour, word_count,
-                    message.guild.id, message.author.id, message.channel.id, date_str, hour, attachment_count,
-                    message.guild.id, message.author.id, message.channel.id, date_str, hour, mention_count
-                ))
-                await db.commit()
+            self.aggregator.add_message(
+                message.guild.id, message.author.id, message.channel.id, current_time,
+                characters=len(message.content),
+                words=len(message.content.split()),
+                attachments=len(message.attachments),
+                mentions=len(message.mentions)
+            )
                 
         except Exception as e:
             print(f"Error tracking message: {e}")
     
-    @commands.Cog.listener()
-    async def on_voice_state_update(self, member, before, after):
-        """Track voice statistics"""
-        if member.bot:
-            return
-        
-        try:
-            current_time = datetime.now(timezone.utc)
-            
-            # Handle voice session tracking
-            if before.channel != after.channel:
-                # User left a voice channel
-                if before.channel:
-                    # Calculate session duration (simplified for now)
-                    session_duration = 60  # Default 1 minute for now
-                    
-                    date_str = current_time.strftime("%Y-%m-%d")
-                    hour = current_time.hour
-                    
-                    async with aiosqlite.connect(self.stats_db) as db:
-                        await db.execute("""
-                            INSERT OR REPLACE INTO voice_stats 
-                            (guild_id, user_id, channel_id, date, hour, duration, duration_minutes)
-                            VALUES (?, ?, ?, ?, ?, 
-                                   COALESCE((SELECT duration FROM voice_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?,
-                                   COALESCE((SELECT duration_minutes FROM voice_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?)
-                        """, (
-                            member.guild.id, member.id, before.channel.id, date_str, hour,
-                            member.guild.id, member.id, before.channel.id, date_str, hour, session_duration,
-                            member.guild.id, member.id, before.channel.id, date_str, hour, session_duration / 60
-                        ))
-                        await db.commit()
-                        
-        except Exception as e:
-            print(f"Error tracking voice: {e}")
+    async def on_voice_segments(self, segments):
+        """Credit published voice time to the hours it covered"""
+        for segment in segments:
+            if not segment.bot:
+                self.aggregator.add_voice(segment.guild_id, segment.user_id, segment.channel_id,
+                                          segment.start, segment.end)
     
     # ==========================================
     # STATISTICS COMMANDS
@@ -626,9 +580,9 @@ class ComprehensiveStats(commands.Cog):
                 messages_yesterday = (result[0] if result and result[0] else 0)
                 
                 # This week's messages
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT SUM(count), SUM(characters), SUM(words), COUNT(DISTINCT user_id)
-                    FROM message_stats WHERE guild_id = ? AND date >= ?
+                    FROM {self.rollup.source('message', week_ago)} WHERE guild_id = ? AND date >= ?
                 """, (ctx.guild.id, week_ago))
                 week_data = await cursor.fetchone()
                 messages_week = (week_data[0] if week_data and week_data[0] else 0)
@@ -637,18 +591,18 @@ class ComprehensiveStats(commands.Cog):
                 active_users_week = (week_data[3] if week_data and week_data[3] else 0)
                 
                 # This month's messages
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT SUM(count), COUNT(DISTINCT user_id)
-                    FROM message_stats WHERE guild_id = ? AND date >= ?
+                    FROM {self.rollup.source('message', month_ago)} WHERE guild_id = ? AND date >= ?
                 """, (ctx.guild.id, month_ago))
                 month_data = await cursor.fetchone()
                 messages_month = (month_data[0] if month_data and month_data[0] else 0)
                 active_users_month = (month_data[1] if month_data and month_data[1] else 0)
                 
                 # All-time messages
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT SUM(count), COUNT(DISTINCT user_id), COUNT(DISTINCT date), MIN(date)
-                    FROM message_stats WHERE guild_id = ?
+                    FROM {self.rollup.source('message')} WHERE guild_id = ?
                 """, (ctx.guild.id,))
                 alltime_data = await cursor.fetchone()
                 messages_alltime = (alltime_data[0] if alltime_data and alltime_data[0] else 0)
@@ -671,9 +625,9 @@ class ComprehensiveStats(commands.Cog):
                 voice_channels_today = (voice_today_data[2] if voice_today_data and voice_today_data[2] else 0)
                 
                 # This week's voice activity
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT SUM(duration_minutes), COUNT(DISTINCT user_id)
-                    FROM voice_stats WHERE guild_id = ? AND date >= ?
+                    FROM {self.rollup.source('voice', week_ago)} WHERE guild_id = ? AND date >= ?
                 """, (ctx.guild.id, week_ago))
                 voice_week_data = await cursor.fetchone()
                 voice_minutes_week = (voice_week_data[0] if voice_week_data and voice_week_data[0] else 0)
@@ -852,14 +806,14 @@ class ComprehensiveStats(commands.Cog):
         
         try:
             async with aiosqlite.connect(self.stats_db) as db:
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT 
                         SUM(count) as total_messages,
                         SUM(characters) as total_chars,
                         SUM(words) as total_words,
                         COUNT(DISTINCT channel_id) as channels_used,
                         COUNT(DISTINCT date) as active_days
-                    FROM message_stats 
+                    FROM {self.rollup.source('message', start_date)} 
                     WHERE guild_id = ? AND user_id = ? AND date BETWEEN ? AND ?
                 """, (ctx.guild.id, target_user.id, start_date, end_date))
                 
@@ -923,12 +877,12 @@ class ComprehensiveStats(commands.Cog):
         
         try:
             async with aiosqlite.connect(self.stats_db) as db:
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT 
                         SUM(duration_minutes) as total_minutes,
                         COUNT(DISTINCT channel_id) as channels_used,
                         COUNT(DISTINCT date) as active_days
-                    FROM voice_stats 
+                    FROM {self.rollup.source('voice', start_date)} 
                     WHERE guild_id = ? AND user_id = ? AND date BETWEEN ? AND ?
                 """, (ctx.guild.id, target_user.id, start_date, end_date))
                 
@@ -990,8 +944,8 @@ class ComprehensiveStats(commands.Cog):
         try:
             async with aiosqlite.connect(self.stats_db) as db:
                 # Message stats
-                cursor = await db.execute("""
-                    SELECT SUM(count), SUM(words) FROM message_stats 
+                cursor = await db.execute(f"""
+                    SELECT SUM(count), SUM(words) FROM {self.rollup.source('message', start_date)} 
                     WHERE guild_id = ? AND user_id = ? AND date BETWEEN ? AND ?
                 """, (ctx.guild.id, target_user.id, start_date, end_date))
                 msg_result = await cursor.fetchone()
@@ -999,8 +953,8 @@ class ComprehensiveStats(commands.Cog):
                 total_words = (msg_result[1] if msg_result and msg_result[1] else 0)
                 
                 # Voice stats
-                cursor = await db.execute("""
-                    SELECT SUM(duration_minutes) FROM voice_stats 
+                cursor = await db.execute(f"""
+                    SELECT SUM(duration_minutes) FROM {self.rollup.source('voice', start_date)} 
                     WHERE guild_id = ? AND user_id = ? AND date BETWEEN ? AND ?
                 """, (ctx.guild.id, target_user.id, start_date, end_date))
                 voice_result = await cursor.fetchone()
@@ -1072,9 +1026,9 @@ class ComprehensiveStats(commands.Cog):
             week_ago = (current_time - timedelta(days=7)).strftime("%Y-%m-%d")
             
             async with aiosqlite.connect(self.stats_db) as db:
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT user_id, SUM(count) as total_messages
-                    FROM message_stats 
+                    FROM {self.rollup.source('message', week_ago)} 
                     WHERE guild_id = ? AND date >= ?
                     GROUP BY user_id
                     ORDER BY total_messages DESC
@@ -1109,6 +1063,60 @@ class ComprehensiveStats(commands.Cog):
         view = CanvasToggleView(ctx, self, "top_members")
         await ctx.reply(embed=embed, view=view)
     
+    @stats_group.command(name="e", aliases=["s.e", "export"])
+    @commands.has_permissions(manage_guild=True)
+    @commands.max_concurrency(1, commands.BucketType.guild)
+    @commands.cooldown(1, 300, commands.BucketType.guild)
+    async def export_command(self, ctx, data: str = "all", fmt: str = "csv"):
+        """Export raw message/voice stats as CSV (gzip) or Parquet files"""
+        kinds = {"messages": ("message",), "voice": ("voice",), "all": ("message", "voice")}.get(data.lower())
+        fmt = fmt.lower()
+        if kinds is None or fmt not in EXPORT_FORMATS:
+            ctx.command.reset_cooldown(ctx)
+            return await ctx.reply(embed=discord.Embed(
+                description="Usage: `s.e [messages|voice|all] [csv|parquet]`",
+                color=0xff0000
+            ))
+        if fmt == "parquet" and not PARQUET_AVAILABLE:
+            ctx.command.reset_cooldown(ctx)
+            return await ctx.reply(embed=discord.Embed(
+                description="❌ Parquet export is not available on this bot, use `csv`.",
+                color=0xff0000
+            ))
+        
+        status = await ctx.reply(embed=discord.Embed(
+            title="📦 Exporting Statistics...",
+            description="🔄 Streaming your server's data, files will be posted as they are ready.",
+            color=0x20b2aa
+        ))
+        
+        parts = rows = 0
+        try:
+            # Buffered increments go in first so the export is up to date
+            await self.aggregator.flush()
+            for kind in kinds:
+                # aclosing: a failed upload still removes the export's temporary files
+                async with contextlib.aclosing(export_stats(self.stats_db, kind, ctx.guild.id, fmt,
+                                                            part_limit=ctx.guild.filesize_limit,
+                                                            rollup=self.rollup)) as exported:
+                    async for part in exported:
+                        await ctx.channel.send(file=discord.File(part.path, filename=part.filename))
+                        parts += 1
+                        rows += part.rows
+        except Exception as e:
+            print(f"[STATS] Export failed for guild {ctx.guild.id}: {e}")
+            return await status.edit(embed=discord.Embed(
+                title="❌ Export Failed",
+                description=f"Sent {parts} file(s) before the error: {e}",
+                color=0xff0000
+            ))
+        
+        await status.edit(embed=discord.Embed(
+            title="📦 Export Complete",
+            description=f"**{rows:,}** rows in **{parts}** file(s)" if parts else "No statistics recorded yet.",
+            color=0x20b2aa
+        ))
+    
     @stats_group.command(name="g", aliases=["s.g", "guide", "help"])
     async def guide_command(self, ctx):
         """Statistics system guide"""
@@ -1141,6 +1149,7 @@ class ComprehensiveStats(commands.Cog):
         embed.add_field(
             name="ℹ️ Other Commands",
             value="• `s.c` - Generate various chart types\n"
+                  "• `s.e [messages|voice|all] [csv|parquet]` - Export raw data (Manage Server)\n"
                   "• `s.g` - This help guide\n"
                   "• `s.p` - Privacy information",
             inline=False
@@ -1201,16 +1210,27 @@ class ComprehensiveStats(commands.Cog):
     # HELPER METHODS FOR CANVAS GENERATION
     # ==========================================
     
+    async def render_chart(self, guild_id, query, period, method, *args):
+        """Render a StatBotStyleGenerator chart in the chart pool"""
+        if not CHARTS_AVAILABLE:
+            return None
+        job = ChartJob(f"{__name__}:StatBotStyleGenerator", method, args)
+        return await self.chart_service.render((guild_id, query, period, "statbot"), job)
+    
     async def generate_user_canvas_buffer(self, ctx, target_user):
         """Helper method to generate user stats canvas"""
         if not self.canvas_generator:
             return None
-            
+        
+        guild_tz = await self.get_guild_timezone(ctx.guild.id)
+        return await self.chart_service.render(
+            (ctx.guild.id, f"user:{target_user.id}", "14d", guild_tz),
+            lambda: self.user_canvas_job(ctx, target_user, guild_tz)
+        )
+    
+    async def user_canvas_job(self, ctx, target_user, guild_tz):
+        """Gather a member's stats for the user canvas"""
         try:
-            # Get guild timezone
-            guild_tz = await self.get_guild_timezone(ctx.guild.id)
-            canvas_gen = StatBotCanvasCV2(timezone=guild_tz)
-            
             current_time = datetime.now(timezone.utc)
             today = current_time.strftime("%Y-%m-%d")
             week_ago = (current_time - timedelta(days=7)).strftime("%Y-%m-%d")
@@ -1225,15 +1245,15 @@ class ComprehensiveStats(commands.Cog):
                 result = await cursor.fetchone()
                 msg_1d = result[0] if result and result[0] else 0
                 
-                cursor = await db.execute("""
-                    SELECT SUM(count) FROM message_stats 
+                cursor = await db.execute(f"""
+                    SELECT SUM(count) FROM {self.rollup.source('message', week_ago)} 
                     WHERE guild_id = ? AND user_id = ? AND date >= ?
                 """, (ctx.guild.id, target_user.id, week_ago))
                 result = await cursor.fetchone()
                 msg_7d = result[0] if result and result[0] else 0
                 
-                cursor = await db.execute("""
-                    SELECT SUM(count) FROM message_stats 
+                cursor = await db.execute(f"""
+                    SELECT SUM(count) FROM {self.rollup.source('message', two_weeks_ago)} 
                     WHERE guild_id = ? AND user_id = ? AND date >= ?
                 """, (ctx.guild.id, target_user.id, two_weeks_ago))
                 result = await cursor.fetchone()
@@ -1247,24 +1267,24 @@ class ComprehensiveStats(commands.Cog):
                 result = await cursor.fetchone()
                 voice_1d = (result[0] if result and result[0] else 0) / 60  # Convert to hours
                 
-                cursor = await db.execute("""
-                    SELECT SUM(duration_minutes) FROM voice_stats 
+                cursor = await db.execute(f"""
+                    SELECT SUM(duration_minutes) FROM {self.rollup.source('voice', week_ago)} 
                     WHERE guild_id = ? AND user_id = ? AND date >= ?
                 """, (ctx.guild.id, target_user.id, week_ago))
                 result = await cursor.fetchone()
                 voice_7d = (result[0] if result and result[0] else 0) / 60
                 
-                cursor = await db.execute("""
-                    SELECT SUM(duration_minutes) FROM voice_stats 
+                cursor = await db.execute(f"""
+                    SELECT SUM(duration_minutes) FROM {self.rollup.source('voice', two_weeks_ago)} 
                     WHERE guild_id = ? AND user_id = ? AND date >= ?
                 """, (ctx.guild.id, target_user.id, two_weeks_ago))
                 result = await cursor.fetchone()
                 voice_14d = (result[0] if result and result[0] else 0) / 60
                 
                 # Get user rank
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT user_id, SUM(count) as total
-                    FROM message_stats
+                    FROM {self.rollup.source('message', two_weeks_ago)}
                     WHERE guild_id = ? AND date >= ?
                     GROUP BY user_id
                     ORDER BY total DESC
@@ -1273,9 +1293,9 @@ class ComprehensiveStats(commands.Cog):
                 msg_rank = next((i+1 for i, (uid, _) in enumerate(rankings) if uid == target_user.id), "N/A")
                 
                 # Get voice rank
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT user_id, SUM(duration_minutes) as total
-                    FROM voice_stats
+                    FROM {self.rollup.source('voice', two_weeks_ago)}
                     WHERE guild_id = ? AND date >= ?
                     GROUP BY user_id
                     ORDER BY total DESC
@@ -1284,9 +1304,9 @@ class ComprehensiveStats(commands.Cog):
                 voice_rank = next((i+1 for i, (uid, _) in enumerate(voice_rankings) if uid == target_user.id), "No Data")
                 
                 # Get top channel
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT channel_id, SUM(count) as total
-                    FROM message_stats
+                    FROM {self.rollup.source('message', two_weeks_ago)}
                     WHERE guild_id = ? AND user_id = ? AND date >= ?
                     GROUP BY channel_id
                     ORDER BY total DESC
@@ -1303,9 +1323,9 @@ class ComprehensiveStats(commands.Cog):
                     top_channel = {'name': 'No data', 'messages': 0}
                 
                 # Get message trend (last 14 days)
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT date, SUM(count) as daily_total
-                    FROM message_stats
+                    FROM {self.rollup.source('message', two_weeks_ago)}
                     WHERE guild_id = ? AND user_id = ? AND date >= ?
                     GROUP BY date
                     ORDER BY date ASC
@@ -1340,11 +1360,8 @@ class ComprehensiveStats(commands.Cog):
                 'voice_trend': np.zeros(14)  # Placeholder for voice trend
             }
             
-            # Generate canvas
-            canvas_buffer = await canvas_gen.generate_user_stats_canvas(
-                user_data, ctx.guild.name
-            )
-            return canvas_buffer
+            return ChartJob(CANVAS_GENERATOR, "generate_user_stats_canvas",
+                            (user_data, ctx.guild.name), {"timezone": guild_tz})
                 
         except Exception as e:
             print(f"[STATS] Error generating user canvas: {e}")
@@ -1356,19 +1373,24 @@ class ComprehensiveStats(commands.Cog):
         """Helper method to generate top members canvas"""
         if not self.canvas_generator:
             return None
-            
+        
+        guild_tz = await self.get_guild_timezone(ctx.guild.id)
+        return await self.chart_service.render(
+            (ctx.guild.id, "top_members", "14d", guild_tz),
+            lambda: self.top_members_canvas_job(ctx, guild_tz)
+        )
+    
+    async def top_members_canvas_job(self, ctx, guild_tz):
+        """Gather the top members for the top members canvas"""
         try:
-            # Get guild timezone
-            guild_tz = await self.get_guild_timezone(ctx.guild.id)
-            canvas_gen = StatBotCanvasCV2(timezone=guild_tz)
             current_time = datetime.now(timezone.utc)
             two_weeks_ago = (current_time - timedelta(days=14)).strftime("%Y-%m-%d")
             
             async with aiosqlite.connect(self.stats_db) as db:
                 # Get top 20 members
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT user_id, SUM(count) as total_messages
-                    FROM message_stats
+                    FROM {self.rollup.source('message', two_weeks_ago)}
                     WHERE guild_id = ? AND date >= ?
                     GROUP BY user_id
                     ORDER BY total_messages DESC
@@ -1390,11 +1412,8 @@ class ComprehensiveStats(commands.Cog):
                 'members': members_data
             }
             
-            # Generate canvas
-            canvas_buffer = await canvas_gen.generate_top_members_canvas(
-                ctx.guild.name, canvas_data
-            )
-            return canvas_buffer
+            return ChartJob(CANVAS_GENERATOR, "generate_top_members_canvas",
+                            (ctx.guild.name, canvas_data), {"timezone": guild_tz})
                 
         except Exception as e:
             print(f"[STATS] Error generating top members canvas: {e}")
@@ -1406,11 +1425,16 @@ class ComprehensiveStats(commands.Cog):
         """Helper method to generate server growth canvas"""
         if not self.canvas_generator:
             return None
-            
+        
+        guild_tz = await self.get_guild_timezone(ctx.guild.id)
+        return await self.chart_service.render(
+            (ctx.guild.id, "server_growth", "30d", guild_tz),
+            lambda: self.server_growth_canvas_job(ctx, guild_tz)
+        )
+    
+    async def server_growth_canvas_job(self, ctx, guild_tz):
+        """Gather the analytics for the server growth canvas"""
         try:
-            # Get guild timezone
-            guild_tz = await self.get_guild_timezone(ctx.guild.id)
-            canvas_gen = StatBotCanvasCV2(timezone=guild_tz)
             import numpy as np
             
             # Get bot stats
@@ -1424,9 +1448,9 @@ class ComprehensiveStats(commands.Cog):
             
             async with aiosqlite.connect(self.stats_db) as db:
                 # Get message trend for last 30 days
-                cursor = await db.execute("""
+                cursor = await db.execute(f"""
                     SELECT date, SUM(count) as daily_total
-                    FROM message_stats
+                    FROM {self.rollup.source('message', thirty_days_ago)}
                     WHERE guild_id = ? AND date >= ?
                     GROUP BY date
                     ORDER BY date ASC
@@ -1458,11 +1482,8 @@ class ComprehensiveStats(commands.Cog):
                 'analysis_period': '30 days'
             }
             
-            # Generate canvas
-            canvas_buffer = await canvas_gen.generate_server_growth_canvas(
-                ctx.guild.name, analytics_data
-            )
-            return canvas_buffer
+            return ChartJob(CANVAS_GENERATOR, "generate_server_growth_canvas",
+                            (ctx.guild.name, analytics_data), {"timezone": guild_tz})
                 
         except Exception as e:
             print(f"[STATS] Error generating growth analytics: {e}")
@@ -1527,7 +1548,8 @@ class StatsNavigationView(discord.ui.View):
                 'growth_rate': 5.2  # Placeholder
             }
             
-            canvas_buffer = await self.cog.chart_generator.generate_server_overview(
+            canvas_buffer = await self.cog.render_chart(
+                self.ctx.guild.id, "overview", "today", "generate_server_overview",
                 self.ctx.guild.name, stats_data
             )
             
@@ -1603,7 +1625,8 @@ class UserStatsView(discord.ui.View):
                 'activity_score': 87.3
             }
             
-            image_buffer = await self.cog.chart_generator.generate_user_stats(
+            image_buffer = await self.cog.render_chart(
+                self.ctx.guild.id, f"user:{self.user.id}", self.timeframe, "generate_user_stats",
                 self.user.display_name, stats_data
             )
             
@@ -1656,7 +1679,8 @@ class ChartSelectionView(discord.ui.View):
         try:
             if chart_type == "trends":
                 trend_data = {'daily_messages': [120, 150, 180, 200, 170, 160, 140]}
-                buffer = await self.cog.chart_generator.generate_message_trends(
+                buffer = await self.cog.render_chart(
+                    self.ctx.guild.id, "message_trends", "7d", "generate_message_trends",
                     self.ctx.guild.name, trend_data
                 )
                 title = "📈 Message Trends"
@@ -1668,7 +1692,8 @@ class ChartSelectionView(discord.ui.View):
                     'top_channels': ['General', 'Gaming', 'Music', 'Study'],
                     'channel_hours': [45, 30, 25, 15]
                 }
-                buffer = await self.cog.chart_generator.generate_voice_activity(
+                buffer = await self.cog.render_chart(
+                    self.ctx.guild.id, "voice_activity", "7d", "generate_voice_activity",
                     self.ctx.guild.name, voice_data
                 )
                 title = "🎤 Voice Activity"
@@ -1679,7 +1704,8 @@ class ChartSelectionView(discord.ui.View):
                     'usernames': ['User1', 'User2', 'User3', 'User4', 'User5'],
                     'activity_scores': [95, 87, 82, 78, 74]
                 }
-                buffer = await self.cog.chart_generator.generate_top_users(
+                buffer = await self.cog.render_chart(
+                    self.ctx.guild.id, "top_users", "7d", "generate_top_users",
                     self.ctx.guild.name, user_data
                 )
                 title = "🏆 Top Active Users"
@@ -1694,7 +1720,8 @@ class ChartSelectionView(discord.ui.View):
                     'messages_week': 12000,
                     'growth_rate': 5.2
                 }
-                buffer = await self.cog.chart_generator.generate_server_overview(
+                buffer = await self.cog.render_chart(
+                    self.ctx.guild.id, "overview", "today", "generate_server_overview",
                     self.ctx.guild.name, stats_data
                 )
                 title = "🏠 Server Overview"
@@ -1756,9 +1783,9 @@ class TopUsersView(discord.ui.View):
             
             async with aiosqlite.connect(self.cog.stats_db) as db:
                 if board_type == "messages_week":
-                    cursor = await db.execute("""
+                    cursor = await db.execute(f"""
                         SELECT user_id, SUM(count) as total
-                        FROM message_stats 
+                        FROM {self.cog.rollup.source('message', week_ago)} 
                         WHERE guild_id = ? AND date >= ?
                         GROUP BY user_id
                         ORDER BY total DESC
@@ -1767,9 +1794,9 @@ class TopUsersView(discord.ui.View):
                     embed.description = "Most messages sent this week"
                     
                 elif board_type == "voice_week":
-                    cursor = await db.execute("""
+                    cursor = await db.execute(f"""
                         SELECT user_id, SUM(duration_minutes) as total
-                        FROM voice_stats 
+                        FROM {self.cog.rollup.source('voice', week_ago)} 
                         WHERE guild_id = ? AND date >= ?
                         GROUP BY user_id
                         ORDER BY total DESC
@@ -1779,15 +1806,15 @@ class TopUsersView(discord.ui.View):
                     
                 else:  # overall
                     # Combine message and voice stats for activity score
-                    cursor = await db.execute("""
+                    cursor = await db.execute(f"""
                         SELECT 
                             COALESCE(m.user_id, v.user_id) as user_id,
                             COALESCE(SUM(m.count), 0) as messages,
                             COALESCE(SUM(v.duration_minutes), 0) as voice_minutes
                         FROM 
-                            (SELECT user_id, SUM(count) as count FROM message_stats WHERE guild_id = ? AND date >= ? GROUP BY user_id) m
+                            (SELECT user_id, SUM(count) as count FROM {self.cog.rollup.source('message', week_ago)} WHERE guild_id = ? AND date >= ? GROUP BY user_id) m
                         FULL OUTER JOIN 
-                            (SELECT user_id, SUM(duration_minutes) as duration_minutes FROM voice_stats WHERE guild_id = ? AND date >= ? GROUP BY user_id) v
+                            (SELECT user_id, SUM(duration_minutes) as duration_minutes FROM {self.cog.rollup.source('voice', week_ago)} WHERE guild_id = ? AND date >= ? GROUP BY user_id) v
                         ON m.user_id = v.user_id
                         ORDER BY (COALESCE(messages, 0) + COALESCE(voice_minutes, 0) * 2) DESC
                         LIMIT 10
@@ -1848,7 +1875,8 @@ class TopUsersView(discord.ui.View):
                 'activity_scores': [95, 87, 82, 78, 74]
             }
             
-            buffer = await self.cog.chart_generator.generate_top_users(
+            buffer = await self.cog.render_chart(
+                self.ctx.guild.id, "top_users", "7d", "generate_top_users",
                 self.ctx.guild.name, user_data
             )
             
@@ -8,6 +8,7 @@ from utils.Tools import *
 from typing import List, Tuple
 
 from utils.error_helpers import StandardErrorHandler
+from utils.cooldowns import cooldowns
 DATABASE_PATH = 'db/customrole.db'
 DATABASE_PATH2 = 'db/np.db'
 
@@ -20,7 +21,7 @@ class Customrole(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
-        self.cooldown = {}
+        self.cooldown = cooldowns.namespace("customrole.assign")
         self.rate_limit = {}
         self.rate_limit_timeout = 5
         # Removed loop access from __init__
@@ -598,10 +599,7 @@ class Customrole(commands.Cog):
                 await message.channel.send("Please mention a user to assign the role.")
                 return
 
-            now = asyncio.get_event_loop().time()
-            if guild_id not in self.cooldown or now - self.cooldown[guild_id] >= 10:
-                self.cooldown[guild_id] = now
-            else:
+            if not self.cooldown.try_acquire(guild_id, 10):
                 await message.channel.send("You're on a cooldown of 5 seconds. Please wait before sending another command.", delete_after=5)
                 return
 
@@ -9,6 +9,8 @@ from typing import Optional, Dict, Any, List, Tuple
 import logging
 import json
 import os
+import time
+import contextlib
 import traceback
 
 from core.sleepless import sleepless
@@ -16,6 +18,13 @@ from utils.error_logger import ErrorLogger
 from utils.Tools import blacklist_check, ignore_check
 from utils.dynamic_dropdowns import PaginatedChannelView
 from utils.timezone_helpers import get_timezone_helpers
+from utils.xp_ledger import XPLedger
+from utils.rank_index import RankIndex
+from utils.user_cache import UserProfileCache
+from utils.level_roles import level_role_reconciler
+from utils.cooldowns import cooldowns
+from utils.level_recompute import LevelRecomputer
+from utils.rank_card import RankCardData, get_rank_card_renderer
 
 # Setup logger - will be initialized when bot is available
 logger = None
@@ -69,19 +78,35 @@ emojis = {
 # Database path
 DB_PATH = "db/leveling.db"
 
+LEADERBOARD_PAGE_SIZE = 10
+
+# How long on_message may reuse a guild's settings before reading them again
+SETTINGS_CACHE_TTL = 30
+
 class LevelingSystem(commands.Cog):
     """🏆 Advanced Leveling System - Track XP, levels, and reward roles"""
     
     def __init__(self, bot: sleepless):
         self.bot = bot
-        self.xp_cooldowns = {}  # Track XP cooldowns per user
+        self.xp_cooldowns = cooldowns.namespace("leveling.xp")  # Track XP cooldowns per user
         self.level_up_cooldowns = {}  # Track level up notifications
         self.error_logger = ErrorLogger(bot)  # Initialize Discord error logger
         self.tz_helpers = get_timezone_helpers(bot)  # Initialize timezone helpers
+        self.settings_cache = {}  # guild_id -> (loaded_at, settings) for the message hot path
+        self.xp_ledger = XPLedger(DB_PATH, self.calculate_level_from_xp, self.calculate_xp_for_level)
+        self.rank_index = RankIndex(DB_PATH, self.xp_ledger)  # Kept current by the ledger
+        self.user_cache = UserProfileCache()  # Names/avatars for leaderboard rows
+        self.level_recomputer = LevelRecomputer(DB_PATH, self.calculate_level_from_xp, self.calculate_xp_for_level)
         
     async def cog_load(self):
         """Called when the cog is loaded"""
         await self.ensure_leveling_db()
+        await self.xp_ledger.start()
+
+    async def cog_unload(self):
+        """Flush pending XP before the cog goes away"""
+        await self.xp_ledger.stop()
+        get_rank_card_renderer().shutdown()
         
     @staticmethod
     def safe_json_loads(json_string: str, default_value):
@@ -153,6 +178,12 @@ class LevelingSystem(commands.Cog):
                     )
                 """)
                 
+                # Keyset index for leaderboard pages ordered by (total_xp DESC, user_id)
+                await db.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_user_levels_leaderboard
+                    ON user_levels (guild_id, total_xp DESC, user_id)
+                """)
+                
                 await db.commit()
                 
                 # Migration: Add missing columns if they don't exist
@@ -306,35 +337,27 @@ class LevelingSystem(commands.Cog):
                 'no_xp_roles': '[]'
             }
 
+    async def get_cached_guild_settings(self, guild_id: int) -> Dict[str, Any]:
+        """Guild settings for the message hot path, re-read at most every SETTINGS_CACHE_TTL seconds"""
+        cached = self.settings_cache.get(guild_id)
+        now = time.monotonic()
+        if cached and now - cached[0] < SETTINGS_CACHE_TTL:
+            return cached[1]
+        settings = await self.get_guild_settings(guild_id)
+        self.settings_cache[guild_id] = (now, settings)
+        return settings
+
+    def invalidate_settings(self, guild_id: Optional[int] = None):
+        """Drop cached settings after a write to guild_level_settings (every guild when None)"""
+        if guild_id is None:
+            self.settings_cache.clear()
+        else:
+            self.settings_cache.pop(guild_id, None)
+
     async def get_user_data(self, guild_id: int, user_id: int) -> Dict[str, Any]:
-        """Get user level data"""
+        """Get user level data (served from the XP ledger so pending gains are included)"""
         try:
-            async with aiosqlite.connect(DB_PATH) as db:
-                async with db.execute(
-                    "SELECT * FROM user_levels WHERE guild_id = ? AND user_id = ?",
-                    (guild_id, user_id)
-                ) as cursor:
-                    row = await cursor.fetchone()
-                    
-                    if row:
-                        columns = [desc[0] for desc in cursor.description]
-                        return dict(zip(columns, row))
-                    else:
-                        # Create new user entry (use INSERT OR IGNORE to prevent UNIQUE constraint errors)
-                        await db.execute("""
-                            INSERT OR IGNORE INTO user_levels (user_id, guild_id) VALUES (?, ?)
-                        """, (user_id, guild_id))
-                        await db.commit()
-                        
-                        return {
-                            'user_id': user_id,
-                            'guild_id': guild_id,
-                            'xp': 0,
-                            'level': 0,
-                            'total_xp': 0,
-                            'messages_sent': 0,
-                            'last_xp_gain': None
-                        }
+            return await self.xp_ledger.get(guild_id, user_id)
         except Exception as e:
             await self.error_logger.log_database_error(
                 "Get User Data", e, "user_levels"
@@ -353,31 +376,14 @@ class LevelingSystem(commands.Cog):
     async def update_user_xp(self, guild_id: int, user_id: int, xp_gain: int, settings: Dict[str, Any]) -> Tuple[bool, int, int]:
         """Update user XP and return (leveled_up, old_level, new_level)"""
         try:
-            user_data = await self.get_user_data(guild_id, user_id)
-            
-            old_level = user_data['level']
-            new_total_xp = user_data['total_xp'] + xp_gain
-            new_level = self.calculate_level_from_xp(new_total_xp, settings['level_formula'])
-            
-            leveled_up = new_level > old_level
-            
-            # Update database
-            async with aiosqlite.connect(DB_PATH) as db:
-                await db.execute("""
-                    UPDATE user_levels 
-                    SET xp = ?, level = ?, total_xp = ?, messages_sent = messages_sent + 1, last_xp_gain = ?
-                    WHERE user_id = ? AND guild_id = ?
-                """, (
-                    new_total_xp - self.calculate_xp_for_level(new_level, settings['level_formula']),
-                    new_level,
-                    new_total_xp,
-                    self.tz_helpers.get_utc_now().isoformat(),
-                    user_id,
-                    guild_id
-                ))
-                await db.commit()
-            
-            return leveled_up, old_level, new_level
+            # Applied in memory and journaled; the ledger flushes batched upserts to the database
+            return await self.xp_ledger.add_xp(
+                guild_id,
+                user_id,
+                xp_gain,
+                settings['level_formula'],
+                self.tz_helpers.get_utc_now().isoformat()
+            )
         except Exception as e:
             await self.error_logger.log_database_error(
                 "Update User XP", e, "user_levels"
@@ -386,60 +392,11 @@ class LevelingSystem(commands.Cog):
             return False, 0, 0
 
     async def assign_level_roles(self, member: discord.Member, new_level: int, settings: Dict[str, Any]):
-        """Assign roles based on level"""
+        """Assign roles based on level (a single member edit, only when something changes)"""
         guild = member.guild
         
-        # Get level roles for this guild
-        async with aiosqlite.connect(DB_PATH) as db:
-            async with db.execute(
-                "SELECT level, role_id FROM level_roles WHERE guild_id = ? AND level <= ? ORDER BY level DESC",
-                (guild.id, new_level)
-            ) as cursor:
-                level_roles = list(await cursor.fetchall())
-        
-        if not level_roles:
-            return
-        
-        # Determine which roles to assign
-        if settings['stack_roles']:
-            # Assign all roles up to current level
-            roles_to_assign = [role_id for level, role_id in level_roles]
-        else:
-            # Assign only the highest level role
-            roles_to_assign = [level_roles[0][1]] if level_roles else []
-        
-        # Get current roles
-        current_role_ids = [role.id for role in member.roles]
-        
-        # Determine which roles to add/remove
-        roles_to_add = []
-        roles_to_remove = []
-        
-        for role_id in roles_to_assign:
-            role = guild.get_role(role_id)
-            if role and role not in member.roles:
-                roles_to_add.append(role)
-        
-        # If not stacking roles, remove previous level roles
-        if not settings['stack_roles'] or settings['remove_previous_roles']:
-            async with aiosqlite.connect(DB_PATH) as db:
-                async with db.execute(
-                    "SELECT role_id FROM level_roles WHERE guild_id = ? AND level < ?",
-                    (guild.id, new_level)
-                ) as cursor:
-                    previous_role_ids = [row[0] for row in await cursor.fetchall()]
-            
-            for role_id in previous_role_ids:
-                role = guild.get_role(role_id)
-                if role and role in member.roles and role_id not in roles_to_assign:
-                    roles_to_remove.append(role)
-        
-        # Apply role changes
         try:
-            if roles_to_add:
-                await member.add_roles(*roles_to_add, reason=f"Level up to {new_level}")
-            if roles_to_remove:
-                await member.remove_roles(*roles_to_remove, reason=f"Level role update")
+            await level_role_reconciler.reconcile(member, new_level, settings, reason=f"Level up to {new_level}")
         except discord.Forbidden:
             await self.error_logger.log_error(
                 "Permission Error", 
@@ -460,19 +417,13 @@ class LevelingSystem(commands.Cog):
             if not message.guild or message.author.bot:
                 return
             
-            settings = await self.get_guild_settings(message.guild.id)
+            settings = await self.get_cached_guild_settings(message.guild.id)
             if not settings['enabled']:
                 return
             
             # Check cooldown
-            user_key = f"{message.guild.id}-{message.author.id}"
-            now = self.tz_helpers.get_utc_now()
-            
-            if user_key in self.xp_cooldowns:
-                if (now - self.xp_cooldowns[user_key]).total_seconds() < settings['xp_cooldown']:
-                    return
-            
-            self.xp_cooldowns[user_key] = now
+            if not self.xp_cooldowns.try_acquire((message.guild.id, message.author.id), settings['xp_cooldown']):
+                return
             
             # Check excluded channels
             exclude_channels = self.safe_json_loads(settings['exclude_channels'], [])
@@ -509,6 +460,8 @@ class LevelingSystem(commands.Cog):
             else:
                 xp_gain = base_xp
             
+            self.user_cache.put(message.author)
+            
             # Update user XP
             leveled_up, old_level, new_level = await self.update_user_xp(
                 message.guild.id, message.author.id, xp_gain, settings
@@ -525,6 +478,15 @@ class LevelingSystem(commands.Cog):
                 f"Error processing XP for message: {str(e)} | Guild: {message.guild.id if message.guild else 'None'} | User: {message.author.id} | Channel: {message.channel.id if hasattr(message.channel, 'id') else 'None'}"
             )
 
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        self.user_cache.put(member)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        if self.user_cache.get(after.id) is not None:
+            self.user_cache.put(after)
+
     async def handle_level_up(self, message: discord.Message, old_level: int, new_level: int, settings: Dict[str, Any]):
         """Handle level up notifications and role assignments"""
         try:
@@ -720,22 +682,10 @@ class LevelingSystem(commands.Cog):
             )
             return await ctx.send(embed=embed)
         
-        # Get user's rank
-        async with aiosqlite.connect(DB_PATH) as db:
-            async with db.execute("""
-                SELECT COUNT(*) + 1 as rank FROM user_levels 
-                WHERE guild_id = ? AND total_xp > ?
-            """, (ctx.guild.id, user_data['total_xp'])) as cursor:
-                rank_data = await cursor.fetchone()
-                rank = rank_data[0] if rank_data else 1
-        
-        # Get total members with XP
-        async with aiosqlite.connect(DB_PATH) as db:
-            async with db.execute("""
-                SELECT COUNT(*) FROM user_levels WHERE guild_id = ? AND total_xp > 0
-            """, (ctx.guild.id,)) as cursor:
-                total_data = await cursor.fetchone()
-                total_members = total_data[0] if total_data else 1
+        # Get user's rank and total members with XP from the in-memory rank index
+        rank_index = await self.rank_index.get(ctx.guild.id)
+        rank = rank_index.rank_of_xp(user_data['total_xp'])
+        total_members = len(rank_index)
         
         # Calculate detailed progress
         current_level_xp = self.calculate_xp_for_level(user_data['level'], settings['level_formula'])
@@ -822,18 +772,99 @@ class LevelingSystem(commands.Cog):
             )
         
         embed.set_footer(text=f"Requested by {ctx.author.display_name} • Leveling formula: {settings['level_formula']}")
-        await ctx.send(embed=embed)
+        
+        # Rank card is drawn in the renderer's process pool; the embed still works without it
+        card = await get_rank_card_renderer().render(target, RankCardData(
+            name=target.display_name,
+            level=user_data['level'],
+            rank=rank,
+            xp_progress=xp_progress,
+            xp_needed=xp_needed_for_level,
+            total_xp=user_data['total_xp']
+        ))
+        if card is not None:
+            embed.set_thumbnail(url=None)
+            embed.set_image(url="attachment://rank.png")
+            await ctx.send(embed=embed, file=card)
+        else:
+            await ctx.send(embed=embed)
+
+    async def get_leaderboard_page(self, guild_id: int, page: int) -> Tuple[List[tuple], int, int]:
+        """
+        Return (rows, page, total_pages) for a leaderboard page.
+
+        The rank index finds the first (total_xp, user_id) of the page and the
+        rows are read with a keyset query from there, so deep pages cost the
+        same as the first one.
+        """
+        # Make sure the table reflects XP still waiting in the ledger
+        await self.xp_ledger.flush()
+        rank_index = await self.rank_index.get(guild_id)
+        total_pages = max(1, math.ceil(len(rank_index) / LEADERBOARD_PAGE_SIZE))
+        page = min(max(1, page), total_pages)
+
+        start = rank_index.at_rank((page - 1) * LEADERBOARD_PAGE_SIZE + 1)
+        if start is None:
+            return [], page, total_pages
+        start_user_id, start_xp = start
+
+        async with aiosqlite.connect(DB_PATH) as db:
+            async with db.execute("""
+                SELECT user_id, level, total_xp, messages_sent 
+                FROM user_levels 
+                WHERE guild_id = ? AND total_xp > 0
+                  AND (total_xp < ? OR (total_xp = ? AND user_id >= ?))
+                ORDER BY total_xp DESC, user_id ASC
+                LIMIT ?
+            """, (guild_id, start_xp, start_xp, start_user_id, LEADERBOARD_PAGE_SIZE)) as cursor:
+                rows = list(await cursor.fetchall())
+        return rows, page, total_pages
+
+    async def build_leaderboard_embed(self, guild: discord.Guild, page: int, requester) -> Tuple[Optional[discord.Embed], int, int]:
+        rows, page, total_pages = await self.get_leaderboard_page(guild.id, page)
+        if not rows:
+            return None, page, total_pages
+
+        profiles = await self.user_cache.resolve_many(self.bot, [row[0] for row in rows], guild)
+
+        embed = discord.Embed(
+            title=f"{emojis['trophy']} Level Leaderboard",
+            description=f"Top members in **{guild.name}**",
+            color=0x006fb9
+        )
+        
+        leaderboard_text = ""
+        medals = [emojis['first'], emojis['second'], emojis['third']]
+        first_rank = (page - 1) * LEADERBOARD_PAGE_SIZE + 1
+        
+        for i, (user_id, level, total_xp, messages) in enumerate(rows, first_rank):
+            profile = profiles.get(user_id)
+            if not profile:
+                continue
+            
+            medal = medals[i-1] if i <= 3 else f"**{i}.**"
+            leaderboard_text += f"{medal} **{profile.name}** - Level **{level:,}** (**{total_xp:,}** XP)\n"
+        
+        embed.add_field(
+            name=f"{emojis['star']} Rankings",
+            value=leaderboard_text or "No members could be resolved on this page.",
+            inline=False
+        )
+        
+        embed.set_footer(text=f"Page {page}/{total_pages} • Requested by {requester.display_name}")
+        return embed, page, total_pages
 
     @level_group.command(name="leaderboard", aliases=["lb", "top"])
     @commands.guild_only()
     @blacklist_check()
     @ignore_check()
-    async def level_leaderboard(self, ctx):
+    async def level_leaderboard(self, ctx, page: int = 1):
         """
-        🏆 Shows top 10 members with the highest level
+        🏆 Shows the members with the highest level
         
         **Usage:**
         `{prefix}level leaderboard` - View top 10 users
+        `{prefix}level leaderboard 3` - Jump to page 3
         """
         try:
             if not ctx.guild:
@@ -849,18 +880,9 @@ class LevelingSystem(commands.Cog):
                 )
                 return await ctx.send(embed=embed)
             
-            # Get top 10 users
-            async with aiosqlite.connect(DB_PATH) as db:
-                async with db.execute("""
-                    SELECT user_id, level, total_xp, messages_sent 
-                    FROM user_levels 
-                    WHERE guild_id = ? AND total_xp > 0
-                    ORDER BY total_xp DESC 
-                    LIMIT 10
-                """, (ctx.guild.id,)) as cursor:
-                    top_users = list(await cursor.fetchall())
-            
-            if not top_users:
+            embed, page, total_pages = await self.build_leaderboard_embed(ctx.guild, page, ctx.author)
+            
+            if embed is None:
                 embed = discord.Embed(
                     title=f"{emojis['warning']} No Data",
                     description="No users have gained XP yet in this server.",
@@ -868,36 +890,10 @@ class LevelingSystem(commands.Cog):
                 )
                 return await ctx.send(embed=embed)
             
-            embed = discord.Embed(
-                title=f"{emojis['trophy']} Level Leaderboard",
-                description=f"Top **{len(top_users)}** members in **{ctx.guild.name}**",
-                color=0x006fb9
-            )
-            
-            leaderboard_text = ""
-            medals = [emojis['first'], emojis['second'], emojis['third']]
-            
-            for i, (user_id, level, total_xp, messages) in enumerate(top_users, 1):
-                user = self.bot.get_user(user_id)
-                if not user:
-                    try:
-                        user = await self.bot.fetch_user(user_id)
-                    except:
-                        continue
-                
-                medal = medals[i-1] if i <= 3 else f"**{i}.**"
-                username = user.display_name if hasattr(user, 'display_name') else user.name
-                
-                leaderboard_text += f"{medal} **{username}** - Level **{level:,}** (**{total_xp:,}** XP)\n"
-            
-            embed.add_field(
-                name=f"{emojis['star']} Rankings",
-                value=leaderboard_text,
-                inline=False
-            )
-            
-            embed.set_footer(text=f"Requested by {ctx.author.display_name}")
-            await ctx.send(embed=embed)
+            if total_pages > 1:
+                await ctx.send(embed=embed, view=LeaderboardPageView(self, ctx.author, page, total_pages))
+            else:
+                await ctx.send(embed=embed)
             
         except Exception as e:
             await self.error_logger.log_error(
@@ -1200,6 +1196,7 @@ class LevelingSystem(commands.Cog):
                     (ctx.guild.id,)
                 )
                 await db.commit()
+                self.invalidate_settings(ctx.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} Leveling Enabled",
@@ -1242,6 +1239,7 @@ class LevelingSystem(commands.Cog):
                     (ctx.guild.id,)
                 )
                 await db.commit()
+                self.invalidate_settings(ctx.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['x']} Leveling Disabled",
@@ -1267,6 +1265,110 @@ class LevelingSystem(commands.Cog):
             )
             await ctx.send(embed=embed)
 
+    @level_settings_group.command(name="formula")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def level_config_formula(self, ctx, formula: str):
+        """
+        📐 Change the level formula and recompute every member's level
+        
+        **Usage:**
+        `{prefix}level settings formula default` - level = √(XP / 1000)
+        `{prefix}level settings formula linear` - 5,000 XP per level
+        `{prefix}level settings formula exponential` - more XP needed per level
+        """
+        formula = formula.lower()
+        if formula not in ("default", "linear", "exponential"):
+            embed = discord.Embed(
+                title=f"{emojis['error']} Invalid Formula",
+                description="Formula must be one of `default`, `linear` or `exponential`.",
+                color=0xff0000
+            )
+            return await ctx.send(embed=embed)
+        
+        if self.level_recomputer.is_running(ctx.guild.id):
+            embed = discord.Embed(
+                title=f"{emojis['warning']} Recompute Running",
+                description="Levels are already being recomputed for this server.",
+                color=0xff9900
+            )
+            return await ctx.send(embed=embed)
+        
+        settings = await self.get_guild_settings(ctx.guild.id)
+        if settings['level_formula'] == formula and await self.level_recomputer.pending_formula(ctx.guild.id) != formula:
+            embed = discord.Embed(
+                title=f"{emojis['warning']} No Change",
+                description=f"This server already uses the **{formula}** formula.",
+                color=0xff9900
+            )
+            return await ctx.send(embed=embed)
+        
+        try:
+            async with aiosqlite.connect(DB_PATH) as db:
+                await db.execute(
+                    "UPDATE guild_level_settings SET level_formula = ? WHERE guild_id = ?",
+                    (formula, ctx.guild.id)
+                )
+                await db.commit()
+            # New XP gains must use the new formula straight away
+            self.invalidate_settings(ctx.guild.id)
+            settings['level_formula'] = formula
+            await self.xp_ledger.flush()
+            
+            embed = discord.Embed(
+                title=f"{emojis['gear']} Recomputing Levels",
+                description=f"Switching to the **{formula}** formula...",
+                color=0x006fb9
+            )
+            status = await ctx.send(embed=embed)
+            
+            async def report(result):
+                embed.description = (f"Processed **{result.processed:,}** / **{result.total:,}** members • "
+                                     f"**{result.changed:,}** levels changed")
+                try:
+                    await status.edit(embed=embed)
+                except discord.HTTPException:
+                    pass
+            
+            reward_table = await level_role_reconciler.get_table(ctx.guild.id)
+            result = await self.level_recomputer.run(ctx.guild.id, formula, reward_table.levels, progress=report)
+            
+            # Cached rows still hold levels from the old formula
+            async with self.xp_ledger.direct_write(ctx.guild.id):
+                pass
+            
+            roles_updated = 0
+            for user_id in result.reward_changes:
+                member = ctx.guild.get_member(user_id)
+                if member is None:
+                    continue
+                user_data = await self.get_user_data(ctx.guild.id, user_id)
+                try:
+                    if await level_role_reconciler.reconcile(member, user_data['level'], settings, reason="Level formula changed"):
+                        roles_updated += 1
+                except discord.HTTPException:
+                    pass
+            
+            embed.title = f"{emojis['check']} Level Formula Updated"
+            embed.description = (f"Now using the **{formula}** formula.\n\n"
+                                 f"**{result.processed:,}** members recomputed in {result.elapsed:.1f}s "
+                                 f"(**{result.rows_per_sec:,.0f}** rows/s)\n"
+                                 f"**{result.changed:,}** levels changed • **{roles_updated:,}** members' level roles updated")
+            embed.color = 0x00ff00
+            await status.edit(embed=embed)
+            
+        except Exception as e:
+            await self.error_logger.log_error(
+                f"Level Formula Error in {ctx.guild.name}",
+                f"Error changing level formula: {str(e)} | Guild: {ctx.guild.id} | User: {ctx.author.id}"
+            )
+            embed = discord.Embed(
+                title=f"{emojis['warning']} Recompute Interrupted",
+                description=f"An error occurred while recomputing levels. Run `{ctx.prefix}level settings formula {formula}` again to continue where it stopped.",
+                color=0xff0000
+            )
+            await ctx.send(embed=embed)
+
     @level_settings_group.command(name="message")
     @commands.guild_only()
     @commands.has_permissions(manage_guild=True)
@@ -1317,6 +1419,7 @@ class LevelingSystem(commands.Cog):
                     (message, ctx.guild.id)
                 )
                 await db.commit()
+                self.invalidate_settings(ctx.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} Level-Up Message Updated",
@@ -1379,6 +1482,7 @@ class LevelingSystem(commands.Cog):
                         (ctx.guild.id,)
                     )
                     await db.commit()
+                    self.invalidate_settings(ctx.guild.id)
                 
                 embed = discord.Embed(
                     title=f"{emojis['x']} Announcements Disabled",
@@ -1393,6 +1497,7 @@ class LevelingSystem(commands.Cog):
                         (channel.id, ctx.guild.id)
                     )
                     await db.commit()
+                    self.invalidate_settings(ctx.guild.id)
                 
                 embed = discord.Embed(
                     title=f"{emojis['check']} Announcement Channel Set",
@@ -1522,6 +1627,7 @@ class LevelingSystem(commands.Cog):
                     action = "added"
                 
                 await db.commit()
+                level_role_reconciler.invalidate(ctx.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} Level Role {action.title()}",
@@ -1586,6 +1692,7 @@ class LevelingSystem(commands.Cog):
                     (ctx.guild.id, level)
                 )
                 await db.commit()
+                level_role_reconciler.invalidate(ctx.guild.id)
             
             # Get role info for confirmation
             removed_role = ctx.guild.get_role(existing[0])
@@ -1779,6 +1886,7 @@ class LevelingSystem(commands.Cog):
                     (json.dumps(excluded_channels), ctx.guild.id)
                 )
                 await db.commit()
+                self.invalidate_settings(ctx.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} Channel Excluded",
@@ -1830,6 +1938,7 @@ class LevelingSystem(commands.Cog):
                     (json.dumps(excluded_roles), ctx.guild.id)
                 )
                 await db.commit()
+                self.invalidate_settings(ctx.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} Role Excluded",
@@ -1902,6 +2011,7 @@ class LevelingSystem(commands.Cog):
                     (json.dumps(excluded_channels), ctx.guild.id)
                 )
                 await db.commit()
+                self.invalidate_settings(ctx.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} Channel Unexcluded",
@@ -1953,6 +2063,7 @@ class LevelingSystem(commands.Cog):
                     (json.dumps(excluded_roles), ctx.guild.id)
                 )
                 await db.commit()
+                self.invalidate_settings(ctx.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} Role Unexcluded",
@@ -2199,6 +2310,7 @@ class LevelingSystem(commands.Cog):
                     action = "added"
                 
                 await db.commit()
+                level_role_reconciler.invalidate(ctx.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} Level Role {action.title()}",
@@ -2263,6 +2375,7 @@ class LevelingSystem(commands.Cog):
                     (ctx.guild.id, level)
                 )
                 await db.commit()
+                level_role_reconciler.invalidate(ctx.guild.id)
             
             # Get role info for confirmation
             removed_role = ctx.guild.get_role(existing[0])
@@ -2394,6 +2507,7 @@ class LevelingSystem(commands.Cog):
             embed.add_field(name=f"{ctx.prefix}level admin add <user> <xp>", value="Add XP to user", inline=False)
             embed.add_field(name=f"{ctx.prefix}level admin remove <user> <levels>", value="Remove levels from user", inline=False)
             embed.add_field(name=f"{ctx.prefix}level admin reset <user>", value="Reset user's XP/level completely", inline=False)
+            embed.add_field(name=f"{ctx.prefix}level admin resync [restart]", value="Re-apply level reward roles to every member", inline=False)
             await ctx.send(embed=embed)
 
     @level_admin_group.command(name="set")
@@ -2418,13 +2532,14 @@ class LevelingSystem(commands.Cog):
             settings = await self.get_guild_settings(ctx.guild.id)
             total_xp = self.calculate_xp_for_level(level, settings['level_formula'])
             
-            async with aiosqlite.connect(DB_PATH) as db:
-                await db.execute("""
-                    INSERT OR REPLACE INTO user_levels 
-                    (user_id, guild_id, level, total_xp, xp, last_xp_gain)
-                    VALUES (?, ?, ?, ?, 0, ?)
-                """, (member.id, ctx.guild.id, level, total_xp, self.tz_helpers.get_utc_now().isoformat()))
-                await db.commit()
+            async with self.xp_ledger.direct_write(ctx.guild.id, member.id):
+                async with aiosqlite.connect(DB_PATH) as db:
+                    await db.execute("""
+                        INSERT OR REPLACE INTO user_levels 
+                        (user_id, guild_id, level, total_xp, xp, last_xp_gain)
+                        VALUES (?, ?, ?, ?, 0, ?)
+                    """, (member.id, ctx.guild.id, level, total_xp, self.tz_helpers.get_utc_now().isoformat()))
+                    await db.commit()
             
             # Assign level roles
             await self.assign_level_roles(member, level, settings)
@@ -2517,13 +2632,14 @@ class LevelingSystem(commands.Cog):
         settings = await self.get_guild_settings(ctx.guild.id)
         new_total_xp = self.calculate_xp_for_level(new_level, settings['level_formula'])
         
-        async with aiosqlite.connect(DB_PATH) as db:
-            await db.execute("""
-                UPDATE user_levels 
-                SET total_xp = ?, level = ?, xp = 0
-                WHERE user_id = ? AND guild_id = ?
-            """, (new_total_xp, new_level, member.id, ctx.guild.id))
-            await db.commit()
+        async with self.xp_ledger.direct_write(ctx.guild.id, member.id):
+            async with aiosqlite.connect(DB_PATH) as db:
+                await db.execute("""
+                    UPDATE user_levels 
+                    SET total_xp = ?, level = ?, xp = 0
+                    WHERE user_id = ? AND guild_id = ?
+                """, (new_total_xp, new_level, member.id, ctx.guild.id))
+                await db.commit()
         
         # Update roles
         await self.assign_level_roles(member, new_level, settings)
@@ -2539,6 +2655,68 @@ class LevelingSystem(commands.Cog):
         
         await ctx.send(embed=embed)
 
+    @level_admin_group.command(name="resync")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def level_admin_resync(self, ctx, mode: str = "resume"):
+        """
+        🔁 Re-apply level reward roles to every member
+        
+        **Usage:**
+        `{prefix}level admin resync` - Resync (continues an interrupted run)
+        `{prefix}level admin resync restart` - Start over from the first member
+        """
+        if level_role_reconciler.is_resyncing(ctx.guild.id):
+            embed = discord.Embed(
+                title=f"{emojis['warning']} Resync Running",
+                description="A level role resync is already running for this server.",
+                color=0xff9900
+            )
+            return await ctx.send(embed=embed)
+        
+        settings = await self.get_guild_settings(ctx.guild.id)
+        # Levels are read from the table, so write pending XP first
+        await self.xp_ledger.flush()
+        
+        embed = discord.Embed(
+            title=f"{emojis['gear']} Resyncing Level Roles",
+            description="Starting...",
+            color=0x006fb9
+        )
+        status = await ctx.send(embed=embed)
+        
+        async def report(checked: int, changed: int, total: int):
+            embed.description = f"Checked **{checked:,}** / **{total:,}** members • **{changed:,}** updated"
+            try:
+                await status.edit(embed=embed)
+            except discord.HTTPException:
+                pass
+        
+        try:
+            checked, changed = await level_role_reconciler.resync_guild(
+                ctx.guild, settings, resume=mode.lower() != "restart", progress=report
+            )
+        except discord.Forbidden:
+            embed.title = f"{emojis['error']} Resync Stopped"
+            embed.description = (f"Missing permissions to manage roles. Fix the bot's role position and run "
+                                 f"`{ctx.prefix}level admin resync` to continue where it stopped.")
+            embed.color = 0xff0000
+            return await status.edit(embed=embed)
+        except Exception as e:
+            await self.error_logger.log_error(
+                f"Level Role Resync Error in {ctx.guild.name}",
+                f"Error resyncing level roles: {str(e)} | Guild: {ctx.guild.id} | Admin: {ctx.author.id}"
+            )
+            embed.title = f"{emojis['warning']} Resync Stopped"
+            embed.description = f"An error occurred. Run `{ctx.prefix}level admin resync` to continue where it stopped."
+            embed.color = 0xff0000
+            return await status.edit(embed=embed)
+        
+        embed.title = f"{emojis['check']} Level Roles Resynced"
+        embed.description = f"Checked **{checked:,}** members • **{changed:,}** updated"
+        embed.color = 0x00ff00
+        await status.edit(embed=embed)
+
     @level_admin_group.command(name="reset")
     @commands.guild_only()
     @commands.has_permissions(manage_guild=True)
@@ -2590,6 +2768,50 @@ class LevelingSystem(commands.Cog):
 
 # ================= VIEW CLASSES =================
 
+class LeaderboardPageView(discord.ui.View):
+    def __init__(self, cog: "LevelingSystem", author: discord.abc.User, page: int, total_pages: int):
+        super().__init__(timeout=120)
+        self.cog = cog
+        self.author = author
+        self.page = page
+        self.total_pages = total_pages
+        self._sync_buttons()
+
+    def _sync_buttons(self):
+        self.previous_page.disabled = self.page <= 1
+        self.next_page.disabled = self.page >= self.total_pages
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        if interaction.user.id != self.author.id:
+            return await interaction.response.send_message("Only the command author can change pages.", ephemeral=True)
+        embed, self.page, self.total_pages = await self.cog.build_leaderboard_embed(interaction.guild, page, self.author)
+        if embed is None:
+            return await interaction.response.edit_message(view=None)
+        self._sync_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
+
+
+def _ledger_write(client, guild_id: int, user_id: Optional[int] = None):
+    """Ledger guard for views that edit user_levels directly (no-op if the cog is not loaded)"""
+    cog = client.get_cog("LevelingSystem") if client else None
+    if cog is None:
+        return contextlib.nullcontext()
+    return cog.xp_ledger.direct_write(guild_id, user_id)
+
+def _settings_changed(client, guild_id: Optional[int] = None):
+    """Drop the cog's cached settings after a view wrote guild_level_settings (no-op if the cog is not loaded)"""
+    cog = client.get_cog("LevelingSystem") if client else None
+    if cog is not None:
+        cog.invalidate_settings(guild_id)
+
 class XPSettingsModal(discord.ui.Modal, title='⚡ XP Settings Configuration'):
     def __init__(self, current_settings: Dict[str, Any], error_logger=None):
         super().__init__()
@@ -2645,6 +2867,7 @@ class XPSettingsModal(discord.ui.Modal, title='⚡ XP Settings Configuration'):
                     WHERE guild_id = ?
                 """, (xp_base, xp_var, cooldown, interaction.guild.id))
                 await db.commit()
+                _settings_changed(interaction.client, interaction.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} XP Settings Updated",
@@ -2685,6 +2908,7 @@ class ChannelSettingsView(discord.ui.View):
                         (json.dumps(channel_ids), interaction.guild and interaction.guild.id)
                     )
                     await db.commit()
+                    _settings_changed(interaction.client, interaction.guild and interaction.guild.id)
                 
                 channel_mentions = [f"<#{channel_id}>" for channel_id in channel_ids]
                 embed = discord.Embed(
@@ -2735,6 +2959,7 @@ class ChannelSettingsView(discord.ui.View):
                         (channel_id, interaction.guild and interaction.guild.id)
                     )
                     await db.commit()
+                    _settings_changed(interaction.client, interaction.guild and interaction.guild.id)
                 
                 embed = discord.Embed(
                     title=f"{emojis['check']} Level Up Channel Updated",
@@ -2793,6 +3018,7 @@ class RoleSettingsView(discord.ui.View):
                     (json.dumps(role_ids), interaction.guild.id)
                 )
                 await db.commit()
+                _settings_changed(interaction.client, interaction.guild.id)
             
             role_mentions = [role.mention for role in select.values]
             embed = discord.Embed(
@@ -2936,6 +3162,7 @@ class AddLevelRoleModal(discord.ui.Modal, title='➕ Add Level Role'):
                         (interaction.guild.id, level_num, role_id)
                     )
                 await db.commit()
+                level_role_reconciler.invalidate(interaction.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} Level Role Added",
@@ -2990,6 +3217,7 @@ class RemoveLevelRoleModal(discord.ui.Modal, title='➖ Remove Level Role'):
                     (interaction.guild.id, level_num)
                 )
                 await db.commit()
+                level_role_reconciler.invalidate(interaction.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} Level Role Removed",
@@ -3142,6 +3370,7 @@ class AddMultiplierModal(discord.ui.Modal, title='⚡ Add XP Multiplier'):
                     (json.dumps(multipliers), interaction.guild.id)
                 )
                 await db.commit()
+                _settings_changed(interaction.client, interaction.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} XP Multiplier Added",
@@ -3209,6 +3438,7 @@ class RemoveMultiplierModal(discord.ui.Modal, title='➖ Remove XP Multiplier'):
                     (json.dumps(multipliers), interaction.guild.id)
                 )
                 await db.commit()
+                _settings_changed(interaction.client, interaction.guild.id)
             
             role = interaction.guild.get_role(role_id)
             role_name = role.mention if role else f"Role ID: {role_id}"
@@ -3266,6 +3496,7 @@ class MessageSettingsModal(discord.ui.Modal, title='💬 Level Up Message Settin
                     (message, interaction.guild.id)
                 )
                 await db.commit()
+                _settings_changed(interaction.client, interaction.guild.id)
             
             embed = discord.Embed(
                 title=f"{emojis['check']} Level Up Message Updated",
@@ -3317,6 +3548,7 @@ class AnnouncementChannelView(PaginatedChannelView):
                         WHERE guild_id = ?
                     """, (channel_id, guild_id))
                     await db.commit()
+                    _settings_changed(interaction.client, guild_id)
                 
                 embed = discord.Embed(
                     title=f"{emojis['success']} Announcement Channel Set",
@@ -3363,6 +3595,7 @@ class DisableAnnouncementsButton(discord.ui.Button):
                     WHERE guild_id = ?
                 """, (self.guild_id,))
                 await db.commit()
+                _settings_changed(interaction.client, self.guild_id)
             
             embed = discord.Embed(
                 title=f"{emojis['success']} Announcements Disabled",
@@ -3413,6 +3646,8 @@ class ResetConfirmView(discord.ui.View):
                 # await db.execute("DELETE FROM user_levels WHERE guild_id = ?", (self.guild_id,))
                 
                 await db.commit()
+                _settings_changed(interaction.client, self.guild_id)
+                level_role_reconciler.invalidate(self.guild_id)
             
             embed = discord.Embed(
                 title=f"{emojis['success']} Settings Reset Complete",
@@ -3521,6 +3756,8 @@ class LevelSetupView(discord.ui.View):
                 """)
                 
                 await db.commit()
+                # The JSON repair above touched every guild's row
+                _settings_changed(interaction.client)
                 
         except Exception as e:
             if self.error_logger:
@@ -3792,12 +4029,13 @@ class ConfirmResetView(discord.ui.View):
     @discord.ui.button(label="Confirm Reset", style=discord.ButtonStyle.danger, emoji="✅")
     async def confirm_reset(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Confirm the user reset"""
-        async with aiosqlite.connect(DB_PATH) as db:
-            await db.execute(
-                "DELETE FROM user_levels WHERE user_id = ? AND guild_id = ?",
-                (self.user_id, self.guild_id)
-            )
-            await db.commit()
+        async with _ledger_write(interaction.client, self.guild_id, self.user_id):
+            async with aiosqlite.connect(DB_PATH) as db:
+                await db.execute(
+                    "DELETE FROM user_levels WHERE user_id = ? AND guild_id = ?",
+                    (self.user_id, self.guild_id)
+                )
+                await db.commit()
         
         user = interaction.guild.get_member(self.user_id) if interaction.guild else None
         username = user.display_name if user else "Unknown User"
@@ -3832,23 +4070,26 @@ class ConfirmServerResetView(discord.ui.View):
     @discord.ui.button(label="CONFIRM FULL RESET", style=discord.ButtonStyle.danger, emoji="💥")
     async def confirm_server_reset(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Confirm the complete server reset"""
-        async with aiosqlite.connect(DB_PATH) as db:
-            # Delete all user data
-            await db.execute(
-                "DELETE FROM user_levels WHERE guild_id = ?",
-                (self.guild_id,)
-            )
-            # Delete all level roles
-            await db.execute(
-                "DELETE FROM level_roles WHERE guild_id = ?",
-                (self.guild_id,)
-            )
-            # Delete guild settings
-            await db.execute(
-                "DELETE FROM guild_level_settings WHERE guild_id = ?",
-                (self.guild_id,)
-            )
-            await db.commit()
+        async with _ledger_write(interaction.client, self.guild_id):
+            async with aiosqlite.connect(DB_PATH) as db:
+                # Delete all user data
+                await db.execute(
+                    "DELETE FROM user_levels WHERE guild_id = ?",
+                    (self.guild_id,)
+                )
+                # Delete all level roles
+                await db.execute(
+                    "DELETE FROM level_roles WHERE guild_id = ?",
+                    (self.guild_id,)
+                )
+                # Delete guild settings
+                await db.execute(
+                    "DELETE FROM guild_level_settings WHERE guild_id = ?",
+                    (self.guild_id,)
+                )
+                await db.commit()
+                _settings_changed(interaction.client, self.guild_id)
+                level_role_reconciler.invalidate(self.guild_id)
         
         embed = discord.Embed(
             title=f"{emojis['check']} Server Reset Complete",
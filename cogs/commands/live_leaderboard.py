@@ -2,29 +2,61 @@ import discord
 from discord.ext import commands, tasks
 import aiosqlite
 import asyncio
+import hashlib
+import json
+import random
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 import os
 from utils.Tools import blacklist_check, ignore_check
 from utils.error_helpers import StandardErrorHandler
+from utils.activity_counters import ActivityCounters, CounterColumns, PERIODS
+from utils.voice_sessions import get_voice_session_engine
 
 DB_PATH = "databases/live_leaderboard.db"
 
+MESSAGE_COLUMNS = CounterColumns("message_leaderboard", "daily_count", "weekly_count", "monthly_count", "alltime_count")
+VOICE_COLUMNS = CounterColumns("voice_leaderboard", "daily_minutes", "weekly_minutes", "monthly_minutes", "alltime_minutes")
+
+REFRESH_INTERVAL = 600  # seconds between refresh cycles
+REFRESH_SPREAD = 0.8    # fraction of the interval refreshes are jittered across
+EDIT_CONCURRENCY = 4    # leaderboard message edits in flight across all guilds
+BOARD_KINDS = ("chat", "voice")
+
 class LiveLeaderboard(commands.Cog):
     """Live leaderboard system with automatic role rewards"""
     
     def __init__(self, bot):
         self.bot = bot
         self.update_lock = asyncio.Lock()
+        # Per-day activity buckets with in-memory period totals (written behind)
+        self.chat_counters = ActivityCounters(DB_PATH, "chat", MESSAGE_COLUMNS)
+        self.voice_counters = ActivityCounters(DB_PATH, "voice", VOICE_COLUMNS)
+        # Voice sessions are tracked by the shared engine, which publishes their durations
+        self.voice_engine = get_voice_session_engine(bot)
+        # Refresh scheduling: boards with new activity since the last cycle,
+        # and a shared budget for message edits
+        self.active_boards = set()  # (guild_id, kind)
+        self.edit_budget = asyncio.Semaphore(EDIT_CONCURRENCY)
+        self.last_refresh_day = None
+        self.last_cycle_stats = {}
         
     async def cog_load(self):
         """Initialize database and start update loop"""
         await self.init_database()
+        await self.chat_counters.start()
+        await self.voice_counters.start()
+        self.voice_engine.subscribe(self.on_voice_segments)
+        await self.voice_engine.start()
         self.leaderboard_update_loop.start()
         
     async def cog_unload(self):
         """Stop update loop when cog is unloaded"""
         self.leaderboard_update_loop.cancel()
+        await self.voice_engine.unsubscribe(self.on_voice_segments)
+        await self.chat_counters.stop()
+        await self.voice_counters.stop()
         
     # Use standardized error handler
     cog_command_error = StandardErrorHandler.create_cog_error_handler()
@@ -88,6 +120,16 @@ class LiveLeaderboard(commands.Cog):
                     )
                 """)
                 
+                # Refresh state: the posted message, the hash of its content and
+                # whether it needs re-rendering (set on setup/customization changes)
+                for column in ("chat_message_id INTEGER", "voice_message_id INTEGER",
+                               "chat_hash TEXT", "voice_hash TEXT",
+                               "chat_dirty INTEGER DEFAULT 1", "voice_dirty INTEGER DEFAULT 1"):
+                    try:
+                        await db.execute(f"ALTER TABLE leaderboard_channels ADD COLUMN {column}")
+                    except Exception:
+                        pass  # Column already exists
+                
                 # Leaderboard customization settings
                 await db.execute("""
                     CREATE TABLE IF NOT EXISTS leaderboard_customization (
@@ -111,15 +153,27 @@ class LiveLeaderboard(commands.Cog):
                     )
                 """)
                 
+                # Any customization change makes the guild's boards dirty
+                for event in ("INSERT", "UPDATE", "DELETE"):
+                    row = "OLD" if event == "DELETE" else "NEW"
+                    await db.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS leaderboard_customization_{event.lower()}
+                        AFTER {event} ON leaderboard_customization
+                        BEGIN
+                            UPDATE leaderboard_channels SET chat_dirty = 1, voice_dirty = 1
+                            WHERE guild_id = {row}.guild_id;
+                        END
+                    """)
+                
                 await db.commit()
                 print("[LIVE_LB] Database initialized successfully")
                 
         except Exception as e:
             print(f"[LIVE_LB] Database initialization error: {e}")
     
-    @tasks.loop(minutes=10)
+    @tasks.loop(seconds=REFRESH_INTERVAL)
     async def leaderboard_update_loop(self):
-        """Update all leaderboard embeds every 10 minutes"""
+        """Refresh changed leaderboard embeds every 10 minutes"""
         async with self.update_lock:
             try:
                 await self.update_all_leaderboards()
@@ -131,37 +185,79 @@ class LiveLeaderboard(commands.Cog):
         """Wait for bot to be ready before starting loop"""
         await self.bot.wait_until_ready()
     
-    async def update_all_leaderboards(self):
-        """Update all active leaderboard embeds"""
+    async def update_all_leaderboards(self, spread: Optional[float] = None):
+        """
+        Refresh every leaderboard that may have changed since the last cycle.
+        
+        A board is refreshed when it had activity, was flagged dirty (setup or
+        customization change) or a new day started. Refreshes are spread with
+        random jitter over ``spread`` seconds instead of bursting at the top
+        of the cycle, and a board whose rendered content hash is unchanged is
+        not edited at all.
+        """
+        if spread is None:
+            spread = REFRESH_INTERVAL * REFRESH_SPREAD
+        started = time.perf_counter()
+        
+        # Period totals and streaks roll over at midnight without any activity
+        today = self.chat_counters.today()
+        new_day = today != self.last_refresh_day
+        self.last_refresh_day = today
+        active, self.active_boards = self.active_boards, set()
+        
         async with aiosqlite.connect(DB_PATH) as db:
-            # Get all configured leaderboard channels
             cursor = await db.execute("""
-                SELECT guild_id, chat_channel_id, voice_channel_id 
+                SELECT guild_id, chat_channel_id, voice_channel_id, chat_message_id, voice_message_id,
+                       chat_hash, voice_hash, chat_dirty, voice_dirty
                 FROM leaderboard_channels 
                 WHERE chat_channel_id IS NOT NULL OR voice_channel_id IS NOT NULL
             """)
-            
             configs = await cursor.fetchall()
-            
-            for guild_id, chat_channel_id, voice_channel_id in configs:
-                guild = self.bot.get_guild(guild_id)
-                if not guild:
-                    continue
-                    
-                # Update chat leaderboard
-                if chat_channel_id:
-                    channel = guild.get_channel(chat_channel_id)
-                    if channel:
-                        await self.update_chat_leaderboard(guild, channel)
-                        
-                # Update voice leaderboard  
-                if voice_channel_id:
-                    channel = guild.get_channel(voice_channel_id)
-                    if channel:
-                        await self.update_voice_leaderboard(guild, channel)
-                        
-                # Update role rewards
+        
+        due = []
+        for guild_id, chat_channel_id, voice_channel_id, chat_message_id, voice_message_id, \
+                chat_hash, voice_hash, chat_dirty, voice_dirty in configs:
+            boards = [
+                (kind, channel_id, message_id, content_hash, bool(dirty))
+                for kind, channel_id, message_id, content_hash, dirty in (
+                    ("chat", chat_channel_id, chat_message_id, chat_hash, chat_dirty),
+                    ("voice", voice_channel_id, voice_message_id, voice_hash, voice_dirty),
+                )
+                if channel_id and (new_day or dirty or (guild_id, kind) in active)
+            ]
+            # Role rewards only change with activity or a new week
+            rewards = new_day or (guild_id, "chat") in active or (guild_id, "voice") in active
+            if boards or rewards:
+                due.append((guild_id, boards, rewards))
+        
+        stats = {"boards": sum(bool(c[1]) + bool(c[2]) for c in configs),
+                 "due": sum(len(boards) for _, boards, _ in due),
+                 "edited": 0, "unchanged": 0, "failed": 0}
+        
+        async def run(delay, guild_id, boards, rewards):
+            await asyncio.sleep(delay)
+            guild = self.bot.get_guild(guild_id)
+            if not guild:
+                return
+            for kind, channel_id, message_id, content_hash, dirty in boards:
+                channel = guild.get_channel(channel_id)
+                if channel:
+                    result = await self.refresh_leaderboard(guild, channel, kind, message_id, content_hash, dirty)
+                    stats[result] += 1
+            if rewards:
                 await self.update_role_rewards(guild)
+        
+        await asyncio.gather(*(run(random.uniform(0, spread), *entry) for entry in due))
+        
+        stats["elapsed"] = time.perf_counter() - started
+        self.last_cycle_stats = stats
+        if stats["edited"] or stats["failed"]:
+            print(f"[LIVE_LB] Refresh cycle: {stats['edited']} edited, {stats['unchanged']} unchanged, "
+                  f"{stats['failed']} failed of {stats['boards']} boards in {stats['elapsed']:.1f}s")
+    
+    def mark_active(self, guild_id, kind):
+        """Flag a guild's board as possibly changed for the next refresh cycle"""
+        self.active_boards.add((guild_id, kind))
     
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -170,189 +266,27 @@ class LiveLeaderboard(commands.Cog):
             return
             
         try:
-            current_date = datetime.now(timezone.utc).date()
-            
-            async with aiosqlite.connect(DB_PATH) as db:
-                # Get or create user record
-                cursor = await db.execute("""
-                    SELECT daily_count, weekly_count, monthly_count, alltime_count,
-                           current_streak, longest_streak, last_activity_date,
-                           last_daily_reset, last_weekly_reset, last_monthly_reset
-                    FROM message_leaderboard 
-                    WHERE guild_id = ? AND user_id = ?
-                """, (message.guild.id, message.author.id))
-                
-                row = await cursor.fetchone()
-                
-                if row:
-                    daily, weekly, monthly, alltime, current_streak, longest_streak, last_activity, last_daily, last_weekly, last_monthly = row
-                    
-                    # Calculate streak
-                    if last_activity:
-                        last_activity_date = datetime.strptime(last_activity, "%Y-%m-%d").date()
-                        days_diff = (current_date - last_activity_date).days
-                        
-                        if days_diff == 1:
-                            # Continue streak
-                            current_streak += 1
-                        elif days_diff == 0:
-                            # Same day, no streak change
-                            pass
-                        else:
-                            # Streak broken
-                            current_streak = 1
-                    else:
-                        # First activity
-                        current_streak = 1
-                    
-                    # Update longest streak
-                    if current_streak > longest_streak:
-                        longest_streak = current_streak
-                    
-                    # Reset counters if needed
-                    if last_daily != str(current_date):
-                        daily = 0
-                    if last_weekly != str(current_date) and current_date.weekday() == 0:  # Monday reset
-                        weekly = 0
-                    if last_monthly != str(current_date) and current_date.day == 1:  # Monthly reset
-                        monthly = 0
-                        
-                    # Increment counts
-                    daily += 1
-                    weekly += 1
-                    monthly += 1
-                    alltime += 1
-                    
-                    await db.execute("""
-                        UPDATE message_leaderboard 
-                        SET daily_count = ?, weekly_count = ?, monthly_count = ?, alltime_count = ?,
-                            current_streak = ?, longest_streak = ?, last_activity_date = ?,
-                            last_daily_reset = ?, last_weekly_reset = ?, last_monthly_reset = ?,
-                            username = ?
-                        WHERE guild_id = ? AND user_id = ?
-                    """, (daily, weekly, monthly, alltime, current_streak, longest_streak, str(current_date),
-                         str(current_date), str(current_date), str(current_date), 
-                         message.author.display_name, message.guild.id, message.author.id))
-                else:
-                    # Create new record
-                    await db.execute("""
-                        INSERT INTO message_leaderboard 
-                        (guild_id, user_id, username, daily_count, weekly_count, monthly_count, alltime_count,
-                         current_streak, longest_streak, last_activity_date,
-                         last_daily_reset, last_weekly_reset, last_monthly_reset)
-                        VALUES (?, ?, ?, 1, 1, 1, 1, 1, 1, ?, ?, ?, ?)
-                    """, (message.guild.id, message.author.id, message.author.display_name,
-                         str(current_date), str(current_date), str(current_date), str(current_date)))
-                
-                await db.commit()
+            await self.chat_counters.add(message.guild.id, message.author.id, message.author.display_name)
+            self.mark_active(message.guild.id, "chat")
                 
         except Exception as e:
             print(f"[LIVE_LB] Message tracking error: {e}")
     
-    @commands.Cog.listener()
-    async def on_voice_state_update(self, member, before, after):
-        """Track voice activity for leaderboard"""
-        if member.bot:
-            return
-            
-        try:
-            current_time = datetime.now(timezone.utc)
-            current_date = current_time.date()
-            
-            async with aiosqlite.connect(DB_PATH) as db:
-                if before.channel is None and after.channel is not None:
-                    # User joined voice - start session
-                    await db.execute("""
-                        INSERT OR REPLACE INTO voice_leaderboard
-                        (guild_id, user_id, username, daily_minutes, weekly_minutes, monthly_minutes, alltime_minutes,
-                         current_streak, longest_streak, last_activity_date,
-                         last_daily_reset, last_weekly_reset, last_monthly_reset, session_start)
-                        VALUES (?, ?, ?, 
-                               COALESCE((SELECT daily_minutes FROM voice_leaderboard WHERE guild_id = ? AND user_id = ?), 0),
-                               COALESCE((SELECT weekly_minutes FROM voice_leaderboard WHERE guild_id = ? AND user_id = ?), 0),
-                               COALESCE((SELECT monthly_minutes FROM voice_leaderboard WHERE guild_id = ? AND user_id = ?), 0),
-                               COALESCE((SELECT alltime_minutes FROM voice_leaderboard WHERE guild_id = ? AND user_id = ?), 0),
-                               COALESCE((SELECT current_streak FROM voice_leaderboard WHERE guild_id = ? AND user_id = ?), 0),
-                               COALESCE((SELECT longest_streak FROM voice_leaderboard WHERE guild_id = ? AND user_id = ?), 0),
-                               COALESCE((SELECT last_activity_date FROM voice_leaderboard WHERE guild_id = ? AND user_id = ?), ?),
-                               ?, ?, ?, ?)
-                    """, (member.guild.id, member.id, member.display_name,
-                         member.guild.id, member.id, member.guild.id, member.id,
-                         member.guild.id, member.id, member.guild.id, member.id,
-                         member.guild.id, member.id, member.guild.id, member.id,
-                         member.guild.id, member.id, str(current_date),
-                         str(current_date), str(current_date), str(current_date), current_time))
-                    
-                elif before.channel is not None and after.channel is None:
-                    # User left voice - end session and calculate time
-                    cursor = await db.execute("""
-                        SELECT session_start, daily_minutes, weekly_minutes, monthly_minutes, alltime_minutes,
-                               current_streak, longest_streak, last_activity_date,
-                               last_daily_reset, last_weekly_reset, last_monthly_reset
-                        FROM voice_leaderboard 
-                        WHERE guild_id = ? AND user_id = ?
-                    """, (member.guild.id, member.id))
-                    
-                    row = await cursor.fetchone()
-                    if row and row[0]:
-                        session_start = datetime.fromisoformat(row[0])
-                        session_minutes = (current_time - session_start).total_seconds() / 60
-                        
-                        daily, weekly, monthly, alltime = row[1], row[2], row[3], row[4]
-                        current_streak, longest_streak, last_activity = row[5], row[6], row[7]
-                        last_daily, last_weekly, last_monthly = row[8], row[9], row[10]
-                        
-                        # Calculate streak
-                        if last_activity:
-                            last_activity_date = datetime.strptime(last_activity, "%Y-%m-%d").date()
-                            days_diff = (current_date - last_activity_date).days
-                            
-                            if days_diff == 1:
-                                # Continue streak
-                                current_streak += 1
-                            elif days_diff == 0:
-                                # Same day, no streak change
-                                pass
-                            else:
-                                # Streak broken
-                                current_streak = 1
-                        else:
-                            # First activity
-                            current_streak = 1
-                        
-                        # Update longest streak
-                        if current_streak > longest_streak:
-                            longest_streak = current_streak
-                        
-                        # Reset counters if needed
-                        if last_daily != str(current_date):
-                            daily = 0
-                        if last_weekly != str(current_date) and current_date.weekday() == 0:
-                            weekly = 0
-                        if last_monthly != str(current_date) and current_date.day == 1:
-                            monthly = 0
-                        
-                        # Add session time
-                        daily += session_minutes
-                        weekly += session_minutes
-                        monthly += session_minutes
-                        alltime += session_minutes
-                        
-                        await db.execute("""
-                            UPDATE voice_leaderboard 
-                            SET daily_minutes = ?, weekly_minutes = ?, monthly_minutes = ?, alltime_minutes = ?,
-                                current_streak = ?, longest_streak = ?, last_activity_date = ?,
-                                last_daily_reset = ?, last_weekly_reset = ?, last_monthly_reset = ?,
-                                session_start = NULL, username = ?
-                            WHERE guild_id = ? AND user_id = ?
-                        """, (daily, weekly, monthly, alltime, current_streak, longest_streak, str(current_date),
-                             str(current_date), str(current_date), str(current_date), 
-                             member.display_name, member.guild.id, member.id))
-                
-                await db.commit()
-                
-        except Exception as e:
-            print(f"[LIVE_LB] Voice tracking error: {e}")
+    async def on_voice_segments(self, segments):
+        """Credit published voice time to the days it covered"""
+        for segment in segments:
+            if segment.bot:
+                continue
+            try:
+                guild = self.bot.get_guild(segment.guild_id)
+                member = guild.get_member(segment.user_id) if guild else None
+                await self.voice_counters.add_session(
+                    segment.guild_id, segment.user_id, member.display_name if member else None,
+                    segment.start, segment.end
+                )
+                self.mark_active(segment.guild_id, "voice")
+            except Exception as e:
+                print(f"[LIVE_LB] Voice tracking error: {e}")
     
     @commands.command(name="glb", help="Setup or view the global chat leaderboard with live updates", usage="glb [#channel]")
     @blacklist_check()
@@ -588,53 +522,82 @@ class LiveLeaderboard(commands.Cog):
     
     async def update_chat_leaderboard(self, guild, channel):
         """Update the chat leaderboard embed in the specified channel"""
-        try:
-            # Get or create the leaderboard message
-            messages = []
-            async for message in channel.history(limit=50):
-                if message.author == self.bot.user and message.embeds:
-                    embed = message.embeds[0]
-                    if "Chat Leaderboard" in (embed.title or ""):
-                        messages.append(message)
-                        break
-            
-            embed = await self.create_chat_leaderboard_embed(guild, "weekly")
-            view = LeaderboardView(None, self, "chat", persistent=True)
-            
-            if messages:
-                # Update existing message
-                await messages[0].edit(embed=embed, view=view)
-            else:
-                # Send new message
-                await channel.send(embed=embed, view=view)
-                
-        except Exception as e:
-            print(f"[LIVE_LB] Error updating chat leaderboard: {e}")
+        await self.refresh_leaderboard(guild, channel, "chat", force=True)
     
     async def update_voice_leaderboard(self, guild, channel):
         """Update the voice leaderboard embed in the specified channel"""
+        await self.refresh_leaderboard(guild, channel, "voice", force=True)
+    
+    @staticmethod
+    def embed_hash(embed):
+        """Hash of an embed's content, ignoring its timestamp"""
+        data = embed.to_dict()
+        data.pop("timestamp", None)
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+    
+    async def find_leaderboard_message(self, channel, kind):
+        """Scan recent history for a posted board (boards from before message ids were stored)"""
+        title = "Chat Leaderboard" if kind == "chat" else "Voice Leaderboard"
+        async for message in channel.history(limit=50):
+            if message.author == self.bot.user and message.embeds:
+                if title in (message.embeds[0].title or ""):
+                    return message
+        return None
+    
+    async def refresh_leaderboard(self, guild, channel, kind, message_id=None, content_hash=None,
+                                  dirty=True, force=False):
+        """
+        Re-render one leaderboard and edit its message if the content changed.
+        
+        Returns "edited", "unchanged" or "failed". Edits go through the shared
+        edit budget; the posted message id and content hash are stored so the
+        next refresh needs neither a history scan nor an edit when nothing moved.
+        """
         try:
-            # Get or create the leaderboard message
-            messages = []
-            async for message in channel.history(limit=50):
-                if message.author == self.bot.user and message.embeds:
-                    embed = message.embeds[0]
-                    if "Voice Leaderboard" in (embed.title or ""):
-                        messages.append(message)
-                        break
+            if kind == "chat":
+                embed = await self.create_chat_leaderboard_embed(guild, "weekly")
+            else:
+                embed = await self.create_voice_leaderboard_embed(guild, "weekly")
+            new_hash = self.embed_hash(embed)
             
-            embed = await self.create_voice_leaderboard_embed(guild, "weekly")
-            view = LeaderboardView(None, self, "voice", persistent=True)
+            if not force and message_id and new_hash == content_hash:
+                if dirty:
+                    await self.save_refresh_state(guild.id, kind, message_id, new_hash)
+                return "unchanged"
             
-            if messages:
-                # Update existing message
-                await messages[0].edit(embed=embed, view=view)
-            else:
-                # Send new message
-                await channel.send(embed=embed, view=view)
-                
+            view = LeaderboardView(None, self, kind, persistent=True)
+            async with self.edit_budget:
+                message = None
+                if message_id:
+                    try:
+                        message = await channel.get_partial_message(message_id).edit(embed=embed, view=view)
+                    except discord.NotFound:
+                        message = None
+                if message is None:
+                    message = await self.find_leaderboard_message(channel, kind)
+                    if message:
+                        # Update existing message
+                        await message.edit(embed=embed, view=view)
+                    else:
+                        # Send new message
+                        message = await channel.send(embed=embed, view=view)
+            
+            await self.save_refresh_state(guild.id, kind, message.id, new_hash)
+            return "edited"
+        
         except Exception as e:
-            print(f"[LIVE_LB] Error updating voice leaderboard: {e}")
+            print(f"[LIVE_LB] Error updating {kind} leaderboard: {e}")
+            return "failed"
+    
+    async def save_refresh_state(self, guild_id, kind, message_id, content_hash):
+        """Store the board's message id and content hash and clear its dirty flag"""
+        async with aiosqlite.connect(DB_PATH) as db:
+            await db.execute(f"""
+                UPDATE leaderboard_channels
+                SET {kind}_message_id = ?, {kind}_hash = ?, {kind}_dirty = 0
+                WHERE guild_id = ?
+            """, (message_id, content_hash, guild_id))
+            await db.commit()
     
     async def get_customization_settings(self, guild_id):
         """Get customization settings for a guild, with defaults if not set"""
@@ -693,25 +656,9 @@ class LiveLeaderboard(commands.Cog):
         # Get customization settings
         settings = await self.get_customization_settings(guild.id)
         
-        timeframe_column = {
-            "daily": "daily_count",
-            "weekly": "weekly_count", 
-            "monthly": "monthly_count",
-            "alltime": "alltime_count"
-        }
-        
-        column = timeframe_column.get(timeframe, "weekly_count")
-        
-        async with aiosqlite.connect(DB_PATH) as db:
-            cursor = await db.execute(f"""
-                SELECT user_id, username, {column}, current_streak
-                FROM message_leaderboard 
-                WHERE guild_id = ? AND {column} > 0
-                ORDER BY {column} DESC
-                LIMIT 10
-            """, (guild.id,))
-            
-            results = await cursor.fetchall()
+        if timeframe not in PERIODS:
+            timeframe = "weekly"
+        results = await self.chat_counters.top(guild.id, timeframe, 10)
         
         # Timeframe icons
         timeframe_icons = {
@@ -788,25 +735,9 @@ class LiveLeaderboard(commands.Cog):
         # Get customization settings
         settings = await self.get_customization_settings(guild.id)
         
-        timeframe_column = {
-            "daily": "daily_minutes",
-            "weekly": "weekly_minutes",
-            "monthly": "monthly_minutes", 
-            "alltime": "alltime_minutes"
-        }
-        
-        column = timeframe_column.get(timeframe, "weekly_minutes")
-        
-        async with aiosqlite.connect(DB_PATH) as db:
-            cursor = await db.execute(f"""
-                SELECT user_id, username, {column}, current_streak
-                FROM voice_leaderboard 
-                WHERE guild_id = ? AND {column} > 0
-                ORDER BY {column} DESC
-                LIMIT 10
-            """, (guild.id,))
-            
-            results = await cursor.fetchall()
+        if timeframe not in PERIODS:
+            timeframe = "weekly"
+        results = await self.voice_counters.top(guild.id, timeframe, 10)
         
         # Timeframe icons
         timeframe_icons = {
@@ -855,7 +786,7 @@ class LiveLeaderboard(commands.Cog):
                 if hours >= 1:
                     time_display = f"{hours:.1f}h"
                 else:
-                    time_display = f"{minutes}m"
+                    time_display = f"{minutes:.0f}m"
                 
                 # Create clean, aligned format
                 if settings['compact_mode']:
@@ -905,15 +836,9 @@ class LiveLeaderboard(commands.Cog):
                     role = guild.get_role(top_chatter_role_id)
                     if role:
                         # Get weekly top chatter
-                        cursor = await db.execute("""
-                            SELECT user_id FROM message_leaderboard 
-                            WHERE guild_id = ? AND weekly_count > 0
-                            ORDER BY weekly_count DESC LIMIT 1
-                        """, (guild.id,))
-                        
-                        result = await cursor.fetchone()
+                        result = await self.chat_counters.top(guild.id, "weekly", 1)
                         if result:
-                            top_user = guild.get_member(result[0])
+                            top_user = guild.get_member(result[0][0])
                             if top_user:
                                 # Remove role from all members
                                 for member in role.members:
@@ -929,15 +854,9 @@ class LiveLeaderboard(commands.Cog):
                     role = guild.get_role(top_voice_role_id)
                     if role:
                         # Get weekly top voice user
-                        cursor = await db.execute("""
-                            SELECT user_id FROM voice_leaderboard 
-                            WHERE guild_id = ? AND weekly_minutes > 0
-                            ORDER BY weekly_minutes DESC LIMIT 1
-                        """, (guild.id,))
-                        
-                        result = await cursor.fetchone()
+                        result = await self.voice_counters.top(guild.id, "weekly", 1)
                         if result:
-                            top_user = guild.get_member(result[0])
+                            top_user = guild.get_member(result[0][0])
                             if top_user:
                                 # Remove role from all members
                                 for member in role.members:
@@ -965,30 +884,17 @@ class LiveLeaderboard(commands.Cog):
         """Show personal streak information"""
         target_user = user or ctx.author
         
-        async with aiosqlite.connect(DB_PATH) as db:
-            # Get chat streak
-            cursor = await db.execute("""
-                SELECT current_streak, longest_streak, last_activity_date
-                FROM message_leaderboard 
-                WHERE guild_id = ? AND user_id = ?
-            """, (ctx.guild.id, target_user.id))
-            
-            chat_data = await cursor.fetchone()
-            chat_current = chat_data[0] if chat_data else 0
-            chat_longest = chat_data[1] if chat_data else 0
-            chat_last = chat_data[2] if chat_data else "Never"
-            
-            # Get voice streak
-            cursor = await db.execute("""
-                SELECT current_streak, longest_streak, last_activity_date
-                FROM voice_leaderboard 
-                WHERE guild_id = ? AND user_id = ?
-            """, (ctx.guild.id, target_user.id))
-            
-            voice_data = await cursor.fetchone()
-            voice_current = voice_data[0] if voice_data else 0
-            voice_longest = voice_data[1] if voice_data else 0
-            voice_last = voice_data[2] if voice_data else "Never"
+        # Get chat streak
+        chat_data = await self.chat_counters.get_user(ctx.guild.id, target_user.id)
+        chat_current = chat_data['current_streak'] if chat_data else 0
+        chat_longest = chat_data['longest_streak'] if chat_data else 0
+        chat_last = (chat_data['last_activity_date'] if chat_data else None) or "Never"
+        
+        # Get voice streak
+        voice_data = await self.voice_counters.get_user(ctx.guild.id, target_user.id)
+        voice_current = voice_data['current_streak'] if voice_data else 0
+        voice_longest = voice_data['longest_streak'] if voice_data else 0
+        voice_last = (voice_data['last_activity_date'] if voice_data else None) or "Never"
         
         embed = discord.Embed(
             title=f"<:feast_time:1400143469892210757> {target_user.display_name}'s Activity Streaks",
@@ -1043,29 +949,11 @@ class LiveLeaderboard(commands.Cog):
     
     async def create_streak_leaderboard_embed(self, guild, streak_type="chat"):
         """Create streak leaderboard embed"""
-        table = "message_leaderboard" if streak_type == "chat" else "voice_leaderboard"
+        counters = self.chat_counters if streak_type == "chat" else self.voice_counters
+        results = await counters.top_streaks(guild.id, 10)
         
-        async with aiosqlite.connect(DB_PATH) as db:
-            cursor = await db.execute(f"""
-                SELECT user_id, username, current_streak, longest_streak
-                FROM {table} 
-                WHERE guild_id = ? AND current_streak > 0
-                ORDER BY current_streak DESC, longest_streak DESC
-                LIMIT 10
-            """, (guild.id,))
-            
-            results = await cursor.fetchall()
-            
-            # Also get longest streaks data
-            longest_cursor = await db.execute(f"""
-                SELECT username, longest_streak
-                FROM {table} 
-                WHERE guild_id = ? AND longest_streak > 0
-                ORDER BY longest_streak DESC
-                LIMIT 3
-            """, (guild.id,))
-            
-            longest_results = await longest_cursor.fetchall()
+        # Also get longest streaks data
+        longest_results = await counters.top_longest_streaks(guild.id, 3)
         
         emoji = "<:feast_plus:1400142875483836547>" if streak_type == "chat" else "<:feast_mod:1400136216497623130>"
         title = f"{emoji} Current {streak_type.title()} Streaks"
@@ -1,17 +1,17 @@
 import discord
 from discord.ext import commands
 import sqlite3
-import time
 from datetime import datetime
 from utils.timezone_helpers import get_timezone_helpers
+from utils.cooldowns import cooldowns
 
 from utils.error_helpers import StandardErrorHandler
 DB_FILE = "logging.db"
 
 # Rate limiting for logging events to prevent spam
-LOG_COOLDOWNS = {}  # {(guild_id, log_type): last_sent_time}
+LOG_COOLDOWNS = cooldowns.namespace("logging.send")  # {(guild_id, log_type)}
 LOG_COOLDOWN_SECONDS = 10  # Minimum seconds between similar log events
-POSITION_CHANGE_COOLDOWNS = {}  # {guild_id: last_position_log_time}
+POSITION_CHANGE_COOLDOWNS = cooldowns.namespace("logging.position")  # {guild_id}
 POSITION_CHANGE_COOLDOWN = 30  # 30 seconds between position change logs
 
 LOG_CHANNELS = {
@@ -85,14 +85,8 @@ class Logging(commands.Cog):
             
         # Rate limiting check (unless bypassed)
         if not bypass_cooldown:
-            current_time = time.time()
-            cooldown_key = (guild.id, log_type)
-            
-            if cooldown_key in LOG_COOLDOWNS:
-                if current_time - LOG_COOLDOWNS[cooldown_key] < LOG_COOLDOWN_SECONDS:
-                    return  # Still in cooldown, skip this log
-                    
-            LOG_COOLDOWNS[cooldown_key] = current_time
+            if not LOG_COOLDOWNS.try_acquire((guild.id, log_type), LOG_COOLDOWN_SECONDS):
+                return  # Still in cooldown, skip this log
         
         try:
             await channel.send(embed=embed)
@@ -100,7 +94,7 @@ class Logging(commands.Cog):
             if e.status == 429:  # Rate limited
                 print(f"[LOGGING] Rate limited in guild {guild.id}, log type {log_type}")
                 # Increase cooldown for this guild/log type
-                LOG_COOLDOWNS[(guild.id, log_type)] = time.time() + 60  # 1 minute penalty
+                LOG_COOLDOWNS.set((guild.id, log_type), LOG_COOLDOWN_SECONDS + 60)  # 1 minute penalty
             else:
                 print(f"[LOGGING] HTTP error in guild {guild.id}: {e}")
         except Exception as e:
@@ -510,11 +504,8 @@ class Logging(commands.Cog):
             
             # If only position changed, apply heavy rate limiting
             if position_only:
-                current_time = time.time()
-                if after.guild.id in POSITION_CHANGE_COOLDOWNS:
-                    if current_time - POSITION_CHANGE_COOLDOWNS[after.guild.id] < POSITION_CHANGE_COOLDOWN:
-                        return  # Skip position-only changes during cooldown
-                POSITION_CHANGE_COOLDOWNS[after.guild.id] = current_time
+                if not POSITION_CHANGE_COOLDOWNS.try_acquire(after.guild.id, POSITION_CHANGE_COOLDOWN):
+                    return  # Skip position-only changes during cooldown
             
         if changes:
             embed = discord.Embed(title="✏️ Channel Updated", color=discord.Color.blue())
@@ -566,11 +557,8 @@ class Logging(commands.Cog):
             
             # If only position changed, apply heavy rate limiting
             if position_only:
-                current_time = time.time()
-                if after.guild.id in POSITION_CHANGE_COOLDOWNS:
-                    if current_time - POSITION_CHANGE_COOLDOWNS[after.guild.id] < POSITION_CHANGE_COOLDOWN:
-                        return  # Skip position-only changes during cooldown
-                POSITION_CHANGE_COOLDOWNS[after.guild.id] = current_time
+                if not POSITION_CHANGE_COOLDOWNS.try_acquire(after.guild.id, POSITION_CHANGE_COOLDOWN):
+                    return  # Skip position-only changes during cooldown
             
         if changes:
             embed = discord.Embed(title="✏️ Role Updated", color=discord.Color.blue())
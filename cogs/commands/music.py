@@ -6,7 +6,7 @@ from discord.ext import commands, tasks
 import datetime
 from discord.ui import Button, View
 import asyncio
-import yt_dlp
+import yt_dlp  # noqa: F401 - loaded before extraction workers fork, so each starts with it imported
 import re
 import os
 import subprocess
@@ -14,6 +14,8 @@ import requests
 from typing import Optional, List, Dict
 from utils import Paginator, DescriptionEmbedPaginator
 from utils.Tools import blacklist_check, ignore_check
+from utils.extraction_pool import NOW_PLAYING, QUEUED, SEARCH, get_extraction_pool
+from utils.track_cache import CachedTrack, canonical_url, get_track_cache, is_url, track_from_data
 from core import Cog, sleepless, Context
 from PIL import Image, ImageDraw, ImageFont, ImageOps
 import io
@@ -494,7 +496,8 @@ class SearchResultView(View):
                     # else continue to download below
             else:
                 # Download the track
-                downloaded_track = await self.music_cog.search_and_download_track(query)
+                priority = QUEUED if self.ctx.guild.id in self.music_cog.current_tracks else NOW_PLAYING
+                downloaded_track = await self.music_cog.search_and_download_track(query, priority=priority)
                 
                 if downloaded_track:
                     downloaded_track.requester = self.ctx.author
@@ -1104,11 +1107,18 @@ class Music(Cog):
         # Lavalink (wavelink) integration: optional
         self.use_lavalink = bool(_os.environ.get('USE_LAVALINK'))
         self._lavalink_pool = None
+        # yt-dlp runs in worker processes with hard timeouts, never on the event loop or its executor
+        self.extraction = get_extraction_pool()
+        # Search results and track metadata survive restarts, so repeat requests skip the lookup
+        self.track_cache = get_track_cache()
         print(f"[INIT] Music cog initialized. USE_LAVALINK={self.use_lavalink}")
         
         # Initialize volume database
         asyncio.create_task(self._init_volume_db())
 
+    async def cog_unload(self):
+        self.extraction.shutdown()
+
     async def _init_volume_db(self):
         """Initialize volume database"""
         try:
@@ -1828,14 +1838,12 @@ class Music(Cog):
         except Exception as e:
             print(f"[CLEANUP] Error during cleanup: {str(e)}")
 
-    async def search_and_download_track(self, query: str, source: str = "ytsearch") -> Optional[Track]:
-        """Search for a track and download it using yt-dlp"""
+    async def search_and_download_track(self, query: str, source: str = "ytsearch", priority: int = QUEUED) -> Optional[Track]:
+        """Search for a track and download it using yt-dlp (``priority``: NOW_PLAYING if nothing is playing yet)"""
         # If Lavalink is enabled and downloads are explicitly disabled, refuse to proceed
         if self.use_lavalink and not bool(_os.environ.get('ALLOW_DOWNLOAD_FALLBACK', '1')):
             print('[ERROR] search_and_download_track called while USE_LAVALINK active and ALLOW_DOWNLOAD_FALLBACK=0')
             return None
-
-        loop = asyncio.get_event_loop()
         
         # Create downloads directory if it doesn't exist
         downloads_dir = "downloads"
@@ -1875,11 +1883,30 @@ class Music(Cog):
         
         # Clean the query
         query = query.strip()
-        
+
+        # A query resolved before skips the info step and downloads right away
+        if is_url(query):
+            cached = await self._cached_url(query)
+            cached = [cached] if cached else None
+        else:
+            cached = await self._cached_query('ytdlp', query)
+        if cached == []:
+            print(f"[DEBUG] Cached: no results for query: {query}")
+            return None
+        if cached:
+            print(f"[DEBUG] Cache hit: {cached[0].title} ({cached[0].url})")
+            try:
+                track = await self._download_entry(cached[0].data(), search_strategies[0]['options'], priority, "Cached")
+                if track:
+                    return track
+            except Exception as e:
+                print(f"[ERROR] Cached track download failed: {str(e)[:100]}...")
+            await self._forget_cached(cached[0].url)
+
+        # Only "nothing found" from every strategy is cached; errors are retried next time
+        found_nothing = True
         for i, strategy in enumerate(search_strategies, 1):
             try:
-                ytdl = yt_dlp.YoutubeDL(strategy['options'])
-                
                 # If it's already a URL, use it directly
                 if query.startswith(('http', 'www')):
                     search_query = query
@@ -1894,8 +1921,7 @@ class Music(Cog):
                 del info_options['outtmpl']  # Remove download template for info extraction
                 info_options['extractaudio'] = False
                 
-                info_ytdl = yt_dlp.YoutubeDL(info_options)
-                info_data = await loop.run_in_executor(None, lambda: info_ytdl.extract_info(search_query, download=False))
+                info_data = await self.extraction.extract(search_query, info_options, priority=priority, timeout=30)
                 
                 if not info_data:
                     print(f"[DEBUG] Strategy {i}: No info data returned")
@@ -1913,6 +1939,7 @@ class Music(Cog):
                     continue
                 
                 print(f"[DEBUG] Strategy {i}: Found track: {track_entry.get('title', 'Unknown')}")
+                found_nothing = False
                 
                 # Now download the track
                 download_url = track_entry.get('webpage_url') or track_entry.get('url')
@@ -1920,55 +1947,125 @@ class Music(Cog):
                     print(f"[DEBUG] Strategy {i}: No download URL found")
                     continue
                 
-                # Download the audio file
-                download_data = await loop.run_in_executor(None, lambda: ytdl.extract_info(download_url, download=True))
-                
-                if download_data:
-                    # Find the downloaded file
-                    filename = ytdl.prepare_filename(download_data)
-                    
-                    # yt-dlp might change the extension due to post-processing or original format
-                    if not os.path.exists(filename):
-                        base, _ = os.path.splitext(filename)
-                        for ext in ['.mp3', '.opus', '.m4a', '.webm', '.mp4', '.wav']:
-                            alt_filename = base + ext
-                            if os.path.exists(alt_filename):
-                                filename = alt_filename
-                                break
-                    
-                    if os.path.exists(filename):
-                        print(f"[DEBUG] Strategy {i}: Successfully downloaded to: {filename}")
-                        # Cleanup old downloads asynchronously
-                        try:
-                            # Run cleanup in thread to avoid blocking event loop
-                            threading.Thread(target=self._cleanup_downloads, daemon=True).start()
-                        except Exception:
-                            pass
-                        # If a file server is enabled for Lavalink, expose an HTTP URL
-                        use_files = bool(_os.environ.get('USE_LAVALINK_FILES'))
-                        if use_files:
-                            host = _os.environ.get('LAVALINK_FILES_HOST', '127.0.0.1')
-                            port = int(_os.environ.get('LAVALINK_FILES_PORT', '8765'))
-                            # Build a file URL path: /files/<basename>
-                            url_path = os.path.basename(filename)
-                            http_url = f"http://{host}:{port}/files/{url_path}"
-                            # Set webpage_url so Lavalink can fetch via HTTP
-                            track_entry['webpage_url'] = http_url
-                            # Return Track without local_file so lavalink path will use the HTTP URL
-                            return Track(track_entry, None, None)
-                        return Track(track_entry, None, filename)
-                    else:
-                        print(f"[DEBUG] Strategy {i}: Downloaded file not found: {filename}")
-                        continue
+                track = await self._download_entry(track_entry, strategy['options'], priority, f"Strategy {i}")
+                if track:
+                    entry = track_from_data(track_entry)
+                    if entry and is_url(query):
+                        # Short links and the like resolve without a search next time too
+                        await self._cache_store(None, None, [entry, entry._replace(url=canonical_url(query))])
+                    elif entry:
+                        await self._cache_store('ytdlp', query, [entry])
+                    return track
                 
             except Exception as e:
+                found_nothing = False
                 error_msg = str(e)
                 print(f"[ERROR] Strategy {i} ({strategy['name']}) failed: {error_msg[:100]}...")
                 continue
         
+        if found_nothing and not is_url(query):
+            await self._cache_store('ytdlp', query, [])
         print(f"[ERROR] All download strategies failed for query: {query}")
         return None
 
+    async def _download_entry(self, track_entry: dict, options: dict, priority: int, label: str) -> Optional[Track]:
+        """Download a resolved track entry; None if the file didn't turn up"""
+        download_url = track_entry.get('webpage_url') or track_entry.get('url')
+        download_data = await self.extraction.extract(download_url, options, download=True,
+                                                      priority=priority, timeout=180)
+        if not download_data:
+            return None
+
+        # Find the downloaded file
+        filename = download_data['_filename']
+        
+        # yt-dlp might change the extension due to post-processing or original format
+        if not os.path.exists(filename):
+            base, _ = os.path.splitext(filename)
+            for ext in ['.mp3', '.opus', '.m4a', '.webm', '.mp4', '.wav']:
+                alt_filename = base + ext
+                if os.path.exists(alt_filename):
+                    filename = alt_filename
+                    break
+        
+        if not os.path.exists(filename):
+            print(f"[DEBUG] {label}: Downloaded file not found: {filename}")
+            return None
+
+        print(f"[DEBUG] {label}: Successfully downloaded to: {filename}")
+        # Cleanup old downloads asynchronously
+        try:
+            # Run cleanup in thread to avoid blocking event loop
+            threading.Thread(target=self._cleanup_downloads, daemon=True).start()
+        except Exception:
+            pass
+        # If a file server is enabled for Lavalink, expose an HTTP URL
+        use_files = bool(_os.environ.get('USE_LAVALINK_FILES'))
+        if use_files:
+            host = _os.environ.get('LAVALINK_FILES_HOST', '127.0.0.1')
+            port = int(_os.environ.get('LAVALINK_FILES_PORT', '8765'))
+            # Build a file URL path: /files/<basename>
+            url_path = os.path.basename(filename)
+            http_url = f"http://{host}:{port}/files/{url_path}"
+            # Set webpage_url so Lavalink can fetch via HTTP (on a copy: the entry's page URL is what gets cached)
+            track_entry = {**track_entry, 'webpage_url': http_url}
+            # Return Track without local_file so lavalink path will use the HTTP URL
+            return Track(track_entry, None, None)
+        return Track(track_entry, None, filename)
+
+    # ---------- track cache ----------
+    # Cache failures are logged and treated as misses: they must never stop playback
+
+    async def _cached_url(self, url: str) -> Optional[CachedTrack]:
+        try:
+            return await self.track_cache.lookup_url(url)
+        except Exception as e:
+            print(f"[ERROR] Track cache lookup failed: {e}")
+            return None
+
+    async def _cached_query(self, scope: str, query: str) -> Optional[List[CachedTrack]]:
+        try:
+            return await self.track_cache.lookup_query(scope, query)
+        except Exception as e:
+            print(f"[ERROR] Track cache lookup failed: {e}")
+            return None
+
+    async def _cache_store(self, scope: Optional[str], query: Optional[str], entries: List[Optional[CachedTrack]]):
+        try:
+            await self.track_cache.store(scope, query, entries)
+        except Exception as e:
+            print(f"[ERROR] Track cache store failed: {e}")
+
+    async def _forget_cached(self, url: str):
+        try:
+            await self.track_cache.forget(url)
+        except Exception as e:
+            print(f"[ERROR] Track cache forget failed: {e}")
+
+    @staticmethod
+    def _playable_entry(playable, extractor: str) -> Optional[CachedTrack]:
+        """Cache entry for a wavelink Playable, with its payload so it can be rebuilt without a search"""
+        payload = getattr(playable, 'raw_data', None)
+        return track_from_data({
+            'title': getattr(playable, 'title', None),
+            'webpage_url': getattr(playable, 'uri', None) or '',
+            'duration': (getattr(playable, 'length', 0) or 0) // 1000,
+            'thumbnail': getattr(playable, 'artwork', '') or '',
+            'uploader': getattr(playable, 'author', None),
+            'extractor': extractor,
+        }, payload if isinstance(payload, dict) and payload.get('encoded') else None)
+
+    @staticmethod
+    def _cached_playable(entry: Optional[CachedTrack]):
+        """wavelink Playable rebuilt from a cache entry, or None"""
+        if entry is None or not entry.lavalink or not WAVELINK_AVAILABLE:
+            return None
+        try:
+            return Playable(entry.lavalink)
+        except Exception as e:
+            print(f"[DEBUG] Cached Lavalink payload unusable: {e}")
+            return None
+
     async def search_track(self, query: str, source: str = "ytsearch") -> Optional[dict]:
         """Legacy method - now redirects to search_and_download_track"""
         track = await self.search_and_download_track(query, source)
@@ -1995,10 +2092,18 @@ class Music(Cog):
                 print('[ERROR] Lavalink pool not available for search')
                 return []
 
+            scope = f"search:lavalink:{source}"
+            cached = await self._cached_query(scope, query)
+            if cached is not None:
+                print(f"[DEBUG] Returning {len(cached)} cached search results")
+                return self._cached_search_results(query, cached)
+
             try:
                 # Enhanced search query preprocessing
-                search_queries = self._generate_search_queries(query, source)
+                search_queries = await self._generate_search_queries(query, source)
                 all_tracks = []
+                entries = {}  # id(track) -> cache entry
+                search_errors = 0
                 
                 for search_query in search_queries:
                     try:
@@ -2034,6 +2139,7 @@ class Music(Cog):
                                     relevance_score = self._calculate_relevance_score(query, track)
                                     track.relevance_score = relevance_score
                                     all_tracks.append(track)
+                                    entries[id(track)] = self._playable_entry(playable, 'lavalink_v4')
                                     print(f"[DEBUG] Successfully converted track: {data['title']} ({duration}s)")
                                     
                                 except Exception as e:
@@ -2047,12 +2153,15 @@ class Music(Cog):
                             break
                             
                     except Exception as e:
+                        search_errors += 1
                         print(f"[DEBUG] Search query failed: {search_query}, error: {e}")
                         continue
 
                 # Sort by relevance score and return best results
                 all_tracks.sort(key=lambda t: getattr(t, 'relevance_score', 0), reverse=True)
                 best_tracks = all_tracks[:5]  # Return top 5 most relevant
+                if best_tracks or not search_errors:
+                    await self._cache_store(scope, query, [entries.get(id(t)) for t in best_tracks])
                 
                 print(f"[DEBUG] Returning {len(best_tracks)} enhanced search results")
                 return best_tracks
@@ -2062,7 +2171,6 @@ class Music(Cog):
                 return []
 
         # Fallback (non-lavalink) legacy behavior retained for environments not using Lavalink
-        loop = asyncio.get_event_loop()
         # Use info-only extraction for search results (no download)
         search_options = {
             'quiet': True,
@@ -2073,15 +2181,21 @@ class Music(Cog):
             'playlistend': 10  # Increased to get more options for filtering
         }
         
+        scope = f"search:ytdlp:{source}"
+        cached = await self._cached_query(scope, query)
+        if cached is not None:
+            print(f"[DEBUG] Returning {len(cached)} cached search results")
+            return self._cached_search_results(query, cached)
+
         try:
             # Clean the query with enhanced preprocessing
-            search_queries = self._generate_search_queries(query, source)
+            search_queries = await self._generate_search_queries(query, source)
             all_tracks = []
+            entries = {}  # id(track) -> cache entry
             
             for search_query in search_queries:
                 print(f"[DEBUG] Searching tracks for: {search_query}")
-                ytdl = yt_dlp.YoutubeDL(search_options)
-                data = await loop.run_in_executor(None, lambda: ytdl.extract_info(search_query, download=False))
+                data = await self.extraction.extract(search_query, search_options, priority=SEARCH, timeout=20)
                 
                 if data and 'entries' in data:
                     for entry in data['entries'][:5]:  # Process first 5 results
@@ -2091,6 +2205,7 @@ class Music(Cog):
                                 relevance_score = self._calculate_relevance_score(query, track)
                                 track.relevance_score = relevance_score
                                 all_tracks.append(track)
+                                entries[id(track)] = track_from_data(entry)
                             except Exception as e:
                                 print(f"[DEBUG] Error creating track: {e}")
                                 continue
@@ -2101,6 +2216,7 @@ class Music(Cog):
             
             # Sort by relevance and return best results
             all_tracks.sort(key=lambda t: getattr(t, 'relevance_score', 0), reverse=True)
+            await self._cache_store(scope, query, [entries.get(id(t)) for t in all_tracks[:5]])
             return all_tracks[:5]
         
         except Exception as e:
@@ -2310,7 +2426,16 @@ class Music(Cog):
                 )
             await ctx.send(embed=embed)
 
-    def _generate_search_queries(self, query: str, source: str = "scsearch") -> List[str]:
+    def _cached_search_results(self, query: str, entries: List[CachedTrack]) -> List[Track]:
+        """Search results rebuilt from the track cache, scored as a fresh search would be"""
+        tracks = []
+        for entry in entries:
+            track = Track(entry.data(), None)
+            track.relevance_score = self._calculate_relevance_score(query, track)
+            tracks.append(track)
+        return tracks
+
+    async def _generate_search_queries(self, query: str, source: str = "scsearch") -> List[str]:
         """Generate multiple search query variations for better matching"""
         queries = []
         clean_query = query.strip()
@@ -2320,24 +2445,28 @@ class Music(Cog):
             # Try to extract title from URL if it's a YouTube URL
             if 'youtube.com' in clean_query or 'youtu.be' in clean_query:
                 try:
-                    import yt_dlp
-                    ydl_opts = {
-                        'quiet': True,
-                        'no_warnings': True,
-                        'extract_flat': True
-                    }
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        info = ydl.extract_info(clean_query, download=False)
-                        if info and info.get('title'):
-                            extracted_title = info['title']
-                            # Clean the extracted title and use it for search
-                            clean_title = re.sub(r'\b(official|music|video|lyric|lyrics|live|acoustic|cover|remix|extended|version|full|song|track|audio|hd|hq|4k|mv|2023|2024|2025)\b', '', extracted_title, flags=re.IGNORECASE)
-                            clean_title = re.sub(r'[^\w\s-]', '', clean_title).strip()
-                            clean_title = ' '.join(clean_title.split())  # Remove extra spaces
-                            if clean_title:
-                                prefix = "scsearch:"  # Always use SoundCloud
-                                queries.append(f"{prefix}{clean_title} audio")
-                                queries.append(f"{prefix}{clean_title} official audio")
+                    cached = await self._cached_url(clean_query)
+                    if cached:
+                        info = cached.data()
+                    else:
+                        ydl_opts = {
+                            'quiet': True,
+                            'no_warnings': True,
+                            'extract_flat': True
+                        }
+                        info = await self.extraction.extract(clean_query, ydl_opts, priority=SEARCH, timeout=10)
+                        if info:
+                            await self._cache_store(None, None, [track_from_data(info)])
+                    if info and info.get('title'):
+                        extracted_title = info['title']
+                        # Clean the extracted title and use it for search
+                        clean_title = re.sub(r'\b(official|music|video|lyric|lyrics|live|acoustic|cover|remix|extended|version|full|song|track|audio|hd|hq|4k|mv|2023|2024|2025)\b', '', extracted_title, flags=re.IGNORECASE)
+                        clean_title = re.sub(r'[^\w\s-]', '', clean_title).strip()
+                        clean_title = ' '.join(clean_title.split())  # Remove extra spaces
+                        if clean_title:
+                            prefix = "scsearch:"  # Always use SoundCloud
+                            queries.append(f"{prefix}{clean_title} audio")
+                            queries.append(f"{prefix}{clean_title} official audio")
                 except Exception as e:
                     print(f"[DEBUG] Failed to extract title from URL: {e}")
             
@@ -2822,6 +2951,7 @@ class Music(Cog):
         print(f"[DEBUG] Original query: {query}")
         
         results = []
+        from_cache = False
         try:
             print(f"[DEBUG] Searching with Wavelink v4 Playable.search: {query}")
             
@@ -2836,8 +2966,19 @@ class Music(Cog):
             if query.startswith(('http://', 'https://')):
                 # For direct URLs, try to use them directly first
                 print(f"[DEBUG] Direct URL detected: {query}")
+                cached_playable = self._cached_playable(await self._cached_url(query))
+                if cached_playable is not None:
+                    print(f"[DEBUG] Cache hit for direct URL: {cached_playable.title}")
+                    results = [cached_playable]
+                    from_cache = True
                 try:
-                    results = await Playable.search(query)
+                    if not results:
+                        results = await Playable.search(query)
+                        # A single track (not a playlist) resolves without a search next time
+                        if results and len(results) == 1:
+                            entry = self._playable_entry(results[0], 'lavalink_v4_direct')
+                            if entry:
+                                await self._cache_store(None, None, [entry, entry._replace(url=canonical_url(query))])
                     if results:
                         print(f"[DEBUG] Direct URL search successful: {len(results)} results")
                     else:
@@ -3149,6 +3290,9 @@ class Music(Cog):
                 # Final check after trying alternatives
                 if not getattr(player, 'playing', False):
                     print(f"[WARNING] No working tracks found after trying {alternatives_tried} alternatives")
+                    if from_cache:
+                        # Resolve it afresh next time rather than replaying a dead payload
+                        await self._forget_cached(query)
                     
                     # Check for YouTube cipher/plugin errors in the error logs
                     youtube_cipher_error = any(
@@ -4014,10 +4158,21 @@ class Music(Cog):
                         
                         all_candidates = []
                         found_good_match = False
+                        search_errors = 0
+                        scope = 'lavalink:nopreview' if skip_previews else 'lavalink:any'
                         
                         # Check if it's a direct URL first
                         if any(url_pattern in query.lower() for url_pattern in ['http://', 'https://', 'youtube.com', 'youtu.be', 'soundcloud.com', 'spotify.com']):
                             print(f"[DEBUG] Detected direct URL, trying direct search first: {query}")
+                            if is_url(query):
+                                cached = await self._cached_url(query)
+                                playable = self._cached_playable(cached)
+                                if playable is not None:
+                                    print(f"[DEBUG] Cache hit for direct URL: {cached.title}")
+                                    track = Track(cached.data(), requester=ctx.author)
+                                    track._lavalink_playable = playable
+                                    await self.add_to_queue(ctx, track)
+                                    return
                             try:
                                 results = await Playable.search(query)
                                 if results:
@@ -4035,6 +4190,10 @@ class Music(Cog):
                                     # Apply quality filtering even for direct URLs
                                     if self._is_valid_direct_url_track(track, query):
                                         track._lavalink_playable = playable
+                                        if is_url(query) and len(results) == 1:
+                                            entry = self._playable_entry(playable, 'lavalink_v4_direct')
+                                            if entry:
+                                                await self._cache_store(None, None, [entry, entry._replace(url=canonical_url(query))])
                                         await self.add_to_queue(ctx, track)
                                         return
                                     else:
@@ -4043,6 +4202,20 @@ class Music(Cog):
                             except Exception as e:
                                 print(f"[DEBUG] Direct URL search failed: {e}")
                         
+                        # A query resolved before is played without searching again
+                        cached = await self._cached_query(scope, query)
+                        if cached:
+                            playable = self._cached_playable(cached[0])
+                            if playable is not None:
+                                print(f"[DEBUG] Cache hit: {cached[0].title} ({cached[0].extractor})")
+                                track = Track(cached[0].data(), requester=ctx.author)
+                                track._lavalink_playable = playable
+                                await self.add_to_queue(ctx, track)
+                                return
+                        elif cached == []:
+                            print(f"[DEBUG] Cached: no Lavalink results for {query}")
+                            search_sources = []
+                        
                         # Try each source with enhanced search queries
                         for source_prefix, source_name, source_weight in search_sources:
                             if not source_prefix:  # Skip direct URL source in this loop
@@ -4102,6 +4275,7 @@ class Music(Cog):
                                             break
                                     
                                     except Exception as e:
+                                        search_errors += 1
                                         print(f"[DEBUG] Search query failed: {search_query}, error: {e}")
                                         continue
                                         
@@ -4111,6 +4285,7 @@ class Music(Cog):
                                     break
                                         
                             except Exception as e:
+                                search_errors += 1
                                 print(f"[DEBUG] {source_name} search failed: {e}")
                                 continue
                         
@@ -4125,6 +4300,7 @@ class Music(Cog):
                                 try:
                                     # Store the playable for later use in play_track
                                     track._lavalink_playable = playable
+                                    await self._cache_store(scope, query, [self._playable_entry(playable, track.extractor)])
                                     await self.add_to_queue(ctx, track)
                                     return
                                 except Exception as e:
@@ -4135,13 +4311,15 @@ class Music(Cog):
                             # If all candidates failed, use the best one anyway
                             best_track, best_score, best_playable, best_source = all_candidates[0]
                             best_track._lavalink_playable = best_playable
+                            await self._cache_store(scope, query, [self._playable_entry(best_playable, best_track.extractor)])
                             await self.add_to_queue(ctx, best_track)
                             return
                         else:
                             print("[DEBUG] No good candidates found, trying basic search as fallback")
                             # Enhanced fallback - try a simple search without prefix
                             try:
-                                results = await Playable.search(query)
+                                # Known to find nothing: go straight to the final fallback
+                                results = await Playable.search(query) if cached != [] else None
                                 if results:
                                     playable = results[0]
                                     data = {
@@ -4154,8 +4332,11 @@ class Music(Cog):
                                     }
                                     track = Track(data, requester=ctx.author)
                                     track._lavalink_playable = playable
+                                    await self._cache_store(scope, query, [self._playable_entry(playable, 'lavalink_v4_fallback')])
                                     await self.add_to_queue(ctx, track)
                                     return
+                                if cached is None and not search_errors:
+                                    await self._cache_store(scope, query, [])
                             except Exception as e:
                                 print(f"[DEBUG] Fallback search failed: {e}")
                             
@@ -4196,7 +4377,9 @@ class Music(Cog):
                 ))
 
             print(f"[DEBUG] Searching and downloading track for query: {query}")
-            track = await self.search_and_download_track(query)
+            # Nothing playing yet: the listener is waiting on this one
+            priority = QUEUED if ctx.guild.id in self.current_tracks else NOW_PLAYING
+            track = await self.search_and_download_track(query, priority=priority)
             if not track:
                 print("[DEBUG] No track found")
                 return await ctx.send(embed=discord.Embed(
@@ -3,7 +3,8 @@ from discord.ext import commands
 from utils.member_state import member_state_manager, PunishmentType, MemberState
 from utils.error_helpers import StandardErrorHandler
 from utils.Tools import blacklist_check, ignore_check
-from datetime import datetime, timedelta
+from utils.cooldowns import cooldowns
+from datetime import datetime
 import asyncio
 import logging
 
@@ -15,7 +16,7 @@ class RoleRestoration(commands.Cog):
         self.logger = logging.getLogger(__name__)
         
         # Rate limiting to prevent spam
-        self.restoration_cooldown = {}
+        self.restoration_cooldown = cooldowns.namespace("role_restoration")
     
     # Use standardized error handler
     cog_command_error = StandardErrorHandler.create_cog_error_handler()
@@ -74,13 +75,9 @@ class RoleRestoration(commands.Cog):
                 return
             
             # Rate limiting check
-            cooldown_key = f"{member.guild.id}:{member.id}"
-            if cooldown_key in self.restoration_cooldown:
-                if datetime.utcnow() < self.restoration_cooldown[cooldown_key]:
-                    return
-            
-            # Set cooldown (5 minutes)
-            self.restoration_cooldown[cooldown_key] = datetime.utcnow() + timedelta(minutes=5)
+            # Cooldown of 5 minutes per member
+            if not self.restoration_cooldown.try_acquire((member.guild.id, member.id), 5 * 60):
+                return
             
             # Get restoration settings
             settings = member_state_manager.get_restoration_settings(member.guild.id)
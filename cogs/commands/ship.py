@@ -1,14 +1,12 @@
 import os
-import io
 import random
 import discord
 import datetime
-import requests
 import typing
 from discord.ext import commands
 from discord.ext.commands import errors
-from PIL import Image, ImageFont, ImageDraw
 from utils.Tools import *
+from utils.ship_card import render_ship_file
 
 from utils.error_helpers import StandardErrorHandler
 class Ship(commands.Cog):
@@ -52,54 +50,28 @@ class Ship(commands.Cog):
             random.seed(seed)
             rate = random.randint(1, 99)
 
-        user_avatar = await get_avatar(user2) if user2 else None
-        author_avatar = await get_avatar(user1) if user1 else None
-
         user1_name = getattr(user1, 'name', 'Unknown')
         user2_name = getattr(user2, 'name', 'Unknown')
         user1_mention = getattr(user1, 'mention', user1_name)
         user2_mention = getattr(user2, 'mention', user2_name)
 
-        if user_avatar and author_avatar:
-            self.make_image(author_avatar, user_avatar, user1_name, user2_name, rate)
-            await self.img_ship(ctx, user1_mention, user2_mention, rate)
+        # Drawn in the rank card worker pool instead of on the event loop
+        image = await render_ship_file(user1, user2, rate)
+        if image is not None:
+            await self.img_ship(ctx, image, user1_mention, user2_mention, rate)
         else:
             await self.text_ship(ctx, user1_mention, user2_mention, rate)
 
-    async def img_ship(self, ctx, author, user, rate):
+    async def img_ship(self, ctx, image, author, user, rate):
         msg = "**Love rate between {0} & {1} is:**\n`{3}` {2}%"
         progress_bar = self.create_progress_bar(rate)
         try:
             b = discord.Embed(color=discord.Color(0xeb1818), description=msg.format(author, user, rate, progress_bar))
-            f = discord.File("./data/ship/tmp_ship.png")
-            b.set_image(url="attachment://tmp_ship.png")
-            await ctx.send(file=f, embed=b)
+            b.set_image(url=f"attachment://{image.filename}")
+            await ctx.send(file=image, embed=b)
         except errors.BadArgument:
             await ctx.send("Oops, something went wrong! Try again later!")
 
-    def make_image(self, author_avatar, user_avatar, author, user, rate):
-        red = (191, 15, 0, 255)
-        white = (255, 255, 255, 255)
-        blank = (255, 255, 255, 0)
-        tmpl = Image.open("./data/ship/Template.png", "r").convert('RGBA')
-        fill = Image.open("./data/ship/Tmpl_fill.png", "r").convert('RGBA')
-        blank = Image.new('RGBA', tmpl.size, blank)
-        fnt = ImageFont.truetype("./data/ship/font.ttf", 34)
-        draw = ImageDraw.Draw(blank)
-        author_avatar = author_avatar.resize((150, 150), Image.Resampling.LANCZOS)
-        user_avatar = user_avatar.resize((150, 150), Image.Resampling.LANCZOS)
-        tmpl.paste(author_avatar, (20, 50))
-        tmpl.paste(user_avatar, (20, 312))
-        offset = (100 - rate) * 2
-        fill = fill.crop((0, offset, fill.width, fill.height))
-        blank.paste(fill, (tmpl.width - fill.width - 1, 154 + offset))
-        draw.text((20, 10), str(author), font=fnt, fill=red)
-        draw.text((20, 460), str(user), font=fnt, fill=red)
-        fnt = ImageFont.truetype("./data/ship/font.ttf", 80)
-        draw.text((330, 192), str(rate) + "%", font=fnt, fill=white)
-        tmpl = Image.alpha_composite(tmpl, blank)
-        tmpl.save("./data/ship/tmp_ship.png", "PNG")
-
     async def text_ship(self, ctx, author, user, rate):
         msg = "**Love rate between {0} & {1} is:**\n`{3}` {2}%"
         progress_bar = self.create_progress_bar(rate)
@@ -115,19 +87,6 @@ class Ship(commands.Cog):
         return bar
 
 
-async def get_avatar(user):
-    try:
-        user_url = user.display_avatar.replace(format="png").url
-        response = requests.get(user_url + "?size=256")
-        avatar = Image.open(io.BytesIO(response.content)).convert('RGBA')
-        tmp = Image.new('RGBA', avatar.size, (255, 255, 255, 255))
-        tmp = Image.alpha_composite(tmp, avatar)
-        return tmp
-    except Exception as e:
-        print(f"Error fetching avatar: {e}")
-        return None
-
-
 def setup(bot):
     bot.add_cog(Ship(bot))
 
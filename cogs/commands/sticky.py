@@ -5,11 +5,11 @@ from discord.ui import View, Select, Button, Modal, TextInput
 import aiosqlite
 import asyncio
 import os
-import time
 from datetime import datetime
 from utils.Tools import *
 from utils.timezone_helpers import get_timezone_helpers
 from utils.button_manager import ButtonManager, create_button_management_view
+from utils.cooldowns import cooldowns
 from typing import Optional
 
 from utils.error_helpers import StandardErrorHandler
@@ -17,7 +17,7 @@ from utils.error_helpers import StandardErrorHandler
 STICKY_DB_PATH = "./db/sticky.db"
 
 # Rate limiting for sticky messages - prevent spam
-STICKY_COOLDOWNS = {}  # {channel_id: last_sent_time}
+STICKY_COOLDOWNS = cooldowns.namespace("sticky.repost")  # {channel_id}
 STICKY_COOLDOWN_SECONDS = 3  # Minimum seconds between sticky reposts
 
 def get_color_from_name(color_name: str) -> Optional[int]:
@@ -717,16 +717,9 @@ class StickyMessages(commands.Cog):
                 if not isinstance(message.channel, (discord.TextChannel, discord.Thread)):
                     return
             
-            # Rate limiting and message count checks
-            current_time = time.time()
-            
-            # Check cooldown
-            if channel_id in STICKY_COOLDOWNS:
-                if current_time - STICKY_COOLDOWNS[channel_id] < STICKY_COOLDOWN_SECONDS:
-                    return  # Still in cooldown, skip
-            
-            # Update cooldown (but still repost every message)
-            STICKY_COOLDOWNS[channel_id] = current_time
+            # Rate limiting - skip while the channel is still in cooldown
+            if not STICKY_COOLDOWNS.try_acquire(channel_id, STICKY_COOLDOWN_SECONDS):
+                return
                     
             # Check if the sticky message still exists
             if sticky_data[3]:  # message_id
@@ -5,10 +5,18 @@ from discord.ui import Button, View, Select, Modal, TextInput
 import json
 import asyncio
 import re
+import tempfile
 from datetime import datetime, timedelta
 import aiosqlite
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from utils.timezone_helpers import get_timezone_helpers
+from utils.ticket_transcript import build_transcript, resolve_timezone
+from utils.transcript_archive import get_transcript_archive
+from utils.panel_registry import PanelRegistry
+from utils.ticket_queue import TicketCreationQueue
+from utils import ticket_analytics
+from utils.ticket_config import (CategoryConfig, GuildTicketConfig, PanelConfig, TicketConfigStore,
+                                 migrate, row_dict)
 from utils.dynamic_dropdowns import DynamicChannelSelect, DynamicChannelView, PaginatedChannelView
 from core import Context
 
@@ -227,6 +235,8 @@ class TicketDatabase:
     def __init__(self, bot=None):
         self.db_path = "db/tickets.db"
         self.bot = bot
+        # Panels, categories and guild config, cached per guild
+        self.config = TicketConfigStore(self.db_path)
         if bot:
             self.tz_helpers = get_timezone_helpers(bot)
     
@@ -262,7 +272,9 @@ class TicketDatabase:
                     embed_thumbnail TEXT,
                     embed_image TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    content_hash TEXT,
+                    verified_at REAL
                 )
             """)
             
@@ -350,6 +362,7 @@ class TicketDatabase:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     claimed_at TIMESTAMP,
                     first_response_at TIMESTAMP,
+                    first_responder_id INTEGER,
                     last_activity_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     closed_at TIMESTAMP,
                     
@@ -522,55 +535,10 @@ class TicketDatabase:
                 )
             """)
             
-            # Migration helpers
-            try:
-                await db.execute("ALTER TABLE tickets ADD COLUMN user_id INTEGER")
-            except:
-                pass
-            
-            try:
-                await db.execute("ALTER TABLE tickets ADD COLUMN status TEXT DEFAULT 'open'")
-            except:
-                pass
-            
-            # Ensure ticket_panels has required columns
-            try:
-                await db.execute("ALTER TABLE ticket_panels ADD COLUMN panel_name TEXT DEFAULT 'Support Panel'")
-            except:
-                pass
-            
-            try:
-                await db.execute("ALTER TABLE ticket_panels ADD COLUMN panel_description TEXT DEFAULT 'Select a ticket category below to get support.'")
-            except:
-                pass
-            
-            try:
-                await db.execute("ALTER TABLE ticket_panels ADD COLUMN embed_title TEXT DEFAULT 'Support Tickets'")
-            except:
-                pass
-            
-            # Ensure ticket_categories has all required columns
-            try:
-                await db.execute("ALTER TABLE ticket_categories ADD COLUMN discord_category_id INTEGER")
-            except:
-                pass
-            
-            try:
-                await db.execute("ALTER TABLE ticket_categories ADD COLUMN user_can_add_others BOOLEAN DEFAULT FALSE")
-            except:
-                pass
-            
-            try:
-                await db.execute("ALTER TABLE ticket_categories ADD COLUMN log_events TEXT")
-            except:
-                pass
-            
-            try:
-                await db.execute("ALTER TABLE ticket_categories ADD COLUMN require_claiming BOOLEAN DEFAULT FALSE")
-            except:
-                pass
-            
+            # Columns and indexes added since these tables were first created
+            await migrate(db)
             await db.commit()
+        self.config.invalidate()
     
     # Panel Management Methods
     async def create_panel(self, guild_id: int, panel_name: str, **kwargs) -> int:
@@ -591,42 +559,20 @@ class TicketDatabase:
                     kwargs.get('embed_image', '')
                 ))
                 await db.commit()
+                self.config.invalidate(guild_id)
                 return cursor.lastrowid or 0
             except Exception as e:
                 if "no column named" in str(e):
                     raise Exception("Database schema is outdated. Please run 'ticket resetdb' to reset the database with the correct schema.") from e
                 raise
     
-    async def get_panel(self, panel_id: int) -> Optional[Dict[str, Any]]:
+    async def get_panel(self, panel_id: int) -> Optional[PanelConfig]:
         """Get panel by ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("SELECT * FROM ticket_panels WHERE panel_id = ?", (panel_id,))
-            result = await cursor.fetchone()
-            if result:
-                return {
-                    'panel_id': result[0], 'guild_id': result[1], 'panel_name': result[2],
-                    'panel_description': result[3], 'panel_color': result[4], 'channel_id': result[5],
-                    'message_id': result[6], 'embed_title': result[7], 'embed_footer': result[8],
-                    'embed_thumbnail': result[9], 'embed_image': result[10], 
-                    'created_at': result[11], 'updated_at': result[12]
-                }
-        return None
+        return await self.config.panel(panel_id)
     
-    async def get_guild_panels(self, guild_id: int) -> List[Dict[str, Any]]:
+    async def get_guild_panels(self, guild_id: int) -> List[PanelConfig]:
         """Get all panels for a guild"""
-        panels = []
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("SELECT * FROM ticket_panels WHERE guild_id = ?", (guild_id,))
-            results = await cursor.fetchall()
-            for result in results:
-                panels.append({
-                    'panel_id': result[0], 'guild_id': result[1], 'panel_name': result[2],
-                    'panel_description': result[3], 'panel_color': result[4], 'channel_id': result[5],
-                    'message_id': result[6], 'embed_title': result[7], 'embed_footer': result[8],
-                    'embed_thumbnail': result[9], 'embed_image': result[10], 
-                    'created_at': result[11], 'updated_at': result[12]
-                })
-        return panels
+        return await self.config.guild_panels(guild_id)
     
     async def update_panel(self, panel_id: int, **kwargs):
         """Update panel configuration"""
@@ -634,12 +580,14 @@ class TicketDatabase:
             for key, value in kwargs.items():
                 await db.execute(f"UPDATE ticket_panels SET {key} = ?, updated_at = CURRENT_TIMESTAMP WHERE panel_id = ?", (value, panel_id))
             await db.commit()
+        self.config.invalidate_panel(panel_id)
     
     async def delete_panel(self, panel_id: int):
         """Delete a panel and all its categories"""
         async with aiosqlite.connect(self.db_path) as db:
             await db.execute("DELETE FROM ticket_panels WHERE panel_id = ?", (panel_id,))
             await db.commit()
+        self.config.invalidate_panel(panel_id)
     
     # Category Management Methods
     async def create_category(self, panel_id: int, guild_id: int, category_name: str, **kwargs) -> int:
@@ -687,52 +635,16 @@ class TicketDatabase:
                 kwargs.get('priority_color')
             ))
             await db.commit()
+            self.config.invalidate(guild_id)
             return cursor.lastrowid or 0
     
-    async def get_category(self, category_id: int) -> Optional[Dict[str, Any]]:
+    async def get_category(self, category_id: int) -> Optional[CategoryConfig]:
         """Get category by ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("SELECT * FROM ticket_categories WHERE category_id = ?", (category_id,))
-            result = await cursor.fetchone()
-            if result:
-                return {
-                    'category_id': result[0], 'panel_id': result[1], 'guild_id': result[2],
-                    'category_name': result[3], 'category_emoji': result[4], 'category_description': result[5],
-                    'parent_category_id': result[6], 'discord_category_id': result[7], 'channel_name_format': result[8],
-                    'support_roles': result[9], 'auto_add_roles': result[10], 'ping_roles': result[11],
-                    'welcome_message': result[12], 'embed_welcome': result[13], 'welcome_embed_data': result[14],
-                    'log_channel_id': result[15], 'log_events': result[16], 'log_creation': result[17], 'log_closure': result[18],
-                    'log_claims': result[19], 'log_transcripts': result[20], 'save_transcripts': result[21],
-                    'transcript_channel_id': result[22], 'transcript_format': result[23], 'auto_transcript': result[24],
-                    'max_tickets_per_user': result[25], 'auto_close_time': result[26], 'auto_close_warning': result[27],
-                    'allow_claiming': result[28], 'require_claiming': result[29], 'claim_message': result[30], 'user_can_close': result[31],
-                    'user_can_add_others': result[32], 'user_can_add_members': result[33], 'priority_level': result[34], 'priority_color': result[35],
-                    'created_at': result[36], 'updated_at': result[37]
-                }
-        return None
+        return await self.config.category(category_id)
     
-    async def get_panel_categories(self, panel_id: int) -> List[Dict[str, Any]]:
+    async def get_panel_categories(self, panel_id: int) -> List[CategoryConfig]:
         """Get all categories for a panel"""
-        categories = []
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("SELECT * FROM ticket_categories WHERE panel_id = ? ORDER BY priority_level DESC, category_name", (panel_id,))
-            results = await cursor.fetchall()
-            for result in results:
-                categories.append({
-                    'category_id': result[0], 'panel_id': result[1], 'guild_id': result[2],
-                    'category_name': result[3], 'category_emoji': result[4], 'category_description': result[5],
-                    'parent_category_id': result[6], 'discord_category_id': result[7], 'channel_name_format': result[8],
-                    'support_roles': result[9], 'auto_add_roles': result[10], 'ping_roles': result[11],
-                    'welcome_message': result[12], 'embed_welcome': result[13], 'welcome_embed_data': result[14],
-                    'log_channel_id': result[15], 'log_events': result[16], 'log_creation': result[17], 'log_closure': result[18],
-                    'log_claims': result[19], 'log_transcripts': result[20], 'save_transcripts': result[21],
-                    'transcript_channel_id': result[22], 'transcript_format': result[23], 'auto_transcript': result[24],
-                    'max_tickets_per_user': result[25], 'auto_close_time': result[26], 'auto_close_warning': result[27],
-                    'allow_claiming': result[28], 'require_claiming': result[29], 'claim_message': result[30], 'user_can_close': result[31],
-                    'user_can_add_others': result[32], 'user_can_add_members': result[33], 'priority_level': result[34], 'priority_color': result[35],
-                    'created_at': result[36], 'updated_at': result[37]
-                })
-        return categories
+        return await self.config.panel_categories(panel_id)
     
     async def update_category(self, category_id: int, **kwargs):
         """Update category configuration"""
@@ -741,7 +653,8 @@ class TicketDatabase:
                 for key, value in kwargs.items():
                     await db.execute(f"UPDATE ticket_categories SET {key} = ?, updated_at = CURRENT_TIMESTAMP WHERE category_id = ?", (value, category_id))
                 await db.commit()
-                return True
+            self.config.invalidate_category(category_id)
+            return True
         except Exception as e:
             print(f"❌ Error updating category {category_id}: {e}")
             return False
@@ -751,6 +664,7 @@ class TicketDatabase:
         async with aiosqlite.connect(self.db_path) as db:
             await db.execute("DELETE FROM ticket_categories WHERE category_id = ?", (category_id,))
             await db.commit()
+        self.config.invalidate_category(category_id)
     
     # ================================
     # ADVANCED CLAIMING & ASSIGNMENT
@@ -821,7 +735,7 @@ class TicketDatabase:
             
             # Safely parse support roles JSON
             try:
-                support_roles_data = category.get('support_roles') or '[]'
+                support_roles_data = category.support_roles or '[]'
                 support_roles = json.loads(support_roles_data) if support_roles_data.strip() else []
             except (json.JSONDecodeError, AttributeError):
                 support_roles = []
@@ -878,10 +792,8 @@ class TicketDatabase:
             
             if best_staff:
                 # Assign ticket
-                await db.execute("""
-                    UPDATE tickets SET claimed_by = ?, claimed_at = CURRENT_TIMESTAMP, status = 'claimed'
-                    WHERE ticket_id = ?
-                """, (best_staff, ticket_id))
+                await ticket_analytics.record_claim(db, ticket_id, best_staff, ticket_analytics.timestamp(), 'claimed')
+                await db.commit()
                 
                 # Update staff workload
                 await self.update_staff_workload(guild_id, best_staff, active_tickets="+1")
@@ -998,39 +910,42 @@ class TicketDatabase:
     async def create_ticket(self, guild_id: int, user_id: int, channel_id: int, category_id: Optional[int] = None, panel_id: Optional[int] = None) -> int:
         """Create a new ticket with enhanced tracking"""
         async with aiosqlite.connect(self.db_path) as db:
-            # Get next ticket number for this guild
-            cursor = await db.execute("SELECT COUNT(*) FROM tickets WHERE guild_id = ?", (guild_id,))
-            count = await cursor.fetchone()
-            ticket_number = (count[0] if count else 0) + 1
+            created_at = ticket_analytics.timestamp()
             
+            # Next ticket number for this guild, taken in the insert itself so tickets
+            # created concurrently (or after a discarded one) don't share a number
             cursor = await db.execute("""
-                INSERT INTO tickets (guild_id, user_id, channel_id, category_id, panel_id, ticket_number)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (guild_id, user_id, channel_id, category_id, panel_id, ticket_number))
-            await db.commit()
-            
+                INSERT INTO tickets (guild_id, user_id, channel_id, category_id, panel_id, ticket_number, created_at)
+                VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(ticket_number), 0) + 1 FROM tickets WHERE guild_id = ?), ?)
+            """, (guild_id, user_id, channel_id, category_id, panel_id, guild_id, created_at))
             ticket_id = cursor.lastrowid or 0
+            await ticket_analytics.record_open(db, guild_id, created_at)
             
             # Log the creation
-            await self.log_ticket_action(ticket_id, user_id, 'created', {'channel_id': channel_id, 'category_id': category_id})
+            await db.execute("""
+                INSERT INTO ticket_logs (ticket_id, action_type, user_id, details)
+                VALUES (?, ?, ?, ?)
+            """, (ticket_id, 'created', user_id, json.dumps({'channel_id': channel_id, 'category_id': category_id})))
+            await db.commit()
             
             return ticket_id
     
+    async def discard_ticket(self, ticket_id: int) -> bool:
+        """Remove a ticket whose creation failed partway, with its logs"""
+        async with aiosqlite.connect(self.db_path) as db:
+            discarded = await ticket_analytics.record_discard(db, ticket_id)
+            if discarded:
+                await db.execute("DELETE FROM ticket_logs WHERE ticket_id = ?", (ticket_id,))
+            await db.commit()
+        return discarded
+    
     async def get_ticket_by_channel(self, channel_id: int) -> Optional[Dict[str, Any]]:
         """Get ticket by channel ID"""
         async with aiosqlite.connect(self.db_path) as db:
             cursor = await db.execute("SELECT * FROM tickets WHERE channel_id = ? AND status != 'closed'", (channel_id,))
             result = await cursor.fetchone()
             if result:
-                return {
-                    'ticket_id': result[0], 'guild_id': result[1], 'user_id': result[2],
-                    'channel_id': result[3], 'category_id': result[4], 'panel_id': result[5],
-                    'status': result[6], 'priority': result[7], 'ticket_number': result[8],
-                    'created_at': result[9], 'claimed_at': result[10], 'closed_at': result[11],
-                    'claimed_by': result[12], 'assigned_roles': result[13], 'close_reason': result[14],
-                    'closed_by': result[15], 'additional_users': result[16], 'notes': result[17],
-                    'transcript_url': result[18]
-                }
+                return row_dict(cursor, result)
         return None
     
     async def get_user_tickets(self, guild_id: int, user_id: int, status: str = 'open') -> List[Dict[str, Any]]:
@@ -1043,39 +958,42 @@ class TicketDatabase:
             )
             results = await cursor.fetchall()
             for result in results:
-                tickets.append({
-                    'ticket_id': result[0], 'guild_id': result[1], 'user_id': result[2],
-                    'channel_id': result[3], 'category_id': result[4], 'panel_id': result[5],
-                    'status': result[6], 'priority': result[7], 'ticket_number': result[8],
-                    'created_at': result[9], 'claimed_at': result[10], 'closed_at': result[11],
-                    'claimed_by': result[12], 'assigned_roles': result[13], 'close_reason': result[14],
-                    'closed_by': result[15], 'additional_users': result[16], 'notes': result[17],
-                    'transcript_url': result[18]
-                })
+                tickets.append(row_dict(cursor, result))
         return tickets
     
-    async def claim_ticket(self, ticket_id: int, claimer_id: int):
-        """Claim a ticket"""
+    async def claim_ticket(self, ticket_id: int, claimer_id: int, status: Optional[str] = 'claimed'):
+        """Claim a ticket (status None leaves the status as it is)"""
         async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                UPDATE tickets SET status = 'claimed', claimed_by = ?, claimed_at = CURRENT_TIMESTAMP
-                WHERE ticket_id = ?
-            """, (claimer_id, ticket_id))
+            await ticket_analytics.record_claim(db, ticket_id, claimer_id, ticket_analytics.timestamp(), status)
             await db.commit()
             
             await self.log_ticket_action(ticket_id, claimer_id, 'claimed', {})
     
     async def close_ticket(self, ticket_id: int, closer_id: int, reason: Optional[str] = None):
-        """Close a ticket"""
+        """Close a ticket; closing an already closed ticket keeps its first close"""
         async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                UPDATE tickets SET status = 'closed', closed_by = ?, closed_at = CURRENT_TIMESTAMP, close_reason = ?
-                WHERE ticket_id = ?
-            """, (closer_id, reason or "No reason provided", ticket_id))
+            await ticket_analytics.record_close(db, ticket_id, closer_id, reason or "No reason provided",
+                                                ticket_analytics.timestamp())
             await db.commit()
             
             await self.log_ticket_action(ticket_id, closer_id, 'closed', {'reason': reason})
     
+    async def record_first_response(self, ticket_id: int, staff_id: int, at: datetime) -> bool:
+        """Record a staff reply in a ticket; returns whether it was the ticket's first"""
+        async with aiosqlite.connect(self.db_path) as db:
+            first = await ticket_analytics.record_first_response(db, ticket_id, staff_id, ticket_analytics.timestamp(at))
+            await db.commit()
+        return first
+    
+    async def get_awaiting_response(self) -> List[Tuple[int, int, int, Optional[int]]]:
+        """(channel_id, ticket_id, opener_id, category_id) of open tickets no staff has answered yet"""
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute("""
+                SELECT channel_id, ticket_id, user_id, category_id FROM tickets
+                WHERE status != 'closed' AND first_response_at IS NULL
+            """) as cursor:
+                return list(await cursor.fetchall())
+    
     async def add_user_to_ticket(self, ticket_id: int, user_id: int, added_by: int):
         """Add additional user to ticket"""
         async with aiosqlite.connect(self.db_path) as db:
@@ -1122,25 +1040,9 @@ class TicketDatabase:
         return logs
     
     # Legacy compatibility methods (keep for backward compatibility)
-    async def get_guild_config(self, guild_id: int) -> Dict[str, Any]:
+    async def get_guild_config(self, guild_id: int) -> GuildTicketConfig:
         """Get legacy guild ticket configuration"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                "SELECT * FROM ticket_config WHERE guild_id = ?", (guild_id,)
-            )
-            result = await cursor.fetchone()
-            if result:
-                return {
-                    'guild_id': result[0],
-                    'category_id': result[1],
-                    'support_role_id': result[2],
-                    'log_channel_id': result[3],
-                    'welcome_message': result[4],
-                    'ticket_counter': result[5],
-                    'max_tickets_per_user': result[6],
-                    'auto_close_time': result[7]
-                }
-            return {}
+        return await self.config.guild_config(guild_id)
     
     async def set_guild_config(self, guild_id: int, **kwargs):
         """Set legacy guild ticket configuration"""
@@ -1170,6 +1072,21 @@ class TicketDatabase:
                     )
             
             await db.commit()
+        self.config.invalidate_guild_config(guild_id)
+    
+    async def next_ticket_counter(self, guild_id: int) -> int:
+        """Increment the legacy ticket counter and return the new value"""
+        async with aiosqlite.connect(self.db_path) as db:
+            # Incremented in the statement itself so concurrent creations don't share a number
+            cursor = await db.execute("""
+                INSERT INTO ticket_config (guild_id, ticket_counter) VALUES (?, 1)
+                ON CONFLICT (guild_id) DO UPDATE SET ticket_counter = COALESCE(ticket_counter, 0) + 1
+                RETURNING ticket_counter
+            """, (guild_id,))
+            (counter,) = await cursor.fetchone()
+            await db.commit()
+        self.config.invalidate_guild_config(guild_id)
+        return counter
 
 # ================================
 # DROPDOWN BUILDER SYSTEM
@@ -1496,7 +1413,7 @@ class CategoryConfigView(View):
         # Get panel_id from category
         category = await self.tickets_cog.db.get_category(self.category_id)
         if category:
-            await self.tickets_cog.show_panel_config(interaction, category['panel_id'])
+            await self.tickets_cog.show_panel_config(interaction, category.panel_id)
         else:
             await interaction.response.send_message("❌ Category not found!", ephemeral=True)
     
@@ -2214,7 +2131,7 @@ class TranscriptConfigView(View):
         await interaction.response.defer()
         
         category = await self.tickets_cog.db.get_category(self.category_id)
-        current_setting = category.get('auto_transcript', False)
+        current_setting = category.auto_transcript
         new_setting = not current_setting
         
         await self.tickets_cog.db.update_category(
@@ -2271,7 +2188,7 @@ class PermissionsConfigView(View):
         await interaction.response.defer()
         
         category = await self.tickets_cog.db.get_category(self.category_id)
-        current_setting = category.get('user_can_close', True)
+        current_setting = category.user_can_close
         new_setting = not current_setting
         
         await self.tickets_cog.db.update_category(
@@ -2291,7 +2208,7 @@ class PermissionsConfigView(View):
         await interaction.response.defer()
         
         category = await self.tickets_cog.db.get_category(self.category_id)
-        current_setting = category.get('user_can_add_others', False)
+        current_setting = category.user_can_add_others
         new_setting = not current_setting
         
         await self.tickets_cog.db.update_category(
@@ -2311,7 +2228,7 @@ class PermissionsConfigView(View):
         await interaction.response.defer()
         
         category = await self.tickets_cog.db.get_category(self.category_id)
-        current_setting = category.get('require_claiming', False)
+        current_setting = category.require_claiming
         new_setting = not current_setting
         
         await self.tickets_cog.db.update_category(
@@ -3205,8 +3122,20 @@ class Tickets(commands.Cog):
         self.bot = bot
         self.db = TicketDatabase(bot)
         self.tz_helpers = get_timezone_helpers(bot)
+        # Closed tickets are archived here (compressed, searchable)
+        self.archive = get_transcript_archive()
         # Add persistent views for ticket panels
         self.bot.add_view(TicketPanelView(self))
+        # Deployed panels: views restored by custom_id, messages kept up to date lazily
+        self.panels = PanelRegistry(
+            bot, self.db.config,
+            lambda panel_id, categories: TicketPanelView(self, panel_id, categories),
+            self.build_panel_embed
+        )
+        # channel_id -> (ticket_id, opener_id, category_id) of tickets waiting for a first staff reply
+        self.awaiting_response: Dict[int, Tuple[int, int, Optional[int]]] = {}
+        # Panel tickets are created through here, a few at a time per guild
+        self.creation_queue = TicketCreationQueue()
 
     @commands.group()
     async def __TicketSystem__(self, ctx: commands.Context):
@@ -3215,7 +3144,53 @@ class Tickets(commands.Cog):
     async def cog_load(self):
         """Initialize database when cog loads"""
         await self.db.init_db()
+        await self.archive.start()
         await self.load_persistent_panels()
+        for channel_id, ticket_id, opener_id, category_id in await self.db.get_awaiting_response():
+            self.awaiting_response[channel_id] = (ticket_id, opener_id, category_id)
+    
+    async def cog_unload(self):
+        self.panels.stop()
+        self.creation_queue.stop()
+        await self.archive.stop()
+    
+    async def is_ticket_staff(self, member: discord.Member, category_id: Optional[int]) -> bool:
+        """Whether a member handles tickets: admins, the guild support role or the category's support roles"""
+        permissions = member.guild_permissions
+        if permissions.administrator or permissions.manage_channels:
+            return True
+        role_ids = {role.id for role in member.roles}
+        config = await self.db.get_guild_config(member.guild.id)
+        if config.support_role_id in role_ids:
+            return True
+        category = await self.db.get_category(category_id) if category_id else None
+        if category:
+            try:
+                support_roles = {int(role_id) for role_id in json.loads(category.support_roles or '[]')}
+            except (json.JSONDecodeError, TypeError, ValueError):
+                support_roles = set()
+            return not support_roles.isdisjoint(role_ids)
+        return False
+    
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        """Record the first staff reply in a ticket (response time analytics)"""
+        entry = self.awaiting_response.get(message.channel.id)
+        if entry is None or message.author.bot or not isinstance(message.author, discord.Member):
+            return
+        ticket_id, opener_id, category_id = entry
+        if message.author.id == opener_id or not await self.is_ticket_staff(message.author, category_id):
+            return
+        # Answered (or closed meanwhile) either way
+        self.awaiting_response.pop(message.channel.id, None)
+        try:
+            await self.db.record_first_response(ticket_id, message.author.id, message.created_at)
+        except Exception as e:
+            print(f"[TICKETS] Failed to record first response for ticket {ticket_id}: {e}")
+    
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.awaiting_response.pop(channel.id, None)
     
     def safe_color(self, color_value):
         """Safely convert color value to integer for discord.Embed"""
@@ -3286,31 +3261,13 @@ class Tickets(commands.Cog):
             await interaction.followup.send(**kwargs)
     
     async def load_persistent_panels(self):
-        """Load all persistent ticket panels when bot starts"""
+        """Re-register deployed panel views; messages are checked in the background"""
         try:
-            async with aiosqlite.connect(self.db.db_path) as db:
-                async with db.execute("SELECT guild_id, channel_id, message_id FROM ticket_panels") as cursor:
-                    panels = await cursor.fetchall()
-                    
-                for guild_id, channel_id, message_id in panels:
-                    guild = self.bot.get_guild(guild_id)
-                    if guild:
-                        channel = guild.get_channel(channel_id)
-                        if channel and isinstance(channel, (discord.TextChannel, discord.Thread)):
-                            try:
-                                message = await channel.fetch_message(message_id)
-                                # Add the view to the message if it doesn't already have one
-                                view = TicketPanelView(self)
-                                await message.edit(view=view)
-                            except discord.NotFound:
-                                # Message was deleted, remove from database
-                                async with aiosqlite.connect(self.db.db_path) as db:
-                                    await db.execute("DELETE FROM ticket_panels WHERE message_id = ?", (message_id,))
-                                    await db.commit()
-                            except Exception as e:
-                                print(f"Error loading panel {message_id}: {e}")
+            count = await self.panels.restore()
+            print(f"[TICKETS] Restored {count} ticket panels")
         except Exception as e:
             print(f"Error loading persistent panels: {e}")
+        self.panels.start()
     
     @commands.group(name="ticket", aliases=["tickets"], invoke_without_command=True)
     @commands.guild_only()
@@ -3505,7 +3462,7 @@ class Tickets(commands.Cog):
         )
         
         # Category
-        category_id = config.get('category_id')
+        category_id = config.category_id
         category = ctx.guild.get_channel(category_id) if category_id else None
         embed.add_field(
             name="📁 Ticket Category",
@@ -3514,7 +3471,7 @@ class Tickets(commands.Cog):
         )
         
         # Support Role
-        role_id = config.get('support_role_id')
+        role_id = config.support_role_id
         role = ctx.guild.get_role(role_id) if role_id else None
         embed.add_field(
             name="👥 Support Role", 
@@ -3523,7 +3480,7 @@ class Tickets(commands.Cog):
         )
         
         # Log Channel
-        log_channel_id = config.get('log_channel_id')
+        log_channel_id = config.log_channel_id
         log_channel = ctx.guild.get_channel(log_channel_id) if log_channel_id else None
         embed.add_field(
             name="📋 Log Channel",
@@ -3533,19 +3490,19 @@ class Tickets(commands.Cog):
         
         embed.add_field(
             name="🎫 Max Tickets per User",
-            value=config.get('max_tickets_per_user', 1),
+            value=config.max_tickets_per_user,
             inline=True
         )
         
         embed.add_field(
             name="📊 Total Tickets Created",
-            value=config.get('ticket_counter', 0),
+            value=config.ticket_counter,
             inline=True
         )
         
         embed.add_field(
             name="⏰ Auto Close Time",
-            value=f"{config.get('auto_close_time', 0)} hours" if config.get('auto_close_time') else "Disabled",
+            value=f"{config.auto_close_time} hours" if config.auto_close_time else "Disabled",
             inline=True
         )
         
@@ -3650,7 +3607,7 @@ class Tickets(commands.Cog):
                     "SELECT * FROM tickets WHERE guild_id = ? AND status = ? ORDER BY created_at DESC LIMIT 20",
                     (ctx.guild.id, status)
                 )
-            tickets = list(await cursor.fetchall()) or []
+            tickets = [row_dict(cursor, row) for row in await cursor.fetchall()]
         
         if not tickets:
             embed = discord.Embed(
@@ -3668,12 +3625,12 @@ class Tickets(commands.Cog):
         
         display_tickets = tickets[:10] if len(tickets) > 10 else tickets
         for ticket in display_tickets:
-            user = ctx.guild.get_member(ticket[2])
-            channel = ctx.guild.get_channel(ticket[3])
+            user = ctx.guild.get_member(ticket['user_id'])
+            channel = ctx.guild.get_channel(ticket['channel_id'])
             
             embed.add_field(
-                name=f"Ticket #{ticket[0]}",
-                value=f"**User:** {user.mention if user else 'Unknown'}\n**Channel:** {channel.mention if channel else 'Deleted'}\n**Status:** {ticket[4]}\n**Created:** <t:{int(datetime.fromisoformat(ticket[5]).timestamp())}:R>",
+                name=f"Ticket #{ticket['ticket_id']}",
+                value=f"**User:** {user.mention if user else 'Unknown'}\n**Channel:** {channel.mention if channel else 'Deleted'}\n**Status:** {ticket['status']}\n**Created:** <t:{int(datetime.fromisoformat(ticket['created_at']).timestamp())}:R>",
                 inline=True
             )
         
@@ -3690,27 +3647,14 @@ class Tickets(commands.Cog):
             await ctx.send("❌ This command can only be used in a server.")
             return
             
+        month_ago = (self.tz_helpers.get_utc_now() - timedelta(days=30)).strftime('%Y-%m-%d')
         async with aiosqlite.connect(self.db.db_path) as db:
-            # Total tickets
-            cursor = await db.execute(
-                "SELECT COUNT(*) FROM tickets WHERE guild_id = ?", (ctx.guild.id,)
-            )
-            result = await cursor.fetchone()
-            total = result[0] if result else 0
-            
-            # Open tickets
-            cursor = await db.execute(
-                "SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND status = 'open'", (ctx.guild.id,)
-            )
-            result = await cursor.fetchone()
-            open_tickets = result[0] if result else 0
-            
-            # Closed tickets
-            cursor = await db.execute(
-                "SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND status = 'closed'", (ctx.guild.id,)
-            )
-            result = await cursor.fetchone()
-            closed_tickets = result[0] if result else 0
+            # Counts and times come from the daily aggregates, not the tickets
+            totals = await ticket_analytics.summary(db, ctx.guild.id)
+            recent = await ticket_analytics.summary(db, ctx.guild.id, month_ago)
+            total = totals.opened
+            closed_tickets = totals.closed
+            open_tickets = total - closed_tickets
             
             # Most active users
             cursor = await db.execute(
@@ -3749,6 +3693,16 @@ class Tickets(commands.Cog):
                 inline=True
             )
         
+        if recent.opened or recent.closed:
+            duration = ticket_analytics.format_duration
+            embed.add_field(
+                name="⏱️ Last 30 Days",
+                value=f"**Opened:** {recent.opened} • **Closed:** {recent.closed}\n"
+                      f"**First Response:** {duration(recent.response_p50)} median, {duration(recent.response_p90)} p90\n"
+                      f"**Resolution:** {duration(recent.resolution_p50)} median, {duration(recent.resolution_p90)} p90",
+                inline=False
+            )
+        
         await ctx.send(embed=embed)
     
     @ticket.command(name="close")
@@ -3775,7 +3729,7 @@ class Tickets(commands.Cog):
         
         # Check permissions
         config = await self.db.get_guild_config(ctx.guild.id)
-        support_role_id = config.get('support_role_id')
+        support_role_id = config.support_role_id
         support_role = ctx.guild.get_role(support_role_id) if support_role_id else None
         
         has_permission = (
@@ -3799,8 +3753,12 @@ class Tickets(commands.Cog):
         
         await ctx.send(embed=embed)
         
+        # Archive the history during the delay; the channel is deleted once it is stored
+        archiving = asyncio.create_task(self.archive_ticket(ctx.channel, ticket_id, ctx.author.id))
+        
         # Delete channel after delay
         await asyncio.sleep(5)
+        await archiving
         if isinstance(ctx.channel, discord.TextChannel):
             try:
                 await ctx.channel.delete(reason=f"Ticket closed by {ctx.author}")
@@ -3829,7 +3787,7 @@ class Tickets(commands.Cog):
         
         # Check permissions
         config = await self.db.get_guild_config(ctx.guild.id)
-        support_role_id = config.get('support_role_id')
+        support_role_id = config.support_role_id
         support_role = ctx.guild.get_role(support_role_id) if support_role_id else None
         
         has_permission = (
@@ -3893,7 +3851,7 @@ class Tickets(commands.Cog):
         
         # Check permissions
         config = await self.db.get_guild_config(ctx.guild.id)
-        support_role_id = config.get('support_role_id')
+        support_role_id = config.support_role_id
         support_role = ctx.guild.get_role(support_role_id) if support_role_id else None
         
         has_permission = (
@@ -3947,7 +3905,7 @@ class Tickets(commands.Cog):
         
         # Check permissions
         config = await self.db.get_guild_config(ctx.guild.id)
-        support_role_id = config.get('support_role_id')
+        support_role_id = config.support_role_id
         support_role = ctx.guild.get_role(support_role_id) if support_role_id else None
         
         has_permission = (
@@ -3959,13 +3917,8 @@ class Tickets(commands.Cog):
             await ctx.send("❌ You don't have permission to claim tickets.")
             return
         
-        # Update ticket in database
-        async with aiosqlite.connect(self.db.db_path) as db:
-            await db.execute(
-                "UPDATE tickets SET claimed_by = ? WHERE ticket_id = ?",
-                (ctx.author.id, ticket_id)
-            )
-            await db.commit()
+        # Update ticket in database; the ticket stays open for the close/add commands
+        await self.db.claim_ticket(ticket_id, ctx.author.id, status=None)
         
         embed = discord.Embed(
             title="👋 Ticket Claimed",
@@ -3996,7 +3949,7 @@ class Tickets(commands.Cog):
         
         # Check permissions
         config = await self.db.get_guild_config(ctx.guild.id)
-        support_role_id = config.get('support_role_id')
+        support_role_id = config.support_role_id
         support_role = ctx.guild.get_role(support_role_id) if support_role_id else None
         
         has_permission = (
@@ -4056,7 +4009,7 @@ class Tickets(commands.Cog):
         
         # Check permissions
         config = await self.db.get_guild_config(ctx.guild.id)
-        support_role_id = config.get('support_role_id')
+        support_role_id = config.support_role_id
         support_role = ctx.guild.get_role(support_role_id) if support_role_id else None
         
         has_permission = (
@@ -4074,46 +4027,14 @@ class Tickets(commands.Cog):
             await ctx.send("❌ This command can only be used in a text channel.")
             return
         
+        transcript = None
         try:
-            # Get channel messages
-            messages = []
-            async for message in ctx.channel.history(limit=None, oldest_first=True):
-                messages.append(message)
-            
-            # Generate transcript content with proper timezone
-            transcript_content = f"Ticket Transcript - {ctx.channel.name}\n"
+            # Stream the history into a temp file in the category's transcript format
+            transcript, extension, message_count = await self.render_transcript(ctx.channel, ctx.author)
             
-            # Use proper timezone formatting for generation timestamp
-            generated_time = await self.tz_helpers.format_datetime_for_user_custom(
-                self.tz_helpers.get_utc_now(), ctx.author, "%Y-%m-%d %H:%M:%S %Z"
-            )
-            transcript_content += f"Generated: {generated_time}\n"
-            transcript_content += f"Channel: #{ctx.channel.name}\n"
-            transcript_content += f"Messages: {len(messages)}\n"
-            transcript_content += "=" * 50 + "\n\n"
-            
-            for message in messages:
-                # Format message timestamp with user's timezone
-                timestamp = await self.tz_helpers.format_datetime_for_user_custom(
-                    message.created_at, ctx.author, '%Y-%m-%d %H:%M:%S %Z'
-                )
-                author = f"{message.author.display_name} ({message.author})"
-                content = message.content or "[No content]"
-                
-                if message.attachments:
-                    content += f" [Attachments: {', '.join([att.filename for att in message.attachments])}]"
-                
-                transcript_content += f"[{timestamp}] {author}: {content}\n"
-            
-            # Save to file
             # Use UTC for filename to avoid timezone confusion in file names
-            filename = f"transcript-{ctx.channel.name}-{self.tz_helpers.get_utc_now().strftime('%Y%m%d-%H%M%S')}.txt"
-            
-            import io
-            transcript_file = discord.File(
-                io.BytesIO(transcript_content.encode('utf-8')), 
-                filename=filename
-            )
+            filename = f"transcript-{ctx.channel.name}-{self.tz_helpers.get_utc_now().strftime('%Y%m%d-%H%M%S')}.{extension}"
+            transcript_file = discord.File(transcript, filename=filename)
             
             embed = discord.Embed(
                 title="📄 Transcript Generated",
@@ -4125,16 +4046,14 @@ class Tickets(commands.Cog):
             await ctx.send(embed=embed, file=transcript_file)
             
             # Also send to log channel if configured
-            log_channel_id = config.get('log_channel_id')
+            log_channel_id = config.log_channel_id
             if log_channel_id:
                 log_channel = ctx.guild.get_channel(log_channel_id)
                 if log_channel and isinstance(log_channel, discord.TextChannel):
                     try:
-                        # Create a new file object since the previous one is consumed
-                        log_transcript_file = discord.File(
-                            io.BytesIO(transcript_content.encode('utf-8')), 
-                            filename=filename
-                        )
+                        # Rewind the transcript for a second upload
+                        transcript.seek(0)
+                        log_transcript_file = discord.File(transcript, filename=filename)
                         
                         # Format timestamp in user's timezone
                         formatted_timestamp = await self.tz_helpers.format_datetime_for_user_custom(
@@ -4149,7 +4068,7 @@ class Tickets(commands.Cog):
                         
                         log_embed.add_field(
                             name="📊 Stats",
-                            value=f"**Messages:** {len(messages)}\n**Channel:** #{ctx.channel.name}",
+                            value=f"**Messages:** {message_count}\n**Channel:** #{ctx.channel.name}",
                             inline=True
                         )
                         
@@ -4159,6 +4078,9 @@ class Tickets(commands.Cog):
             
         except Exception as e:
             await ctx.send(f"❌ Failed to generate transcript: {str(e)}")
+        finally:
+            if transcript is not None:
+                transcript.close()
     
     async def close_ticket_channel(self, interaction: discord.Interaction, ticket_id: int):
         """Close a ticket channel"""
@@ -4171,7 +4093,7 @@ class Tickets(commands.Cog):
             
         # Check permissions
         config = await self.db.get_guild_config(interaction.guild.id)
-        support_role_id = config.get('support_role_id')
+        support_role_id = config.support_role_id
         support_role = interaction.guild.get_role(support_role_id) if support_role_id else None
         
         has_permission = (
@@ -4193,9 +4115,12 @@ class Tickets(commands.Cog):
         
         # Close in database
         await self.db.close_ticket(ticket_id, interaction.user.id, "Closed by staff")
+        # Archive the history during the delay; the channel is deleted once it is stored
+        archiving = asyncio.create_task(self.archive_ticket(interaction.channel, ticket_id, interaction.user.id))
         
         # Delete channel after delay
         await asyncio.sleep(5)
+        await archiving
         try:
             if (interaction.channel and 
                 isinstance(interaction.channel, (discord.TextChannel, discord.VoiceChannel, discord.CategoryChannel))):
@@ -4221,7 +4146,7 @@ class Tickets(commands.Cog):
         
         # Check permissions
         config = await self.db.get_guild_config(interaction.guild.id)
-        support_role_id = config.get('support_role_id')
+        support_role_id = config.support_role_id
         support_role = interaction.guild.get_role(support_role_id) if support_role_id else None
         
         has_permission = (
@@ -4233,13 +4158,8 @@ class Tickets(commands.Cog):
             await interaction.response.send_message("❌ You don't have permission to claim tickets.", ephemeral=True)
             return
         
-        # Update ticket in database
-        async with aiosqlite.connect(self.db.db_path) as db:
-            await db.execute(
-                "UPDATE tickets SET claimed_by = ? WHERE ticket_id = ?",
-                (interaction.user.id, ticket_id)
-            )
-            await db.commit()
+        # Update ticket in database; the ticket stays open for the close/add commands
+        await self.db.claim_ticket(ticket_id, interaction.user.id, status=None)
         
         embed = discord.Embed(
             title="👋 Ticket Claimed",
@@ -4270,7 +4190,7 @@ class Tickets(commands.Cog):
         
         # Check permissions
         config = await self.db.get_guild_config(interaction.guild.id)
-        support_role_id = config.get('support_role_id')
+        support_role_id = config.support_role_id
         support_role = interaction.guild.get_role(support_role_id) if support_role_id else None
         
         has_permission = (
@@ -4294,8 +4214,12 @@ class Tickets(commands.Cog):
         
         await interaction.response.send_message(embed=embed)
         
+        # Archive the history during the delay; the channel is deleted once it is stored
+        archiving = asyncio.create_task(self.archive_ticket(interaction.channel, ticket_id, interaction.user.id))
+        
         # Delete channel after delay
         await asyncio.sleep(5)
+        await archiving
         if isinstance(interaction.channel, discord.TextChannel):
             try:
                 await interaction.channel.delete(reason=f"Ticket closed by {interaction.user}")
@@ -4310,7 +4234,7 @@ class Tickets(commands.Cog):
         
         # Check permissions
         config = await self.db.get_guild_config(interaction.guild.id)
-        support_role_id = config.get('support_role_id')
+        support_role_id = config.support_role_id
         support_role = interaction.guild.get_role(support_role_id) if support_role_id else None
         
         has_permission = (
@@ -4358,6 +4282,37 @@ class Tickets(commands.Cog):
         else:
             await interaction.response.send_message("❌ This command can only be used in a text channel.", ephemeral=True)
     
+    async def render_transcript(self, channel: discord.TextChannel, requester: discord.abc.User):
+        """Stream a ticket channel's transcript to a temp file in its category's format"""
+        transcript_format = 'txt'
+        ticket = await self.db.get_ticket_by_channel(channel.id)
+        if ticket and ticket.get('category_id'):
+            category = await self.db.get_category(ticket['category_id'])
+            if category and isinstance(category.transcript_format, str):
+                transcript_format = category.transcript_format
+        
+        # One timezone lookup per transcript instead of one per message
+        tz = await resolve_timezone(self.bot, requester)
+        return await build_transcript(channel, transcript_format, tz, self.tz_helpers.get_utc_now())
+    
+    async def archive_ticket(self, channel, ticket_id: int, closed_by: int):
+        """Archive a closing ticket's history unless its category turned transcripts off"""
+        if not isinstance(channel, discord.TextChannel):
+            return
+        try:
+            async with aiosqlite.connect(self.db.db_path) as db:
+                cursor = await db.execute("SELECT user_id, category_id FROM tickets WHERE ticket_id = ?", (ticket_id,))
+                ticket = await cursor.fetchone()
+            opener_id, category_id = ticket if ticket else (None, None)
+            if category_id:
+                category = await self.db.get_category(category_id)
+                if category and not category.save_transcripts:
+                    return
+            # Streamed from the channel a batch at a time, so it must finish before the channel goes
+            await self.archive.archive_channel(channel.guild.id, ticket_id, channel, opener_id, closed_by)
+        except Exception as e:
+            print(f"[TICKETS] Failed to archive ticket {ticket_id}: {e}")
+    
     async def generate_transcript_button(self, interaction: discord.Interaction):
         """Handle generate transcript button"""
         if not interaction.guild or not isinstance(interaction.user, discord.Member):
@@ -4366,7 +4321,7 @@ class Tickets(commands.Cog):
         
         # Check permissions
         config = await self.db.get_guild_config(interaction.guild.id)
-        support_role_id = config.get('support_role_id')
+        support_role_id = config.support_role_id
         support_role = interaction.guild.get_role(support_role_id) if support_role_id else None
         
         has_permission = (
@@ -4384,46 +4339,14 @@ class Tickets(commands.Cog):
             await interaction.followup.send("❌ This command can only be used in a text channel.", ephemeral=True)
             return
         
+        transcript = None
         try:
-            # Get channel messages
-            messages = []
-            async for message in interaction.channel.history(limit=None, oldest_first=True):
-                messages.append(message)
-            
-            # Generate transcript content with proper timezone
-            transcript_content = f"Ticket Transcript - {interaction.channel.name}\n"
-            
-            # Use proper timezone formatting for generation timestamp  
-            generated_time = await self.tz_helpers.format_datetime_for_user_custom(
-                self.tz_helpers.get_utc_now(), interaction.user, "%Y-%m-%d %H:%M:%S %Z"
-            )
-            transcript_content += f"Generated: {generated_time}\n"
-            transcript_content += f"Channel: #{interaction.channel.name}\n"
-            transcript_content += f"Messages: {len(messages)}\n"
-            transcript_content += "=" * 50 + "\n\n"
-            
-            for message in messages:
-                # Format message timestamp with user's timezone
-                timestamp = await self.tz_helpers.format_datetime_for_user_custom(
-                    message.created_at, interaction.user, '%Y-%m-%d %H:%M:%S %Z'
-                )
-                author = f"{message.author.display_name} ({message.author})"
-                content = message.content or "[No content]"
-                
-                if message.attachments:
-                    content += f" [Attachments: {', '.join([att.filename for att in message.attachments])}]"
-                
-                transcript_content += f"[{timestamp}] {author}: {content}\n"
+            # Stream the history into a temp file in the category's transcript format
+            transcript, extension, message_count = await self.render_transcript(interaction.channel, interaction.user)
             
-            # Save to file
             # Use UTC for filename to avoid timezone confusion in file names
-            filename = f"transcript-{interaction.channel.name}-{self.tz_helpers.get_utc_now().strftime('%Y%m%d-%H%M%S')}.txt"
-            
-            import io
-            transcript_file = discord.File(
-                io.BytesIO(transcript_content.encode('utf-8')), 
-                filename=filename
-            )
+            filename = f"transcript-{interaction.channel.name}-{self.tz_helpers.get_utc_now().strftime('%Y%m%d-%H%M%S')}.{extension}"
+            transcript_file = discord.File(transcript, filename=filename)
             
             embed = discord.Embed(
                 title="📄 Transcript Generated",
@@ -4435,16 +4358,14 @@ class Tickets(commands.Cog):
             await interaction.followup.send(embed=embed, file=transcript_file)
             
             # Also send to log channel if configured
-            log_channel_id = config.get('log_channel_id')
+            log_channel_id = config.log_channel_id
             if log_channel_id:
                 log_channel = interaction.guild.get_channel(log_channel_id)
                 if log_channel and isinstance(log_channel, discord.TextChannel):
                     try:
-                        # Create a new file object since the previous one is consumed
-                        log_transcript_file = discord.File(
-                            io.BytesIO(transcript_content.encode('utf-8')), 
-                            filename=filename
-                        )
+                        # Rewind the transcript for a second upload
+                        transcript.seek(0)
+                        log_transcript_file = discord.File(transcript, filename=filename)
                         
                         # Format timestamp in user's timezone
                         formatted_timestamp = await self.tz_helpers.format_datetime_for_user_custom(
@@ -4459,7 +4380,7 @@ class Tickets(commands.Cog):
                         
                         log_embed.add_field(
                             name="📊 Stats",
-                            value=f"**Messages:** {len(messages)}\n**Channel:** #{interaction.channel.name}",
+                            value=f"**Messages:** {message_count}\n**Channel:** #{interaction.channel.name}",
                             inline=True
                         )
                         
@@ -4469,6 +4390,9 @@ class Tickets(commands.Cog):
             
         except Exception as e:
             await interaction.followup.send(f"❌ Failed to generate transcript: {str(e)}", ephemeral=True)
+        finally:
+            if transcript is not None:
+                transcript.close()
     
     async def create_ticket_channel(self, interaction: discord.Interaction, subject: str, description: str):
         """Create a new ticket channel with control buttons"""
@@ -4476,9 +4400,9 @@ class Tickets(commands.Cog):
             return
         
         config = await self.db.get_guild_config(interaction.guild.id)
-        category_id = config.get('category_id')
-        support_role_id = config.get('support_role_id')
-        welcome_message = config.get('welcome_message', 'Thank you for creating a ticket! Our support team will assist you shortly.')
+        category_id = config.category_id
+        support_role_id = config.support_role_id
+        welcome_message = config.welcome_message or 'Thank you for creating a ticket! Our support team will assist you shortly.'
         
         if not category_id:
             await interaction.followup.send(
@@ -4496,8 +4420,7 @@ class Tickets(commands.Cog):
             return
         
         # Increment ticket counter
-        ticket_counter = config.get('ticket_counter', 0) + 1
-        await self.db.set_guild_config(interaction.guild.id, ticket_counter=ticket_counter)
+        ticket_counter = await self.db.next_ticket_counter(interaction.guild.id)
         
         # Create channel
         channel_name = f"ticket-{ticket_counter:04d}"
@@ -4540,6 +4463,7 @@ class Tickets(commands.Cog):
             interaction.user.id,
             channel.id
         )
+        self.awaiting_response[channel.id] = (ticket_id, interaction.user.id, None)
         
         # Create welcome embed with ticket info
         embed = discord.Embed(
@@ -4574,6 +4498,91 @@ class Tickets(commands.Cog):
     # DROPDOWN BUILDER METHODS
     # ================================
     
+    @ticket.group(name="archive", invoke_without_command=True)
+    @commands.has_permissions(manage_messages=True)
+    async def ticket_archive(self, ctx: Context):
+        """Search and manage archived ticket transcripts"""
+        retention = await self.archive.get_retention(ctx.guild.id)
+        embed = discord.Embed(
+            title="🗄️ Ticket Archive",
+            description="Closed tickets are archived automatically and can be searched.",
+            color=0x00E6A7
+        )
+        embed.add_field(
+            name="Commands",
+            value="• `ticket archive search [member] <words>` - Find archived messages\n"
+                  "• `ticket archive view <ticket id>` - Download an archived transcript\n"
+                  "• `ticket archive retention <days>` - How long to keep transcripts (0 = forever)",
+            inline=False
+        )
+        embed.add_field(name="Retention", value="Forever" if retention == 0 else f"{retention} days", inline=True)
+        await ctx.send(embed=embed)
+    
+    @ticket_archive.command(name="search")
+    @commands.has_permissions(manage_messages=True)
+    async def ticket_archive_search(self, ctx: Context, member: Optional[discord.User] = None, *, query: str):
+        """Search archived ticket messages, optionally from one member"""
+        hits = await self.archive.search(ctx.guild.id, query, author_id=member.id if member else None)
+        if not hits:
+            await ctx.send(embed=discord.Embed(
+                description=f"🔍 No archived messages match `{discord.utils.escape_markdown(query)}`.",
+                color=0x00E6A7
+            ))
+            return
+        
+        embed = discord.Embed(title=f"🔍 Archive Search: {query[:100]}", color=0x00E6A7)
+        for hit in hits:
+            text = hit.text if len(hit.text) <= 200 else hit.text[:197] + "..."
+            embed.add_field(
+                name=f"Ticket #{hit.ticket_id} • #{hit.channel_name}"[:256],
+                value=f"**{discord.utils.escape_markdown(hit.author)}** <t:{int(hit.created_at)}:f>\n{text or '[No content]'}"[:1024],
+                inline=False
+            )
+        embed.set_footer(text="Use ticket archive view <ticket id> for the full transcript")
+        await ctx.send(embed=embed)
+    
+    @ticket_archive.command(name="view")
+    @commands.has_permissions(manage_messages=True)
+    async def ticket_archive_view(self, ctx: Context, ticket_id: int):
+        """Download an archived transcript as text"""
+        archived = await self.archive.get_transcript(ctx.guild.id, ticket_id)
+        if archived is None:
+            await ctx.send(f"❌ Ticket #{ticket_id} is not in the archive.")
+            return
+        
+        info, records = archived
+        tz = await resolve_timezone(self.bot, ctx.author)
+        transcript = tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024)
+        try:
+            transcript.write(f"Ticket Transcript - {info['channel_name']} (ticket #{ticket_id})\n{'=' * 50}\n\n".encode('utf-8'))
+            for record in records:
+                timestamp = datetime.fromtimestamp(record['ts'], tz).strftime('%Y-%m-%d %H:%M:%S %Z')
+                content = record.get('content') or "[No content]"
+                if record.get('attachments'):
+                    content += f" [Attachments: {', '.join(att['filename'] for att in record['attachments'])}]"
+                transcript.write(f"[{timestamp}] {record['author']}: {content}\n".encode('utf-8'))
+            transcript.seek(0)
+            await ctx.send(
+                f"🗄️ Archived transcript for ticket #{ticket_id} ({info['message_count']} messages)",
+                file=discord.File(transcript, filename=f"archive-{ticket_id}-{info['channel_name']}.txt")
+            )
+        finally:
+            transcript.close()
+    
+    @ticket_archive.command(name="retention")
+    @commands.has_permissions(manage_guild=True)
+    async def ticket_archive_retention(self, ctx: Context, days: int):
+        """Set how many days archived transcripts are kept (0 keeps them forever)"""
+        if days < 0:
+            await ctx.send("❌ Days must be 0 or more.")
+            return
+        await self.archive.set_retention(ctx.guild.id, days)
+        await ctx.send(embed=discord.Embed(
+            description="✅ Archived transcripts will be kept forever." if days == 0
+            else f"✅ Archived transcripts will be kept for **{days}** days.",
+            color=0x00E6A7
+        ))
+    
     @ticket.command(name="builder", aliases=["build", "create"])
     @commands.has_permissions(administrator=True)
     async def ticket_builder(self, ctx: Context):
@@ -4597,7 +4606,7 @@ class Tickets(commands.Cog):
         panels = await self.db.get_guild_panels(guild_id)
         
         if panels:
-            panel_list = "\n".join([f"• **{panel['panel_name']}** - {len(await self.db.get_panel_categories(panel['panel_id']))} categories" for panel in panels])
+            panel_list = "\n".join([f"• **{panel.panel_name}** - {len(await self.db.get_panel_categories(panel.panel_id))} categories" for panel in panels])
             embed.add_field(
                 name="📋 Existing Panels",
                 value=panel_list,
@@ -4633,13 +4642,13 @@ class Tickets(commands.Cog):
         categories = await self.db.get_panel_categories(panel_id)
         
         embed = discord.Embed(
-            title=f"🎫 Configure Panel: {panel['panel_name']}",
-            description=f"**Embed Title:** {panel['embed_title']}\n**Description:** {panel['panel_description'][:100]}{'...' if len(panel['panel_description']) > 100 else ''}",
-            color=self.safe_color(panel['panel_color'])
+            title=f"🎫 Configure Panel: {panel.panel_name}",
+            description=f"**Embed Title:** {panel.embed_title}\n**Description:** {(panel.panel_description or '')[:100]}{'...' if len(panel.panel_description or '') > 100 else ''}",
+            color=self.safe_color(panel.panel_color)
         )
         
         if categories:
-            category_list = "\n".join([f"• {cat['category_emoji']} **{cat['category_name']}**" for cat in categories])
+            category_list = "\n".join([f"• {cat.category_emoji} **{cat.category_name}**" for cat in categories])
             embed.add_field(
                 name=f"📂 Categories ({len(categories)})",
                 value=category_list,
@@ -4665,20 +4674,20 @@ class Tickets(commands.Cog):
             return
         
         embed = discord.Embed(
-            title=f"{category['category_emoji']} Configure: {category['category_name']}",
-            description=f"**Description:** {category['category_description'] or 'No description set'}",
-            color=self.safe_color(category.get('priority_color', 0x00E6A7))
+            title=f"{category.category_emoji} Configure: {category.category_name}",
+            description=f"**Description:** {category.category_description or 'No description set'}",
+            color=self.safe_color(category.priority_color)
         )
         
         # Show current configuration
         config_text = []
-        config_text.append(f"🏠 **Parent Category:** {'<#' + str(category['parent_category_id']) + '>' if category['parent_category_id'] else 'None'}")
-        config_text.append(f"📝 **Channel Format:** `{category['channel_name_format']}`")
-        config_text.append(f"👋 **Welcome Message:** {'Set' if category['welcome_message'] else 'Not set'}")
-        config_text.append(f"📊 **Logging:** {'Enabled' if category['log_channel_id'] else 'Disabled'}")
-        config_text.append(f"📄 **Transcripts:** {'Enabled' if category['save_transcripts'] else 'Disabled'}")
-        config_text.append(f"👥 **Max Tickets:** {category['max_tickets_per_user']}")
-        config_text.append(f"⏰ **Auto-close:** {str(category['auto_close_time']) + ' hours' if category['auto_close_time'] else 'Disabled'}")
+        config_text.append(f"🏠 **Parent Category:** {'<#' + str(category.parent_category_id) + '>' if category.parent_category_id else 'None'}")
+        config_text.append(f"📝 **Channel Format:** `{category.channel_name_format}`")
+        config_text.append(f"👋 **Welcome Message:** {'Set' if category.welcome_message else 'Not set'}")
+        config_text.append(f"📊 **Logging:** {'Enabled' if category.log_channel_id else 'Disabled'}")
+        config_text.append(f"📄 **Transcripts:** {'Enabled' if category.save_transcripts else 'Disabled'}")
+        config_text.append(f"👥 **Max Tickets:** {category.max_tickets_per_user}")
+        config_text.append(f"⏰ **Auto-close:** {str(category.auto_close_time) + ' hours' if category.auto_close_time else 'Disabled'}")
         
         embed.add_field(
             name="⚙️ Current Configuration",
@@ -4689,9 +4698,9 @@ class Tickets(commands.Cog):
         # Show role configuration
         role_text = []
         try:
-            support_roles = json.loads(category.get('support_roles', '[]'))
-            auto_add_roles = json.loads(category.get('auto_add_roles', '[]'))
-            ping_roles = json.loads(category.get('ping_roles', '[]'))
+            support_roles = json.loads(category.support_roles or '[]')
+            auto_add_roles = json.loads(category.auto_add_roles or '[]')
+            ping_roles = json.loads(category.ping_roles or '[]')
             
             role_text.append(f"🛡️ **Support Roles:** {', '.join([f'<@&{rid}>' for rid in support_roles]) if support_roles else 'None'}")
             role_text.append(f"➕ **Auto-Add Roles:** {', '.join([f'<@&{rid}>' for rid in auto_add_roles]) if auto_add_roles else 'None'}")
@@ -4824,7 +4833,7 @@ class Tickets(commands.Cog):
             return
         
         embed = discord.Embed(
-            title=f"📂 Categories in {panel['panel_name']}",
+            title=f"📂 Categories in {panel.panel_name}",
             description="Select a category to configure or manage",
             color=0x00E6A7
         )
@@ -4833,10 +4842,10 @@ class Tickets(commands.Cog):
         options = []
         for cat in categories:
             options.append(discord.SelectOption(
-                label=cat['category_name'],
-                description=cat['category_description'][:100] if cat['category_description'] else "No description",
-                emoji=cat['category_emoji'],
-                value=str(cat['category_id'])
+                label=cat.category_name,
+                description=cat.category_description[:100] if cat.category_description else "No description",
+                emoji=cat.category_emoji,
+                value=str(cat.category_id)
             ))
         
         if len(options) > 25:  # Discord limit
@@ -4893,19 +4902,19 @@ class Tickets(commands.Cog):
             return
         
         embed = discord.Embed(
-            title=f"🚀 Deploy Panel: {panel['panel_name']}",
+            title=f"🚀 Deploy Panel: {panel.panel_name}",
             description="Choose a channel to deploy this ticket panel to.",
             color=0x00E6A7
         )
         
         # Show panel preview
         preview_embed = discord.Embed(
-            title=panel['embed_title'],
-            description=panel['panel_description'],
-            color=self.safe_color(panel['panel_color'])
+            title=panel.embed_title,
+            description=panel.panel_description,
+            color=self.safe_color(panel.panel_color)
         )
         
-        category_text = "\n".join([f"{cat['category_emoji']} **{cat['category_name']}**" for cat in categories])
+        category_text = "\n".join([f"{cat.category_emoji} **{cat.category_name}**" for cat in categories])
         preview_embed.add_field(
             name="Available Categories",
             value=category_text,
@@ -4960,47 +4969,51 @@ class Tickets(commands.Cog):
         
         await interaction.followup.send(embed=preview_embed)
     
-    async def deploy_panel_to_channel(self, interaction, panel_id: int, channel: discord.TextChannel):
-        """Deploy the panel to a specific channel"""
-        panel = await self.db.get_panel(panel_id)
-        if not panel:
-            await self._safe_send(interaction, "❌ Panel not found!", ephemeral=True)
-            return
-            
-        categories = await self.db.get_panel_categories(panel_id)
-        
-        # Create the panel embed
+    def build_panel_embed(self, panel: PanelConfig, categories: List[CategoryConfig]) -> discord.Embed:
+        """The embed a deployed panel shows"""
         embed = discord.Embed(
-            title=panel['embed_title'],
-            description=panel['panel_description'],
-            color=self.safe_color(panel['panel_color'])
+            title=panel.embed_title,
+            description=panel.panel_description,
+            color=self.safe_color(panel.panel_color)
         )
         
-        if panel['embed_thumbnail']:
-            embed.set_thumbnail(url=panel['embed_thumbnail'])
+        if panel.embed_thumbnail:
+            embed.set_thumbnail(url=panel.embed_thumbnail)
         
-        if panel['embed_image']:
-            embed.set_image(url=panel['embed_image'])
+        if panel.embed_image:
+            embed.set_image(url=panel.embed_image)
         
-        if panel['embed_footer']:
-            embed.set_footer(text=panel['embed_footer'])
+        if panel.embed_footer:
+            embed.set_footer(text=panel.embed_footer)
         
         # Add categories info
-        category_text = "\n".join([f"{cat['category_emoji']} **{cat['category_name']}** - {cat['category_description'] or 'No description'}" for cat in categories])
+        category_text = "\n".join([f"{cat.category_emoji} **{cat.category_name}** - {cat.category_description or 'No description'}" for cat in categories])
         embed.add_field(
             name="📂 Available Categories",
             value=category_text,
             inline=False
         )
+        return embed
+    
+    async def deploy_panel_to_channel(self, interaction, panel_id: int, channel: discord.TextChannel):
+        """Deploy the panel to a specific channel"""
+        panel = await self.db.get_panel(panel_id)
+        if not panel:
+            await self._safe_send(interaction, "❌ Panel not found!", ephemeral=True)
+            return
+            
+        categories = await self.db.get_panel_categories(panel_id)
+        embed = self.build_panel_embed(panel, categories)
         
         # Create the dropdown for ticket creation
-        view = await self.create_ticket_panel_view(panel_id)
+        view = TicketPanelView(self, panel_id, categories)
         
         try:
             message = await channel.send(embed=embed, view=view)
             
             # Update panel with channel and message info
             await self.db.update_panel(panel_id, channel_id=channel.id, message_id=message.id)
+            await self.panels.deployed(panel_id, message.id, embed, view)
             
             embed_success = discord.Embed(
                 title="✅ Panel Deployed Successfully!",
@@ -5027,13 +5040,13 @@ class Tickets(commands.Cog):
             
             embed = discord.Embed(
                 title="✏️ Edit Panel Details",
-                description=f"**Current Panel:** {panel.get('panel_name', 'Unknown Panel')}\n\nSelect what you want to edit:",
+                description=f"**Current Panel:** {panel.panel_name}\n\nSelect what you want to edit:",
                 color=0x00E6A7
             )
             
             embed.add_field(
                 name="� Current Settings",
-                value=f"**Name:** {panel.get('panel_name', 'N/A')}\n**Title:** {panel.get('embed_title', 'N/A')}\n**Description:** {panel.get('panel_description', 'N/A')[:100]}{'...' if len(panel.get('panel_description', '')) > 100 else ''}",
+                value=f"**Name:** {panel.panel_name}\n**Title:** {panel.embed_title or 'N/A'}\n**Description:** {(panel.panel_description or 'N/A')[:100]}{'...' if len(panel.panel_description or '') > 100 else ''}",
                 inline=False
             )
             
@@ -5061,7 +5074,7 @@ class Tickets(commands.Cog):
             
             embed.add_field(
                 name="🎨 Current Settings",
-                value=f"**Color:** {panel.get('embed_color', 'Default')}\n**Footer:** {panel.get('embed_footer', 'Default')}\n**Thumbnail:** {'Set' if panel.get('embed_thumbnail') else 'None'}",
+                value=f"**Color:** {panel.panel_color or 'Default'}\n**Footer:** {panel.embed_footer or 'Default'}\n**Thumbnail:** {'Set' if panel.embed_thumbnail else 'None'}",
                 inline=False
             )
             
@@ -5080,13 +5093,13 @@ class Tickets(commands.Cog):
         
         embed = discord.Embed(
             title="⚙️ Basic Category Settings",
-            description=f"Configure basic settings for **{category['category_name']}**",
+            description=f"Configure basic settings for **{category.category_name}**",
             color=0x00E6A7
         )
         
         embed.add_field(
             name="📝 Current Settings",
-            value=f"**Name:** {category['category_name']}\n**Emoji:** {category['category_emoji'] or 'None'}\n**Description:** {category['category_description'] or 'None'}",
+            value=f"**Name:** {category.category_name}\n**Emoji:** {category.category_emoji or 'None'}\n**Description:** {category.category_description or 'None'}",
             inline=False
         )
         
@@ -5102,20 +5115,20 @@ class Tickets(commands.Cog):
         
         embed = discord.Embed(
             title="📝 Channel Settings",
-            description=f"Configure channel settings for **{category['category_name']}**",
+            description=f"Configure channel settings for **{category.category_name}**",
             color=0x00E6A7
         )
         
         # Show current settings
         embed.add_field(
             name="🏷️ Channel Name Format",
-            value=f"`{category.get('channel_name_format', 'ticket-{user}-{number}')}`",
+            value=f"`{category.channel_name_format}`",
             inline=False
         )
         
         embed.add_field(
             name="📂 Discord Category",
-            value=f"<#{category.get('discord_category_id', 'Not set')}>" if category.get('discord_category_id') else "Not set",
+            value=f"<#{category.discord_category_id}>" if category.discord_category_id else "Not set",
             inline=False
         )
         
@@ -5131,25 +5144,25 @@ class Tickets(commands.Cog):
         
         embed = discord.Embed(
             title="👥 Role Configuration",
-            description=f"Configure roles for **{category['category_name']}**",
+            description=f"Configure roles for **{category.category_name}**",
             color=0x00E6A7
         )
         
         # Safely parse JSON role data with error handling
         try:
-            support_roles_data = category.get('support_roles') or '[]'
+            support_roles_data = category.support_roles or '[]'
             support_roles = json.loads(support_roles_data) if support_roles_data.strip() else []
         except (json.JSONDecodeError, AttributeError):
             support_roles = []
             
         try:
-            auto_add_roles_data = category.get('auto_add_roles') or '[]'
+            auto_add_roles_data = category.auto_add_roles or '[]'
             auto_add_roles = json.loads(auto_add_roles_data) if auto_add_roles_data.strip() else []
         except (json.JSONDecodeError, AttributeError):
             auto_add_roles = []
             
         try:
-            ping_roles_data = category.get('ping_roles') or '[]'
+            ping_roles_data = category.ping_roles or '[]'
             ping_roles = json.loads(ping_roles_data) if ping_roles_data.strip() else []
         except (json.JSONDecodeError, AttributeError):
             ping_roles = []
@@ -5184,15 +5197,15 @@ class Tickets(commands.Cog):
         
         embed = discord.Embed(
             title="� Logging Settings",
-            description=f"Configure logging for **{category['category_name']}**",
+            description=f"Configure logging for **{category.category_name}**",
             color=0x00E6A7
         )
         
-        log_channel_id = category.get('log_channel_id')
+        log_channel_id = category.log_channel_id
         
         # Safely parse log events JSON
         try:
-            log_events_data = category.get('log_events') or '["created", "closed", "claimed"]'
+            log_events_data = category.log_events or '["created", "closed", "claimed"]'
             log_events = json.loads(log_events_data) if log_events_data.strip() else ["created", "closed", "claimed"]
         except (json.JSONDecodeError, AttributeError):
             log_events = ["created", "closed", "claimed"]
@@ -5225,13 +5238,13 @@ class Tickets(commands.Cog):
         
         embed = discord.Embed(
             title="� Transcript Settings",
-            description=f"Configure transcripts for **{category['category_name']}**",
+            description=f"Configure transcripts for **{category.category_name}**",
             color=0x00E6A7
         )
         
-        auto_transcript = category.get('auto_transcript', False)
-        transcript_channel_id = category.get('transcript_channel_id')
-        transcript_format = category.get('transcript_format', 'text')
+        auto_transcript = category.auto_transcript
+        transcript_channel_id = category.transcript_channel_id
+        transcript_format = category.transcript_format or 'text'
         
         # Ensure transcript_format is a string
         if not isinstance(transcript_format, str):
@@ -5271,13 +5284,13 @@ class Tickets(commands.Cog):
         
         embed = discord.Embed(
             title="⏰ Limits & Automation",
-            description=f"Configure limits for **{category['category_name']}**",
+            description=f"Configure limits for **{category.category_name}**",
             color=0x00E6A7
         )
         
-        max_tickets = category.get('max_tickets_per_user', 1)
-        auto_close_time = category.get('auto_close_time', 0)
-        warning_time = category.get('warning_time', 0)
+        max_tickets = category.max_tickets_per_user
+        auto_close_time = category.auto_close_time
+        warning_time = category.auto_close_warning
         
         embed.add_field(
             name="🎫 Max Tickets Per User",
@@ -5309,13 +5322,13 @@ class Tickets(commands.Cog):
         
         embed = discord.Embed(
             title="� Permissions Settings",
-            description=f"Configure permissions for **{category['category_name']}**",
+            description=f"Configure permissions for **{category.category_name}**",
             color=0x00E6A7
         )
         
-        user_can_close = category.get('user_can_close', True)
-        user_can_add_others = category.get('user_can_add_others', False)
-        require_claiming = category.get('require_claiming', False)
+        user_can_close = category.user_can_close
+        user_can_add_others = category.user_can_add_others
+        require_claiming = category.require_claiming
         
         embed.add_field(
             name="🔒 User Can Close",
@@ -5347,7 +5360,7 @@ class Tickets(commands.Cog):
         
         embed = discord.Embed(
             title="⚠️ Delete Panel",
-            description=f"Are you sure you want to delete panel **{panel['panel_name']}**?\n\n**This will also delete all categories in this panel!**\n\nThis action cannot be undone.",
+            description=f"Are you sure you want to delete panel **{panel.panel_name}**?\n\n**This will also delete all categories in this panel!**\n\nThis action cannot be undone.",
             color=0xFF0000
         )
         
@@ -5363,11 +5376,11 @@ class Tickets(commands.Cog):
         
         embed = discord.Embed(
             title="⚠️ Delete Category",
-            description=f"Are you sure you want to delete category **{category['category_name']}**?\n\nThis action cannot be undone.",
+            description=f"Are you sure you want to delete category **{category.category_name}**?\n\nThis action cannot be undone.",
             color=0xFF0000
         )
         
-        view = CategoryDeletionConfirmView(self, category_id, category['panel_id'])
+        view = CategoryDeletionConfirmView(self, category_id, category.panel_id)
         await self._safe_send(interaction, embed=embed, view=view, ephemeral=True)
     
     # ================================
@@ -5746,10 +5759,11 @@ class Tickets(commands.Cog):
     
     @ticket.command(name="analytics", aliases=["dashboard"])
     @commands.has_permissions(administrator=True)
-    async def analytics_dashboard(self, ctx: Context):
+    async def analytics_dashboard(self, ctx: Context, days: int = 30):
         """📊 Advanced analytics dashboard"""
         if not ctx.guild:
             return
+        days = max(1, min(days, 3650))
             
         embed = discord.Embed(
             title="📊 Ticket Analytics Dashboard",
@@ -5757,42 +5771,61 @@ class Tickets(commands.Cog):
             color=0x00E6A7
         )
         
-        # Get basic stats
+        now = self.tz_helpers.get_utc_now()
+        today = now.strftime('%Y-%m-%d')
+        start = (now - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        week_start = (now - timedelta(days=6)).strftime('%Y-%m-%d')
         async with aiosqlite.connect(self.db.db_path) as db:
-            # Total tickets
-            cursor = await db.execute("SELECT COUNT(*) FROM tickets WHERE guild_id = ?", (ctx.guild.id,))
-            result = await cursor.fetchone()
-            total_tickets = result[0] if result else 0
-            
-            # Open tickets
-            cursor = await db.execute("SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND status != 'closed'", (ctx.guild.id,))
-            result = await cursor.fetchone()
-            open_tickets = result[0] if result else 0
-            
-            # Average resolution time
-            cursor = await db.execute("""
-                SELECT AVG(resolution_time) FROM tickets 
-                WHERE guild_id = ? AND resolution_time IS NOT NULL
-            """, (ctx.guild.id,))
-            result = await cursor.fetchone()
-            avg_resolution = result[0] if result and result[0] else 0
+            # Served from the daily aggregates (see utils.ticket_analytics)
+            totals = await ticket_analytics.summary(db, ctx.guild.id)
+            period = await ticket_analytics.summary(db, ctx.guild.id, start)
+            staff = await ticket_analytics.staff_summary(db, ctx.guild.id, start, limit=5)
+            week = await ticket_analytics.daily_volume(db, ctx.guild.id, week_start)
             
             # SLA breaches today
-            today = self.tz_helpers.get_utc_now().date()
+            tomorrow = (now + timedelta(days=1)).strftime('%Y-%m-%d')
             cursor = await db.execute("""
                 SELECT COUNT(*) FROM tickets 
-                WHERE guild_id = ? AND sla_status = 'breached' 
-                AND DATE(created_at) = ?
-            """, (ctx.guild.id, today))
+                WHERE guild_id = ? AND created_at >= ? AND created_at < ?
+                AND sla_status = 'breached'
+            """, (ctx.guild.id, today, tomorrow))
             result = await cursor.fetchone()
             sla_breaches = result[0] if result else 0
         
+        duration = ticket_analytics.format_duration
         embed.add_field(
             name="📈 Overview",
-            value=f"**Total Tickets:** {total_tickets}\n**Open Tickets:** {open_tickets}\n**Avg Resolution:** {avg_resolution:.1f} min\n**SLA Breaches Today:** {sla_breaches}",
+            value=f"**Total Tickets:** {totals.opened}\n**Open Tickets:** {totals.opened - totals.closed}\n**Avg Resolution:** {duration(totals.avg_resolution)}\n**SLA Breaches Today:** {sla_breaches}",
+            inline=False
+        )
+        
+        embed.add_field(
+            name=f"⏱️ Last {days} Days",
+            value=f"**Opened:** {period.opened} • **Closed:** {period.closed} • **Claimed:** {period.claimed}\n"
+                  f"**First Response:** avg {duration(period.avg_response)}, median {duration(period.response_p50)}, p90 {duration(period.response_p90)}\n"
+                  f"**Resolution:** avg {duration(period.avg_resolution)}, median {duration(period.resolution_p50)}, p90 {duration(period.resolution_p90)}",
             inline=False
         )
         
+        if week:
+            embed.add_field(
+                name="📅 This Week (opened / closed)",
+                value="\n".join(f"`{day.date[5:]}` {day.opened} / {day.closed}" for day in week),
+                inline=True
+            )
+        
+        if staff:
+            lines = []
+            for entry in staff:
+                member = ctx.guild.get_member(entry.staff_id)
+                lines.append(f"{member.mention if member else entry.staff_id}: {entry.claimed} claimed, {entry.closed} closed, "
+                             f"first reply {duration(entry.avg_response)}")
+            embed.add_field(
+                name=f"👥 Staff ({days}d)",
+                value="\n".join(lines),
+                inline=True
+            )
+        
         embed.add_field(
             name="🚀 Advanced Features",
             value="• Real-time SLA monitoring\n• Staff performance tracking\n• AI-powered categorization\n• Sentiment analysis\n• Workload balancing\n• Custom reporting",
@@ -5835,21 +5868,77 @@ class Tickets(commands.Cog):
         return view
     
     async def create_ticket_from_panel(self, interaction: discord.Interaction, category_id: int, panel_id: Optional[int] = None):
-        """Create a ticket for the selected category from a panel"""
+        """Queue a ticket for the selected category from a panel and acknowledge with its queue position"""
         if not interaction.guild:
             await interaction.response.send_message("❌ This can only be used in a server!", ephemeral=True)
             return
-            
+        
         category = await self.db.get_category(category_id)
         
         if not category:
             await interaction.response.send_message("❌ Category not found!", ephemeral=True)
             return
         
-        # Check if user has reached ticket limit for this category
+        key = (interaction.guild.id, interaction.user.id, panel_id)
+        position = self.creation_queue.position(key)
+        if position is not None:
+            await interaction.response.send_message(
+                f"⏳ Your ticket is already being created{self.queue_note(position)}",
+                ephemeral=True
+            )
+            return
+        if self.creation_queue.full(interaction.guild.id):
+            await interaction.response.send_message(
+                "❌ Too many tickets are being created right now, please try again in a minute.",
+                ephemeral=True
+            )
+            return
+        
+        # The job edits the acknowledgement, so it waits until that has been sent
+        acknowledged = asyncio.Event()
+        
+        async def job():
+            await acknowledged.wait()
+            await self.run_panel_ticket_creation(interaction, category, panel_id)
+        
+        position = self.creation_queue.submit(key, job)
+        try:
+            await interaction.response.send_message(f"⏳ Creating your ticket{self.queue_note(position)}", ephemeral=True)
+        finally:
+            acknowledged.set()
+    
+    @staticmethod
+    def queue_note(position: int) -> str:
+        return "..." if position == 0 else f" - you're #{position} in the queue."
+    
+    async def reply_to_creation(self, interaction: discord.Interaction, content: str):
+        """Replace a queued creation's acknowledgement with its outcome"""
+        try:
+            await interaction.edit_original_response(content=content)
+        except discord.HTTPException:
+            pass  # Acknowledgement failed or the interaction expired
+    
+    async def rollback_ticket(self, channel: Optional[discord.abc.GuildChannel], ticket_id: Optional[int]):
+        """Undo a ticket creation that failed partway: drop its record and delete its channel"""
+        if ticket_id is not None:
+            try:
+                await self.db.discard_ticket(ticket_id)
+            except Exception as e:
+                print(f"[TICKETS] Could not discard ticket {ticket_id}: {e}")
+        if channel is not None:
+            self.awaiting_response.pop(channel.id, None)
+            try:
+                await channel.delete(reason="Ticket creation failed")
+            except discord.HTTPException as e:
+                print(f"[TICKETS] Could not delete channel {channel.id} of a failed ticket: {e}")
+    
+    async def run_panel_ticket_creation(self, interaction: discord.Interaction, category: CategoryConfig, panel_id: Optional[int]):
+        """Create a queued panel ticket; runs in the guild's creation queue"""
+        category_id = category.category_id
+        # Checked here rather than when queued, so it sees the user's tickets created meanwhile
         existing_tickets = await self.db.get_user_tickets(
-            interaction.guild.id, 
-            interaction.user.id, 
+            interaction.guild.id,
+            interaction.user.id,
             'open'
         )
         
@@ -5857,25 +5946,27 @@ class Tickets(commands.Cog):
         category_tickets = [t for t in existing_tickets if t.get('category_id') == category_id]
         
         # Check ticket limit with proper null handling
-        max_tickets = category.get('max_tickets_per_user') or 1
+        max_tickets = category.max_tickets_per_user or 1
         if not isinstance(max_tickets, int):
             max_tickets = 1
-            
+        
         if len(category_tickets) >= max_tickets:
-            await interaction.response.send_message(
-                f"❌ You already have the maximum number of tickets ({max_tickets}) open for this category!",
-                ephemeral=True
+            await self.reply_to_creation(
+                interaction,
+                f"❌ You already have the maximum number of tickets ({max_tickets}) open for this category!"
             )
             return
         
+        channel = None
+        ticket_id = None
         # Create the ticket channel
         try:
             # Format channel name with safe field handling
-            channel_name_format = category.get('channel_name_format') or 'ticket-{user}-{number}'
+            channel_name_format = category.channel_name_format or 'ticket-{user}-{number}'
             channel_name = channel_name_format.format(
                 user=interaction.user.display_name.lower().replace(' ', '-')[:20],  # Limit length
                 number=len(existing_tickets) + 1,
-                category=category['category_name'].lower().replace(' ', '-')[:20]  # Limit length
+                category=category.category_name.lower().replace(' ', '-')[:20]  # Limit length
             )
             
             # Clean channel name (Discord requirements)
@@ -5885,7 +5976,7 @@ class Tickets(commands.Cog):
             
             # Get parent category with safe handling
             parent_category = None
-            parent_category_id = category.get('parent_category_id')
+            parent_category_id = category.parent_category_id
             if parent_category_id:
                 parent_cat = interaction.guild.get_channel(parent_category_id)
                 if isinstance(parent_cat, discord.CategoryChannel):
@@ -5912,7 +6003,7 @@ class Tickets(commands.Cog):
             
             # Add support roles with safe JSON parsing
             try:
-                support_roles_data = category.get('support_roles') or '[]'
+                support_roles_data = category.support_roles or '[]'
                 support_roles = json.loads(support_roles_data) if support_roles_data.strip() else []
             except (json.JSONDecodeError, AttributeError):
                 support_roles = []
@@ -5931,7 +6022,7 @@ class Tickets(commands.Cog):
                 name=channel_name,
                 category=parent_category,
                 overwrites=overwrites,
-                topic=f"Ticket created by {interaction.user} | Category: {category['category_name']} | Support ticket"
+                topic=f"Ticket created by {interaction.user} | Category: {category.category_name} | Support ticket"
             )
             
             # Create ticket in database
@@ -5942,18 +6033,19 @@ class Tickets(commands.Cog):
                 category_id,
                 panel_id
             )
+            self.awaiting_response[channel.id] = (ticket_id, interaction.user.id, category_id)
             
             # Send welcome message with safe field handling
-            welcome_message = category.get('welcome_message') or 'Thank you for creating a ticket! A staff member will be with you shortly.'
+            welcome_message = category.welcome_message or 'Thank you for creating a ticket! A staff member will be with you shortly.'
             welcome_embed = discord.Embed(
-                title=f"🎫 Ticket #{len(existing_tickets) + 1} - {category['category_name']}",
+                title=f"🎫 Ticket #{len(existing_tickets) + 1} - {category.category_name}",
                 description=welcome_message,
-                color=self.safe_color(category.get('priority_color', 0x00E6A7))
+                color=self.safe_color(category.priority_color)
             )
             
             welcome_embed.add_field(
                 name="📋 Ticket Information",
-                value=f"**Created by:** {interaction.user.mention}\n**Category:** {category['category_name']}\n**Channel:** {channel.mention}",
+                value=f"**Created by:** {interaction.user.mention}\n**Category:** {category.category_name}\n**Channel:** {channel.mention}",
                 inline=False
             )
             
@@ -5963,7 +6055,7 @@ class Tickets(commands.Cog):
             # Ping roles if configured with safe JSON parsing
             ping_content = ""
             try:
-                ping_roles_data = category.get('ping_roles') or '[]'
+                ping_roles_data = category.ping_roles or '[]'
                 ping_roles = json.loads(ping_roles_data) if ping_roles_data.strip() else []
             except (json.JSONDecodeError, AttributeError):
                 ping_roles = []
@@ -5985,7 +6077,7 @@ class Tickets(commands.Cog):
             
             # Auto-add roles to user if configured with safe JSON parsing
             try:
-                auto_add_roles_data = category.get('auto_add_roles') or '[]'
+                auto_add_roles_data = category.auto_add_roles or '[]'
                 auto_add_roles = json.loads(auto_add_roles_data) if auto_add_roles_data.strip() else []
             except (json.JSONDecodeError, AttributeError):
                 auto_add_roles = []
@@ -5995,17 +6087,17 @@ class Tickets(commands.Cog):
                     role = interaction.guild.get_role(role_id)
                     if role and role not in interaction.user.roles:
                         try:
-                            await interaction.user.add_roles(role, reason=f"Auto-added from ticket category: {category['category_name']}")
+                            await interaction.user.add_roles(role, reason=f"Auto-added from ticket category: {category.category_name}")
                         except:
                             pass  # Skip if can't add role
             
             # Log creation if enabled
-            if category['log_creation'] and category['log_channel_id']:
-                log_channel = interaction.guild.get_channel(category['log_channel_id'])
+            if category.log_creation and category.log_channel_id:
+                log_channel = interaction.guild.get_channel(category.log_channel_id)
                 if log_channel and isinstance(log_channel, discord.TextChannel):
                     log_embed = discord.Embed(
                         title="🎫 Ticket Created",
-                        description=f"**User:** {interaction.user.mention}\n**Category:** {category['category_name']}\n**Channel:** {channel.mention}",
+                        description=f"**User:** {interaction.user.mention}\n**Category:** {category.category_name}\n**Channel:** {channel.mention}",
                         color=0x00FF00,
                         timestamp=self.tz_helpers.get_utc_now()
                     )
@@ -6014,15 +6106,16 @@ class Tickets(commands.Cog):
                     except:
                         pass  # Skip if can't log
             
-            await interaction.response.send_message(
-                f"✅ Ticket created! {channel.mention}",
-                ephemeral=True
-            )
-            
         except discord.Forbidden:
-            await interaction.response.send_message("❌ I don't have permission to create channels!", ephemeral=True)
+            await self.rollback_ticket(channel, ticket_id)
+            await self.reply_to_creation(interaction, "❌ I don't have permission to create channels!")
+            return
         except Exception as e:
-            await interaction.response.send_message(f"❌ Error creating ticket: {str(e)}", ephemeral=True)
+            await self.rollback_ticket(channel, ticket_id)
+            await self.reply_to_creation(interaction, f"❌ Error creating ticket: {str(e)}")
+            return
+        
+        await self.reply_to_creation(interaction, f"✅ Ticket created! {channel.mention}")
 
 class MainSetupView(View):
     """Main setup view with create panel button"""
@@ -6047,11 +6140,11 @@ class MainSetupView(View):
         # Create panel selection dropdown
         options = []
         for panel in panels:
-            categories_count = len(await self.tickets_cog.db.get_panel_categories(panel['panel_id']))
+            categories_count = len(await self.tickets_cog.db.get_panel_categories(panel.panel_id))
             options.append(discord.SelectOption(
-                label=panel['panel_name'],
+                label=panel.panel_name,
                 description=f"{categories_count} categories",
-                value=str(panel['panel_id'])
+                value=str(panel.panel_id)
             ))
         
         view = View()
@@ -6090,9 +6183,9 @@ class TicketCategorySelect(Select):
         options = []
         if categories:
             for category in categories:
-                emoji = category.get('category_emoji', '🎫')
-                name = category['category_name']
-                description = category.get('category_description', 'Create a support ticket')
+                emoji = category.category_emoji
+                name = category.category_name
+                description = category.category_description
                 
                 # Truncate description if too long
                 if description and len(description) > 100:
@@ -6102,7 +6195,7 @@ class TicketCategorySelect(Select):
                     label=name,
                     description=description,
                     emoji=emoji,
-                    value=str(category['category_id'])
+                    value=str(category.category_id)
                 ))
         
         # If no categories, show disabled placeholder
@@ -1,11 +1,12 @@
 import discord
 from discord.ext import commands
+import asyncio
 import sqlite3
 import os
 import typing
-from datetime import datetime, timezone
 
 from utils.error_helpers import StandardErrorHandler
+from utils.voice_sessions import get_voice_session_engine
 DB_PATH = "db/vctracker.db"
 os.makedirs("db", exist_ok=True)
 
@@ -99,13 +100,19 @@ class VCTracker(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
-        self.vc_sessions = {}
-        # Initialize database when cog loads
-        self.bot.loop.create_task(self.init_db())
+        # Sessions are tracked by the shared engine; we only add up what it publishes
+        self.voice_engine = get_voice_session_engine(bot)
 
-    async def init_db(self):
+    async def cog_load(self):
+        await asyncio.to_thread(self.init_db)
+        self.voice_engine.subscribe(self.on_voice_segments)
+        await self.voice_engine.start()
+
+    async def cog_unload(self):
+        await self.voice_engine.unsubscribe(self.on_voice_segments)
+
+    def init_db(self):
         """Initialize the database"""
-        await self.bot.wait_until_ready()
         with sqlite3.connect(DB_PATH) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS vc_stats (
@@ -122,23 +129,24 @@ class VCTracker(commands.Cog):
         hrs, mins = divmod(mins, 60)
         return f"{hrs}h {mins}m {sec}s"
 
-    @commands.Cog.listener()
-    async def on_voice_state_update(self, member, before, after):
-        if before.channel is None and after.channel is not None:
-            self.vc_sessions[member.id] = datetime.now(timezone.utc)
-        elif before.channel is not None and after.channel is None:
-            start_time = self.vc_sessions.pop(member.id, None)
-            if start_time:
-                seconds = int((datetime.now(timezone.utc) - start_time).total_seconds())
-                with sqlite3.connect(DB_PATH) as conn:
-                    conn.execute("""
-                        INSERT OR IGNORE INTO vc_stats (guild_id, user_id, time)
-                        VALUES (?, ?, 0)
-                    """, (str(member.guild.id), str(member.id)))
-                    conn.execute("""
-                        UPDATE vc_stats SET time = time + ? WHERE guild_id = ? AND user_id = ?
-                    """, (seconds, str(member.guild.id), str(member.id)))
-                    conn.commit()
+    async def on_voice_segments(self, segments):
+        """Add published voice time (bots included, as before) in one transaction"""
+        totals = {}
+        for segment in segments:
+            key = (str(segment.guild_id), str(segment.user_id))
+            totals[key] = totals.get(key, 0.0) + segment.seconds
+        rows = [(guild_id, user_id, int(round(seconds))) for (guild_id, user_id), seconds in totals.items()
+                if seconds >= 0.5]
+        if rows:
+            await asyncio.to_thread(self.add_time, rows)
+
+    def add_time(self, rows):
+        with sqlite3.connect(DB_PATH) as conn:
+            conn.executemany("""
+                INSERT INTO vc_stats (guild_id, user_id, time) VALUES (?, ?, ?)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET time = time + excluded.time
+            """, rows)
+            conn.commit()
 
     @commands.group(name="vctime", invoke_without_command=True)
     async def vctime(self, ctx):
@@ -4,6 +4,7 @@ from discord.ext import commands
 import aiosqlite
 from datetime import datetime, timedelta
 from utils.timezone_helpers import get_timezone_helpers
+from utils.cooldowns import cooldowns
 
 class AutoBlacklist(Cog):
     def __init__(self, client: sleepless):
@@ -11,9 +12,9 @@ class AutoBlacklist(Cog):
         self.tz_helpers = get_timezone_helpers(client)
         self.spam_cd_mapping = commands.CooldownMapping.from_cooldown(5, 5, commands.BucketType.member)
         self.spam_command_mapping = commands.CooldownMapping.from_cooldown(15, 30, commands.BucketType.member)  # Much more lenient
-        self.last_spam = {}
         self.spam_threshold = 20  # Increased from 5 to 20
         self.spam_window = timedelta(minutes=30)  # Increased from 10 to 30 minutes
+        self.last_spam = cooldowns.sliding_window("autoblacklist.spam", self.spam_window.total_seconds())
         self.db_path = 'db/block.db'
         self.bot_user_id = self.client.user.id if self.client.user else None
         self.guild_command_tracking = {}
@@ -125,14 +126,10 @@ class AutoBlacklist(Cog):
 
                 # Only blacklist after repeated bot mentions
                 if message.content in (f'<@{self.bot_user_id}>', f'<@!{self.bot_user_id}>'):
-                    if message.author.id not in self.last_spam:
-                        self.last_spam[message.author.id] = []
-                    self.last_spam[message.author.id].append(self.tz_helpers.get_utc_now())
-                    recent_spam = [timestamp for timestamp in self.last_spam.get(message.author.id, []) if timestamp >= self.tz_helpers.get_utc_now() - self.spam_window]
-                    self.last_spam[message.author.id] = recent_spam
+                    recent_spam = self.last_spam.hit(message.author.id)
                     
                     # Only blacklist after many bot mentions
-                    if len(recent_spam) >= self.spam_threshold:
+                    if recent_spam >= self.spam_threshold:
                         await self.add_to_blacklist(user_id=message.author.id)
                         embed = discord.Embed(
                             title="<:feast_warning:1400143131990560830> User Blacklisted",
@@ -145,7 +142,7 @@ class AutoBlacklist(Cog):
                             pass  # Ignore if we can't send the message
                         
                         # Check for guild blacklist after user blacklist
-                        if message.guild and len(recent_spam) >= self.spam_threshold:
+                        if message.guild and recent_spam >= self.spam_threshold:
                             await self.check_and_blacklist_guild(message.guild.id)
 
     @commands.Cog.listener()
@@ -174,14 +171,10 @@ class AutoBlacklist(Cog):
                     pass
                 
                 # Track command spam - only blacklist after multiple warnings
-                if ctx.author.id not in self.last_spam:
-                    self.last_spam[ctx.author.id] = []
-                self.last_spam[ctx.author.id].append(self.tz_helpers.get_utc_now())
-                recent_command_spam = [timestamp for timestamp in self.last_spam.get(ctx.author.id, []) if timestamp >= self.tz_helpers.get_utc_now() - timedelta(minutes=5)]
-                self.last_spam[ctx.author.id] = recent_command_spam
+                recent_command_spam = self.last_spam.hit(ctx.author.id, window=5 * 60)
                 
                 # Only blacklist after multiple command spam incidents
-                if len(recent_command_spam) >= 5:  # 5 warnings within 5 minutes
+                if recent_command_spam >= 5:  # 5 warnings within 5 minutes
                     await self.add_to_blacklist(user_id=ctx.author.id)
                     embed = discord.Embed(
                         title="<:feast_warning:1400143131990560830> User Blacklisted",
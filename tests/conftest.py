@@ -0,0 +1,53 @@
+import asyncio
+import os
+import sys
+
+import aiosqlite
+import pytest
+
+# The bot runs from the repository root; tests import ``utils`` the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.stats_rollup import StatsRollup  # noqa: E402
+
+# The hourly stats tables as ComprehensiveStats.init_database creates them
+STATS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS message_stats (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        hour INTEGER NOT NULL,
+        count INTEGER DEFAULT 0,
+        characters INTEGER DEFAULT 0,
+        words INTEGER DEFAULT 0,
+        attachments INTEGER DEFAULT 0,
+        mentions INTEGER DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id, channel_id, date, hour)
+    );
+    CREATE TABLE IF NOT EXISTS voice_stats (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        date DATE NOT NULL,
+        hour INTEGER NOT NULL,
+        duration INTEGER DEFAULT 0,
+        duration_minutes REAL DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id, channel_id, date, hour)
+    );
+"""
+
+
+@pytest.fixture
+def stats_db(tmp_path):
+    """Path of a stats database with the hourly tables and the rollup tiers"""
+    path = str(tmp_path / "stats.db")
+
+    async def create():
+        async with aiosqlite.connect(path) as db:
+            await db.executescript(STATS_SCHEMA)
+            await StatsRollup.ensure_tables(db)
+            await db.commit()
+
+    asyncio.run(create())
+    return path
@@ -0,0 +1,225 @@
+"""ActivityCounters with an injected clock: period buckets, rollovers, legacy seeding and reloads"""
+import asyncio
+import contextlib
+import random
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import aiosqlite
+import pytest
+
+from utils.activity_counters import ActivityCounters, CounterColumns, day_key, month_key, week_key
+
+# The summary tables as LiveLeaderboard.init_database creates them
+MESSAGE_COLUMNS = CounterColumns("message_leaderboard", "daily_count", "weekly_count", "monthly_count", "alltime_count")
+VOICE_COLUMNS = CounterColumns("voice_leaderboard", "daily_minutes", "weekly_minutes", "monthly_minutes", "alltime_minutes")
+SUMMARY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        username TEXT NOT NULL,
+        {daily} INTEGER DEFAULT 0,
+        {weekly} INTEGER DEFAULT 0,
+        {monthly} INTEGER DEFAULT 0,
+        {alltime} INTEGER DEFAULT 0,
+        current_streak INTEGER DEFAULT 0,
+        longest_streak INTEGER DEFAULT 0,
+        last_activity_date DATE,
+        last_daily_reset DATE,
+        last_weekly_reset DATE,
+        last_monthly_reset DATE,
+        PRIMARY KEY (guild_id, user_id)
+    )
+"""
+GUILD_ID = 5
+EASTERN = timezone(timedelta(hours=-5))
+
+
+class Clock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+async def _counters(path: str, clock: Clock, tz=timezone.utc, kind: str = "chat") -> ActivityCounters:
+    columns = MESSAGE_COLUMNS if kind == "chat" else VOICE_COLUMNS
+    async with aiosqlite.connect(path) as db:
+        await db.execute(SUMMARY_SCHEMA.format(**columns._asdict()))
+        await db.commit()
+    counters = ActivityCounters(path, kind, columns, tz=tz, flush_interval=3600, clock=clock)
+    await counters.start()
+    return counters
+
+
+def _bucket_total(path: str) -> float:
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        return db.execute("SELECT COALESCE(SUM(amount), 0) FROM activity_buckets").fetchone()[0]
+
+
+class Model:
+    """Every event kept as is; the periods are recomputed from scratch"""
+
+    def __init__(self, tz):
+        self.tz = tz
+        self.events = defaultdict(list)  # user_id -> [(day, amount)]
+
+    def add(self, user_id: int, amount, moment: datetime):
+        self.events[user_id].append((day_key(moment, self.tz), amount))
+
+    def expected(self, user_id: int, now: datetime):
+        today = day_key(now, self.tz)
+        events = self.events[user_id]
+        days = sorted({day for day, _ in events})
+        runs, run = {}, 0
+        for i, day in enumerate(days):
+            run = run + 1 if i and days[i - 1] == day - 1 else 1
+            runs[day] = run
+        last = days[-1]
+        return {
+            "daily": sum(amount for day, amount in events if day == today),
+            "weekly": sum(amount for day, amount in events if week_key(day) == week_key(today)),
+            "monthly": sum(amount for day, amount in events if month_key(day) == month_key(today)),
+            "alltime": sum(amount for _, amount in events),
+            "current_streak": runs[last] if last >= today - 1 else 0,
+            "longest_streak": max(runs.values()),
+        }
+
+
+def _period_view(user: dict) -> dict:
+    return {key: user[key] for key in ("daily", "weekly", "monthly", "alltime", "current_streak", "longest_streak")}
+
+
+def test_midnight_week_and_month_rollover(tmp_path):
+    path = str(tmp_path / "leaderboard.db")
+    # Sunday 23:50 in UTC-5, which is already Monday in UTC
+    clock = Clock(datetime(2024, 3, 17, 23, 50, tzinfo=EASTERN))
+
+    async def go():
+        counters = await _counters(path, clock, tz=EASTERN)
+        seen = []
+        await counters.add(GUILD_ID, 1, "one", 3)
+        seen.append(_period_view(await counters.get_user(GUILD_ID, 1)))
+        clock.now += timedelta(minutes=20)  # Monday 00:10: new day and new week, same month
+        seen.append(_period_view(await counters.get_user(GUILD_ID, 1)))
+        await counters.add(GUILD_ID, 1, "one", 2)
+        seen.append(_period_view(await counters.get_user(GUILD_ID, 1)))
+        clock.now = datetime(2024, 4, 1, 0, 5, tzinfo=EASTERN)  # a quiet fortnight, then a new month
+        seen.append(_period_view(await counters.get_user(GUILD_ID, 1)))
+        await counters.add(GUILD_ID, 1, "one", 4)
+        seen.append(_period_view(await counters.get_user(GUILD_ID, 1)))
+        await counters.stop()
+        return seen
+
+    assert asyncio.run(go()) == [
+        {"daily": 3, "weekly": 3, "monthly": 3, "alltime": 3, "current_streak": 1, "longest_streak": 1},
+        {"daily": 0, "weekly": 0, "monthly": 3, "alltime": 3, "current_streak": 1, "longest_streak": 1},
+        {"daily": 2, "weekly": 2, "monthly": 5, "alltime": 5, "current_streak": 2, "longest_streak": 2},
+        {"daily": 0, "weekly": 0, "monthly": 0, "alltime": 5, "current_streak": 0, "longest_streak": 2},
+        {"daily": 4, "weekly": 4, "monthly": 4, "alltime": 9, "current_streak": 1, "longest_streak": 2},
+    ]
+
+
+def test_voice_session_is_split_on_local_midnight(tmp_path):
+    path = str(tmp_path / "leaderboard.db")
+    clock = Clock(datetime(2024, 3, 18, 0, 30, tzinfo=EASTERN))
+
+    async def go():
+        counters = await _counters(path, clock, tz=EASTERN, kind="voice")
+        await counters.add_session(GUILD_ID, 1, "one", datetime(2024, 3, 17, 23, 0, tzinfo=EASTERN), clock.now)
+        user = await counters.get_user(GUILD_ID, 1)
+        await counters.stop()
+        return user
+
+    user = asyncio.run(go())
+    # 60 minutes on Sunday (last week), 30 on Monday
+    assert (user["daily"], user["weekly"], user["monthly"], user["alltime"]) == (30, 30, 90, 90)
+    assert user["current_streak"] == 2
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_random_activity_with_flushes_and_reloads(tmp_path, seed):
+    rng = random.Random(seed)
+    path = str(tmp_path / "leaderboard.db")
+    tz = rng.choice((timezone.utc, EASTERN, timezone(timedelta(hours=9, minutes=30))))
+    clock = Clock(datetime(2024, 1, 20, 12, tzinfo=timezone.utc))
+    model = Model(tz)
+
+    async def go():
+        counters = await _counters(path, clock, tz=tz)
+        reloads = 0
+        for _ in range(1500):
+            # Minutes to a couple of days apart: days, weeks and months roll over, and streaks break
+            clock.now += timedelta(minutes=rng.choice((rng.randint(1, 90), rng.randint(60, 1500), rng.randint(1440, 3000))))
+            user_id = rng.randint(1, 6)
+            amount = rng.randint(1, 5)
+            await counters.add(GUILD_ID, user_id, f"user{user_id}", amount)
+            model.add(user_id, amount, clock.now)
+
+            roll = rng.random()
+            if roll < 0.05:
+                await counters.flush()
+            elif roll < 0.08:
+                # Restart: a flushed stop, then a fresh instance loads the guild from the tables
+                await counters.stop()
+                counters = await _counters(path, clock, tz=tz)
+                reloads += 1
+            if roll < 0.1 or _ == 1499:
+                for member in model.events:
+                    assert _period_view(await counters.get_user(GUILD_ID, member)) == \
+                        model.expected(member, clock.now), member
+        await counters.stop()
+        return reloads
+
+    assert asyncio.run(go()) > 10
+    # Reloading never counted anything twice
+    assert _bucket_total(path) == sum(amount for events in model.events.values() for _, amount in events)
+
+
+def _summary_row(path: str, user_id: int, last_activity: str, daily: int, weekly: int, monthly: int, alltime: int):
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        db.execute(SUMMARY_SCHEMA.format(**MESSAGE_COLUMNS._asdict()))
+        db.execute("""
+            INSERT INTO message_leaderboard (guild_id, user_id, username, daily_count, weekly_count, monthly_count,
+                                             alltime_count, current_streak, longest_streak, last_activity_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 4, 9, ?)
+        """, (GUILD_ID, user_id, f"legacy{user_id}", daily, weekly, monthly, alltime, last_activity))
+        db.commit()
+
+
+def test_legacy_summary_rows_are_seeded_once(tmp_path):
+    path = str(tmp_path / "leaderboard.db")
+    # Thursday: the week began on Monday the 11th, the month on the 1st
+    clock = Clock(datetime(2024, 3, 14, 18, tzinfo=timezone.utc))
+    _summary_row(path, 1, "2024-03-14", daily=5, weekly=12, monthly=30, alltime=100)
+    _summary_row(path, 2, "2024-03-12", daily=2, weekly=3, monthly=8, alltime=50)
+    _summary_row(path, 3, "2024-02-20", daily=1, weekly=1, monthly=1, alltime=70)
+
+    async def view(counters):
+        return [_period_view(await counters.get_user(GUILD_ID, user_id)) for user_id in (1, 2, 3)]
+
+    async def go():
+        counters = await _counters(path, clock)
+        seeded = await view(counters)
+        await counters.add(GUILD_ID, 1, None, 1)
+        await counters.stop()
+        # A second start finds buckets and must not seed the summary totals again
+        counters = await _counters(path, clock)
+        reloaded = await view(counters)
+        await counters.stop()
+        return seeded, reloaded
+
+    seeded, reloaded = asyncio.run(go())
+    assert seeded == [
+        {"daily": 5, "weekly": 12, "monthly": 30, "alltime": 100, "current_streak": 4, "longest_streak": 9},
+        # Last active two days ago: the streak has lapsed, the week and month still count
+        {"daily": 0, "weekly": 3, "monthly": 8, "alltime": 50, "current_streak": 0, "longest_streak": 9},
+        # Last month: only the all-time total carries over
+        {"daily": 0, "weekly": 0, "monthly": 0, "alltime": 70, "current_streak": 0, "longest_streak": 9},
+    ]
+    assert reloaded[0] == {"daily": 6, "weekly": 13, "monthly": 31, "alltime": 101,
+                           "current_streak": 4, "longest_streak": 9}
+    assert reloaded[1:] == seeded[1:]
+    assert _bucket_total(path) == 31 + 8
@@ -0,0 +1,160 @@
+"""AutomodActionCoalescer: one punishment per window, held flush tasks, bulk deletes and summary logs"""
+import asyncio
+import contextlib
+import gc
+import os
+import sqlite3
+import weakref
+from types import SimpleNamespace
+
+import pytest
+
+from utils.automod_actions import AutomodActionCoalescer
+
+LOG_CHANNEL = 900
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.mention = f"<#{channel_id}>"
+        self.sent = []
+        self.bulk = []
+
+    async def send(self, embed=None, delete_after=None):
+        self.sent.append(embed)
+
+    async def delete_messages(self, messages):
+        self.bulk.append([message.id for message in messages])
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, channels):
+        self.id = guild_id
+        self.channels = {channel.id: channel for channel in channels}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+class FakeMember:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+        self.avatar = None
+        self.default_avatar = SimpleNamespace(url="https://cdn.example/default.png")
+        self.calls = []
+
+    def __str__(self):
+        return f"member{self.id}"
+
+    def is_timed_out(self):
+        return False
+
+    async def edit(self, timed_out_until=None, reason=None):
+        self.calls.append("timeout")
+
+    async def kick(self, reason=None):
+        self.calls.append("kick")
+
+
+class FakeMessage:
+    deleted = []
+
+    def __init__(self, message_id: int, guild, author, channel):
+        self.id, self.guild, self.author, self.channel = message_id, guild, author, channel
+
+    async def delete(self):
+        FakeMessage.deleted.append(self.id)
+
+
+@pytest.fixture
+def log_db(tmp_path, monkeypatch):
+    """The coalescer reads db/automod.db relative to the working directory, like the cogs"""
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("db")
+    with contextlib.closing(sqlite3.connect("db/automod.db")) as db:
+        db.execute("CREATE TABLE automod_logging (guild_id INTEGER, log_channel INTEGER, PRIMARY KEY (guild_id))")
+        db.execute("INSERT INTO automod_logging VALUES (1, ?)", (LOG_CHANNEL,))
+        db.commit()
+    FakeMessage.deleted = []
+
+
+def _coalescer():
+    bot = SimpleNamespace(user=SimpleNamespace(avatar=None))
+    return AutomodActionCoalescer(bot, window=0.05, delete_delay=0.01)
+
+
+def _handle(coalescer, message, punishment="Mute"):
+    return coalescer.handle(message, event="Anti Spam", punishment=punishment, reason="Spamming", timeout_minutes=5,
+                            mute_label="Muted", notice_title="Automod Anti Spam", notice_text="spamming")
+
+
+def test_burst_is_flushed_by_held_tasks(log_db):
+    spam, logs = FakeChannel(10), FakeChannel(LOG_CHANNEL)
+    guild = FakeGuild(1, [spam, logs])
+    member = FakeMember(42)
+
+    async def go():
+        coalescer = _coalescer()
+        actions = [await _handle(coalescer, FakeMessage(i, guild, member, spam)) for i in range(250)]
+        # One delete flush for the channel and one log flush for the guild, both held by the coalescer
+        held = set(coalescer._tasks)
+        refs = [weakref.ref(task) for task in held]
+        gc.collect()
+        assert len(held) == 2 and all(ref() is not None for ref in refs)
+        del held
+        await asyncio.wait(set(coalescer._tasks))
+        return coalescer, actions
+
+    coalescer, actions = asyncio.run(go())
+    assert coalescer._tasks == set()
+    assert set(actions) == {"Muted"} and member.calls == ["timeout"]
+    # One notice; bulk deletes of at most 100
+    assert len(spam.sent) == 1
+    assert spam.bulk == [list(range(100)), list(range(100, 200)), list(range(200, 250))]
+    assert len(logs.sent) == 1 and "**250** violations by **1** user(s)" in logs.sent[0].description
+
+
+def test_single_message_and_escalation(log_db):
+    spam, logs = FakeChannel(10), FakeChannel(LOG_CHANNEL)
+    guild = FakeGuild(1, [spam, logs])
+    member = FakeMember(42)
+
+    async def go():
+        coalescer = _coalescer()
+        muted = await _handle(coalescer, FakeMessage(1, guild, member, spam))
+        await asyncio.wait(set(coalescer._tasks))
+        # A new window; a kick escalates even though the user was just muted in it
+        await _handle(coalescer, FakeMessage(2, guild, member, spam))
+        kicked = await _handle(coalescer, FakeMessage(3, guild, member, spam), punishment="Kick")
+        await asyncio.wait(set(coalescer._tasks))
+        return coalescer, muted, kicked
+
+    coalescer, muted, kicked = asyncio.run(go())
+    assert (muted, kicked) == ("Muted", "Kicked") and member.calls == ["timeout", "timeout", "kick"]
+    assert FakeMessage.deleted == [1] and spam.bulk == [[2, 3]]
+    assert [embed.title for embed in logs.sent] == ["Automod Log: Anti Spam", "Automod Log: Summary"]
+    assert coalescer._tasks == set()
+
+
+def test_failed_flush_is_still_released(log_db):
+    spam = FakeChannel(10)
+    guild = FakeGuild(1, [spam])
+
+    async def broken(messages):
+        raise RuntimeError("connection reset")
+
+    spam.delete_messages = broken
+
+    async def go():
+        coalescer = _coalescer()
+        for i in range(3):
+            await _handle(coalescer, FakeMessage(i, guild, FakeMember(42), spam))
+        tasks = set(coalescer._tasks)
+        await asyncio.wait(tasks)
+        return coalescer, tasks
+
+    coalescer, tasks = asyncio.run(go())
+    assert coalescer._tasks == set()
+    assert sorted(type(task.exception()).__name__ for task in tasks if task.exception()) == ["RuntimeError"]
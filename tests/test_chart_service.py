@@ -0,0 +1,157 @@
+"""ChartRenderService: single-flight requests, the TTL cache and failures"""
+import asyncio
+import io
+import os
+import time
+
+import pytest
+
+from utils.chart_service import ChartJob, ChartRenderService
+
+# Generators below are built in forked workers, which already have this module imported
+GENERATOR = __name__ + ":FakeChart"
+
+
+class FakeChart:
+    def __init__(self, prefix: str = "png"):
+        self.prefix = prefix
+
+    async def draw(self, label: str, delay: float = 0.0):
+        time.sleep(delay)
+        return f"{self.prefix}:{label}:{os.getpid()}".encode()
+
+    def buffer(self, label: str):
+        return io.BytesIO(f"{self.prefix}:{label}".encode())
+
+    async def nothing(self):
+        return None
+
+    async def broken(self):
+        raise ValueError("no data")
+
+    async def awaits(self):
+        await asyncio.sleep(0)
+        return b"never"
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_identical_keys_share_one_render():
+    async def go():
+        service = ChartRenderService(workers=1)
+        queries = []
+
+        async def factory():
+            # The stats queries run once for every caller waiting on the key
+            queries.append(1)
+            await asyncio.sleep(0.05)
+            return ChartJob(GENERATOR, "draw", ("trends", 0.1))
+
+        try:
+            results = await asyncio.gather(*(service.render((1, "trends", "7d"), factory) for _ in range(12)))
+            other = await service.render((2, "trends", "7d"), ChartJob(GENERATOR, "draw", ("other",)))
+        finally:
+            service.shutdown()
+        return service, queries, results, other
+
+    service, queries, results, other = asyncio.run(go())
+    assert len(queries) == 1
+    assert service.stats["misses"] == 2 and service.stats["coalesced"] == 11
+    assert {result.getvalue() for result in results} == {results[0].getvalue()}
+    assert results[0].getvalue().startswith(b"png:trends:") and not results[0].getvalue().endswith(str(os.getpid()).encode())
+    # Every caller gets its own buffer to hand to discord.File
+    assert len({id(result) for result in results}) == 12
+    assert other.getvalue().startswith(b"png:other:")
+
+
+def test_cached_images_expire_after_the_ttl():
+    clock = Clock()
+
+    async def go():
+        service = ChartRenderService(workers=1, ttl=300, clock=clock)
+        jobs = []
+
+        async def factory():
+            jobs.append(clock.now)
+            return ChartJob(GENERATOR, "buffer", (f"at {clock.now}",), {"prefix": "theme"})
+
+        try:
+            first = await service.render("key", factory)
+            clock.now += 299
+            cached = await service.render("key", factory)
+            clock.now += 1
+            expired = await service.render("key", factory)
+        finally:
+            service.shutdown()
+        return service, jobs, first, cached, expired
+
+    service, jobs, first, cached, expired = asyncio.run(go())
+    assert jobs == [1000.0, 1300.0]
+    assert first.getvalue() == cached.getvalue() == b"theme:at 1000.0"
+    assert expired.getvalue() == b"theme:at 1300.0"
+    assert (service.stats["hits"], service.stats["misses"]) == (1, 2)
+
+
+def test_cache_size_and_invalidation():
+    async def go():
+        service = ChartRenderService(workers=1, max_entries=3)
+        try:
+            for guild_id in range(5):
+                await service.render((guild_id, "trends"), ChartJob(GENERATOR, "buffer", (str(guild_id),)))
+            kept = list(service._cache)
+            service.invalidate(lambda key: key[0] == 3)
+            return kept, list(service._cache)
+        finally:
+            service.shutdown()
+
+    kept, after = asyncio.run(go())
+    assert kept == [(2, "trends"), (3, "trends"), (4, "trends")]
+    assert after == [(2, "trends"), (4, "trends")]
+
+
+@pytest.mark.parametrize("method", ["nothing", "broken", "awaits"])
+def test_failures_are_not_cached(method, capsys):
+    async def go():
+        service = ChartRenderService(workers=1)
+        try:
+            results = await asyncio.gather(*(service.render("bad", ChartJob(GENERATOR, method)) for _ in range(3)))
+            return service, results
+        finally:
+            service.shutdown()
+
+    service, results = asyncio.run(go())
+    assert results == [None, None, None]
+    assert service._cache == {} and service._inflight == {}
+    assert service.stats["coalesced"] == 2
+    assert service.stats["failures"] == (0 if method == "nothing" else 1)
+    if method != "nothing":
+        assert "[STATS] Chart render failed for 'bad'" in capsys.readouterr().out
+
+
+def test_cancelled_leader_releases_waiters():
+    async def go():
+        service = ChartRenderService(workers=1)
+
+        async def slow_factory():
+            await asyncio.sleep(10)
+
+        try:
+            leader = asyncio.create_task(service.render("key", slow_factory))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(service.render("key", slow_factory))
+            await asyncio.sleep(0.05)
+            leader.cancel()
+            result = await asyncio.wait_for(waiter, 2)
+            # The key renders normally afterwards
+            retry = await service.render("key", ChartJob(GENERATOR, "buffer", ("again",)))
+            return leader.cancelled(), result, retry.getvalue()
+        finally:
+            service.shutdown()
+
+    assert asyncio.run(go()) == (True, None, b"png:again")
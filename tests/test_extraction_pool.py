@@ -0,0 +1,194 @@
+"""ExtractionPool: hard timeouts, worker recycling, priority order and a full queue"""
+import asyncio
+import os
+import sys
+import time
+import types
+
+import pytest
+
+from utils.extraction_pool import (
+    NOW_PLAYING, QUEUED, SEARCH, ExtractionError, ExtractionPool, ExtractionQueueFull, ExtractionTimeout
+)
+
+# Jobs below run in forked workers, which already have this module imported
+JOB = __name__ + ":"
+
+
+def search(query: str, delay: float = 0.0):
+    time.sleep(delay)
+    return {"query": query, "pid": os.getpid()}
+
+
+def pid():
+    return os.getpid()
+
+
+def hang():
+    while True:
+        time.sleep(1)
+
+
+def crash():
+    os._exit(3)
+
+
+def fail():
+    raise ValueError("Unsupported URL: nope")
+
+
+def _alive(process_id: int) -> bool:
+    try:
+        os.kill(process_id, 0)
+    except ProcessLookupError:
+        return False
+    with open(f"/proc/{process_id}/stat") as f:
+        return f.read().split()[2] != "Z"
+
+
+async def _gone(process_id: int, within: float = 2.0) -> bool:
+    deadline = time.perf_counter() + within
+    while _alive(process_id):
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(0.02)
+    return True
+
+
+class FakeYoutubeDL:
+    """yt-dlp is not needed to exercise extract_info's own code in a worker"""
+
+    def __init__(self, options):
+        self.options = options
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def extract_info(self, query, download=False):
+        if query == "nothing":
+            return None
+        return {"title": query, "id": "x1", "ext": "opus", "_private": object()}
+
+    def prepare_filename(self, info):
+        return f"downloads/{info['id']}.{info['ext']}"
+
+    def sanitize_info(self, info):
+        return {key: value for key, value in info.items() if not key.startswith("_")}
+
+
+def test_results_and_job_errors(monkeypatch):
+    monkeypatch.setitem(sys.modules, "yt_dlp", types.SimpleNamespace(YoutubeDL=FakeYoutubeDL))
+
+    async def go():
+        pool = ExtractionPool(workers=1, timeout=5)
+        try:
+            assert (await pool.run(JOB + "search", "song"))["pid"] != os.getpid()
+            assert await pool.extract("song", {}) == {"title": "song", "id": "x1", "ext": "opus"}
+            assert (await pool.extract("song", {}, download=True))["_filename"] == "downloads/x1.opus"
+            assert await pool.extract("nothing", {}) is None
+            with pytest.raises(ExtractionError, match="ValueError: Unsupported URL"):
+                await pool.run(JOB + "fail")
+            # A failing job leaves its worker in service
+            assert await pool.run(JOB + "pid") == await pool.run(JOB + "pid")
+        finally:
+            pool.shutdown()
+
+    asyncio.run(go())
+
+
+def test_timeout_kills_the_worker():
+    async def go():
+        pool = ExtractionPool(workers=2, timeout=5)
+        try:
+            first, second = await asyncio.gather(pool.run(JOB + "search", "a", 0.1), pool.run(JOB + "search", "b", 0.1))
+            victims = {first["pid"], second["pid"]}
+            started = time.perf_counter()
+            results = await asyncio.gather(pool.run(JOB + "hang", timeout=0.3), pool.run(JOB + "hang", timeout=0.3),
+                                           return_exceptions=True)
+            took = time.perf_counter() - started
+            assert all(isinstance(result, ExtractionTimeout) for result in results)
+            assert took < 1.0
+            assert all([await _gone(victim) for victim in victims])
+            assert pool.stats["timeouts"] == 2
+
+            # Both slots get fresh workers; a crash is replaced the same way
+            assert not {await pool.run(JOB + "pid") for _ in range(4)} & victims
+            with pytest.raises(ExtractionError, match="died"):
+                await pool.run(JOB + "crash")
+            assert (await pool.run(JOB + "search", "after"))["query"] == "after"
+        finally:
+            pool.shutdown()
+
+    asyncio.run(go())
+
+
+def test_workers_are_recycled_after_max_jobs():
+    async def go():
+        pool = ExtractionPool(workers=1, max_jobs_per_worker=3, timeout=5)
+        try:
+            seen = [await pool.run(JOB + "pid") for _ in range(9)]
+            # Three workers, three jobs each, one after the other
+            assert [seen.count(process_id) for process_id in dict.fromkeys(seen)] == [3, 3, 3]
+            assert pool.stats["recycled"] == 3
+            # Retired workers exit on the stop message, well before the kill grace
+            assert all([await _gone(process_id) for process_id in set(seen)])
+        finally:
+            pool.shutdown()
+
+    asyncio.run(go())
+
+
+def test_priority_order_and_full_queue():
+    async def go():
+        pool = ExtractionPool(workers=1, max_waiting=4, timeout=5)
+        order = []
+
+        async def job(name: str, priority: int, delay: float = 0.02):
+            try:
+                await pool.run(JOB + "search", name, delay, priority=priority)
+                order.append(name)
+            except ExtractionQueueFull as e:
+                order.append(f"{name}:{'displaced' if 'displaced' in str(e) else 'refused'}")
+
+        try:
+            # Warm the worker so the blocker is running before anything queues
+            await pool.run(JOB + "pid")
+            blocker = asyncio.create_task(job("blocker", QUEUED, 0.3))
+            await asyncio.sleep(0.1)
+            tasks = [asyncio.create_task(job(name, priority))
+                     for name, priority in (("s1", SEARCH), ("s2", SEARCH), ("q1", QUEUED), ("s3", SEARCH))]
+            await asyncio.sleep(0)
+            # The queue is full: the newest lower-priority job makes room ...
+            tasks.append(asyncio.create_task(job("np", NOW_PLAYING)))
+            await asyncio.sleep(0)
+            # ... and with nothing lower left to displace, a search is refused
+            tasks.append(asyncio.create_task(job("s4", SEARCH)))
+            await asyncio.gather(blocker, *tasks)
+        finally:
+            pool.shutdown()
+        return order, pool.stats
+
+    order, stats = asyncio.run(go())
+    assert order == ["s3:displaced", "s4:refused", "blocker", "np", "q1", "s1", "s2"]
+    assert stats["displaced"] == 1 and stats["refused"] == 1
+
+
+def test_shutdown_fails_pending_jobs():
+    async def go():
+        pool = ExtractionPool(workers=1, timeout=5)
+        worker = await pool.run(JOB + "pid")
+        running = asyncio.create_task(pool.run(JOB + "hang"))
+        waiting = asyncio.create_task(pool.run(JOB + "pid"))
+        await asyncio.sleep(0.1)
+        pool.shutdown()
+        results = await asyncio.gather(running, waiting, return_exceptions=True)
+        assert all(isinstance(result, ExtractionError) for result in results)
+        assert await _gone(worker)
+        # The pool starts new workers on demand afterwards
+        assert await pool.run(JOB + "pid") != worker
+        pool.shutdown()
+
+    asyncio.run(go())
@@ -0,0 +1,166 @@
+"""Fuzzing the link scanner with obfuscated invites and URLs, and the domain trie against a linear lookup"""
+import random
+import string
+import time
+
+import pytest
+
+from utils.link_scanner import (
+    ALLOW, DEFAULT_LINK_RULES, DENY, DomainTrie, LinkToken, compile_link_rules, is_link_allowed,
+    normalize_domain, scan_links
+)
+
+DOTS = (".", " . ", ". ", " .", "[.]", "[dot]", "(.)", "(dot)", "{.}", "{dot}", " [ . ] ", "( dot )")
+HOST_DOTS = (".", "[.]", "[dot]", "(.)", "(dot)", "{.}", "{dot}")
+SLASHES = ("/", " / ", "/ ", " /")
+INVITE_HOSTS = (
+    lambda dot, slash: f"discord{dot}gg",
+    lambda dot, slash: f"discord{dot}io",
+    lambda dot, slash: f"discord{dot}me",
+    lambda dot, slash: f"discord{dot}li",
+    lambda dot, slash: f"dsc{dot}gg",
+    lambda dot, slash: f"discord{dot}com{slash}invite",
+    lambda dot, slash: f"discordapp{dot}com{slash}invite",
+)
+FILLER = ("join", "my", "server", "lol", "check", "this", "out", "gg", "discord", "dot", "com", "invite", "ok")
+
+
+def _mixed_case(rng: random.Random, text: str) -> str:
+    return "".join(c.upper() if rng.random() < 0.3 else c for c in text)
+
+
+def _code(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_letters + string.digits + "-") for _ in range(rng.randint(2, 32)))
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(FILLER) for _ in range(rng.randint(0, 5)))
+
+
+def _wrap(rng: random.Random, link: str) -> str:
+    """The link as people post it: bare, in markdown, in angle brackets, or before punctuation"""
+    return rng.choice((
+        link,
+        f"[click here]({link})",
+        f"<{link}>",
+        f"{link}.",
+        f"{link}!",
+        f"({link})",
+        f"**{link}**",
+    ))
+
+
+def _invite(rng: random.Random, code: str) -> str:
+    dot, slash = rng.choice(DOTS), rng.choice(SLASHES)
+    host = rng.choice(INVITE_HOSTS)(dot, slash)
+    prefix = rng.choice(("", "https://", "http://")) + rng.choice(("", f"www{rng.choice(DOTS)}"))
+    return _mixed_case(rng, prefix + host) + slash + code
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_obfuscated_invites_are_found(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        code = _code(rng)
+        text = f"{_sentence(rng)} {_wrap(rng, _invite(rng, code))} {_sentence(rng)}".strip()
+        invites = [token for token in scan_links(text) if token.kind == "invite"]
+        assert [token.code for token in invites] == [code], text
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_several_links_in_one_message(seed):
+    rng = random.Random(1000 + seed)
+    expected, parts = [], []
+    for _ in range(rng.randint(1, 8)):
+        if rng.random() < 0.5:
+            code = _code(rng)
+            parts.append(_wrap(rng, _invite(rng, code)))
+            expected.append(("invite", code))
+        else:
+            labels = [_mixed_case(rng, "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 10))))
+                      for _ in range(rng.randint(2, 4))]
+            host = rng.choice(HOST_DOTS).join(labels)
+            parts.append(_wrap(rng, f"https://{host}/{_sentence(rng).replace(' ', '/')}"))
+            expected.append(("url", normalize_domain(".".join(labels))))
+        parts.append(_sentence(rng) or "and")
+    tokens = scan_links(" ".join(parts))
+    assert [(token.kind, token.code if token.kind == "invite" else token.host) for token in tokens] == expected
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "gg everyone, see you on discord",
+    "discord gg",
+    "discordgg/abcdef",
+    "discord.ggg/abcdef",
+    "discord.gg",
+    "discord.gg/a",
+    "my email is someone@discord.com",
+    "visit example.com later",
+    "www.example.com",
+    "http:/broken.example.com",
+])
+def test_near_misses_are_not_links(text):
+    assert scan_links(text) == []
+
+
+def test_url_tail_and_path():
+    assert scan_links("see [docs](https://Docs.Example.com/a/b?c=1).") == [
+        LinkToken("url", "https://Docs.Example.com/a/b?c=1", "docs.example.com", None, "/a/b")]
+    assert scan_links("(https://www.example.com/wiki/Foo_(bar))") == [
+        LinkToken("url", "https://www.example.com/wiki/Foo_(bar)", "example.com", None, "/wiki/Foo_(bar)")]
+    assert scan_links("https://evil[.]example{dot}com:8080/x.gif,")[0][2:] == ("evil.example.com", None, "/x.gif")
+
+
+def test_adversarial_input_is_fast():
+    # Long runs of near-separators must not backtrack catastrophically
+    text = "discord" + " ." * 5000 + " discord[.]" * 2000 + "https://" + "a." * 5000
+    started = time.perf_counter()
+    scan_links(text)
+    assert time.perf_counter() - started < 1.0
+
+
+# ---------- domain trie ----------
+
+def _linear_lookup(rules, host: str):
+    """The most specific rule covering ``host``: its exact rule, else the longest matching wildcard"""
+    host = normalize_domain(host)
+    exact, wildcards = {}, {}
+    for pattern, action in rules:
+        pattern = normalize_domain(pattern)
+        if pattern.startswith("*."):
+            wildcards[pattern[2:]] = action
+        elif pattern:
+            exact[pattern] = action
+    if host in exact:
+        return exact[host]
+    covering = [suffix for suffix in wildcards if host.endswith("." + suffix)]
+    return wildcards[max(covering, key=len)] if covering else None
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_trie_matches_linear_lookup(seed):
+    rng = random.Random(seed)
+    labels = ("com", "net", "gg", "example", "evil", "cdn", "a", "b", "media", "www")
+    hosts = [".".join(rng.choice(labels) for _ in range(rng.randint(1, 5))) for _ in range(400)]
+    rules = []
+    for _ in range(rng.randint(1, 120)):
+        pattern = rng.choice(hosts)
+        if rng.random() < 0.4:
+            pattern = "*." + pattern
+        rules.append((rng.choice((pattern, pattern.upper(), pattern + ".")), rng.choice((ALLOW, DENY))))
+    trie = DomainTrie(rules)
+    assert len(trie) == len({normalize_domain(pattern) for pattern, _ in rules})
+    for host in hosts + ["www." + host for host in hosts[:50]]:
+        assert trie.lookup(host) == _linear_lookup(rules, host), host
+
+
+def test_guild_rules_override_defaults():
+    rules = compile_link_rules([("tenor.com", DENY), ("*.example.com", ALLOW), ("bad.example.com", DENY)])
+    assert rules.lookup("tenor.com") == DENY
+    assert rules.lookup("media.tenor.com") == ALLOW
+    assert rules.lookup("x.example.com") == ALLOW and rules.lookup("bad.example.com") == DENY
+    assert rules.lookup("example.com") is None
+    assert len(compile_link_rules([], include_defaults=True)) == len(DEFAULT_LINK_RULES)
+    assert is_link_allowed(scan_links("https://unknown.net/cat.GIF")[0], rules)
+    assert not is_link_allowed(scan_links("https://unknown.net/cat.png")[0], rules)
@@ -0,0 +1,280 @@
+"""PanelRegistry against a fake bot: REST-free restore, stale detection and verification"""
+import asyncio
+import contextlib
+import sqlite3
+from collections import Counter
+from types import SimpleNamespace
+
+import aiosqlite
+import discord
+import pytest
+
+from utils.panel_registry import PanelRegistry, render_hash
+from utils.ticket_config import TicketConfigStore, migrate
+
+# The columns TicketDatabase.init_db creates that panels are built from; migrate adds the rest
+SCHEMA = """
+    CREATE TABLE ticket_panels (
+        panel_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        panel_name TEXT DEFAULT 'Support Panel',
+        panel_description TEXT DEFAULT 'Select a ticket category below to get support.',
+        panel_color INTEGER DEFAULT 0x00E6A7,
+        channel_id INTEGER,
+        message_id INTEGER,
+        embed_title TEXT DEFAULT 'Support Tickets',
+        embed_footer TEXT,
+        embed_thumbnail TEXT,
+        embed_image TEXT
+    );
+    CREATE TABLE ticket_categories (
+        category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        panel_id INTEGER NOT NULL,
+        guild_id INTEGER NOT NULL,
+        category_name TEXT NOT NULL,
+        category_emoji TEXT DEFAULT '🎫',
+        category_description TEXT,
+        priority_level INTEGER DEFAULT 1
+    );
+    CREATE TABLE tickets (
+        ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        user_id INTEGER,
+        category_id INTEGER,
+        ticket_number INTEGER,
+        status TEXT DEFAULT 'open',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        claimed_at TIMESTAMP,
+        first_response_at TIMESTAMP,
+        closed_at TIMESTAMP,
+        claimed_by INTEGER,
+        closed_by INTEGER
+    );
+"""
+PANELS = 40
+DAY = 86400
+
+
+def _message_id(panel_id: int) -> int:
+    return 10 ** 9 + panel_id
+
+
+def _channel_id(panel_id: int) -> int:
+    return 10 ** 6 + panel_id
+
+
+def _not_found():
+    return discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), {"code": 10008, "message": "Unknown Message"})
+
+
+def _forbidden():
+    return discord.Forbidden(SimpleNamespace(status=403, reason="Forbidden"), {"code": 50001, "message": "Missing Access"})
+
+
+class FakeMessage:
+    def __init__(self, bot, channel_id: int, message_id: int):
+        self.bot, self.channel_id, self.id = bot, channel_id, message_id
+
+    async def _request(self, kind: str):
+        self.bot.calls.append((kind, self.id))
+        if self.id in self.bot.dead:
+            raise _not_found()
+        if self.id in self.bot.forbidden:
+            raise _forbidden()
+
+    async def fetch(self):
+        await self._request("fetch")
+        return self
+
+    async def edit(self, embed=None, view=None):
+        await self._request("edit")
+        self.bot.edits[self.id] = (embed, view)
+        return self
+
+
+class FakeBot:
+    """Records REST calls; partial messages are the only way to reach a message"""
+
+    def __init__(self):
+        self.calls = []
+        self.views = {}
+        self.edits = {}
+        self.dead = set()
+        self.forbidden = set()
+
+    def add_view(self, view, message_id=None):
+        self.views[message_id] = view
+
+    def get_partial_messageable(self, channel_id):
+        return SimpleNamespace(get_partial_message=lambda message_id: FakeMessage(self, channel_id, message_id))
+
+    async def wait_until_ready(self):
+        pass
+
+
+def build_view(panel_id: int, categories) -> discord.ui.View:
+    """The shape of TicketPanelView: one persistent select of the panel's categories"""
+    view = discord.ui.View(timeout=None)
+    options = [discord.SelectOption(label=category.category_name, emoji=category.category_emoji,
+                                    description=category.category_description,
+                                    value=str(category.category_id)) for category in categories]
+    view.add_item(discord.ui.Select(custom_id=f"ticket_category_select_{panel_id}",
+                                    options=options or [discord.SelectOption(label="No categories", value="none")]))
+    return view
+
+
+def build_embed(panel, categories) -> discord.Embed:
+    embed = discord.Embed(title=panel.embed_title, description=panel.panel_description, color=panel.panel_color)
+    for category in categories:
+        embed.add_field(name=f"{category.category_emoji} {category.category_name}",
+                        value=category.category_description or "No description", inline=False)
+    return embed
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def ticket_db(tmp_path):
+    path = str(tmp_path / "tickets.db")
+
+    async def create():
+        async with aiosqlite.connect(path) as db:
+            await db.executescript(SCHEMA)
+            await migrate(db)
+            await db.executemany("""
+                INSERT INTO ticket_panels (panel_id, guild_id, panel_name, channel_id, message_id) VALUES (?, ?, ?, ?, ?)
+            """, [(p, 100 + p % 3, f"Panel {p}", _channel_id(p), _message_id(p)) for p in range(1, PANELS + 1)])
+            # Configured but never deployed
+            await db.execute("INSERT INTO ticket_panels (panel_id, guild_id) VALUES (?, 100)", (PANELS + 1,))
+            await db.executemany("""
+                INSERT INTO ticket_categories (panel_id, guild_id, category_name, category_description, priority_level)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(p, 100 + p % 3, f"Category {k}", f"Help with {k}", k % 2)
+                  for p in range(1, PANELS + 2) for k in range(3)])
+            await db.commit()
+
+    asyncio.run(create())
+    return path
+
+
+def _registry(bot, path, clock=None):
+    return PanelRegistry(bot, TicketConfigStore(path), build_view, build_embed, verify_rate=1e9,
+                         clock=clock or Clock())
+
+
+async def _deploy_all(path, clock):
+    """A first run: every panel restored, found stale (no hashes yet) and re-rendered"""
+    bot = FakeBot()
+    registry = _registry(bot, path, clock)
+    await registry.restore()
+    await registry._find_stale()
+    assert len(registry.pending) == PANELS
+    assert Counter([await registry.verify(panel_id) for panel_id in list(registry.pending)]) == {"edited": PANELS}
+    return bot
+
+
+def test_restore_registers_views_without_rest_calls(ticket_db):
+    async def go():
+        bot = FakeBot()
+        registry = _registry(bot, ticket_db)
+        count = await registry.restore()
+        return bot, registry, count
+
+    bot, registry, count = asyncio.run(go())
+    assert count == PANELS and bot.calls == []
+    assert set(bot.views) == {_message_id(p) for p in range(1, PANELS + 1)}
+    select = registry.views[7].children[0]
+    assert select.custom_id == "ticket_category_select_7"
+    # get_panel_categories order: priority first, then name
+    assert [option.label for option in select.options] == ["Category 1", "Category 0", "Category 2"]
+
+
+def test_find_stale_queues_only_changed_panels(ticket_db):
+    clock = Clock()
+    asyncio.run(_deploy_all(ticket_db, clock))
+    with contextlib.closing(sqlite3.connect(ticket_db)) as db:
+        db.execute("UPDATE ticket_categories SET category_emoji = '📦' WHERE panel_id IN (3, 9)")
+        db.execute("UPDATE ticket_panels SET panel_description = 'New text' WHERE panel_id = 12")
+        db.execute("UPDATE ticket_categories SET category_description = 'Changed' WHERE panel_id = ?", (PANELS + 1,))
+        db.commit()
+
+    async def go():
+        bot = FakeBot()
+        registry = _registry(bot, ticket_db, clock)
+        await registry.restore()
+        assert registry.pending == {}
+        await registry._find_stale(batch=7)
+        return bot, registry
+
+    bot, registry = asyncio.run(go())
+    assert list(registry.pending) == [3, 9, 12]
+    assert bot.calls == [] and registry._restored == []
+
+
+def test_verify_edits_checks_and_prunes(ticket_db):
+    clock = Clock()
+    asyncio.run(_deploy_all(ticket_db, clock))
+    with contextlib.closing(sqlite3.connect(ticket_db)) as db:
+        db.execute("UPDATE ticket_panels SET panel_color = 0xFF0000 WHERE panel_id = 5")
+        db.commit()
+
+    async def go():
+        bot = FakeBot()
+        registry = _registry(bot, ticket_db, clock)
+        await registry.restore()
+        bot.dead.add(_message_id(6))
+        bot.forbidden.add(_message_id(8))
+        clock.now += DAY
+        results = [await registry.verify(panel_id) for panel_id in (5, 5, 6, 7, 8, PANELS + 1, 999)]
+        return bot, registry, results
+
+    bot, registry, results = asyncio.run(go())
+    assert results == ["edited", "ok", "pruned", "ok", "skipped", "missing", "missing"]
+    # One request per verified panel: the edit, then a fetch once the hash matches
+    assert bot.calls == [("edit", _message_id(5)), ("fetch", _message_id(5)), ("fetch", _message_id(6)),
+                         ("fetch", _message_id(7)), ("fetch", _message_id(8))]
+    assert bot.edits[_message_id(5)][0].color.value == 0xFF0000
+
+    # The dead panel is undeployed, its view dropped, its configuration kept
+    assert 6 not in registry.views and registry.views.get(5) is bot.edits[_message_id(5)][1]
+    with contextlib.closing(sqlite3.connect(ticket_db)) as db:
+        rows = dict((row[0], row[1:]) for row in db.execute(
+            "SELECT panel_id, channel_id, message_id, content_hash, verified_at FROM ticket_panels"))
+        assert db.execute("SELECT COUNT(*) FROM ticket_categories WHERE panel_id = 6").fetchone()[0] == 3
+    assert rows[6] == (None, None, None, rows[6][3])
+    assert rows[7][3] == clock.now and rows[8][3] == clock.now
+    assert rows[5][2] == render_hash(*bot.edits[_message_id(5)])
+
+
+def test_verify_loop_handles_pending_before_due_panels(ticket_db):
+    clock = Clock()
+    asyncio.run(_deploy_all(ticket_db, clock))
+    with contextlib.closing(sqlite3.connect(ticket_db)) as db:
+        db.execute("UPDATE ticket_categories SET category_name = 'Renamed' WHERE panel_id IN (20, 30)")
+        db.commit()
+
+    async def go():
+        bot = FakeBot()
+        registry = _registry(bot, ticket_db, clock)
+        await registry.restore()
+        # Everything has come due by now
+        clock.now += 8 * DAY
+        registry.start()
+        for _ in range(500):
+            await asyncio.sleep(0.01)
+            if len(bot.calls) >= PANELS:
+                break
+        registry.stop()
+        return bot
+
+    bot = asyncio.run(go())
+    assert bot.calls[:2] == [("edit", _message_id(20)), ("edit", _message_id(30))]
+    assert sorted(message_id for _, message_id in bot.calls[2:PANELS]) == \
+        sorted(_message_id(p) for p in range(1, PANELS + 1) if p not in (20, 30))
@@ -0,0 +1,138 @@
+"""The rank index against the SQL ranking it replaced, under random XP changes"""
+import asyncio
+import random
+import types
+from bisect import bisect_left, insort
+
+import aiosqlite
+import pytest
+
+from utils.rank_index import OrderStatisticList, RankIndex
+
+GUILD_ID = 7
+
+SCHEMA = """
+    CREATE TABLE user_levels (
+        user_id INTEGER,
+        guild_id INTEGER,
+        xp INTEGER DEFAULT 0,
+        level INTEGER DEFAULT 0,
+        total_xp INTEGER DEFAULT 0,
+        messages_sent INTEGER DEFAULT 0,
+        last_xp_gain TEXT,
+        PRIMARY KEY (user_id, guild_id)
+    )
+"""
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_order_statistic_list_matches_a_sorted_list(seed):
+    rng = random.Random(seed)
+    # A tiny load makes buckets split and empty out all the time
+    values = [rng.randrange(500) for _ in range(50)]
+    ordered = sorted(values)
+    index = OrderStatisticList(values, load=4)
+    for _ in range(3000):
+        value = rng.randrange(500)
+        if rng.random() < 0.55:
+            index.add(value)
+            insort(ordered, value)
+        else:
+            present = value in ordered
+            assert index.remove(value) == present
+            if present:
+                ordered.remove(value)
+        probe = rng.randrange(-10, 510)
+        assert len(index) == len(ordered)
+        assert index.bisect_left(probe) == bisect_left(ordered, probe)
+        if ordered:
+            k = rng.randrange(-len(ordered), len(ordered))
+            assert index[k] == ordered[k]
+    with pytest.raises(IndexError):
+        index[len(ordered)]
+
+
+async def _sql_rank(db, total_xp: int) -> int:
+    # The query ``level rank`` ran before the index
+    async with db.execute("SELECT COUNT(*) + 1 FROM user_levels WHERE guild_id = ? AND total_xp > ?",
+                          (GUILD_ID, total_xp)) as cursor:
+        return (await cursor.fetchone())[0]
+
+
+async def _sql_board(db):
+    async with db.execute("""
+        SELECT user_id, total_xp FROM user_levels
+        WHERE guild_id = ? AND total_xp > 0
+        ORDER BY total_xp DESC, user_id ASC
+    """, (GUILD_ID,)) as cursor:
+        return await cursor.fetchall()
+
+
+async def _randomized(tmp_path, seed: int, members: int, steps: int):
+    rng = random.Random(seed)
+    path = str(tmp_path / "leveling.db")
+    # Stands in for the XP ledger: the index only needs its listeners and hot rows
+    ledger = types.SimpleNamespace(listeners=[], rows={})
+    ranks = RankIndex(path, ledger)
+    xp = {}
+    async with aiosqlite.connect(path) as db:
+        await db.execute(SCHEMA)
+        for user_id in range(1, members + 1):
+            # Coarse XP values so many members tie
+            xp[user_id] = rng.choice((0, rng.randrange(0, 50) * 100, rng.randrange(0, 100_000)))
+        await db.executemany("INSERT INTO user_levels (user_id, guild_id, total_xp) VALUES (?, ?, ?)",
+                             [(user_id, GUILD_ID, total) for user_id, total in xp.items()])
+        # Another guild's members must not count
+        await db.executemany("INSERT INTO user_levels (user_id, guild_id, total_xp) VALUES (?, ?, ?)",
+                             [(user_id, GUILD_ID + 1, 10 ** 6) for user_id in range(1, 50)])
+        await db.commit()
+
+        for step in range(steps):
+            user_id = rng.randint(1, members + members // 10)
+            roll = rng.random()
+            if roll < 0.8:
+                total = xp.get(user_id, 0) + rng.randint(15, 25) * rng.choice((1, 1, 10))
+            elif roll < 0.95:
+                total = rng.choice((0, rng.randrange(0, 50) * 100))  # level set / reset by an admin
+            else:
+                # A bulk edit outside the ledger: the guild is invalidated and rebuilt from the table
+                for other in rng.sample(sorted(xp), 20):
+                    xp[other] = 0
+                    await db.execute("UPDATE user_levels SET total_xp = 0 WHERE guild_id = ? AND user_id = ?",
+                                     (GUILD_ID, other))
+                await db.commit()
+                for listener in ledger.listeners:
+                    listener(GUILD_ID, None, None)
+                continue
+            xp[user_id] = total
+            await db.execute("""
+                INSERT INTO user_levels (user_id, guild_id, total_xp) VALUES (?, ?, ?)
+                ON CONFLICT(user_id, guild_id) DO UPDATE SET total_xp = excluded.total_xp
+            """, (user_id, GUILD_ID, total))
+            await db.commit()
+            for listener in ledger.listeners:
+                listener(GUILD_ID, user_id, total)
+
+            if step % 25 == 0:
+                index = await ranks.get(GUILD_ID)
+                board = await _sql_board(db)
+                assert len(index) == len(board)
+                for probe in rng.sample(sorted(xp), 10) + [user_id]:
+                    assert index.rank(probe) == await _sql_rank(db, xp[probe])
+                    assert index.rank_of_xp(xp[probe]) == await _sql_rank(db, xp[probe])
+                for k in rng.sample(range(1, len(board) + 1), min(10, len(board))) + [len(board) + 1]:
+                    assert index.at_rank(k) == (board[k - 1] if k <= len(board) else None)
+        return await ranks.get(GUILD_ID), await _sql_board(db)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_rank_index_matches_sql(tmp_path, seed):
+    index, board = asyncio.run(_randomized(tmp_path, seed, members=300, steps=1500))
+    assert [index.at_rank(k) for k in range(1, len(index) + 1)] == list(board)
+
+
+def test_rank_index_matches_sql_across_buckets(tmp_path):
+    # Several buckets at the default load, so ranks cross bucket boundaries
+    index, board = asyncio.run(_randomized(tmp_path, 99, members=2500, steps=800))
+    assert len(index) > 1024
+    assert [index.at_rank(k) for k in range(1, len(index) + 1)] == list(board)
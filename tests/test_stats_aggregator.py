@@ -0,0 +1,199 @@
+"""StatsAggregator flushes against the per-message INSERT OR REPLACE statements it replaced"""
+import asyncio
+import contextlib
+import random
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import aiosqlite
+import pytest
+
+from utils.stats_aggregator import StatsAggregator, split_by_hour
+
+# ComprehensiveStats.on_message and on_voice_state_update before the aggregator
+OLD_MESSAGE_STATEMENT = """
+    INSERT OR REPLACE INTO message_stats
+    (guild_id, user_id, channel_id, date, hour, count, characters, words, attachments, mentions)
+    VALUES (?, ?, ?, ?, ?,
+           COALESCE((SELECT count FROM message_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + 1,
+           COALESCE((SELECT characters FROM message_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?,
+           COALESCE((SELECT words FROM message_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?,
+           COALESCE((SELECT attachments FROM message_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?,
+           COALESCE((SELECT mentions FROM message_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?)
+"""
+OLD_VOICE_STATEMENT = """
+    INSERT OR REPLACE INTO voice_stats
+    (guild_id, user_id, channel_id, date, hour, duration, duration_minutes)
+    VALUES (?, ?, ?, ?, ?,
+           COALESCE((SELECT duration FROM voice_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?,
+           COALESCE((SELECT duration_minutes FROM voice_stats WHERE guild_id=? AND user_id=? AND channel_id=? AND date=? AND hour=?), 0) + ?)
+"""
+
+
+def _old_message(db, guild_id, user_id, channel_id, moment, characters, words, attachments, mentions):
+    key = (guild_id, user_id, channel_id, moment.strftime("%Y-%m-%d"), moment.hour)
+    db.execute(OLD_MESSAGE_STATEMENT, key + key + key + (characters,) + key + (words,) + key + (attachments,)
+               + key + (mentions,))
+
+
+def _old_voice(db, guild_id, user_id, channel_id, start, end):
+    # The old listener credited a flat 60 seconds; it is fed the real hourly pieces here
+    for hour_start, seconds in split_by_hour(start, end):
+        key = (guild_id, user_id, channel_id, hour_start.strftime("%Y-%m-%d"), hour_start.hour)
+        db.execute(OLD_VOICE_STATEMENT, key + key + (seconds,) + key + (seconds / 60,))
+
+
+def _replay_old(path: str, events):
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        for kind, event in events:
+            if kind == "message":
+                guild_id, user_id, channel_id, moment = event[:4]
+                _old_message(db, guild_id, user_id, channel_id, moment.astimezone(timezone.utc), *event[4:])
+            else:
+                _old_voice(db, *event)
+        db.commit()
+
+
+def _record(aggregator: StatsAggregator, events):
+    for kind, event in events:
+        if kind == "message":
+            aggregator.add_message(*event)
+        else:
+            aggregator.add_voice(*event)
+
+
+def _rows(path: str):
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        messages = db.execute("SELECT * FROM message_stats ORDER BY 1, 2, 3, 4, 5").fetchall()
+        voice = db.execute("SELECT * FROM voice_stats ORDER BY 1, 2, 3, 4, 5").fetchall()
+    voice = [row[:5] + (row[5], round(row[6], 6)) for row in voice]
+    return messages, voice
+
+
+def _old_db(tmp_path, stats_db):
+    path = str(tmp_path / "old.db")
+    with contextlib.closing(sqlite3.connect(stats_db)) as source, contextlib.closing(sqlite3.connect(path)) as db:
+        source.backup(db)
+    return path
+
+
+def _traffic(rng: random.Random, count: int):
+    """Messages and whole-second voice sessions around a UTC midnight"""
+    moment = datetime(2024, 5, 31, 21, tzinfo=timezone.utc)
+    for _ in range(count):
+        moment += timedelta(seconds=rng.randint(0, 12))
+        ids = (rng.randint(1, 2), rng.randint(1, 8), rng.randint(1, 4))
+        if rng.random() < 0.9:
+            # Sometimes reported in another zone, as discord.py datetimes can be
+            local = moment.astimezone(timezone(timedelta(hours=rng.choice((0, -7, 5)))))
+            yield "message", ids + (local, rng.randint(0, 400), rng.randint(0, 60), rng.randint(0, 2), rng.randint(0, 3))
+        else:
+            start = moment - timedelta(seconds=rng.randint(1, 3 * 3600))
+            yield "voice", ids + (start, moment)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_flush_matches_the_old_statement(tmp_path, stats_db, seed):
+    rng = random.Random(seed)
+    old_path = _old_db(tmp_path, stats_db)
+    events = list(_traffic(rng, 6000))
+    _replay_old(old_path, events)
+
+    async def go():
+        aggregator = StatsAggregator(stats_db, max_pending=10 ** 9)
+        for chunk in range(0, len(events), 1000):
+            _record(aggregator, events[chunk:chunk + 1000])
+            await aggregator.flush()
+        await aggregator.stop()
+
+    asyncio.run(go())
+    new, old = _rows(stats_db), _rows(old_path)
+    assert len(new[0]) > 100 and len(new[1]) > 100
+    assert {row[3] for row in new[0]} == {"2024-05-31", "2024-06-01"}
+    assert new == old
+
+
+def test_split_by_hour():
+    start = datetime(2024, 5, 31, 22, 50, tzinfo=timezone.utc)
+    assert split_by_hour(start, datetime(2024, 6, 1, 0, 10, 30, tzinfo=timezone.utc)) == [
+        (start, 600.0),
+        (datetime(2024, 5, 31, 23, tzinfo=timezone.utc), 3600.0),
+        (datetime(2024, 6, 1, 0, tzinfo=timezone.utc), 630.0),
+    ]
+    # Naive datetimes are UTC; aware ones are converted
+    assert split_by_hour(datetime(2024, 1, 1, 10, 30), datetime(2024, 1, 1, 11, 15)) == [
+        (datetime(2024, 1, 1, 10, 30, tzinfo=timezone.utc), 1800.0),
+        (datetime(2024, 1, 1, 11, tzinfo=timezone.utc), 900.0),
+    ]
+    eastern = timezone(timedelta(hours=-5))
+    assert split_by_hour(datetime(2024, 1, 1, 5, 59, tzinfo=eastern), datetime(2024, 1, 1, 6, 1, tzinfo=eastern)) == [
+        (datetime(2024, 1, 1, 10, 59, tzinfo=timezone.utc), 60.0),
+        (datetime(2024, 1, 1, 11, tzinfo=timezone.utc), 60.0),
+    ]
+    assert split_by_hour(start, start) == [] and split_by_hour(start, start - timedelta(hours=1)) == []
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_split_by_hour_random(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=rng.uniform(0, 86400 * 3))
+        end = start + timedelta(seconds=rng.uniform(0, 86400))
+        pieces = split_by_hour(start, end)
+        assert sum(seconds for _, seconds in pieces) == pytest.approx((end - start).total_seconds())
+        for i, (piece_start, seconds) in enumerate(pieces):
+            assert 0 < seconds <= 3600
+            hour = piece_start.replace(minute=0, second=0, microsecond=0)
+            assert piece_start + timedelta(seconds=seconds) <= hour + timedelta(hours=1)
+            if i:
+                assert piece_start == hour
+
+
+def test_failed_flush_is_merged_back(tmp_path, stats_db, monkeypatch):
+    rng = random.Random(7)
+    old_path = _old_db(tmp_path, stats_db)
+    events = list(_traffic(rng, 3000))
+    connect = aiosqlite.connect
+
+    async def go():
+        aggregator = StatsAggregator(stats_db, max_pending=10 ** 9)
+        failures = 0
+
+        def failing_connect(*args, **kwargs):
+            # More traffic lands while the flush is out, then the write fails
+            _record(aggregator, events[1000:1500])
+            raise sqlite3.OperationalError("database is locked")
+
+        _record(aggregator, events[:1000])
+        monkeypatch.setattr(aiosqlite, "connect", failing_connect)
+        try:
+            await aggregator.flush()
+        except sqlite3.OperationalError:
+            failures += 1
+        monkeypatch.setattr(aiosqlite, "connect", connect)
+
+        _record(aggregator, events[1500:])
+        await aggregator.flush()
+        assert not aggregator.messages and not aggregator.voice
+        return failures
+
+    assert asyncio.run(go()) == 1
+    _replay_old(old_path, events)
+    # Everything counted exactly once
+    assert _rows(stats_db) == _rows(old_path)
+
+
+def test_burst_flushes_early(stats_db):
+    async def go():
+        aggregator = StatsAggregator(stats_db, flush_interval=3600, max_pending=50)
+        moment = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for user_id in range(60):
+            aggregator.add_message(1, user_id, 1, moment)
+        await aggregator._early_flush
+        pending = len(aggregator.messages)
+        await aggregator.stop()
+        return pending
+
+    assert asyncio.run(go()) < 50
+    with contextlib.closing(sqlite3.connect(stats_db)) as db:
+        assert db.execute("SELECT COUNT(*), SUM(count) FROM message_stats").fetchone() == (60, 60)
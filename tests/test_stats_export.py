@@ -0,0 +1,103 @@
+"""Streaming stats export: every row exactly once, valid parts, and no read held across a yield"""
+import asyncio
+import contextlib
+import csv
+import gzip
+import io
+import random
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.stats_aggregator import StatsAggregator
+from utils.stats_export import PART_MARGIN, export_columns, export_stats, iter_rows
+
+
+def _fill(path: str, seed: int = 1):
+    """Random hourly and daily rows for guilds 1 and 2; many share a date, so chunks split inside a day"""
+    rng = random.Random(seed)
+    hourly = {(rng.choice((1, 2)), rng.randint(1, 40), rng.randint(1, 6), f"2024-01-{rng.randint(1, 5):02d}",
+               rng.randint(0, 23)) for _ in range(4000)}
+    daily = {(rng.choice((1, 2)), f"2023-12-{rng.randint(1, 4):02d}", rng.randint(1, 40), rng.randint(1, 6))
+             for _ in range(600)}
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        db.executemany("""
+            INSERT INTO message_stats (guild_id, user_id, channel_id, date, hour, count, characters)
+            VALUES (?, ?, ?, ?, ?, 1, 10)
+        """, sorted(hourly))
+        db.executemany("""
+            INSERT INTO message_stats_daily (guild_id, date, user_id, channel_id, count, characters)
+            VALUES (?, ?, ?, ?, 3, 30)
+        """, sorted(daily))
+        db.commit()
+    return ({row for row in hourly if row[0] == 1},
+            {(guild_id, user_id, channel_id, date) for guild_id, date, user_id, channel_id in daily if guild_id == 1})
+
+
+async def _rows(path: str, chunk_rows: int):
+    return [row async for chunk in iter_rows(path, "message", 1, chunk_rows) for row in chunk]
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 64, 50_000])
+def test_chunks_cover_every_row_once(stats_db, chunk_rows):
+    hourly, daily = _fill(stats_db)
+    rows = asyncio.run(_rows(stats_db, chunk_rows))
+    assert all(len(row) == len(export_columns("message")) for row in rows)
+
+    got_hourly = [row[:5] for row in rows if row[5] == "hour"]
+    got_daily = [row[:4] for row in rows if row[5] == "day"]
+    assert len(got_hourly) == len(set(got_hourly)) and set(got_hourly) == hourly
+    assert len(got_daily) == len(set(got_daily)) and set(got_daily) == daily
+    # Oldest tier first, each in date order
+    assert [row[5] for row in rows] == ["day"] * len(daily) + ["hour"] * len(hourly)
+    assert [row[3] for row in rows] == sorted(row[3] for row in rows)
+
+
+def test_csv_parts_are_complete_files(stats_db, tmp_path):
+    hourly, daily = _fill(stats_db)
+
+    async def export():
+        parts = []
+        # Just over the margin: a part is closed after every chunk
+        async for part in export_stats(stats_db, "message", 1, "csv", part_limit=PART_MARGIN + 1, chunk_rows=500,
+                                       directory=str(tmp_path)):
+            with open(part.path, "rb") as file:
+                data = file.read()
+            assert len(data) == part.size
+            parts.append((part, list(csv.reader(io.StringIO(gzip.decompress(data).decode("utf-8"))))))
+        return parts
+
+    parts = asyncio.run(export())
+    assert len(parts) > 1
+    columns = list(export_columns("message"))
+    rows = []
+    for part, table in parts:
+        assert table[0] == columns
+        assert len(table) - 1 == part.rows
+        rows.extend(table[1:])
+    assert len(rows) == len(hourly) + len(daily)
+    # Every part was removed once the export moved past it
+    assert not list(tmp_path.glob("stats_export_*"))
+
+
+def test_writers_are_not_blocked_while_a_part_is_pending(stats_db, tmp_path):
+    _fill(stats_db)
+
+    async def go():
+        aggregator = StatsAggregator(stats_db)
+        flushed = 0
+        parts = export_stats(stats_db, "message", 1, "csv", part_limit=PART_MARGIN + 1, chunk_rows=200,
+                             directory=str(tmp_path))
+        async with contextlib.aclosing(parts):
+            async for _ in parts:
+                # The caller is "uploading" this part; a stats flush must go through meanwhile
+                aggregator.add_message(1, 999, 1, datetime(2024, 2, 1, 12, tzinfo=timezone.utc), characters=5)
+                await asyncio.wait_for(aggregator.flush(), timeout=2)
+                flushed += 1
+        return flushed
+
+    # Parts are yielded while most of the rows are still unread
+    assert asyncio.run(go()) > 10
+    with contextlib.closing(sqlite3.connect(stats_db)) as db:
+        assert db.execute("SELECT count FROM message_stats WHERE user_id = 999").fetchone()[0] >= 1
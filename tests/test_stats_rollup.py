@@ -0,0 +1,172 @@
+"""StatsRollup: routed sums survive compaction across the hourly, daily and monthly tiers"""
+import asyncio
+import random
+from datetime import date, datetime, timedelta, timezone
+
+import aiosqlite
+import pytest
+
+from utils.stats_rollup import STATS_TABLES, StatsRollup
+
+NOW = datetime(2024, 6, 15, 12, tzinfo=timezone.utc)
+TODAY = NOW.date()
+
+
+async def _fill(db, rng: random.Random, first: date, last: date, rows: int):
+    """Random hourly rows dated from ``first`` to ``last``, for a few guilds, users and channels"""
+    span = (last - first).days
+    messages, voice = {}, {}
+    for _ in range(rows):
+        key = (rng.randint(1, 3), rng.randint(1, 15), rng.randint(1, 4),
+               (first + timedelta(days=rng.randint(0, span))).isoformat(), rng.randint(0, 23))
+        messages[key] = (rng.randint(1, 30), rng.randint(0, 3000), rng.randint(0, 500), rng.randint(0, 4), rng.randint(0, 9))
+        seconds = rng.randint(1, 3600)
+        voice[key] = (seconds, seconds / 60)
+    await db.executemany("""
+        INSERT INTO message_stats (guild_id, user_id, channel_id, date, hour, count, characters, words, attachments, mentions)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(guild_id, user_id, channel_id, date, hour) DO UPDATE SET count = count + excluded.count
+    """, [key + values for key, values in messages.items()])
+    await db.executemany("""
+        INSERT INTO voice_stats (guild_id, user_id, channel_id, date, hour, duration, duration_minutes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(guild_id, user_id, channel_id, date, hour) DO UPDATE SET duration = duration + excluded.duration,
+            duration_minutes = duration_minutes + excluded.duration_minutes
+    """, [key + values for key, values in voice.items()])
+    await db.commit()
+
+
+async def _sums(db, rollup: StatsRollup, start):
+    """What a stats query reads: per guild and user, every column summed from ``start`` on"""
+    result = {}
+    for kind, (_, columns) in STATS_TABLES.items():
+        sums = ", ".join(f"SUM({column})" for column in columns)
+        where = "WHERE date >= ?" if start else ""
+        async with db.execute(f"""
+            SELECT guild_id, user_id, {sums} FROM {rollup.source(kind, start)} {where}
+            GROUP BY guild_id, user_id
+        """, (start,) if start else ()) as cursor:
+            for row in await cursor.fetchall():
+                result[(kind,) + row[:2]] = tuple(round(value, 6) for value in row[2:])
+    return result
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _starts():
+    """Every stats range plus starts on both sides of each tier boundary"""
+    hourly_cutoff = TODAY - timedelta(days=35)
+    daily_cutoff = _month_start(TODAY - timedelta(days=400))
+    starts = [None, TODAY, TODAY - timedelta(days=7), TODAY - timedelta(days=14), TODAY - timedelta(days=30),
+              hourly_cutoff, hourly_cutoff - timedelta(days=1), hourly_cutoff + timedelta(days=1),
+              TODAY - timedelta(days=90), TODAY - timedelta(days=365),
+              daily_cutoff, daily_cutoff + timedelta(days=1),
+              _month_start(daily_cutoff - timedelta(days=1)), _month_start(daily_cutoff - timedelta(days=100)),
+              date(2022, 1, 1)]
+    return [start.isoformat() if start else None for start in starts]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_sums_survive_compaction(stats_db, seed):
+    rng = random.Random(seed)
+
+    async def go():
+        rollup = StatsRollup(stats_db)
+        async with aiosqlite.connect(stats_db) as db:
+            await _fill(db, rng, date(2022, 3, 1), TODAY, 6000)
+            before = {start: await _sums(db, rollup, start) for start in _starts()}
+            moved = await rollup.compact(NOW)
+            after = {start: await _sums(db, rollup, start) for start in _starts()}
+            # A second pass has nothing left to move and changes nothing
+            again = await rollup.compact(NOW)
+            assert await _sums(db, rollup, None) == after[None]
+
+            tiers = {}
+            for kind, (table, _) in STATS_TABLES.items():
+                for suffix in ("", "_daily", "_monthly"):
+                    async with db.execute(f"SELECT MIN(date), MAX(date), COUNT(*) FROM {table}{suffix}") as cursor:
+                        tiers[table + suffix] = await cursor.fetchone()
+        return before, after, moved, again, tiers
+
+    before, after, moved, again, tiers = asyncio.run(go())
+    assert all(moved.values()) and not any(again.values())
+    assert before == after
+    for table, _ in STATS_TABLES.values():
+        assert tiers[table][0] == (TODAY - timedelta(days=35)).isoformat()
+        assert tiers[f"{table}_daily"][0] == "2023-05-01" and tiers[f"{table}_daily"][1] < tiers[table][0]
+        assert tiers[f"{table}_monthly"][:2] == ("2022-03-01", "2023-04-01")
+
+
+def test_monthly_tier_counts_whole_months(stats_db):
+    rng = random.Random(11)
+
+    async def go():
+        rollup = StatsRollup(stats_db)
+        async with aiosqlite.connect(stats_db) as db:
+            await _fill(db, rng, date(2022, 3, 1), TODAY, 3000)
+            mid_month = "2022-09-17"
+            whole_months = await _sums(db, rollup, "2022-10-01")
+            await rollup.compact(NOW)
+            return whole_months, await _sums(db, rollup, mid_month)
+
+    whole_months, routed = asyncio.run(go())
+    # The September rows are dated 2022-09-01 once rolled up, so a mid-month start skips the month
+    assert routed == whole_months
+
+
+def test_repeated_compaction_as_time_passes(stats_db):
+    rng = random.Random(5)
+
+    async def go():
+        rollup = StatsRollup(stats_db)
+        async with aiosqlite.connect(stats_db) as db:
+            await _fill(db, rng, date(2023, 1, 1), TODAY, 3000)
+            now = NOW
+            for _ in range(8):
+                now += timedelta(days=rng.randint(10, 60))
+                await rollup.compact(now)
+                # Late rows for days already rolled up merge into the existing daily and monthly rows
+                await _fill(db, rng, date(2022, 6, 1), now.date(), 200)
+                expected = await _sums(db, rollup, None)
+                await rollup.compact(now)
+                assert await _sums(db, rollup, None) == expected
+
+            # A restarted bot loads the floors and routes the same way
+            restarted = StatsRollup(stats_db)
+            await restarted.start()
+            await restarted.stop()
+            assert restarted.floors == rollup.floors
+            return expected, await _sums(db, restarted, None)
+
+    expected, routed = asyncio.run(go())
+    assert routed == expected
+
+
+def test_pruning_drops_only_expired_months(stats_db):
+    rng = random.Random(3)
+
+    async def go():
+        rollup = StatsRollup(stats_db, monthly_months=18)
+        async with aiosqlite.connect(stats_db) as db:
+            await _fill(db, rng, date(2021, 6, 1), TODAY, 6000)
+            # Retention keeps December 2022 onwards: 18 months before June 2024
+            kept_start = "2022-12-01"
+            kept = await _sums(db, rollup, kept_start)
+            result = await rollup.compact(NOW)
+            oldest = {}
+            for table, _ in STATS_TABLES.values():
+                async with db.execute(f"SELECT MIN(date) FROM {table}_monthly") as cursor:
+                    oldest[table] = (await cursor.fetchone())[0]
+            return kept, await _sums(db, rollup, kept_start), await _sums(db, rollup, None), result, oldest
+
+    kept, routed, everything, result, oldest = asyncio.run(go())
+    assert result["message_pruned"] > 0 and result["voice_pruned"] > 0
+    assert set(oldest.values()) == {"2022-12-01"}
+    assert routed == kept == everything
+
+
+def test_hourly_days_must_cover_the_stats_ranges(stats_db):
+    with pytest.raises(ValueError):
+        StatsRollup(stats_db, hourly_days=30)
@@ -0,0 +1,104 @@
+"""Incremental ticket analytics against a full ``rebuild`` scan"""
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+import aiosqlite
+import pytest
+
+from utils import ticket_analytics
+from utils.ticket_analytics import timestamp
+
+TICKETS_SCHEMA = """
+    CREATE TABLE tickets (
+        ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        status TEXT DEFAULT 'open',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        claimed_at TIMESTAMP,
+        claimed_by INTEGER,
+        first_response_at TIMESTAMP,
+        first_responder_id INTEGER,
+        closed_at TIMESTAMP,
+        closed_by INTEGER,
+        close_reason TEXT,
+        resolution_time INTEGER
+    )
+"""
+TABLES = {
+    "ticket_daily_stats": "guild_id, date",
+    "ticket_staff_daily_stats": "guild_id, date, staff_id",
+    "ticket_latency_sketch": "guild_id, metric, date, bucket",
+    "ticket_latency_sketch_monthly": "guild_id, metric, month, bucket",
+}
+GUILDS = (100, 200, 300)
+STAFF = (11, 12, 13, 14, 15)
+
+
+async def _aggregates(db):
+    result = {}
+    for table, order in TABLES.items():
+        async with db.execute(f"SELECT * FROM {table} ORDER BY {order}") as cursor:
+            result[table] = await cursor.fetchall()
+    return result
+
+
+async def _replay(events: int, seed: int):
+    """Apply ``events`` random lifecycle transitions, then compare with a rebuild of the same tickets"""
+    rng = random.Random(seed)
+    now = datetime(2024, 1, 28, tzinfo=timezone.utc)
+    tickets = []
+    async with aiosqlite.connect(":memory:") as db:
+        await db.execute(TICKETS_SCHEMA)
+        await ticket_analytics.create_tables(db)
+        for _ in range(events):
+            # Minutes to days apart, so days and months roll over during the run
+            now += timedelta(seconds=rng.choice((rng.randint(0, 120), rng.randint(60, 7200), rng.randint(3600, 86400 * 2))))
+            at = timestamp(now)
+            roll = rng.random()
+            if roll < 0.3 or not tickets:
+                guild_id = rng.choice(GUILDS)
+                cursor = await db.execute(
+                    "INSERT INTO tickets (guild_id, user_id, channel_id, created_at) VALUES (?, ?, ?, ?)",
+                    (guild_id, rng.randint(1, 50), rng.randint(1000, 9999), at))
+                tickets.append(cursor.lastrowid)
+                await ticket_analytics.record_open(db, guild_id, at)
+                continue
+            # Mostly recent tickets, sometimes an old (often already closed) one
+            ticket_id = tickets[-rng.randint(1, min(len(tickets), 15))] if rng.random() < 0.8 else rng.choice(tickets)
+            if roll < 0.35:
+                if await ticket_analytics.record_discard(db, ticket_id):
+                    tickets.remove(ticket_id)
+            elif roll < 0.55:
+                await ticket_analytics.record_claim(db, ticket_id, rng.choice(STAFF), at,
+                                                    rng.choice((None, "claimed", "escalated")))
+            elif roll < 0.8:
+                await ticket_analytics.record_first_response(db, ticket_id, rng.choice(STAFF), at)
+            else:
+                await ticket_analytics.record_close(db, ticket_id, rng.choice(STAFF), "done", at)
+        await db.commit()
+
+        incremental = await _aggregates(db)
+        await ticket_analytics.rebuild(db)
+        rebuilt = await _aggregates(db)
+        # A single guild's rebuild leaves every other guild's rows as they were
+        await ticket_analytics.rebuild(db, GUILDS[0])
+        rebuilt_one = await _aggregates(db)
+    return incremental, rebuilt, rebuilt_one
+
+
+def test_incremental_matches_rebuild():
+    incremental, rebuilt, rebuilt_one = asyncio.run(_replay(6000, seed=47))
+    assert all(incremental[table] for table in TABLES)
+    for table in TABLES:
+        assert incremental[table] == rebuilt[table], table
+        assert rebuilt_one[table] == rebuilt[table], table
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_matches_rebuild_short_runs(seed):
+    incremental, rebuilt, _ = asyncio.run(_replay(400, seed))
+    for table in TABLES:
+        assert incremental[table] == rebuilt[table], table
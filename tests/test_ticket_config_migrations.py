@@ -0,0 +1,203 @@
+"""Schema migrations in utils.ticket_config, run against legacy ticket databases"""
+import asyncio
+
+import aiosqlite
+import pytest
+
+from utils import ticket_config
+from utils.ticket_config import MIGRATIONS, SCHEMA_VERSION, PanelConfig, fetch, migrate, schema_version
+
+# The ticket tables as an early release created them: none of the columns the
+# migrations add, and ``status`` / ``user_id`` appended later by an ALTER, so
+# they sit at the end of the table rather than where a fresh schema has them.
+LEGACY_SCHEMA = """
+    CREATE TABLE ticket_panels (
+        panel_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        panel_color INTEGER DEFAULT 0x00E6A7,
+        channel_id INTEGER,
+        message_id INTEGER
+    );
+    CREATE TABLE ticket_categories (
+        category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        panel_id INTEGER NOT NULL,
+        guild_id INTEGER NOT NULL,
+        category_name TEXT NOT NULL,
+        priority_level INTEGER DEFAULT 1
+    );
+    CREATE TABLE tickets (
+        ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        category_id INTEGER,
+        ticket_number INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        claimed_at TIMESTAMP,
+        first_response_at TIMESTAMP,
+        closed_at TIMESTAMP,
+        claimed_by INTEGER,
+        closed_by INTEGER
+    );
+    ALTER TABLE tickets ADD COLUMN status TEXT DEFAULT 'open';
+    ALTER TABLE tickets ADD COLUMN user_id INTEGER;
+"""
+
+PANELS = [(1, 100, 0x123456, 500, 600), (2, 100, 0x00E6A7, None, None), (3, 200, 0xFF0000, 700, 800)]
+CATEGORIES = [(1, 1, 100, "Support", 2), (2, 1, 100, "Billing", 3), (3, 3, 200, "Reports", 1)]
+TICKETS = [
+    # ticket_id, guild_id, channel_id, category_id, ticket_number, created_at, claimed_at,
+    # first_response_at, closed_at, claimed_by, closed_by, status, user_id
+    (1, 100, 1001, 1, 1, "2024-03-01 10:00:00", "2024-03-01 10:05:00", "2024-03-01 10:02:00",
+     "2024-03-01 12:00:00", 42, 42, "closed", 7),
+    (2, 100, 1002, 2, 2, "2024-03-01 11:00:00", None, None, None, None, None, "open", 8),
+    (3, 200, 2001, 3, 1, "2024-03-02 09:00:00", "2024-03-02 09:30:00", None, None, 43, None, "claimed", 9),
+]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _legacy_db(path, version=0):
+    """A legacy database with sample rows, already migrated to ``version``"""
+    async with aiosqlite.connect(path) as db:
+        await db.executescript(LEGACY_SCHEMA)
+        await db.executemany("INSERT INTO ticket_panels VALUES (?, ?, ?, ?, ?)", PANELS)
+        await db.executemany("INSERT INTO ticket_categories VALUES (?, ?, ?, ?, ?)", CATEGORIES)
+        await db.executemany("INSERT INTO tickets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", TICKETS)
+        for target, step in MIGRATIONS:
+            if target <= version:
+                await step(db)
+        await db.execute(f"PRAGMA user_version = {version}")
+        await db.commit()
+
+
+async def _schema(db):
+    """Columns of every table and the set of indexes; what migrations are expected to produce"""
+    async with db.execute("SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'") as cursor:
+        objects = await cursor.fetchall()
+    columns = {}
+    for kind, name in objects:
+        if kind == "table":
+            async with db.execute(f"PRAGMA table_info({name})") as cursor:
+                columns[name] = sorted(row[1] for row in await cursor.fetchall())
+    return columns, sorted(name for kind, name in objects if kind == "index")
+
+
+async def _rows(db, table, order):
+    async with db.execute(f"SELECT * FROM {table} ORDER BY {order}") as cursor:
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in await cursor.fetchall()]
+
+
+async def _migrated(path, version=0):
+    await _legacy_db(path, version)
+    async with aiosqlite.connect(path) as db:
+        result = await migrate(db)
+        return result, await schema_version(db), await _schema(db)
+
+
+def test_schema_version_is_last_migration():
+    targets = [target for target, _ in MIGRATIONS]
+    assert targets == sorted(set(targets))
+    assert SCHEMA_VERSION == targets[-1] == 5
+
+
+def test_legacy_database_migrates_to_current(tmp_path):
+    result, stored, (columns, indexes) = run(_migrated(tmp_path / "tickets.db"))
+    assert result == stored == SCHEMA_VERSION
+    assert {"panel_name", "panel_description", "embed_title", "content_hash", "verified_at"} <= set(columns["ticket_panels"])
+    assert {"discord_category_id", "user_can_add_others", "log_events", "require_claiming"} <= set(columns["ticket_categories"])
+    assert {"status", "user_id", "first_responder_id"} <= set(columns["tickets"])
+    assert {"ticket_daily_stats", "ticket_staff_daily_stats", "ticket_latency_sketch",
+            "ticket_latency_sketch_monthly"} <= set(columns)
+    assert {"idx_ticket_categories_panel", "idx_ticket_panels_guild", "idx_ticket_categories_guild",
+            "idx_tickets_guild_user", "idx_tickets_guild_created", "idx_tickets_guild_number"} <= set(indexes)
+
+
+@pytest.mark.parametrize("version", range(SCHEMA_VERSION + 1))
+def test_every_intermediate_version_reaches_the_same_schema(tmp_path, version):
+    _, _, expected = run(_migrated(tmp_path / "from-zero.db"))
+    result, stored, schema = run(_migrated(tmp_path / f"from-{version}.db", version))
+    assert result == stored == SCHEMA_VERSION
+    assert schema == expected
+
+
+@pytest.mark.parametrize("version", range(SCHEMA_VERSION + 1))
+def test_migrate_runs_only_newer_steps(tmp_path, monkeypatch, version):
+    path = tmp_path / "tickets.db"
+    run(_legacy_db(path, version))
+    applied = []
+
+    def recorded(target, step):
+        async def wrapper(db):
+            applied.append(target)
+            await step(db)
+        return wrapper
+
+    monkeypatch.setattr(ticket_config, "MIGRATIONS",
+                        tuple((target, recorded(target, step)) for target, step in MIGRATIONS))
+
+    async def go():
+        async with aiosqlite.connect(path) as db:
+            return await migrate(db)
+
+    assert run(go()) == SCHEMA_VERSION
+    assert applied == list(range(version + 1, SCHEMA_VERSION + 1))
+
+
+def test_rerun_is_idempotent(tmp_path):
+    path = tmp_path / "tickets.db"
+    run(_legacy_db(path))
+
+    async def go():
+        async with aiosqlite.connect(path) as db:
+            await migrate(db)
+            first = await _schema(db), await _rows(db, "tickets", "ticket_id"), \
+                await _rows(db, "ticket_daily_stats", "guild_id, date")
+            # Nothing left to apply
+            assert await migrate(db) == SCHEMA_VERSION
+            # Every step again over an up to date database: adds nothing, duplicates nothing
+            await db.execute("PRAGMA user_version = 0")
+            await db.commit()
+            assert await migrate(db) == SCHEMA_VERSION
+            second = await _schema(db), await _rows(db, "tickets", "ticket_id"), \
+                await _rows(db, "ticket_daily_stats", "guild_id, date")
+            return first, second
+
+    first, second = run(go())
+    assert first == second
+
+
+def test_row_values_are_preserved(tmp_path):
+    path = tmp_path / "tickets.db"
+    run(_legacy_db(path))
+
+    async def go():
+        async with aiosqlite.connect(path) as db:
+            await migrate(db)
+            return (await _rows(db, "tickets", "ticket_id"),
+                    await _rows(db, "ticket_categories", "category_id"),
+                    await fetch(db, PanelConfig, "SELECT * FROM ticket_panels ORDER BY panel_id"),
+                    await _rows(db, "ticket_daily_stats", "guild_id, date"))
+
+    tickets, categories, panels, daily = run(go())
+    ticket_columns = ("ticket_id", "guild_id", "channel_id", "category_id", "ticket_number", "created_at",
+                      "claimed_at", "first_response_at", "closed_at", "claimed_by", "closed_by", "status", "user_id")
+    assert [tuple(row[column] for column in ticket_columns) for row in tickets] == TICKETS
+    assert all(row["first_responder_id"] is None for row in tickets)
+
+    category_columns = ("category_id", "panel_id", "guild_id", "category_name", "priority_level")
+    assert [tuple(row[column] for column in category_columns) for row in categories] == CATEGORIES
+    assert all(row["user_can_add_others"] == 0 and row["require_claiming"] == 0 for row in categories)
+
+    # Appended columns are read by name, with the table defaults for what the legacy rows never had
+    assert [(p.panel_id, p.guild_id, p.panel_color, p.channel_id, p.message_id) for p in panels] == PANELS
+    assert all(p.panel_name == "Support Panel" and p.embed_title == "Support Tickets" for p in panels)
+    assert all(p.content_hash is None and p.verified_at is None for p in panels)
+
+    # Analytics backfilled from the existing tickets
+    opened = {(row["guild_id"], row["date"]): row["opened"] for row in daily}
+    assert opened == {(100, "2024-03-01"): 2, (200, "2024-03-02"): 1}
+    closed = {(row["guild_id"], row["date"]): row["closed"] for row in daily}
+    assert closed[(100, "2024-03-01")] == 1
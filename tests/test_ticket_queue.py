@@ -0,0 +1,303 @@
+"""TicketCreationQueue: dedup, per-guild concurrency, positions, the pending bound, stop() and a panel burst"""
+import asyncio
+import random
+from collections import Counter
+
+import aiosqlite
+import pytest
+
+from utils import ticket_analytics
+from utils.ticket_queue import TicketCreationQueue
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _drained(queue: TicketCreationQueue):
+    while queue._pending:
+        await asyncio.sleep(0.001)
+
+
+def _waiting_job(gate: asyncio.Event, started: list, name):
+    async def job():
+        started.append(name)
+        await gate.wait()
+    return job
+
+
+def test_positions_and_arrival_order():
+    async def go():
+        queue = TicketCreationQueue(concurrency=2)
+        gate, started = asyncio.Event(), []
+        keys = [(1, user, 5) for user in range(5)]
+        # The first two take the idle workers, the rest wait behind them
+        assert [queue.submit(key, _waiting_job(gate, started, i)) for i, key in enumerate(keys)] == [0, 0, 1, 2, 3]
+        await asyncio.sleep(0)
+        assert [queue.position(key) for key in keys] == [0, 0, 1, 2, 3]
+        assert queue.position((1, 99, 5)) is None
+        gate.set()
+        await _drained(queue)
+        assert started == [0, 1, 2, 3, 4]
+        assert queue.position(keys[0]) is None and not queue._lanes
+
+    run(go())
+
+
+def test_pending_key_is_deduplicated():
+    async def go():
+        queue = TicketCreationQueue()
+        gate, started = asyncio.Event(), []
+        queue.submit((1, 7, 5), _waiting_job(gate, started, "first"))
+        with pytest.raises(ValueError):
+            queue.submit((1, 7, 5), _waiting_job(gate, started, "again"))
+        # Another panel, or the same user elsewhere, is a different creation
+        queue.submit((1, 7, 6), _waiting_job(gate, started, "other panel"))
+        queue.submit((2, 7, 5), _waiting_job(gate, started, "other guild"))
+        gate.set()
+        await _drained(queue)
+        assert sorted(started) == ["first", "other guild", "other panel"]
+        # Once it has run, the same key can be queued again
+        queue.submit((1, 7, 5), _waiting_job(gate, started, "later"))
+        await _drained(queue)
+        assert started[-1] == "later"
+
+    run(go())
+
+
+def test_concurrency_is_per_guild():
+    async def go():
+        queue = TicketCreationQueue(concurrency=2)
+        running, peak = Counter(), Counter()
+
+        def job(guild_id):
+            async def create():
+                running[guild_id] += 1
+                peak[guild_id] = max(peak[guild_id], running[guild_id])
+                await asyncio.sleep(0.002)
+                running[guild_id] -= 1
+            return create
+
+        for user in range(20):
+            for guild_id in (1, 2, 3):
+                queue.submit((guild_id, user, None), job(guild_id))
+        await _drained(queue)
+        assert peak == {1: 2, 2: 2, 3: 2}
+
+    run(go())
+
+
+def test_max_pending_bound():
+    async def go():
+        queue = TicketCreationQueue(concurrency=1, max_pending=3)
+        gate, started = asyncio.Event(), []
+        queue.submit((1, 0, None), _waiting_job(gate, started, 0))
+        await asyncio.sleep(0)  # the worker takes it, so it no longer waits
+        for user in (1, 2, 3):
+            assert not queue.full(1)
+            queue.submit((1, user, None), _waiting_job(gate, started, user))
+        assert queue.full(1)
+        assert not queue.full(2)
+        gate.set()
+        await _drained(queue)
+        assert not queue.full(1) and started == [0, 1, 2, 3]
+
+    run(go())
+
+
+def test_failed_job_does_not_stop_the_lane(capsys):
+    async def go():
+        queue = TicketCreationQueue(concurrency=1)
+        done = []
+
+        async def boom():
+            raise RuntimeError("welcome send failed")
+
+        async def fine():
+            done.append("fine")
+
+        queue.submit((1, 1, None), boom)
+        queue.submit((1, 2, None), fine)
+        await _drained(queue)
+        assert done == ["fine"]
+        # The failed creation can be retried
+        assert queue.position((1, 1, None)) is None
+
+    run(go())
+    assert "[TICKETS] Ticket creation failed" in capsys.readouterr().out
+
+
+def test_stop_cancels_queued_and_running():
+    async def go():
+        queue = TicketCreationQueue(concurrency=2)
+        hang = asyncio.Event()
+        started = []
+
+        async def job():
+            started.append(1)
+            await hang.wait()
+
+        for user in range(6):
+            queue.submit((1, user, None), job)
+        await asyncio.sleep(0.01)
+        queue.stop()
+        await asyncio.sleep(0.01)
+        assert len(started) == 2
+        assert not queue._lanes and not queue._pending and not queue._workers
+
+    run(go())
+
+
+# ---------- burst against a fake REST layer ----------
+
+CREATE_LATENCY, SEND_LATENCY, DELETE_LATENCY = 0.003, 0.001, 0.001
+RATE_WINDOW, RATE_LIMIT = 0.01, 10  # channel creates per window per guild
+SEND_FAILURE = 0.05
+
+
+class FakeREST:
+    """Channel creates are rate limited per guild; welcome sends sometimes fail"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.channels = {}
+        self.calls = Counter()
+        self.rate_limited = 0
+        self.creating = self.peak_creating = 0
+        self._window = []
+        self._next_id = 10_000
+
+    async def create_channel(self, name: str) -> int:
+        self.calls["create"] += 1
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self._window = [at for at in self._window if now - at < RATE_WINDOW]
+        if len(self._window) >= RATE_LIMIT:
+            self.rate_limited += 1
+        self._window.append(now)
+        self.creating += 1
+        self.peak_creating = max(self.peak_creating, self.creating)
+        try:
+            await asyncio.sleep(CREATE_LATENCY)
+        finally:
+            self.creating -= 1
+        self._next_id += 1
+        self.channels[self._next_id] = {"name": name, "welcomed": False}
+        return self._next_id
+
+    async def send_welcome(self, channel_id: int):
+        self.calls["send"] += 1
+        await asyncio.sleep(SEND_LATENCY)
+        if self.rng.random() < SEND_FAILURE:
+            raise RuntimeError("500 Internal Server Error")
+        self.channels[channel_id]["welcomed"] = True
+
+    async def delete_channel(self, channel_id: int):
+        self.calls["delete"] += 1
+        await asyncio.sleep(DELETE_LATENCY)
+        del self.channels[channel_id]
+
+
+TICKETS_SCHEMA = """
+    CREATE TABLE tickets (
+        ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        ticket_number INTEGER,
+        status TEXT DEFAULT 'open',
+        created_at TIMESTAMP,
+        claimed_by INTEGER,
+        first_response_at TIMESTAMP
+    )
+"""
+
+
+async def _burst(presses: int, users: int, seed: int):
+    """``presses`` simultaneous selections by ``users`` users, each job mirroring the panel creation"""
+    rng = random.Random(seed)
+    rest = FakeREST(rng)
+    queue = TicketCreationQueue()
+    replies = {}
+    guild_id = 9
+    async with aiosqlite.connect(":memory:") as db:
+        await db.execute(TICKETS_SCHEMA)
+        await ticket_analytics.create_tables(db)
+
+        def job(user_id: int):
+            async def create():
+                async with db.execute("SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND user_id = ? AND status = 'open'",
+                                      (guild_id, user_id)) as cursor:
+                    if (await cursor.fetchone())[0]:
+                        replies[user_id] = "limit"
+                        return
+                channel_id = ticket_id = None
+                try:
+                    channel_id = await rest.create_channel(f"ticket-{user_id}")
+                    created_at = ticket_analytics.timestamp()
+                    cursor = await db.execute("""
+                        INSERT INTO tickets (guild_id, user_id, channel_id, ticket_number, created_at)
+                        VALUES (?, ?, ?, (SELECT COALESCE(MAX(ticket_number), 0) + 1 FROM tickets WHERE guild_id = ?), ?)
+                    """, (guild_id, user_id, channel_id, guild_id, created_at))
+                    ticket_id = cursor.lastrowid
+                    await ticket_analytics.record_open(db, guild_id, created_at)
+                    await db.commit()
+                    await rest.send_welcome(channel_id)
+                    replies[user_id] = "created"
+                except Exception:
+                    # Roll back like Tickets.rollback_ticket: the row (and its opened count), then the channel
+                    if ticket_id is not None:
+                        await ticket_analytics.record_discard(db, ticket_id)
+                        await db.commit()
+                    if channel_id is not None:
+                        await rest.delete_channel(channel_id)
+                    replies[user_id] = "failed"
+            return create
+
+        async def press(user_id: int):
+            await asyncio.sleep(rng.uniform(0, 0.005))
+            key = (guild_id, user_id, 1)
+            if queue.position(key) is not None:
+                return "pending"
+            if queue.full(guild_id):
+                return "full"
+            queue.submit(key, job(user_id))
+            return "queued"
+
+        who = list(range(users)) + [rng.randrange(users) for _ in range(presses - users)]
+        rng.shuffle(who)
+        acks = Counter(await asyncio.gather(*(press(user_id) for user_id in who)))
+        await _drained(queue)
+
+        async with db.execute("SELECT user_id, channel_id, ticket_number FROM tickets") as cursor:
+            tickets = await cursor.fetchall()
+        async with db.execute("SELECT COALESCE(SUM(opened), 0) FROM ticket_daily_stats") as cursor:
+            opened = (await cursor.fetchone())[0]
+    return rest, queue, acks, replies, tickets, opened
+
+
+def test_burst_of_panel_presses():
+    rest, queue, acks, replies, tickets, opened = run(_burst(presses=500, users=300, seed=1))
+    failed = [user for user, outcome in replies.items() if outcome == "failed"]
+    assert failed, "the fake REST layer should have failed some welcome sends"
+
+    # Every press was acknowledged; repeats found the pending creation instead of queueing again
+    assert sum(acks.values()) == 500 and acks["full"] == 0
+    assert acks["queued"] + acks["pending"] == 500
+
+    # One ticket per user, except those whose welcome failed; numbers unique
+    per_user = Counter(user_id for user_id, _, _ in tickets)
+    assert all(count == 1 for count in per_user.values())
+    assert set(per_user) == {user for user, outcome in replies.items() if outcome in ("created", "limit")}
+    assert len({number for _, _, number in tickets}) == len(tickets)
+
+    # Failed welcome sends were rolled back: no orphan channels, no rows without a channel
+    assert {channel_id for _, channel_id, _ in tickets} == set(rest.channels)
+    assert all(channel["welcomed"] for channel in rest.channels.values())
+    assert rest.calls["delete"] == len(failed)
+    assert opened == len(tickets)
+
+    # Creations ran two at a time, inside the channel-create rate limit
+    assert rest.peak_creating <= queue.concurrency
+    assert rest.rate_limited == 0
+    assert not queue._lanes and not queue._workers
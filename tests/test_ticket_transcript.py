@@ -0,0 +1,216 @@
+"""Streaming ticket transcripts: every format from a fake paged history"""
+import asyncio
+import html
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from html.parser import HTMLParser
+
+import pytest
+
+from utils import ticket_transcript
+from utils.ticket_transcript import build_transcript, write_transcript
+
+TZ = timezone(timedelta(hours=5, minutes=30), "IST")
+GENERATED = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+CONTENTS = (
+    "hello there",
+    "",
+    "quotes \" and ' and \\ backslashes",
+    "<script>alert('x')</script> & <b>not bold</b>",
+    "multi\nline\r\nmessage\ttabbed",
+    "émojis 🎫🔥 and 中文",
+    "}], \"message_count\": 0, {",
+)
+
+
+class FakeAuthor:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.display_name = f"Member <{user_id}> & co"
+
+    def __str__(self):
+        return f"member{self.id}"
+
+
+class FakeAttachment:
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.url = f"https://cdn.example/a?b=1&name={filename}"
+
+
+class FakeEmbed:
+    def __init__(self, title, description):
+        self.title = title
+        self.description = description
+
+
+class FakeMessage:
+    def __init__(self, message_id: int):
+        self.id = message_id
+        self.author = FakeAuthor(1000 + message_id % 4)
+        self.created_at = datetime.fromtimestamp(1.7e9 + message_id * 61, timezone.utc)
+        self.content = CONTENTS[message_id % len(CONTENTS)]
+        self.attachments = [FakeAttachment(f"shot<{message_id}>.png")] if message_id % 5 == 0 else []
+        self.embeds = [FakeEmbed(None, "desc & more"), FakeEmbed("Title \"q\"", None)] if message_id % 9 == 0 else []
+
+
+class FakeChannel:
+    """History produced a page at a time, as the API returns it"""
+
+    def __init__(self, messages: int, page: int = 100, fail_after=None):
+        self.name = "ticket-<0001> & \"co\""
+        self.messages = messages
+        self.page = page
+        self.fail_after = fail_after
+        self.pages = 0
+
+    async def history(self, limit=None, oldest_first=False):
+        assert limit is None and oldest_first
+        for start in range(0, self.messages, self.page):
+            self.pages += 1
+            await asyncio.sleep(0)
+            for message_id in range(start, min(start + self.page, self.messages)):
+                if message_id == self.fail_after:
+                    raise ConnectionError("history request failed")
+                yield FakeMessage(message_id)
+
+
+class RecordingSink(io.BytesIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+def _render(fmt: str, messages: int) -> str:
+    sink = io.BytesIO()
+    count = asyncio.run(write_transcript(FakeChannel(messages), sink, fmt, TZ, GENERATED))
+    assert count == messages
+    return sink.getvalue().decode("utf-8")
+
+
+class _Checker(HTMLParser):
+    """Tag balance and the text content of an HTML transcript"""
+    VOID = {"meta", "hr", "br"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack, self.tags, self.texts, self.links = [], [], [], []
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.append(tag)
+        if tag == "a":
+            self.links.append(dict(attrs)["href"])
+        if tag not in self.VOID:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        assert self.stack and self.stack.pop() == tag, tag
+
+    def handle_data(self, data):
+        self.texts.append(data)
+
+
+@pytest.mark.parametrize("messages", [0, 1, 99, 100, 101, 523])
+def test_json_round_trips(messages):
+    document = json.loads(_render("json", messages))
+    assert document["channel"] == FakeChannel(0).name
+    assert document["generated"] == "2024-03-01 17:30:00 IST"
+    assert document["message_count"] == len(document["messages"]) == messages
+    for entry in document["messages"]:
+        message = FakeMessage(entry["id"])
+        assert entry == {
+            "id": message.id,
+            "author_id": message.author.id,
+            "author": str(message.author),
+            "timestamp": message.created_at.astimezone(TZ).strftime("%Y-%m-%d %H:%M:%S %Z"),
+            "content": message.content,
+            "attachments": [{"filename": att.filename, "url": att.url} for att in message.attachments],
+            "embeds": [{"title": embed.title, "description": embed.description} for embed in message.embeds],
+        }
+    assert [entry["id"] for entry in document["messages"]] == list(range(messages))
+
+
+@pytest.mark.parametrize("messages", [0, 1, 250])
+def test_html_is_balanced_and_escaped(messages):
+    checker = _Checker()
+    checker.feed(_render("html", messages))
+    checker.close()
+    assert checker.stack == []
+    # Message text never becomes markup
+    assert set(checker.tags) <= {"html", "head", "meta", "title", "style", "body", "h1", "p", "hr", "div", "span", "a"}
+    # The message, its content, then one per attachment and embed
+    assert checker.tags.count("div") == sum(
+        2 + len(FakeMessage(i).attachments) + len(FakeMessage(i).embeds) for i in range(messages))
+    text = "".join(checker.texts)
+    for message_id in range(messages):
+        message = FakeMessage(message_id)
+        assert message.content in text and message.author.display_name in text
+    assert checker.links == [att.url for i in range(messages) for att in FakeMessage(i).attachments]
+    assert f"Messages: {messages}" in text and "Ticket Transcript - #" + FakeChannel(0).name in text
+
+
+def test_txt_lines():
+    transcript = _render("txt", 30)
+    header, body = transcript.split("=" * 50 + "\n\n", 1)
+    assert header == (f"Ticket Transcript - {FakeChannel(0).name}\nGenerated: 2024-03-01 17:30:00 IST\n"
+                      f"Channel: #{FakeChannel(0).name}\n")
+    assert body.endswith("\n" + "=" * 50 + "\nMessages: 30\n")
+    first = FakeMessage(0)
+    assert body.startswith(f"[{first.created_at.astimezone(TZ).strftime('%Y-%m-%d %H:%M:%S %Z')}] "
+                           f"{first.author.display_name} (member1000): hello there "
+                           f"[Attachments: shot<0>.png <{first.attachments[0].url}>] "
+                           "[Embeds: desc & more; Title \"q\"]\n")
+    assert "(member1001): [No content]\n" in body
+
+
+def test_pages_are_written_together():
+    sink = RecordingSink()
+    channel = FakeChannel(1050)
+    asyncio.run(write_transcript(channel, sink, "txt", page_size=100))
+    # Header, eleven pages, footer
+    assert sink.writes == 13 and channel.pages == 11
+
+
+@pytest.mark.parametrize("fmt, extension", [("html", "html"), ("HTML", "html"), ("text", "txt"), ("json", "json"),
+                                            (None, "txt"), ("pdf", "txt")])
+def test_build_transcript_formats(fmt, extension, monkeypatch):
+    monkeypatch.setattr(ticket_transcript, "SPOOL_SIZE", 4096)
+
+    async def go():
+        sink, ext, count = await build_transcript(FakeChannel(200), fmt, TZ, GENERATED)
+        try:
+            # Past SPOOL_SIZE the transcript is on disk, rewound for the upload
+            return ext, count, sink._rolled, sink.read()
+        finally:
+            sink.close()
+
+    ext, count, rolled, data = asyncio.run(go())
+    assert (ext, count, rolled) == (extension, 200, True)
+    if extension == "json":
+        assert json.loads(data)["message_count"] == 200
+    else:
+        assert data.decode("utf-8").rstrip().endswith("200" if extension == "txt" else "200</p></body></html>")
+
+
+def test_failed_history_closes_the_file(monkeypatch):
+    opened = []
+    spooled = ticket_transcript.tempfile.SpooledTemporaryFile
+
+    def tracking(*args, **kwargs):
+        opened.append(spooled(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(ticket_transcript.tempfile, "SpooledTemporaryFile", tracking)
+    with pytest.raises(ConnectionError):
+        asyncio.run(build_transcript(FakeChannel(500, fail_after=321), "json"))
+    assert len(opened) == 1 and opened[0].closed
+
+
+def test_escaping_in_html_header():
+    transcript = _render("html", 0)
+    assert f"<title>Ticket Transcript - {html.escape(FakeChannel(0).name)}</title>" in transcript
@@ -0,0 +1,162 @@
+"""TrackCache: TTLs, negative caching, canonical URLs and eviction under max_bytes"""
+import asyncio
+import contextlib
+import os
+import sqlite3
+
+import pytest
+
+from utils.track_cache import CachedTrack, TrackCache, canonical_url, normalize_query, track_from_data
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _track(i: int, lavalink=None, pad: int = 0) -> CachedTrack:
+    return CachedTrack(f"https://soundcloud.com/artist/t{i}", f"Track {i}" + "x" * pad, 180, "thumb", "Artist",
+                       "soundcloud", lavalink)
+
+
+def _row_bytes(path: str) -> float:
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        return db.execute("""
+            SELECT (SELECT TOTAL(size) FROM cached_tracks) + (SELECT TOTAL(size) FROM cached_queries)
+        """).fetchone()[0]
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://youtu.be/5NV6Rdv1a3I?si=xyz&t=3", "https://www.youtube.com/watch?v=5NV6Rdv1a3I"),
+    ("http://M.YouTube.com/watch?feature=share&v=5NV6Rdv1a3I&list=PL1", "https://www.youtube.com/watch?v=5NV6Rdv1a3I"),
+    ("https://music.youtube.com/watch?v=5NV6Rdv1a3I", "https://www.youtube.com/watch?v=5NV6Rdv1a3I"),
+    ("https://www.youtube.com/shorts/5NV6Rdv1a3I", "https://www.youtube.com/watch?v=5NV6Rdv1a3I"),
+    ("https://www.youtube.com/embed/5NV6Rdv1a3I?autoplay=1", "https://www.youtube.com/watch?v=5NV6Rdv1a3I"),
+    ("  https://youtube.com/live/5NV6Rdv1a3I  ", "https://www.youtube.com/watch?v=5NV6Rdv1a3I"),
+    ("https://SoundCloud.com/a/b/?utm_source=x&in=set#frag", "https://soundcloud.com/a/b?in=set"),
+    ("https://example.com:8443/track?fbclid=1&id=7", "https://example.com:8443/track?id=7"),
+    ("http://example.com", "http://example.com/"),
+    # Not a video id: left as a regular URL
+    ("https://youtu.be/short", "https://youtu.be/short"),
+    ("https://www.youtube.com/playlist?list=PL1&si=x", "https://www.youtube.com/playlist?list=PL1"),
+    ("not a url", "not a url"),
+    ("ytsearch:never gonna", "ytsearch:never gonna"),
+])
+def test_canonical_url(url, expected):
+    assert canonical_url(url) == expected
+    assert canonical_url(expected) == expected
+
+
+def test_normalize_query_and_track_data():
+    assert normalize_query("  Ｑueen   BOHEMIAN\tRhapsody ") == "queen bohemian rhapsody"
+    track = track_from_data({"webpage_url": "https://youtu.be/5NV6Rdv1a3I", "title": "Song", "duration": "212.4",
+                             "author": "Band"})
+    assert track == CachedTrack("https://www.youtube.com/watch?v=5NV6Rdv1a3I", "Song", 212, "", "Band", "Unknown")
+    assert track_from_data({"webpage_url": "https://x.com/p", "title": "List", "entries": []}) is None
+    assert track_from_data({"title": "No page URL"}) is None
+
+
+def test_ttl_expiry_and_negative_caching(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "music_cache.db")
+
+    async def go():
+        cache = TrackCache(path, track_ttl=100, query_ttl=50, negative_ttl=10, touch_interval=5, clock=clock)
+        await cache.store("yt", "Q one", [_track(1, {"encoded": "E1", "info": {}}), _track(2)])
+        assert [entry.url for entry in await cache.lookup_query("yt", "  q   ONE")] == [_track(1).url, _track(2).url]
+        assert await cache.lookup_query("sc", "q one") is None
+        # A store without a Lavalink payload keeps the cached one
+        await cache.store(None, None, [_track(1)])
+        assert (await cache.lookup_url(_track(1).url)).lavalink == {"encoded": "E1", "info": {}}
+
+        # A lookup that found nothing is remembered briefly; an uncacheable result not at all
+        await cache.store_miss("yt", "nothing")
+        assert await cache.lookup_query("yt", "nothing") == []
+        await cache.store("yt", "partial", [_track(7), None])
+        assert await cache.lookup_query("yt", "partial") is None and await cache.lookup_url(_track(7).url)
+        clock.now += 11
+        assert await cache.lookup_query("yt", "nothing") is None
+        assert cache.stats["negative_hits"] == 1
+
+        clock.now += 40  # 51 s: the query expired, its tracks not yet
+        assert await cache.lookup_query("yt", "q one") is None
+        assert await cache.lookup_url(_track(2).url) is not None
+        await cache.store("yt", "q two", [_track(3)])
+        clock.now += 60  # tracks 1 and 2 were stored 111 s ago
+        assert await cache.lookup_url(_track(1).url) is None
+        assert await cache.lookup_url(_track(3).url) is not None
+        assert await cache.prune() >= 2
+
+        # A query whose track is gone misses instead of coming back short
+        await cache.forget("https://SoundCloud.com/artist/t3/?utm_source=share")
+        assert await cache.lookup_query("yt", "q two") is None
+        return cache._bytes
+
+    assert asyncio.run(go()) == _row_bytes(path)
+
+
+def test_use_times_are_written_back_once_per_interval(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "music_cache.db")
+
+    def used_at():
+        with contextlib.closing(sqlite3.connect(path)) as db:
+            return db.execute("SELECT used_at FROM cached_tracks").fetchone()[0]
+
+    async def go():
+        cache = TrackCache(path, touch_interval=60, clock=clock)
+        await cache.store(None, None, [_track(1)])
+        stored = used_at()
+        clock.now += 30
+        await cache.lookup_url(_track(1).url)
+        assert used_at() == stored
+        clock.now += 30
+        await cache.lookup_url(_track(1).url)
+        assert used_at() == clock.now
+
+    asyncio.run(go())
+
+
+def test_eviction_keeps_hot_entries_under_max_bytes(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "music_cache.db")
+    limit = 512 * 1024
+
+    async def go():
+        cache = TrackCache(path, max_bytes=limit, touch_interval=0, clock=clock)
+        hot = [_track(i, pad=300) for i in range(20)]
+        await cache.store(None, None, hot)
+        for batch in range(60):
+            clock.now += 1
+            # The hot set keeps being played while new searches pour in
+            for entry in hot:
+                assert await cache.lookup_url(entry.url)
+            await cache.store("yt", f"q{batch}", [_track(1000 + batch * 50 + j, {"encoded": "E" * 200, "info": {}},
+                                                         pad=300) for j in range(50)])
+        hot_kept = [await cache.lookup_url(entry.url) is not None for entry in hot]
+        return cache, hot_kept, await cache.lookup_url(_track(1000).url)
+
+    cache, hot_kept, oldest = asyncio.run(go())
+    assert cache.stats["evicted"] > 1000
+    assert _row_bytes(path) == cache._bytes <= limit
+    assert all(hot_kept) and oldest is None
+    # Freed pages go back to the file system
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    assert os.path.getsize(path) <= 1.5 * limit
+
+
+def test_size_is_recounted_after_a_restart(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "music_cache.db")
+
+    async def go():
+        await TrackCache(path, clock=clock).store("yt", "q", [_track(i, pad=100) for i in range(30)])
+        restarted = TrackCache(path, clock=clock)
+        await restarted.ensure_tables()
+        return restarted._bytes
+
+    assert asyncio.run(go()) == _row_bytes(path) > 0
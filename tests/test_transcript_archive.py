@@ -0,0 +1,163 @@
+"""TranscriptArchive: a ticket streamed from its channel, stored, searched and pruned"""
+import asyncio
+import contextlib
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from utils import transcript_archive
+from utils.transcript_archive import MAX_ATTACHMENT_BYTES, PACK_BATCH, TranscriptArchive
+
+
+class FakeAuthor:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+    def __str__(self):
+        return f"member{self.id}"
+
+
+class FakeAttachment:
+    def __init__(self, filename: str, data: bytes):
+        self.filename = filename
+        self.url = f"https://cdn.example/{filename}"
+        self.size = len(data)
+        self.data = data
+
+    async def read(self) -> bytes:
+        return self.data
+
+
+class FakeMessage:
+    def __init__(self, message_id: int, content: str, attachments=()):
+        self.id = message_id
+        self.author = FakeAuthor(1000 + message_id % 3)
+        self.created_at = datetime.fromtimestamp(1.7e9 + message_id, timezone.utc)
+        self.content = content
+        self.attachments = list(attachments)
+        self.embeds = []
+
+
+class FakeChannel:
+    def __init__(self, messages):
+        self.name = "ticket-0001"
+        self.messages = messages
+        self.read = 0
+
+    async def history(self, limit=None, oldest_first=False):
+        for message in self.messages:
+            self.read += 1
+            yield message
+
+
+def _counts(path: str):
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        return dict(db.execute("SELECT kind, COUNT(*) FROM archive_blobs GROUP BY kind").fetchall())
+
+
+def test_channel_round_trip(tmp_path):
+    path = str(tmp_path / "archive.db")
+    logo = b"\x89PNG" + bytes(range(256)) * 40
+    big = b"x" * (MAX_ATTACHMENT_BYTES + 1)
+    pasted = "stack trace line\n" * 60
+    messages = [FakeMessage(i, f"message {i} about a refund" if i % 10 == 0 else f"message {i}") for i in range(700)]
+    messages[3] = FakeMessage(3, "logo", [FakeAttachment("logo.png", logo)])
+    messages[4] = FakeMessage(4, "logo again", [FakeAttachment("logo.png", logo)])
+    messages[5] = FakeMessage(5, "too big", [FakeAttachment("dump.bin", big)])
+    messages[6] = FakeMessage(6, pasted)
+    messages[7] = FakeMessage(7, pasted)
+    channel = FakeChannel(messages)
+
+    async def go():
+        archive = TranscriptArchive(path)
+        assert await archive.archive_channel(1, 42, channel, opener_id=1000, closed_by=1001) == 700
+        return archive, await archive.get_transcript(1, 42), await archive.search(1, "refund")
+
+    archive, (info, records), hits = asyncio.run(go())
+    assert info["message_count"] == 700 and info["opener_id"] == 1000
+    assert [record["content"] for record in records] == [message.content for message in messages]
+    # The logo is stored once; the oversized file keeps its link only
+    assert [att.get("hash") is not None for att in records[3]["attachments"] + records[5]["attachments"]] == [True, False]
+    assert records[3]["attachments"][0]["hash"] == records[4]["attachments"][0]["hash"]
+    assert asyncio.run(archive.get_attachment(records[3]["attachments"][0]["hash"])) == logo
+    assert _counts(path) == {"document": 1, "attachment": 1, "content": 1}
+    assert len(hits) == 10 and all("refund" in hit.text for hit in hits)
+
+
+def test_records_are_packed_while_the_history_is_read(tmp_path, monkeypatch):
+    channel = FakeChannel([FakeMessage(i, f"message {i}") for i in range(PACK_BATCH * 5)])
+    progress = []
+    feed = transcript_archive._Packer.feed
+
+    def watched(packer, records):
+        progress.append(channel.read)
+        feed(packer, records)
+
+    monkeypatch.setattr(transcript_archive._Packer, "feed", watched)
+    archive = TranscriptArchive(str(tmp_path / "archive.db"))
+    assert asyncio.run(archive.archive_channel(1, 1, channel)) == PACK_BATCH * 5
+    # Each batch went to the packer before the next one was read
+    assert progress == [PACK_BATCH * n for n in range(1, 6)]
+
+
+def test_attachments_flush_a_batch_early(tmp_path, monkeypatch):
+    screenshot = bytes(range(256)) * (MAX_ATTACHMENT_BYTES // 256)
+    channel = FakeChannel([FakeMessage(i, "see attached", [FakeAttachment(f"s{i}.png", screenshot)]) for i in range(4)])
+    sizes = []
+    feed = transcript_archive._Packer.feed
+
+    def watched(packer, records):
+        sizes.append(len(records))
+        feed(packer, records)
+
+    monkeypatch.setattr(transcript_archive._Packer, "feed", watched)
+    archive = TranscriptArchive(str(tmp_path / "archive.db"))
+    asyncio.run(archive.archive_channel(1, 1, channel))
+    # Every screenshot reaches PACK_BATCH_BYTES alone, so none waits for a full batch
+    assert sizes == [1, 1, 1, 1]
+
+
+def test_prune_drops_unreferenced_blobs(tmp_path):
+    path = str(tmp_path / "archive.db")
+    logo = bytes(range(256)) * 40
+
+    async def go():
+        archive = TranscriptArchive(path)
+        for ticket_id, guild_id in ((1, 1), (2, 2)):
+            channel = FakeChannel([FakeMessage(1, "logo", [FakeAttachment("logo.png", logo)]),
+                                   FakeMessage(2, f"ticket {ticket_id}")])
+            await archive.archive_channel(guild_id, ticket_id, channel)
+        await archive.set_retention(1, 1)
+        assert await archive.prune(now=time.time() + 2 * 86400) == 1
+        shared = _counts(path)
+        await archive.set_retention(2, 1)
+        assert await archive.prune(now=time.time() + 2 * 86400) == 1
+        return shared, _counts(path), await archive.get_transcript(1, 1)
+
+    shared, empty, gone = asyncio.run(go())
+    # Guild 2 still references the logo after guild 1's transcript went
+    assert shared == {"document": 1, "attachment": 1}
+    assert empty == {} and gone is None
+
+
+def test_stop_waits_for_ingests(tmp_path):
+    async def go():
+        archive = TranscriptArchive(str(tmp_path / "archive.db"))
+        await archive.start()
+        gate = asyncio.Event()
+
+        async def records():
+            await gate.wait()
+            yield {"id": 1, "author_id": 1, "author": "a", "ts": 1.7e9, "content": "hello",
+                   "attachments": [], "embeds": []}
+
+        ingesting = asyncio.create_task(archive.ingest(1, 9, "ticket", records()))
+        await asyncio.sleep(0)
+        stopping = asyncio.create_task(archive.stop())
+        await asyncio.sleep(0.01)
+        assert not stopping.done()
+        gate.set()
+        await stopping
+        return ingesting.done() and await ingesting
+
+    assert asyncio.run(go()) == 1
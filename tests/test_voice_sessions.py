@@ -0,0 +1,372 @@
+"""VoiceSessionEngine under random joins, moves, mutes, outages and crash-restarts"""
+import asyncio
+import random
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+
+import pytest
+
+from utils.voice_sessions import VoiceSessionEngine
+
+GUILDS = (1, 2)
+CHANNELS = (10, 11, 12)
+RESUME_GAP = 300
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class World:
+    """Who is really in voice; builds the gateway objects the engine reads"""
+
+    def __init__(self):
+        self.states = {}  # (guild, user) -> (channel, muted, deafened)
+        self.channels = {}
+
+    def channel(self, channel_id):
+        if channel_id is None:
+            return None
+        return self.channels.setdefault(channel_id, SimpleNamespace(id=channel_id))
+
+    def voice(self, key, rng=None):
+        """The member's voice state; a disconnected one when they are not in voice"""
+        channel_id, muted, deafened = self.states.get(key, (None, False, False))
+        # Server and self mute count the same
+        server = rng is not None and rng.random() < 0.3
+        return SimpleNamespace(channel=self.channel(channel_id), self_mute=muted and not server, mute=muted and server,
+                               self_deaf=deafened, deaf=False)
+
+    def member(self, key, rng=None):
+        voice = self.voice(key, rng) if key in self.states else None
+        return SimpleNamespace(guild=SimpleNamespace(id=key[0]), id=key[1], bot=key[1] % 7 == 0, voice=voice)
+
+    @property
+    def guilds(self):
+        members = defaultdict(list)
+        for key, (channel_id, _, _) in self.states.items():
+            members[(key[0], channel_id)].append(self.member(key))
+        return [SimpleNamespace(id=guild_id, stage_channels=[], voice_channels=[
+            SimpleNamespace(id=channel_id, members=members[(guild_id, channel_id)]) for channel_id in CHANNELS])
+            for guild_id in GUILDS]
+
+
+class FakeBot:
+    def __init__(self, world: World):
+        self.world = world
+        self.listeners = []
+
+    def add_listener(self, func, name):
+        self.listeners.append((name, func))
+
+    def remove_listener(self, func, name):
+        self.listeners.remove((name, func))
+
+    def is_ready(self):
+        return True
+
+    @property
+    def guilds(self):
+        return self.world.guilds
+
+
+class Model:
+    """
+    What the engine promises, in terms of presence intervals: time is credited
+    as it happens while connected; after an outage, vanished members end at
+    the disconnect, movers restart at the reconcile and mute changes apply
+    from the reconcile; after a crash, sessions resume from their checkpoint
+    when the member is still in the same channel and the gap was short.
+    """
+
+    def __init__(self):
+        self.view = {}  # key -> [channel, muted, deafened, credited until]
+        self.saved = {}
+        self.disconnected_at = None
+        self.credited = Counter()
+
+    def _credit(self, key, until):
+        session = self.view[key]
+        if until > session[3]:
+            self.credited[key + tuple(session[:3])] += until - session[3]
+            session[3] = until
+
+    def event(self, key, state, now):
+        if state is not None and key in self.view and tuple(self.view[key][:3]) == state:
+            return  # nothing tracked changed, so nothing is credited yet
+        if key in self.view and (state is None or state[0] != self.view[key][0]):
+            self._credit(key, now)
+            del self.view[key]
+        if state is None:
+            return
+        if key not in self.view:
+            self.view[key] = list(state) + [now]
+        else:
+            self._credit(key, now)
+            self.view[key][1:3] = state[1:]
+
+    def checkpoint(self, now):
+        until = self.disconnected_at if self.disconnected_at is not None else now
+        for key in self.view:
+            self._credit(key, until)
+        self.saved = {key: list(session) for key, session in self.view.items()}
+
+    def reconcile(self, states, now):
+        gone_at = self.disconnected_at if self.disconnected_at is not None else now
+        for key in list(self.view):
+            state = states.get(key)
+            if state is None or state[0] != self.view[key][0]:
+                self._credit(key, min(max(gone_at, self.view[key][3]), now))
+                del self.view[key]
+            elif tuple(self.view[key][1:3]) != state[1:]:
+                self._credit(key, now)
+                self.view[key][1:3] = state[1:]
+        for key, state in states.items():
+            if key not in self.view:
+                self.view[key] = list(state) + [now]
+        self.disconnected_at = None
+
+    def restart(self, states, now):
+        self.view, self.disconnected_at = {}, None
+        for key, session in self.saved.items():
+            state = states.get(key)
+            if state is not None and state[0] == session[0]:
+                self.view[key] = list(session)
+                if now - session[3] > RESUME_GAP:
+                    self.view[key][3] = now
+        self.reconcile(states, now)
+
+
+def _random_state(rng: random.Random, current):
+    roll = rng.random()
+    if current is None:
+        return (rng.choice(CHANNELS), rng.random() < 0.3, rng.random() < 0.1) if roll < 0.8 else None
+    if roll < 0.25:
+        return None
+    if roll < 0.45:
+        return (rng.choice(CHANNELS),) + current[1:]
+    if roll < 0.85:
+        return (current[0], rng.random() < 0.5, rng.random() < 0.2)
+    return current  # a stream or video toggle: nothing the engine tracks
+
+
+async def _run(tmp_path, seed: int, steps: int, outages: bool, crashes: bool):
+    rng = random.Random(seed)
+    clock = Clock()
+    world = World()
+    model = Model()
+    segments = []
+
+    async def collect(batch):
+        segments.extend(batch)
+
+    def engine():
+        new = VoiceSessionEngine(FakeBot(world), db_path=str(tmp_path / "voice_sessions.db"),
+                                 checkpoint_interval=10 ** 6, resume_gap=RESUME_GAP, clock=clock)
+        new.subscribe(collect)
+        return new
+
+    sessions = engine()
+    await sessions.start()
+    keys = [(guild_id, user_id) for guild_id in GUILDS for user_id in range(1, 15)]
+    disconnected = False
+    for _ in range(steps):
+        clock.now += rng.choice((0, rng.randint(1, 60), rng.randint(60, 900)))
+        roll = rng.random()
+        if roll < 0.7:
+            key = rng.choice(keys)
+            before = world.voice(key, rng)
+            state = _random_state(rng, world.states.get(key))
+            if state is None:
+                world.states.pop(key, None)
+            else:
+                world.states[key] = state
+            if not disconnected:
+                await sessions.on_voice_state_update(world.member(key), before, world.voice(key, rng))
+                model.event(key, state, clock.now)
+        elif roll < 0.8:
+            await sessions.checkpoint()
+            model.checkpoint(clock.now)
+        elif roll < 0.88 and outages:
+            if not disconnected:
+                await sessions.on_disconnect()
+                model.disconnected_at = clock.now
+                disconnected = True
+            else:
+                await rng.choice((sessions.on_resumed, sessions.on_ready))()
+                model.reconcile(dict(world.states), clock.now)
+                disconnected = False
+        elif roll < 0.92 and crashes:
+            # Killed without a clean stop: whatever the last checkpoint saved is all the next run has
+            sessions._checkpoint_task.cancel()
+            clock.now += rng.randint(10, 2 * RESUME_GAP)
+            for key in rng.sample(keys, 4):
+                state = _random_state(rng, world.states.get(key))
+                if state is None:
+                    world.states.pop(key, None)
+                else:
+                    world.states[key] = state
+            sessions = engine()
+            await sessions.start()
+            model.restart(dict(world.states), clock.now)
+            disconnected = False
+    if disconnected:
+        await sessions.on_resumed()
+        model.reconcile(dict(world.states), clock.now)
+    clock.now += 30
+    await sessions.checkpoint()
+    model.checkpoint(clock.now)
+    await sessions.stop()
+    return segments, model, world
+
+
+def _credited(segments):
+    credited = Counter()
+    for segment in segments:
+        credited[(segment.guild_id, segment.user_id, segment.channel_id, segment.muted, segment.deafened)] += \
+            segment.seconds
+    return +credited
+
+
+def _assert_no_overlap(segments):
+    by_member = defaultdict(list)
+    for segment in segments:
+        by_member[(segment.guild_id, segment.user_id)].append((segment.start, segment.end))
+    for intervals in by_member.values():
+        intervals.sort()
+        assert all(previous[1] <= current[0] for previous, current in zip(intervals, intervals[1:]))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_credited_time_is_true_presence_without_outages(tmp_path, seed):
+    rng = random.Random(seed)
+    clock = Clock()
+    world = World()
+    presence = Counter()
+    since = {}
+    segments = []
+
+    async def collect(batch):
+        segments.extend(batch)
+
+    async def go():
+        sessions = VoiceSessionEngine(FakeBot(world), db_path=str(tmp_path / "voice_sessions.db"),
+                                      checkpoint_interval=10 ** 6, clock=clock)
+        sessions.subscribe(collect)
+        await sessions.start()
+        for step in range(1500):
+            clock.now += rng.randint(0, 300)
+            key = (rng.choice(GUILDS), rng.randint(1, 10))
+            before = world.voice(key, rng)
+            state = _random_state(rng, world.states.get(key))
+            if key in world.states:
+                presence[key + world.states[key]] += clock.now - since[key]
+            since[key] = clock.now
+            if state is None:
+                world.states.pop(key, None)
+            else:
+                world.states[key] = state
+            await sessions.on_voice_state_update(world.member(key), before, world.voice(key, rng))
+            if step % 97 == 0:
+                await sessions.checkpoint()
+        for key, state in world.states.items():
+            presence[key + state] += clock.now - since[key]
+        await sessions.checkpoint()
+        await sessions.stop()
+
+    asyncio.run(go())
+    assert _credited(segments) == +presence
+    _assert_no_overlap(segments)
+    assert all(segment.bot == (segment.user_id % 7 == 0) for segment in segments)
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_random_sequences_with_outages_and_crashes(tmp_path, seed):
+    crashes = seed % 3 != 0
+    segments, model, world = asyncio.run(_run(tmp_path, seed, 1200, outages=True, crashes=crashes))
+    assert _credited(segments) == +model.credited
+    assert set(model.view) == set(world.states)
+    if not crashes:
+        # A crash may credit a leave-and-rejoin inside its last interval twice; nothing else may overlap
+        _assert_no_overlap(segments)
+
+
+def test_sessions_end_with_one_final_segment(tmp_path):
+    segments, _, _ = asyncio.run(_run(tmp_path, 99, 800, outages=True, crashes=False))
+    open_sessions = {}
+    for segment in segments:
+        key = (segment.guild_id, segment.user_id)
+        if key in open_sessions:
+            # Pieces of one session follow each other with no gap
+            assert open_sessions[key].end == segment.start and open_sessions[key].channel_id == segment.channel_id
+        if segment.final:
+            open_sessions.pop(key, None)
+        else:
+            open_sessions[key] = segment
+    assert any(segment.final for segment in segments)
+
+
+def test_resume_gap_after_restart(tmp_path):
+    clock = Clock()
+    world = World()
+    segments = []
+
+    async def collect(batch):
+        segments.extend(batch)
+
+    async def go(downtime):
+        world.states = {(1, 1): (10, False, False)}
+        path = str(tmp_path / f"voice_sessions_{downtime}.db")
+        sessions = VoiceSessionEngine(FakeBot(world), db_path=path, resume_gap=RESUME_GAP, clock=clock)
+        sessions.subscribe(collect)
+        await sessions.start()
+        clock.now += 100
+        await sessions.checkpoint()
+        sessions._checkpoint_task.cancel()
+        clock.now += downtime
+        restarted = VoiceSessionEngine(FakeBot(world), db_path=path, resume_gap=RESUME_GAP, clock=clock)
+        restarted.subscribe(collect)
+        await restarted.start()
+        clock.now += 50
+        await restarted.checkpoint()
+        await restarted.stop()
+
+    asyncio.run(go(RESUME_GAP))
+    assert sum(segment.seconds for segment in segments) == 100 + RESUME_GAP + 50
+    segments.clear()
+    asyncio.run(go(RESUME_GAP + 1))
+    assert sum(segment.seconds for segment in segments) == 100 + 50
+
+
+def test_failing_subscriber_is_isolated(tmp_path, capsys):
+    clock = Clock()
+    world = World()
+    seen = []
+
+    async def broken(batch):
+        raise RuntimeError("boom")
+
+    async def collect(batch):
+        seen.extend(batch)
+
+    async def go():
+        sessions = VoiceSessionEngine(FakeBot(world), db_path=str(tmp_path / "voice_sessions.db"), clock=clock)
+        sessions.subscribe(broken)
+        sessions.subscribe(collect)
+        await sessions.start()
+        world.states[(1, 1)] = (10, False, False)
+        await sessions.on_voice_state_update(world.member((1, 1)), world.voice((2, 2)), world.voice((1, 1)))
+        clock.now += 40
+        await sessions.checkpoint()
+        await sessions.unsubscribe(broken)
+        await sessions.unsubscribe(collect)
+        # The last subscriber out stops the engine
+        return sessions._started, sessions.bot.listeners
+
+    assert asyncio.run(go()) == (False, [])
+    assert [segment.seconds for segment in seen] == [40]
+    assert "[VOICE] Segment subscriber" in capsys.readouterr().out
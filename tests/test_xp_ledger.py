@@ -0,0 +1,208 @@
+"""XPLedger against the per-message implementation it replaced, including crashes and journal replay"""
+import asyncio
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+import aiosqlite
+import pytest
+
+from utils import xp_ledger
+from utils.xp_ledger import XPLedger
+
+LEVELING_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS user_levels (
+        user_id INTEGER,
+        guild_id INTEGER,
+        xp INTEGER DEFAULT 0,
+        level INTEGER DEFAULT 0,
+        total_xp INTEGER DEFAULT 0,
+        messages_sent INTEGER DEFAULT 0,
+        last_xp_gain TEXT,
+        PRIMARY KEY (user_id, guild_id)
+    );
+    CREATE TABLE IF NOT EXISTS guild_level_settings (
+        guild_id INTEGER PRIMARY KEY,
+        level_formula TEXT DEFAULT 'default'
+    );
+"""
+FORMULAS = {1: "default", 2: "linear", 3: "exponential"}
+
+
+# LevelingSystem.calculate_level_from_xp / calculate_xp_for_level
+def level_from_xp(xp: int, formula: str = "default") -> int:
+    if xp <= 0:
+        return 0
+    if formula == "linear":
+        return int(xp / 5000)
+    if formula == "exponential":
+        return int(math.log(xp / 100 + 1) * 10)
+    return int(math.sqrt(xp / 1000))
+
+
+def xp_for_level(level: int, formula: str = "default") -> int:
+    if level <= 0:
+        return 0
+    if formula == "linear":
+        return int(level * 5000)
+    if formula == "exponential":
+        return int((math.exp(level / 10) - 1) * 100)
+    return int(level ** 2 * 1000)
+
+
+async def _create(path: str):
+    async with aiosqlite.connect(path) as db:
+        await db.executescript(LEVELING_SCHEMA)
+        await db.executemany("INSERT INTO guild_level_settings (guild_id, level_formula) VALUES (?, ?)",
+                             FORMULAS.items())
+        await db.commit()
+
+
+async def _reference_gain(path: str, guild_id: int, user_id: int, xp_gain: int, timestamp: str):
+    """The per-message get_user_data + update_user_xp the ledger replaced"""
+    formula = FORMULAS[guild_id]
+    async with aiosqlite.connect(path) as db:
+        async with db.execute("SELECT level, total_xp FROM user_levels WHERE guild_id = ? AND user_id = ?",
+                              (guild_id, user_id)) as cursor:
+            row = await cursor.fetchone()
+        if not row:
+            await db.execute("INSERT OR IGNORE INTO user_levels (user_id, guild_id) VALUES (?, ?)", (user_id, guild_id))
+            row = (0, 0)
+        old_level = row[0]
+        new_total_xp = row[1] + xp_gain
+        new_level = level_from_xp(new_total_xp, formula)
+        await db.execute("""
+            UPDATE user_levels
+            SET xp = ?, level = ?, total_xp = ?, messages_sent = messages_sent + 1, last_xp_gain = ?
+            WHERE user_id = ? AND guild_id = ?
+        """, (new_total_xp - xp_for_level(new_level, formula), new_level, new_total_xp, timestamp, user_id, guild_id))
+        await db.commit()
+    return new_level > old_level, old_level, new_level
+
+
+async def _table(path: str):
+    async with aiosqlite.connect(path) as db:
+        async with db.execute("SELECT * FROM user_levels ORDER BY guild_id, user_id") as cursor:
+            return await cursor.fetchall()
+
+
+def _ledger(path: str, max_rows: int = 50000) -> XPLedger:
+    # The flush loop never fires on its own; the test decides when to flush
+    return XPLedger(path, level_from_xp, xp_for_level, flush_interval=3600, max_rows=max_rows)
+
+
+def _crash(ledger: XPLedger):
+    """Drop the ledger without flushing, as if the process died; the journal is line buffered"""
+    ledger._flush_task.cancel()
+    ledger._journal.close()
+    ledger._journal = None
+
+
+async def _run(tmp_path, messages: int, seed: int, max_rows: int = 50000):
+    rng = random.Random(seed)
+    expected, actual = str(tmp_path / "reference.db"), str(tmp_path / "leveling.db")
+    await _create(expected)
+    await _create(actual)
+
+    ledger = _ledger(actual, max_rows)
+    await ledger.start()
+    now = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    crashes = replays = 0
+    for _ in range(messages):
+        now += timedelta(seconds=rng.randint(1, 90))
+        guild_id = rng.choice(tuple(FORMULAS))
+        # A few chatty members and a long tail, so rows are both hot and evicted
+        user_id = rng.randint(1, 8) if rng.random() < 0.6 else rng.randint(9, 400)
+        xp_gain = rng.randint(15, 25) * rng.choice((1, 1, 1, 2, 5))
+        timestamp = now.isoformat()
+
+        assert await ledger.add_xp(guild_id, user_id, xp_gain, FORMULAS[guild_id], timestamp) == \
+            await _reference_gain(expected, guild_id, user_id, xp_gain, timestamp)
+
+        roll = rng.random()
+        if roll < 0.01:
+            await ledger.flush()
+        elif roll < 0.015:
+            _crash(ledger)
+            crashes += 1
+            ledger = _ledger(actual, max_rows)
+            await ledger.start()
+            replays += not ledger.rows
+
+    await ledger.stop()
+    return await _table(expected), await _table(actual), crashes
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_per_message_updates_across_crashes(tmp_path, seed):
+    expected, actual, crashes = asyncio.run(_run(tmp_path, 3000, seed))
+    assert crashes
+    assert actual == expected
+    assert sum(row[5] for row in actual) == 3000
+
+
+def test_matches_with_eviction(tmp_path):
+    # Far fewer slots than members: clean rows are evicted and reloaded from the database
+    expected, actual, _ = asyncio.run(_run(tmp_path, 3000, seed=11, max_rows=20))
+    assert actual == expected
+
+
+def test_replay_is_exactly_once(tmp_path):
+    path = str(tmp_path / "leveling.db")
+
+    async def go():
+        await _create(path)
+        ledger = _ledger(path)
+        await ledger.start()
+        for i in range(10):
+            await ledger.add_xp(1, 7, 100, "default", f"2024-03-01T00:00:{i:02d}")
+        await ledger.flush()
+        for i in range(5):
+            await ledger.add_xp(1, 7, 100, "default", f"2024-03-01T00:01:{i:02d}")
+        _crash(ledger)
+        # A torn final line from the crash is ignored
+        with open(ledger.journal_path, "a", encoding="utf-8") as journal:
+            journal.write("99 1 7 100")
+
+        for _ in range(2):
+            # Starting twice in a row must not apply the journal twice
+            ledger = _ledger(path)
+            await ledger.start()
+            _crash(ledger)
+        return await _table(path)
+
+    assert asyncio.run(go()) == [(7, 1, 1500 - 1000, 1, 1500, 15, "2024-03-01T00:01:04")]
+
+
+def test_failed_flush_is_replayed_from_the_rotated_journal(tmp_path, monkeypatch):
+    path = str(tmp_path / "leveling.db")
+    real_connect = aiosqlite.connect
+
+    def broken_connect(*args, **kwargs):
+        raise aiosqlite.OperationalError("database is locked")
+
+    async def go():
+        await _create(path)
+        ledger = _ledger(path)
+        await ledger.start()
+        for user_id in (1, 2, 3):
+            await ledger.add_xp(2, user_id, 5000, "linear", "2024-03-01T00:00:00")
+        # The journal is rotated, then the upsert fails; the rows stay dirty
+        monkeypatch.setattr(xp_ledger.aiosqlite, "connect", broken_connect)
+        with pytest.raises(aiosqlite.OperationalError):
+            await ledger.flush()
+        monkeypatch.setattr(xp_ledger.aiosqlite, "connect", real_connect)
+        assert all(row.dirty for row in ledger.rows.values())
+        await ledger.add_xp(2, 1, 5000, "linear", "2024-03-01T00:00:01")
+        _crash(ledger)
+
+        ledger = _ledger(path)
+        await ledger.start()
+        await ledger.stop()
+        return await _table(path)
+
+    assert asyncio.run(go()) == [
+        (1, 2, 0, 2, 10000, 2, "2024-03-01T00:00:01"),
+        (2, 2, 0, 1, 5000, 1, "2024-03-01T00:00:00"),
+        (3, 2, 0, 1, 5000, 1, "2024-03-01T00:00:00"),
+    ]
@@ -0,0 +1,439 @@
+"""
+Epoch-bucketed activity counters for the live leaderboards.
+
+Activity is stored once per (guild, user, day) in ``activity_buckets``; a
+day is the number of days since 1970-01-01 in the leaderboard's timezone, a
+week is the Monday-aligned week number derived from it and a month is
+``year * 12 + month - 1``. A period rolls over simply because "now" maps to a
+new key, so there is no reset pass over every row.
+
+Each loaded guild keeps a small in-memory aggregate per user (current day /
+week / month totals tagged with their keys, all-time total, streak state), so
+leaderboards never scan the bucket table. Streaks follow from which days have
+a bucket: consecutive active days extend the streak, a gap restarts it.
+Increments are written behind in batches with ``ON CONFLICT`` upserts.
+"""
+import asyncio
+import heapq
+import traceback
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import aiosqlite
+
+EPOCH = date(1970, 1, 1)
+PERIODS = ("daily", "weekly", "monthly", "alltime")
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def day_key(moment: datetime, tz: tzinfo = timezone.utc) -> int:
+    """Days since 1970-01-01 for ``moment``'s local date in ``tz``"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment.astimezone(tz).date() - EPOCH).days
+
+
+def week_key(day: int) -> int:
+    """Monday-aligned week number (1970-01-01 was a Thursday)"""
+    return (day + 3) // 7
+
+
+def month_key(day: int) -> int:
+    local = EPOCH + timedelta(days=day)
+    return local.year * 12 + local.month - 1
+
+
+def day_to_date(day: int) -> date:
+    return EPOCH + timedelta(days=day)
+
+
+def split_by_day(start: datetime, end: datetime, tz: tzinfo = timezone.utc) -> List[Tuple[int, float]]:
+    """Split [start, end) into (day, minutes) pieces on local midnights"""
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    pieces = []
+    cursor = start
+    while cursor < end:
+        local = cursor.astimezone(tz)
+        next_midnight = datetime.combine(local.date() + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+        piece_end = min(end, next_midnight.astimezone(timezone.utc))
+        if piece_end <= cursor:
+            break
+        pieces.append((day_key(cursor, tz), (piece_end - cursor).total_seconds() / 60))
+        cursor = piece_end
+    return pieces
+
+
+class CounterColumns(NamedTuple):
+    """Names of the legacy per-user summary table and its columns"""
+    table: str
+    daily: str
+    weekly: str
+    monthly: str
+    alltime: str
+
+
+class UserActivity:
+    __slots__ = ("username", "day_key", "daily", "week_key", "weekly", "month_key", "monthly",
+                 "alltime", "last_day", "streak", "longest", "dirty")
+
+    def __init__(self, username: str = ""):
+        self.username = username
+        self.day_key = self.week_key = self.month_key = None
+        self.daily = self.weekly = self.monthly = self.alltime = 0
+        self.last_day: Optional[int] = None
+        self.streak = 0
+        self.longest = 0
+        self.dirty = False
+
+    def period_total(self, period: str, day: int):
+        if period == "daily":
+            return self.daily if self.day_key == day else 0
+        if period == "weekly":
+            return self.weekly if self.week_key == week_key(day) else 0
+        if period == "monthly":
+            return self.monthly if self.month_key == month_key(day) else 0
+        return self.alltime
+
+    def current_streak(self, day: int) -> int:
+        """A streak survives until a full day passes without activity"""
+        if self.last_day is None or self.last_day < day - 1:
+            return 0
+        return self.streak
+
+    def add(self, day: int, amount):
+        # A day older than the tracked period (a late voice session piece) only
+        # reaches the bucket table; it must not reset the current totals
+        self.day_key, self.daily = self._advance(self.day_key, self.daily, day, amount)
+        self.week_key, self.weekly = self._advance(self.week_key, self.weekly, week_key(day), amount)
+        self.month_key, self.monthly = self._advance(self.month_key, self.monthly, month_key(day), amount)
+        self.alltime += amount
+        self.touch(day)
+
+    @staticmethod
+    def _advance(current_key: Optional[int], total, key: int, amount):
+        if current_key == key:
+            return current_key, total + amount
+        if current_key is None or key > current_key:
+            return key, amount
+        return current_key, total
+
+    def touch(self, day: int):
+        if self.last_day is not None and day <= self.last_day:
+            return
+        self.streak = self.streak + 1 if self.last_day == day - 1 else 1
+        self.last_day = day
+        self.longest = max(self.longest, self.streak)
+
+
+class ActivityCounters:
+    """Bucketed chat or voice counters for all guilds"""
+
+    def __init__(self, db_path: str, kind: str, columns: CounterColumns,
+                 tz: tzinfo = timezone.utc, flush_interval: float = 15.0,
+                 clock: Callable[[], datetime] = utc_now):
+        self.db_path = db_path
+        self.kind = kind
+        self.columns = columns
+        self.tz = tz
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self.guilds: Dict[int, Dict[int, UserActivity]] = {}
+        # (guild_id, user_id, day) -> amount not yet written
+        self.pending: Dict[Tuple[int, int, int], float] = {}
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # ---------- lifecycle ----------
+
+    async def start(self):
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS activity_buckets (
+                    guild_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    day INTEGER NOT NULL,
+                    amount REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (guild_id, kind, user_id, day)
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_activity_buckets_day
+                ON activity_buckets (guild_id, kind, day)
+            """)
+            await db.commit()
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                print(f"[LIVE_LB] {self.kind} counter flush failed: {traceback.format_exc()}")
+
+    # ---------- loading ----------
+
+    def today(self, now: Optional[datetime] = None) -> int:
+        return day_key(now or self.clock(), self.tz)
+
+    async def _guild(self, guild_id: int) -> Dict[int, UserActivity]:
+        users = self.guilds.get(guild_id)
+        if users is not None:
+            return users
+        loading = self._loading.get(guild_id)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[guild_id] = future
+        try:
+            users = await self._load(guild_id)
+            self.guilds[guild_id] = users
+            future.set_result(users)
+            return users
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't leave an unretrieved exception behind
+            future.exception()
+            raise
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            self._loading.pop(guild_id, None)
+
+    async def _load(self, guild_id: int) -> Dict[int, UserActivity]:
+        today = self.today()
+        # Buckets older than the start of the current week and month can't affect any period
+        month_start = today - (day_to_date(today).day - 1)
+        since = min(today - (today + 3) % 7, month_start)
+        users: Dict[int, UserActivity] = {}
+        c = self.columns
+
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute(
+                "SELECT 1 FROM activity_buckets WHERE guild_id = ? AND kind = ? LIMIT 1", (guild_id, self.kind)
+            ) as cursor:
+                has_buckets = await cursor.fetchone() is not None
+
+            legacy = []
+            async with db.execute(f"""
+                SELECT user_id, username, {c.alltime}, current_streak, longest_streak, last_activity_date,
+                       {c.daily}, {c.weekly}, {c.monthly}
+                FROM {c.table} WHERE guild_id = ?
+            """, (guild_id,)) as cursor:
+                async for user_id, username, alltime, streak, longest, last_activity, daily, weekly, monthly in cursor:
+                    user = users[user_id] = UserActivity(username or "")
+                    user.alltime = alltime or 0
+                    user.streak = streak or 0
+                    user.longest = longest or 0
+                    if last_activity:
+                        try:
+                            user.last_day = (date.fromisoformat(str(last_activity)[:10]) - EPOCH).days
+                        except ValueError:
+                            user.last_day = None
+                    if not has_buckets and user.last_day is not None and user.last_day >= since:
+                        legacy.extend((user_id, day, amount) for day, amount in self._legacy_buckets(
+                            user.last_day, daily or 0, weekly or 0, monthly or 0) if day >= since)
+
+            if legacy:
+                # First load since the switch to buckets: carry the summary
+                # table's current-period totals over, or the next flush would
+                # write zeros back into it
+                await db.executemany("""
+                    INSERT INTO activity_buckets (guild_id, kind, user_id, day, amount)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(guild_id, kind, user_id, day) DO UPDATE SET
+                        amount = amount + excluded.amount
+                """, [(guild_id, self.kind, user_id, day, amount) for user_id, day, amount in legacy])
+                await db.commit()
+                print(f"[LIVE_LB] Seeded {self.kind} buckets for {len({row[0] for row in legacy})} members "
+                      f"in guild {guild_id} from the summary table")
+
+            async with db.execute("""
+                SELECT user_id, day, amount FROM activity_buckets
+                WHERE guild_id = ? AND kind = ? AND day >= ?
+            """, (guild_id, self.kind, since)) as cursor:
+                async for user_id, day, amount in cursor:
+                    user = users.get(user_id)
+                    if user is None:
+                        user = users[user_id] = UserActivity()
+                    amount = self._coerce(amount)
+                    if day == today:
+                        user.day_key = today
+                        user.daily += amount
+                    if week_key(day) == week_key(today):
+                        user.week_key = week_key(today)
+                        user.weekly += amount
+                    if month_key(day) == month_key(today):
+                        user.month_key = month_key(today)
+                        user.monthly += amount
+        return users
+
+    @staticmethod
+    def _legacy_buckets(last_day: int, daily, weekly, monthly) -> List[Tuple[int, float]]:
+        """
+        Synthetic (day, amount) buckets reproducing a summary row's totals.
+
+        The counts all happened on or before ``last_day``: the daily total
+        goes on that day, the rest of the week on the day before and the rest
+        of the month on the first of the month when that lies before the
+        week. Legacy periods were not Monday-aligned, so whatever does not fit
+        is left out.
+        """
+        week_start = last_day - (last_day + 3) % 7
+        month_start = last_day - (day_to_date(last_day).day - 1)
+        buckets: Dict[int, float] = {}
+        in_month = 0
+        if daily > 0:
+            buckets[last_day] = daily
+            in_month += daily
+        rest_of_week = weekly - max(daily, 0)
+        if rest_of_week > 0 and last_day - 1 >= week_start:
+            buckets[last_day - 1] = rest_of_week
+            if last_day - 1 >= month_start:
+                in_month += rest_of_week
+        rest_of_month = monthly - in_month
+        if rest_of_month > 0 and month_start < week_start:
+            buckets[month_start] = buckets.get(month_start, 0) + rest_of_month
+        return sorted(buckets.items())
+
+    def _coerce(self, amount):
+        return int(amount) if self.kind == "chat" else amount
+
+    # ---------- recording ----------
+
+    async def add(self, guild_id: int, user_id: int, username: Optional[str], amount=1,
+                  now: Optional[datetime] = None):
+        """Count ``amount`` for a member; a None username keeps the stored one"""
+        users = await self._guild(guild_id)
+        day = self.today(now)
+        user = users.get(user_id)
+        if user is None:
+            user = users[user_id] = UserActivity(username or str(user_id))
+        elif username is not None:
+            user.username = username
+        user.add(day, amount)
+        user.dirty = True
+        key = (guild_id, user_id, day)
+        self.pending[key] = self.pending.get(key, 0) + amount
+
+    async def add_session(self, guild_id: int, user_id: int, username: Optional[str],
+                          start: datetime, end: datetime):
+        """Credit voice minutes, split across the local days the session covered"""
+        for day, minutes in split_by_day(start, end, self.tz):
+            await self.add(guild_id, user_id, username, minutes,
+                           now=datetime.combine(day_to_date(day), datetime.min.time(), tzinfo=self.tz))
+
+    # ---------- queries ----------
+
+    async def top(self, guild_id: int, period: str = "weekly", limit: int = 10,
+                  now: Optional[datetime] = None) -> List[Tuple[int, str, float, int]]:
+        """(user_id, username, amount, current_streak) for the top members in a period"""
+        users = await self._guild(guild_id)
+        day = self.today(now)
+        totals = ((user.period_total(period, day), user_id, user) for user_id, user in users.items())
+        best = heapq.nlargest(limit, (entry for entry in totals if entry[0] > 0), key=lambda entry: entry[0])
+        return [(user_id, user.username, amount, user.current_streak(day)) for amount, user_id, user in best]
+
+    async def top_streaks(self, guild_id: int, limit: int = 10,
+                          now: Optional[datetime] = None) -> List[Tuple[int, str, int, int]]:
+        """(user_id, username, current_streak, longest_streak) ordered by current streak"""
+        users = await self._guild(guild_id)
+        day = self.today(now)
+        entries = ((user.current_streak(day), user.longest, user_id, user) for user_id, user in users.items())
+        best = heapq.nlargest(limit, (entry for entry in entries if entry[0] > 0), key=lambda entry: entry[:2])
+        return [(user_id, user.username, streak, longest) for streak, longest, user_id, user in best]
+
+    async def top_longest_streaks(self, guild_id: int, limit: int = 3) -> List[Tuple[str, int]]:
+        users = await self._guild(guild_id)
+        best = heapq.nlargest(limit, (user for user in users.values() if user.longest > 0),
+                              key=lambda user: user.longest)
+        return [(user.username, user.longest) for user in best]
+
+    async def get_user(self, guild_id: int, user_id: int,
+                       now: Optional[datetime] = None) -> Optional[Dict]:
+        users = await self._guild(guild_id)
+        user = users.get(user_id)
+        if user is None:
+            return None
+        day = self.today(now)
+        return {
+            'username': user.username,
+            'daily': user.period_total("daily", day),
+            'weekly': user.period_total("weekly", day),
+            'monthly': user.period_total("monthly", day),
+            'alltime': user.alltime,
+            'current_streak': user.current_streak(day),
+            'longest_streak': user.longest,
+            'last_activity_date': str(day_to_date(user.last_day)) if user.last_day is not None else None,
+        }
+
+    # ---------- persistence ----------
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, {}
+            dirty = []
+            for guild_id, users in self.guilds.items():
+                for user_id, user in users.items():
+                    if user.dirty:
+                        user.dirty = False
+                        dirty.append((guild_id, user_id, user))
+
+            c = self.columns
+            today = self.today()
+            try:
+                async with aiosqlite.connect(self.db_path) as db:
+                    await db.executemany("""
+                        INSERT INTO activity_buckets (guild_id, kind, user_id, day, amount)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(guild_id, kind, user_id, day) DO UPDATE SET
+                            amount = amount + excluded.amount
+                    """, [(guild_id, self.kind, user_id, day, amount)
+                          for (guild_id, user_id, day), amount in pending.items()])
+                    # The summary row keeps all-time totals and streak state for the next load
+                    await db.executemany(f"""
+                        INSERT INTO {c.table} (guild_id, user_id, username, {c.daily}, {c.weekly}, {c.monthly},
+                                               {c.alltime}, current_streak, longest_streak, last_activity_date)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(guild_id, user_id) DO UPDATE SET
+                            username = excluded.username,
+                            {c.daily} = excluded.{c.daily},
+                            {c.weekly} = excluded.{c.weekly},
+                            {c.monthly} = excluded.{c.monthly},
+                            {c.alltime} = excluded.{c.alltime},
+                            current_streak = excluded.current_streak,
+                            longest_streak = excluded.longest_streak,
+                            last_activity_date = excluded.last_activity_date
+                    """, [(guild_id, user_id, user.username,
+                           user.period_total("daily", today), user.period_total("weekly", today),
+                           user.period_total("monthly", today), user.alltime,
+                           user.streak, user.longest,
+                           str(day_to_date(user.last_day)) if user.last_day is not None else None)
+                          for guild_id, user_id, user in dirty])
+                    await db.commit()
+            except Exception:
+                # Put the increments back so the next flush retries them
+                for key, amount in pending.items():
+                    self.pending[key] = self.pending.get(key, 0) + amount
+                for _, _, user in dirty:
+                    user.dirty = True
+                raise
@@ -0,0 +1,228 @@
+"""
+Coalesces automod punishments, message deletes and log embeds during spam bursts.
+
+Every automod cog used to time out the user, delete the message, post a notice
+and send a log embed for *each* offending message. During a raid most of those
+calls are redundant (the user is already muted) and they burn through the
+rate limits. The coalescer punishes a user once per window, bulk-deletes the
+collected messages per channel and folds the window's log entries into a
+single summary embed per guild.
+"""
+import asyncio
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import aiosqlite
+import discord
+
+FOOTER_TEXT = "Use the “automod logging” command to get automod logs if it is not enabled."
+
+
+class _Offender:
+    __slots__ = ("expires", "action_taken", "removed")
+
+    def __init__(self, expires: float):
+        self.expires = expires
+        self.action_taken: Optional[str] = None
+        self.removed = False
+
+
+class _LogEntry:
+    __slots__ = ("user", "channel", "event", "action", "reason", "count")
+
+    def __init__(self, user, channel, event, action, reason):
+        self.user = user
+        self.channel = channel
+        self.event = event
+        self.action = action
+        self.reason = reason
+        self.count = 1
+
+
+class AutomodActionCoalescer:
+    """Merges automod actions per user over a short window"""
+
+    def __init__(self, bot, window: float = 5.0, delete_delay: float = 1.0):
+        self.bot = bot
+        self.window = window
+        self.delete_delay = delete_delay
+        self._offenders: Dict[Tuple[int, int], _Offender] = {}
+        self._pending_deletes: Dict[int, List[discord.Message]] = {}
+        self._pending_logs: Dict[int, Dict[Tuple[int, str], _LogEntry]] = {}
+        # The loop only keeps weak references to tasks; these hold the flushes until they finish
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _offender(self, guild_id: int, user_id: int) -> Tuple[_Offender, bool]:
+        now = time.monotonic()
+        key = (guild_id, user_id)
+        offender = self._offenders.get(key)
+        if offender is not None and offender.expires > now:
+            return offender, False
+
+        if len(self._offenders) > 1000:
+            self._offenders = {k: v for k, v in self._offenders.items() if v.expires > now}
+        offender = _Offender(now + self.window)
+        self._offenders[key] = offender
+        return offender, True
+
+    async def handle(self, message: discord.Message, *, event: str, punishment: Optional[str], reason: str,
+                     timeout_minutes: int, mute_label: str, notice_title: str, notice_text: str,
+                     delete_message: bool = True) -> Optional[str]:
+        """
+        Punish the author of ``message`` for an automod ``event``.
+
+        Returns the action taken for this user in the current window. Only the
+        first violation of a window issues the punishment and the channel
+        notice; later ones just queue their message for deletion and bump the
+        log counter.
+        """
+        guild = message.guild
+        user = message.author
+        channel = message.channel
+        offender, notify = self._offender(guild.id, user.id)
+        removing = punishment in ("Kick", "Ban")
+        if not notify and removing and not offender.removed:
+            # Escalate a window that has only muted so far
+            notify = True
+
+        if delete_message:
+            self._queue_delete(message)
+
+        if notify:
+            # Flag before awaiting so concurrent violations skip the REST calls
+            offender.removed = offender.removed or removing
+            offender.action_taken = await self._apply_punishment(user, punishment, reason, timeout_minutes, mute_label)
+
+            simple_embed = discord.Embed(title=notice_title, color=0xff0000)
+            simple_embed.description = f"<:feast_tick:1400143469892210753> | {user.mention} has been successfully **{offender.action_taken}** for **{notice_text}**"
+            simple_embed.set_footer(text=FOOTER_TEXT, icon_url=self.bot.user.avatar.url if self.bot.user.avatar else None)
+            try:
+                await channel.send(embed=simple_embed, delete_after=30)
+            except discord.HTTPException:
+                pass
+
+        self._queue_log(guild, user, channel, event, offender.action_taken, reason)
+        return offender.action_taken
+
+    async def _apply_punishment(self, user, punishment, reason, timeout_minutes, mute_label):
+        try:
+            if punishment == "Mute":
+                if user.is_timed_out():
+                    return mute_label
+                timeout_duration = discord.utils.utcnow() + timedelta(minutes=timeout_minutes)
+                await user.edit(timed_out_until=timeout_duration, reason=reason)
+                return mute_label
+            elif punishment == "Kick":
+                await user.kick(reason=reason)
+                return "Kicked"
+            elif punishment == "Ban":
+                await user.ban(reason=reason)
+                return "Banned"
+        except discord.HTTPException:
+            pass
+        return None
+
+    def _queue_delete(self, message: discord.Message):
+        pending = self._pending_deletes.setdefault(message.channel.id, [])
+        pending.append(message)
+        if len(pending) == 1:
+            self._spawn(self._flush_deletes(message.channel))
+
+    async def _flush_deletes(self, channel):
+        await asyncio.sleep(self.delete_delay)
+        messages = self._pending_deletes.pop(channel.id, [])
+        # Bulk delete takes at most 100 messages per call
+        for start in range(0, len(messages), 100):
+            chunk = messages[start:start + 100]
+            try:
+                if len(chunk) == 1:
+                    await chunk[0].delete()
+                else:
+                    await channel.delete_messages(chunk)
+            except discord.NotFound:
+                pass
+            except discord.HTTPException:
+                pass
+
+    def _queue_log(self, guild, user, channel, event, action, reason):
+        pending = self._pending_logs.get(guild.id)
+        if pending is None:
+            pending = self._pending_logs[guild.id] = {}
+            self._spawn(self._flush_logs(guild))
+
+        entry = pending.get((user.id, event))
+        if entry is None:
+            pending[(user.id, event)] = _LogEntry(user, channel, event, action, reason)
+        else:
+            entry.count += 1
+            entry.action = action or entry.action
+
+    async def _flush_logs(self, guild):
+        await asyncio.sleep(self.window)
+        entries = list(self._pending_logs.pop(guild.id, {}).values())
+        if not entries:
+            return
+
+        async with aiosqlite.connect("db/automod.db") as db:
+            cursor = await db.execute("SELECT log_channel FROM automod_logging WHERE guild_id = ?", (guild.id,))
+            log_channel_id = await cursor.fetchone()
+
+        if not log_channel_id or not log_channel_id[0]:
+            return
+        log_channel = guild.get_channel(log_channel_id[0])
+        if not log_channel:
+            return
+
+        try:
+            await log_channel.send(embed=self._build_log_embed(entries))
+        except discord.HTTPException:
+            pass
+
+    def _build_log_embed(self, entries: List[_LogEntry]) -> discord.Embed:
+        if len(entries) == 1 and entries[0].count == 1:
+            entry = entries[0]
+            embed = discord.Embed(title=f"Automod Log: {entry.event}", color=0xff0000)
+            embed.add_field(name="User", value=entry.user.mention, inline=False)
+            embed.add_field(name="Action", value=entry.action, inline=False)
+            embed.add_field(name="Channel", value=entry.channel.mention, inline=False)
+            embed.add_field(name="Reason", value=entry.reason, inline=False)
+            embed.set_footer(text=f"User ID: {entry.user.id}")
+            avatar_url = entry.user.avatar.url if entry.user.avatar else entry.user.default_avatar.url
+            embed.set_thumbnail(url=avatar_url)
+            embed.timestamp = discord.utils.utcnow()
+            return embed
+
+        total = sum(entry.count for entry in entries)
+        users = {entry.user.id for entry in entries}
+        embed = discord.Embed(
+            title="Automod Log: Summary",
+            description=f"**{total}** violations by **{len(users)}** user(s) in the last {int(self.window)} seconds.",
+            color=0xff0000
+        )
+        for entry in entries[:25]:
+            embed.add_field(
+                name=f"{entry.event} — {entry.user} ({entry.user.id})",
+                value=f"**Action:** {entry.action}\n**Channel:** {entry.channel.mention}\n**Reason:** {entry.reason}\n**Messages:** {entry.count}",
+                inline=False
+            )
+        if len(entries) > 25:
+            embed.set_footer(text=f"{len(entries) - 25} more entries not shown")
+        embed.timestamp = discord.utils.utcnow()
+        return embed
+
+
+_coalescer: Optional[AutomodActionCoalescer] = None
+
+
+def get_automod_coalescer(bot) -> AutomodActionCoalescer:
+    """Return the process-wide coalescer shared by all automod cogs"""
+    global _coalescer
+    if _coalescer is None or _coalescer.bot is not bot:
+        _coalescer = AutomodActionCoalescer(bot)
+    return _coalescer
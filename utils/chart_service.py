@@ -0,0 +1,200 @@
+"""
+Chart rendering off the event loop.
+
+The stats charts (matplotlib) and canvases (OpenCV) are CPU-bound and used to
+run straight on the event loop, freezing the bot for the whole render. The
+service runs them in a small process pool whose workers import the plotting
+libraries and warm the font cache once at start-up.
+
+Finished images are cached by a caller-chosen key - (guild, query, period,
+theme) - for a short TTL, and concurrent requests for the same key share a
+single render (single-flight), including the data queries when the job is
+passed as a factory.
+
+A job names its generator as ``"module:Class"``; each worker builds one
+instance per (class, kwargs) and calls the named (async, non-awaiting) method
+on it.
+"""
+import asyncio
+import importlib
+import io
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple, Union
+
+
+class ChartJob(NamedTuple):
+    generator: str                       # "module:Class"
+    method: str
+    args: tuple = ()
+    generator_kwargs: Optional[dict] = None
+
+
+JobFactory = Callable[[], Awaitable[Optional[ChartJob]]]
+
+
+# ---------- worker process ----------
+
+_generators: Dict[Tuple[str, tuple], Any] = {}
+
+
+def _init_worker():
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        # First draw loads the font cache; do it before the first real request
+        fig, ax = plt.subplots(figsize=(1, 1))
+        ax.text(0.5, 0.5, "warm")
+        fig.savefig(io.BytesIO(), format="png")
+        plt.close(fig)
+    except ImportError:
+        pass
+    try:
+        import cv2  # noqa: F401
+    except ImportError:
+        pass
+
+
+def _generator(path: str, kwargs: Optional[dict]):
+    key = (path, tuple(sorted((kwargs or {}).items())))
+    generator = _generators.get(key)
+    if generator is None:
+        module_name, _, class_name = path.partition(":")
+        cls = getattr(importlib.import_module(module_name), class_name)
+        generator = _generators[key] = cls(**(kwargs or {}))
+    return generator
+
+
+def _drive(coro):
+    """Run a coroutine that never actually suspends (the generators' methods)"""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("chart generator awaited inside a worker")
+
+
+def render_job(job: ChartJob) -> Optional[bytes]:
+    """Runs in a worker: PNG bytes for the job, or None if the generator gave nothing"""
+    result = getattr(_generator(job.generator, job.generator_kwargs), job.method)(*job.args)
+    if asyncio.iscoroutine(result):
+        result = _drive(result)
+    if result is None:
+        return None
+    if isinstance(result, (bytes, bytearray)):
+        return bytes(result)
+    return result.getvalue()
+
+
+# ---------- event loop side ----------
+
+class ChartRenderService:
+    """Process-pool chart renderer with a TTL cache and single-flight requests"""
+
+    def __init__(self, workers: int = 2, ttl: float = 300.0, max_entries: int = 128,
+                 clock: Callable[[], float] = time.monotonic):
+        self.workers = workers
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[Hashable, Tuple[float, bytes]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "failures": 0, "render_seconds": 0.0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] = lambda key: True):
+        for key in [key for key in self._cache if predicate(key)]:
+            del self._cache[key]
+
+    def _cached(self, key: Hashable) -> Optional[bytes]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires, png = entry
+        if expires <= self.clock():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return png
+
+    async def render(self, key: Hashable, job: Union[ChartJob, JobFactory]) -> Optional[io.BytesIO]:
+        """
+        PNG for ``key`` as a fresh BytesIO, or None if it could not be drawn.
+
+        ``job`` may be an async factory returning the ChartJob (or None); it
+        is only called on a cache miss, once for all concurrent callers.
+        """
+        png = self._cached(key)
+        if png is not None:
+            self.stats["hits"] += 1
+            return io.BytesIO(png)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            png = await asyncio.shield(future)
+            return io.BytesIO(png) if png is not None else None
+
+        self.stats["misses"] += 1
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            png = await self._render(job)
+        except asyncio.CancelledError:
+            future.set_result(None)
+            raise
+        except Exception as e:
+            png = None
+            self.stats["failures"] += 1
+            print(f"[STATS] Chart render failed for {key!r}: {e}")
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(png)
+
+        if png is None:
+            return None
+        self._cache[key] = (self.clock() + self.ttl, png)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return io.BytesIO(png)
+
+    async def _render(self, job: Union[ChartJob, JobFactory]) -> Optional[bytes]:
+        if not isinstance(job, ChartJob):
+            job = await job()
+            if job is None:
+                return None
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._get_pool(), render_job, job)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool and try once more
+            self.shutdown()
+            return await loop.run_in_executor(self._get_pool(), render_job, job)
+        finally:
+            self.stats["render_seconds"] += time.perf_counter() - started
+
+
+_service: Optional[ChartRenderService] = None
+
+
+def get_chart_service() -> ChartRenderService:
+    global _service
+    if _service is None:
+        _service = ChartRenderService()
+    return _service
@@ -0,0 +1,278 @@
+"""
+Shared TTL store for per-feature cooldowns.
+
+Cogs used to keep their own ``{key: last_time}`` dicts (leveling XP cooldowns,
+sticky reposts, log rate limits, ...) that were only ever written to, so they
+grew for the lifetime of the process. Every namespace here keeps its entries
+in a hierarchical timing wheel: set, check and expiry are O(1) and expired
+keys are dropped as the wheel turns, so memory follows the number of *active*
+cooldowns instead of every key ever seen.
+
+Usage::
+
+    from utils.cooldowns import cooldowns
+
+    xp_cooldowns = cooldowns.namespace("leveling.xp")
+    if not xp_cooldowns.try_acquire((guild_id, user_id), 60):
+        return  # still on cooldown
+
+``SlidingWindow`` namespaces count events per key over a trailing window
+(e.g. "5 warnings in 5 minutes") with the same expiry handling.
+"""
+import sys
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Set
+
+# Wheel geometry: 1s ticks, 64 slots per level, 4 levels (~194 days of range)
+_SLOT_BITS = 6
+_SLOTS = 1 << _SLOT_BITS
+_SLOT_MASK = _SLOTS - 1
+_LEVELS = 4
+
+# Rough per-entry cost of the bookkeeping around a key (dict slot, entry list, set slot)
+_ENTRY_OVERHEAD = 200
+
+
+class _TimingWheel:
+    """Hierarchical timing wheel mapping keys to expiry ticks"""
+
+    def __init__(self, resolution: float, clock: Callable[[], float]):
+        self.resolution = resolution
+        self.clock = clock
+        self.tick = int(clock() / resolution)
+        self.slots: List[List[Set[Hashable]]] = [[set() for _ in range(_SLOTS)] for _ in range(_LEVELS)]
+        # key -> [expires_at, expire_tick, slot set, value]
+        self.entries: Dict[Hashable, list] = {}
+        self.expired = 0
+        self.on_expire: Optional[Callable[[Hashable, Any], None]] = None
+
+    def _slot_for(self, expire_tick: int) -> Set[Hashable]:
+        delta = expire_tick - self.tick
+        for level in range(_LEVELS):
+            if delta < 1 << (_SLOT_BITS * (level + 1)):
+                return self.slots[level][(expire_tick >> (_SLOT_BITS * level)) & _SLOT_MASK]
+        # Beyond the wheel's range: park in the furthest slot and re-place on cascade
+        top = _LEVELS - 1
+        return self.slots[top][((self.tick >> (_SLOT_BITS * top)) - 1) & _SLOT_MASK]
+
+    def _place(self, key: Hashable, entry: list):
+        slot = self._slot_for(entry[1])
+        slot.add(key)
+        entry[2] = slot
+
+    def set(self, key: Hashable, expires_at: float, value: Any = None):
+        self.advance()
+        entry = self.entries.get(key)
+        expire_tick = max(int(expires_at / self.resolution) + 1, self.tick + 1)
+        if entry is None:
+            entry = self.entries[key] = [expires_at, expire_tick, None, value]
+        else:
+            entry[2].discard(key)
+            entry[0], entry[1], entry[3] = expires_at, expire_tick, value
+        self._place(key, entry)
+
+    def get_entry(self, key: Hashable, now: float) -> Optional[list]:
+        self.advance(now)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= now:
+            return None
+        return entry
+
+    def delete(self, key: Hashable) -> bool:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[2].discard(key)
+        return True
+
+    def clear(self):
+        for level in self.slots:
+            for slot in level:
+                slot.clear()
+        self.entries.clear()
+
+    def advance(self, now: Optional[float] = None):
+        target = int((self.clock() if now is None else now) / self.resolution)
+        if target <= self.tick:
+            return
+        if not self.entries:
+            self.tick = target
+            return
+        # After a long idle gap re-placing every entry is cheaper than walking each tick
+        if target - self.tick > _SLOTS * 4:
+            self._rebuild(target)
+            return
+        while self.tick < target:
+            self.tick += 1
+            self._cascade()
+            self._expire_slot(self.slots[0][self.tick & _SLOT_MASK])
+
+    def _cascade(self):
+        for level in range(1, _LEVELS):
+            if (self.tick >> (_SLOT_BITS * (level - 1))) & _SLOT_MASK:
+                return
+            slot = self.slots[level][(self.tick >> (_SLOT_BITS * level)) & _SLOT_MASK]
+            keys = list(slot)
+            slot.clear()
+            for key in keys:
+                self._place(key, self.entries[key])
+
+    def _expire_slot(self, slot: Set[Hashable]):
+        if not slot:
+            return
+        keys = list(slot)
+        slot.clear()
+        for key in keys:
+            entry = self.entries[key]
+            if entry[1] <= self.tick:
+                self._drop(key, entry)
+            else:
+                self._place(key, entry)
+
+    def _rebuild(self, target: int):
+        self.tick = target
+        entries = list(self.entries.items())
+        for level in self.slots:
+            for slot in level:
+                slot.clear()
+        for key, entry in entries:
+            if entry[1] <= target:
+                self._drop(key, entry)
+            else:
+                self._place(key, entry)
+
+    def _drop(self, key: Hashable, entry: list):
+        del self.entries[key]
+        self.expired += 1
+        if self.on_expire is not None:
+            self.on_expire(key, entry[3])
+
+
+class CooldownNamespace:
+    """Keys with a time-to-live; ``try_acquire`` is the usual cooldown check"""
+
+    def __init__(self, name: str, resolution: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.clock = clock
+        self._wheel = _TimingWheel(resolution, clock)
+
+    def __len__(self):
+        return len(self._wheel.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._wheel.get_entry(key, self.clock()) is not None
+
+    def set(self, key: Hashable, ttl: float, value: Any = None):
+        """(Re)start ``key``'s cooldown for ``ttl`` seconds"""
+        self._wheel.set(key, self.clock() + ttl, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._wheel.get_entry(key, self.clock())
+        return default if entry is None else entry[3]
+
+    def remaining(self, key: Hashable) -> float:
+        """Seconds left on ``key``'s cooldown, 0 if it is not active"""
+        now = self.clock()
+        entry = self._wheel.get_entry(key, now)
+        return 0.0 if entry is None else entry[0] - now
+
+    def try_acquire(self, key: Hashable, ttl: float) -> bool:
+        """Start the cooldown and return True, or return False if it is still active"""
+        now = self.clock()
+        if self._wheel.get_entry(key, now) is not None:
+            return False
+        self._wheel.set(key, now + ttl)
+        return True
+
+    def delete(self, key: Hashable) -> bool:
+        return self._wheel.delete(key)
+
+    def clear(self):
+        self._wheel.clear()
+
+    def expire(self):
+        """Drop expired keys now (they are otherwise dropped on the next access)"""
+        self._wheel.advance()
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by this namespace's keys and values"""
+        total = 0
+        for key, entry in self._wheel.entries.items():
+            total += _ENTRY_OVERHEAD + sys.getsizeof(key)
+            if entry[3] is not None:
+                total += sys.getsizeof(entry[3])
+        return total
+
+    def stats(self) -> Dict[str, int]:
+        self.expire()
+        return {
+            "entries": len(self),
+            "expired": self._wheel.expired,
+            "approx_bytes": self.memory_usage(),
+        }
+
+
+class SlidingWindow(CooldownNamespace):
+    """Per-key event counts over a trailing window"""
+
+    def __init__(self, name: str, window: float, resolution: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        super().__init__(name, resolution, clock)
+        self.window = window
+
+    def hit(self, key: Hashable, window: Optional[float] = None) -> int:
+        """Record an event for ``key`` and return how many fall inside the window"""
+        window = self.window if window is None else window
+        now = self.clock()
+        entry = self._wheel.get_entry(key, now)
+        hits: Deque[float] = entry[3] if entry is not None else deque()
+        hits.append(now)
+        cutoff = now - window
+        while hits and hits[0] <= cutoff:
+            hits.popleft()
+        # The key lives as long as its newest event is inside the window
+        self._wheel.set(key, now + window, hits)
+        return len(hits)
+
+    def count(self, key: Hashable, window: Optional[float] = None) -> int:
+        window = self.window if window is None else window
+        now = self.clock()
+        entry = self._wheel.get_entry(key, now)
+        if entry is None:
+            return 0
+        cutoff = now - window
+        return sum(1 for timestamp in entry[3] if timestamp > cutoff)
+
+    def memory_usage(self) -> int:
+        total = 0
+        for key, entry in self._wheel.entries.items():
+            total += _ENTRY_OVERHEAD + sys.getsizeof(key) + sys.getsizeof(entry[3])
+        return total
+
+
+class CooldownStore:
+    """Registry of named cooldown namespaces shared by all cogs"""
+
+    def __init__(self):
+        self.namespaces: Dict[str, CooldownNamespace] = {}
+
+    def namespace(self, name: str, resolution: float = 1.0) -> CooldownNamespace:
+        ns = self.namespaces.get(name)
+        if ns is None:
+            ns = self.namespaces[name] = CooldownNamespace(name, resolution)
+        return ns
+
+    def sliding_window(self, name: str, window: float, resolution: float = 1.0) -> SlidingWindow:
+        ns = self.namespaces.get(name)
+        if ns is None:
+            ns = self.namespaces[name] = SlidingWindow(name, window, resolution)
+        elif not isinstance(ns, SlidingWindow):
+            raise ValueError(f"Cooldown namespace {name!r} is not a sliding window")
+        return ns
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: ns.stats() for name, ns in sorted(self.namespaces.items())}
+
+
+cooldowns = CooldownStore()
@@ -0,0 +1,309 @@
+"""
+yt-dlp extraction in a dedicated pool of worker processes.
+
+Extraction used to run on the event loop's default thread pool (and, for
+YouTube title lookups, on the event loop itself), so a slow or stuck
+extractor held a shared executor thread - or the whole bot - for as long as
+it liked. ``ExtractionPool`` runs extractions in ``workers`` child processes
+of its own:
+
+* every job has a hard timeout; a job that overruns has its worker killed,
+  and a fresh worker takes the slot on its next job,
+* waiting jobs are served by priority - ``NOW_PLAYING`` (a guild with nothing
+  playing), then ``QUEUED``, then ``SEARCH`` - and in arrival order within a
+  priority,
+* at most ``max_waiting`` jobs wait; a job arriving at a full queue displaces
+  the newest waiting job of a lower priority, or is refused if there is none
+  (both fail with ``ExtractionQueueFull``),
+* a worker is retired after ``max_jobs_per_worker`` jobs, so memory yt-dlp
+  accumulates (extractor caches, fragmentation) goes back to the OS.
+
+A job names a module-level function as ``"module:function"``; its arguments
+and return value must be picklable. ``extract_info`` is the yt-dlp job.
+"""
+import asyncio
+import heapq
+import importlib
+import itertools
+import multiprocessing
+import signal
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+NOW_PLAYING = 0
+QUEUED = 1
+SEARCH = 2
+
+EXTRACT_INFO = "utils.extraction_pool:extract_info"
+
+
+class ExtractionError(Exception):
+    """An extraction failed, or its worker died"""
+
+
+class ExtractionTimeout(ExtractionError):
+    pass
+
+
+class ExtractionQueueFull(ExtractionError):
+    pass
+
+
+# ---------- worker process ----------
+
+_functions: Dict[str, Callable] = {}
+
+
+def _function(path: str) -> Callable:
+    function = _functions.get(path)
+    if function is None:
+        module_name, _, name = path.partition(":")
+        function = _functions[path] = getattr(importlib.import_module(module_name), name)
+    return function
+
+
+def _worker_main(conn):
+    # Forked from the bot: signals are the bot's to handle, and must not be
+    # written to the event loop's wakeup fd this process inherited
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        path, args = message
+        try:
+            reply = (True, _function(path)(*args))
+        except Exception as e:
+            reply = (False, f"{type(e).__name__}: {e}")
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send((False, f"result could not be sent back: {e}"))
+
+
+def extract_info(query: str, options: dict, download: bool = False) -> Optional[dict]:
+    """
+    Runs in a worker: yt-dlp's info for ``query`` as plain data. With
+    ``download`` the media is downloaded too, and ``_filename`` is the path
+    yt-dlp prepared for it.
+    """
+    import yt_dlp
+    with yt_dlp.YoutubeDL(options) as ydl:
+        info = ydl.extract_info(query, download=download)
+        if info is None:
+            return None
+        filename = ydl.prepare_filename(info) if download else None
+        info = ydl.sanitize_info(info)
+    if filename is not None:
+        info["_filename"] = filename
+    return info
+
+
+# ---------- event loop side ----------
+
+class _Job:
+    __slots__ = ("priority", "seq", "path", "args", "timeout", "future", "queued_at")
+
+    def __init__(self, priority: int, seq: int, path: str, args: tuple, timeout: float, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.path = path
+        self.args = args
+        self.timeout = timeout
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    async def call(self, path: str, args: tuple):
+        loop = asyncio.get_running_loop()
+        reply = loop.create_future()
+        fd = self.conn.fileno()
+
+        def readable():
+            loop.remove_reader(fd)
+            if reply.done():
+                return
+            try:
+                reply.set_result(self.conn.recv())
+            except (EOFError, OSError):
+                reply.set_exception(ExtractionError("extraction worker died"))
+
+        self.conn.send((path, args))
+        loop.add_reader(fd, readable)
+        try:
+            return await reply
+        finally:
+            loop.remove_reader(fd)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+    def retire(self, grace: float = 5.0):
+        """Let the worker exit once it reads the stop message; kill it if it hasn't after ``grace``"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.conn.close()
+        asyncio.get_running_loop().call_later(grace, self._reap)
+
+    def _reap(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+
+
+class ExtractionPool:
+    """Process pool for extraction jobs with hard timeouts, priorities and worker recycling"""
+
+    def __init__(self, workers: int = 4, max_waiting: int = 128, max_jobs_per_worker: int = 50,
+                 timeout: float = 60.0):
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.timeout = timeout
+        self._context = multiprocessing.get_context()
+        # Free slots; None until the slot's worker is first needed
+        self._idle: List[Optional[_Worker]] = [None] * workers
+        self._busy: Set[_Worker] = set()
+        self._waiting: List[_Job] = []
+        self._seq = itertools.count()
+        self._tasks: Set[asyncio.Task] = set()
+        self._generation = 0  # bumped by shutdown, so jobs cancelled by it don't hand back slots
+        self.stats = {"jobs": 0, "failures": 0, "timeouts": 0, "displaced": 0, "refused": 0,
+                      "recycled": 0, "wait_seconds": 0.0, "run_seconds": 0.0}
+
+    async def run(self, path: str, *args, priority: int = QUEUED, timeout: Optional[float] = None) -> Any:
+        """Result of ``path(*args)`` run in a worker; raises ExtractionError (or a subclass)"""
+        job = _Job(priority, next(self._seq), path, args, timeout or self.timeout,
+                   asyncio.get_running_loop().create_future())
+        self._enqueue(job)
+        self._dispatch()
+        return await job.future
+
+    async def extract(self, query: str, options: dict, download: bool = False, priority: int = QUEUED,
+                      timeout: Optional[float] = None) -> Optional[dict]:
+        return await self.run(EXTRACT_INFO, query, options, download, priority=priority, timeout=timeout)
+
+    def _enqueue(self, job: _Job):
+        if len(self._waiting) >= self.max_waiting:
+            # Drop jobs whose callers gave up before making room
+            self._waiting = [waiting for waiting in self._waiting if not waiting.future.done()]
+            heapq.heapify(self._waiting)
+        if len(self._waiting) >= self.max_waiting:
+            worst = max(self._waiting)
+            if worst.priority <= job.priority:
+                self.stats["refused"] += 1
+                raise ExtractionQueueFull("too many extractions are waiting")
+            self._waiting.remove(worst)
+            heapq.heapify(self._waiting)
+            worst.future.set_exception(ExtractionQueueFull("displaced by a higher priority extraction"))
+            self.stats["displaced"] += 1
+        heapq.heappush(self._waiting, job)
+
+    def _dispatch(self):
+        while self._idle and self._waiting:
+            job = heapq.heappop(self._waiting)
+            if job.future.done():
+                continue
+            task = asyncio.create_task(self._run(self._idle.pop(), job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, worker: Optional[_Worker], job: _Job):
+        generation = self._generation
+        try:
+            if worker is None or not worker.alive():
+                worker = _Worker(self._context)
+            self._busy.add(worker)
+            started = time.perf_counter()
+            self.stats["wait_seconds"] += started - job.queued_at
+            try:
+                ok, value = await asyncio.wait_for(worker.call(job.path, job.args), job.timeout)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                worker = self._discard(worker, kill=True)
+                raise ExtractionTimeout(f"extraction took longer than {job.timeout:g}s")
+            except (ExtractionError, OSError):
+                worker = self._discard(worker, kill=True)
+                raise ExtractionError("extraction worker died")
+            finally:
+                self.stats["run_seconds"] += time.perf_counter() - started
+            self.stats["jobs"] += 1
+            worker.jobs += 1
+            if worker.jobs >= self.max_jobs_per_worker:
+                self.stats["recycled"] += 1
+                worker = self._discard(worker, kill=False)
+            if not ok:
+                raise ExtractionError(value)
+            if not job.future.done():
+                job.future.set_result(value)
+        except asyncio.CancelledError:
+            if worker is not None:
+                worker = self._discard(worker, kill=True)
+            if not job.future.done():
+                job.future.set_exception(ExtractionError("extraction pool shut down"))
+            raise
+        except Exception as e:
+            self.stats["failures"] += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            if generation == self._generation:
+                if worker is not None:
+                    self._busy.discard(worker)
+                self._idle.append(worker)
+                self._dispatch()
+
+    def _discard(self, worker: _Worker, kill: bool) -> None:
+        """Take a worker out of service; returns None to put in its slot"""
+        self._busy.discard(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.retire()
+        return None
+
+    def shutdown(self):
+        """Kill every worker and fail pending jobs"""
+        self._generation += 1
+        for task in list(self._tasks):
+            task.cancel()
+        for job in self._waiting:
+            if not job.future.done():
+                job.future.set_exception(ExtractionError("extraction pool shut down"))
+        self._waiting = []
+        for worker in list(self._busy) + [worker for worker in self._idle if worker is not None]:
+            worker.kill()
+        self._busy.clear()
+        self._idle = [None] * self.workers
+
+
+_pool: Optional[ExtractionPool] = None
+
+
+def get_extraction_pool() -> ExtractionPool:
+    global _pool
+    if _pool is None:
+        _pool = ExtractionPool()
+    return _pool
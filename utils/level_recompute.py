@@ -0,0 +1,224 @@
+"""
+Bulk level recomputation for a guild.
+
+Switching ``level_formula`` leaves every stored ``level``/``xp`` in
+``user_levels`` computed with the old formula. The recompute job streams the
+guild's rows in user_id order, computes the new levels for a whole chunk at
+once with NumPy (in a worker thread, off the event loop) and writes only the
+rows that changed, one transaction per chunk. A checkpoint row is stored with
+every chunk so an interrupted job resumes where it stopped.
+
+Members whose earned reward role changed are collected so the caller can
+reconcile just those members afterwards.
+"""
+import asyncio
+import time
+from bisect import bisect_right
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import aiosqlite
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+LevelFn = Callable[[int, str], int]
+ProgressCallback = Callable[["RecomputeResult"], Awaitable[None]]
+
+# Values this close to an integer are re-checked with the scalar formula, so
+# float rounding differences (e.g. a SIMD log) can never change a level
+_BOUNDARY_EPSILON = 1e-7
+
+
+class RecomputeResult:
+    __slots__ = ("guild_id", "formula", "total", "processed", "changed", "reward_changes", "elapsed", "resumed")
+
+    def __init__(self, guild_id: int, formula: str, total: int = 0):
+        self.guild_id = guild_id
+        self.formula = formula
+        self.total = total
+        self.processed = 0
+        self.changed = 0
+        self.reward_changes: List[int] = []
+        self.elapsed = 0.0
+        self.resumed = False
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _raw_levels(xp, formula: str):
+    """Unfloored level values for a float64 array of positive XP totals"""
+    if formula == "linear":
+        return xp / 5000
+    if formula == "exponential":
+        return np.log(xp / 100 + 1) * 10
+    return np.sqrt(xp / 1000)
+
+
+def compute_levels(total_xp: Sequence[int], formula: str, level_from_xp: LevelFn) -> List[int]:
+    """
+    Levels for many XP totals; identical to calling ``level_from_xp`` on
+    each value, which is also the fallback without NumPy.
+    """
+    if not NUMPY_AVAILABLE:
+        return [level_from_xp(xp, formula) for xp in total_xp]
+
+    try:
+        xp = np.asarray(total_xp, dtype=np.int64)
+    except OverflowError:
+        return [level_from_xp(value, formula) for value in total_xp]
+    if len(xp) and xp.max() > 2 ** 53:
+        # Beyond exact float64 integers the vector maths could disagree
+        return [level_from_xp(value, formula) for value in total_xp]
+    levels = np.zeros(len(xp), dtype=np.int64)
+    positive = xp > 0
+    if positive.any():
+        raw = _raw_levels(xp[positive].astype(np.float64), formula)
+        levels[positive] = np.floor(raw).astype(np.int64)
+        # Patch up values that sit right on a level boundary
+        near = np.abs(raw - np.rint(raw)) < _BOUNDARY_EPSILON
+        if near.any():
+            positive_index = np.flatnonzero(positive)[near]
+            for index in positive_index:
+                levels[index] = level_from_xp(int(xp[index]), formula)
+    return levels.tolist()
+
+
+class LevelRecomputer:
+    """Runs at most one recompute job per guild"""
+
+    def __init__(self, db_path: str, level_from_xp: LevelFn, xp_for_level: LevelFn, chunk_size: int = 20000):
+        self.db_path = db_path
+        self.level_from_xp = level_from_xp
+        self.xp_for_level = xp_for_level
+        self.chunk_size = chunk_size
+        self._running: Dict[int, asyncio.Task] = {}
+
+    def is_running(self, guild_id: int) -> bool:
+        task = self._running.get(guild_id)
+        return task is not None and not task.done()
+
+    async def _ensure_checkpoint_table(self, db: aiosqlite.Connection):
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS level_recompute_jobs (
+                guild_id INTEGER PRIMARY KEY,
+                formula TEXT NOT NULL,
+                last_user_id INTEGER NOT NULL,
+                processed INTEGER NOT NULL DEFAULT 0,
+                changed INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+    async def pending_formula(self, guild_id: int) -> Optional[str]:
+        """Formula of an unfinished job for this guild, if any"""
+        async with aiosqlite.connect(self.db_path) as db:
+            await self._ensure_checkpoint_table(db)
+            async with db.execute("SELECT formula FROM level_recompute_jobs WHERE guild_id = ?", (guild_id,)) as cursor:
+                row = await cursor.fetchone()
+        return row[0] if row else None
+
+    def _compute_chunk(self, rows: List[Tuple[int, int, int, int]], formula: str,
+                       reward_levels: List[int]) -> Tuple[List[tuple], List[int]]:
+        """Worker-thread part: new levels, changed rows and reward-tier changes"""
+        new_levels = compute_levels([row[1] for row in rows], formula, self.level_from_xp)
+        # Level thresholds are few, so xp_for_level goes through a small lookup
+        thresholds: Dict[int, int] = {}
+        updates, reward_changes = [], []
+        for (user_id, total_xp, old_level, old_xp), new_level in zip(rows, new_levels):
+            old_level = old_level or 0
+            threshold = thresholds.get(new_level)
+            if threshold is None:
+                threshold = thresholds[new_level] = self.xp_for_level(new_level, formula)
+            # A row whose level is unchanged can still hold in-level xp from the old formula
+            new_xp = (total_xp or 0) - threshold
+            if new_level == old_level and new_xp == old_xp:
+                continue
+            updates.append((new_level, new_xp, user_id, total_xp))
+            if reward_levels and bisect_right(reward_levels, old_level) != bisect_right(reward_levels, new_level):
+                reward_changes.append(user_id)
+        return updates, reward_changes
+
+    async def run(self, guild_id: int, formula: str, reward_levels: Sequence[int] = (),
+                  progress: Optional[ProgressCallback] = None) -> RecomputeResult:
+        """
+        Recompute every stored level in ``guild_id`` with ``formula``.
+
+        ``reward_levels`` are the levels that unlock a reward role; members
+        who cross one of them are listed in ``result.reward_changes``.
+        """
+        if self.is_running(guild_id):
+            raise RuntimeError("A level recompute is already running for this guild")
+        task = asyncio.current_task()
+        if task is not None:
+            self._running[guild_id] = task
+        try:
+            return await self._run(guild_id, formula, sorted(set(reward_levels)), progress)
+        finally:
+            self._running.pop(guild_id, None)
+
+    async def _run(self, guild_id: int, formula: str, reward_levels: List[int],
+                   progress: Optional[ProgressCallback]) -> RecomputeResult:
+        started = time.perf_counter()
+        async with aiosqlite.connect(self.db_path) as db:
+            await self._ensure_checkpoint_table(db)
+            async with db.execute("SELECT COUNT(*) FROM user_levels WHERE guild_id = ?", (guild_id,)) as cursor:
+                result = RecomputeResult(guild_id, formula, (await cursor.fetchone())[0])
+
+            last_user_id = -1
+            async with db.execute(
+                "SELECT formula, last_user_id, processed, changed FROM level_recompute_jobs WHERE guild_id = ?",
+                (guild_id,)
+            ) as cursor:
+                checkpoint = await cursor.fetchone()
+            if checkpoint and checkpoint[0] == formula:
+                _, last_user_id, result.processed, result.changed = checkpoint
+                result.resumed = True
+
+            while True:
+                async with db.execute("""
+                    SELECT user_id, total_xp, level, xp FROM user_levels
+                    WHERE guild_id = ? AND user_id > ?
+                    ORDER BY user_id ASC
+                    LIMIT ?
+                """, (guild_id, last_user_id, self.chunk_size)) as cursor:
+                    rows = await cursor.fetchall()
+                if not rows:
+                    break
+
+                updates, reward_changes = await asyncio.to_thread(self._compute_chunk, rows, formula, reward_levels)
+                if updates:
+                    # total_xp guard: skip rows the XP ledger rewrote since they were read
+                    await db.executemany(
+                        "UPDATE user_levels SET level = ?, xp = ? WHERE guild_id = ? AND user_id = ? AND total_xp = ?",
+                        [(level, xp, guild_id, user_id, total_xp) for level, xp, user_id, total_xp in updates]
+                    )
+                last_user_id = rows[-1][0]
+                result.processed += len(rows)
+                result.changed += len(updates)
+                result.reward_changes.extend(reward_changes)
+                await db.execute("""
+                    INSERT INTO level_recompute_jobs (guild_id, formula, last_user_id, processed, changed)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(guild_id) DO UPDATE SET
+                        formula = excluded.formula,
+                        last_user_id = excluded.last_user_id,
+                        processed = excluded.processed,
+                        changed = excluded.changed
+                """, (guild_id, formula, last_user_id, result.processed, result.changed))
+                await db.commit()
+
+                result.elapsed = time.perf_counter() - started
+                if progress is not None:
+                    await progress(result)
+
+            await db.execute("DELETE FROM level_recompute_jobs WHERE guild_id = ?", (guild_id,))
+            await db.commit()
+
+        result.elapsed = time.perf_counter() - started
+        print(f"[LEVELING] Recomputed {result.processed:,} levels in guild {guild_id} "
+              f"({result.changed:,} changed, {result.rows_per_sec:,.0f} rows/s)")
+        return result
@@ -0,0 +1,284 @@
+"""
+Level reward role reconciliation.
+
+``assign_level_roles`` used to query ``level_roles`` twice and then issue
+separate ``add_roles`` / ``remove_roles`` calls, so a single level-up could
+cost several REST requests. The reconciler keeps each guild's reward table in
+memory, computes the member's full target role list and applies it with one
+``Member.edit(roles=...)`` call, and only when it differs from what the
+member already has.
+
+Roles the reconciler adds are recorded in ``level_role_grants``. A reward
+role above the member's level is only taken away when it was granted that
+way, so a higher role handed out by a moderator survives a level reset.
+
+Guild-wide resyncs (after a formula change or reset) walk ``user_levels`` in
+user_id order and store a checkpoint after every chunk, so an interrupted
+resync continues where it stopped.
+"""
+import asyncio
+from bisect import bisect_right
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import aiosqlite
+import discord
+
+DB_PATH = "db/leveling.db"
+
+ProgressCallback = Callable[[int, int, int], Awaitable[None]]
+
+
+class RewardTable:
+    """Sorted (level, role_id) rewards for one guild"""
+
+    __slots__ = ("levels", "role_ids", "all_role_ids")
+
+    def __init__(self, rows: Iterable[Tuple[int, int]]):
+        ordered = sorted(rows)
+        self.levels = [level for level, _ in ordered]
+        self.role_ids = [role_id for _, role_id in ordered]
+        self.all_role_ids = set(self.role_ids)
+
+    def __bool__(self):
+        return bool(self.role_ids)
+
+    def earned(self, level: int) -> List[int]:
+        """Reward role ids unlocked at or below ``level``, lowest first"""
+        return self.role_ids[:bisect_right(self.levels, level)]
+
+    def above(self, level: int) -> Set[int]:
+        """Reward role ids that need a higher level than ``level``"""
+        return set(self.role_ids[bisect_right(self.levels, level):]) - set(self.earned(level))
+
+
+def target_reward_roles(table: RewardTable, level: int, stack_roles: bool,
+                        remove_previous_roles: bool, granted: Set[int] = frozenset()) -> Tuple[Set[int], Set[int]]:
+    """
+    Return (wanted, unwanted) reward role ids for a member at ``level``.
+
+    Without stacking only the highest earned reward is kept. Earned rewards
+    outside ``wanted`` are removed unless roles stack and
+    ``remove_previous_roles`` is off, matching the old add/remove behaviour.
+    Rewards above the member's level are removed only if they are in
+    ``granted`` (added by the reconciler), so a lowered level is reflected
+    without touching roles given out by hand.
+    """
+    earned = table.earned(level)
+    if stack_roles:
+        wanted = set(earned)
+    else:
+        wanted = {earned[-1]} if earned else set()
+
+    unwanted = table.above(level) & set(granted)
+    if not (stack_roles and not remove_previous_roles):
+        unwanted |= set(earned) - wanted
+    return wanted, unwanted
+
+
+class LevelRoleReconciler:
+    """Applies level reward roles with at most one member edit per member"""
+
+    def __init__(self, db_path: str = DB_PATH, resync_chunk: int = 500):
+        self.db_path = db_path
+        self.resync_chunk = resync_chunk
+        self.tables: Dict[int, RewardTable] = {}
+        self._resyncs: Dict[int, asyncio.Task] = {}
+        self._grants_ready = False
+
+    # ---------- reward table ----------
+
+    def invalidate(self, guild_id: int):
+        """Call after ``level_roles`` changes for a guild"""
+        self.tables.pop(guild_id, None)
+
+    async def get_table(self, guild_id: int) -> RewardTable:
+        table = self.tables.get(guild_id)
+        if table is not None:
+            return table
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute("SELECT level, role_id FROM level_roles WHERE guild_id = ?", (guild_id,)) as cursor:
+                rows = await cursor.fetchall()
+        table = self.tables[guild_id] = RewardTable(rows)
+        return table
+
+    # ---------- single member ----------
+
+    async def _ensure_grants_table(self, db: aiosqlite.Connection):
+        if self._grants_ready:
+            return
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS level_role_grants (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                role_id INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, user_id, role_id)
+            )
+        """)
+        self._grants_ready = True
+
+    async def granted_roles(self, guild_id: int, user_id: int, role_ids: Iterable[int]) -> Set[int]:
+        """Which of ``role_ids`` were added to the member by the reconciler"""
+        role_ids = list(role_ids)
+        if not role_ids:
+            return set()
+        async with aiosqlite.connect(self.db_path) as db:
+            await self._ensure_grants_table(db)
+            placeholders = ",".join("?" * len(role_ids))
+            async with db.execute(
+                f"SELECT role_id FROM level_role_grants WHERE guild_id = ? AND user_id = ? AND role_id IN ({placeholders})",
+                (guild_id, user_id, *role_ids)
+            ) as cursor:
+                return {row[0] for row in await cursor.fetchall()}
+
+    async def _record_grants(self, guild_id: int, user_id: int, added: Set[int], removed: Set[int]):
+        async with aiosqlite.connect(self.db_path) as db:
+            await self._ensure_grants_table(db)
+            if added:
+                await db.executemany(
+                    "INSERT OR IGNORE INTO level_role_grants (guild_id, user_id, role_id) VALUES (?, ?, ?)",
+                    [(guild_id, user_id, role_id) for role_id in added]
+                )
+            if removed:
+                await db.executemany(
+                    "DELETE FROM level_role_grants WHERE guild_id = ? AND user_id = ? AND role_id = ?",
+                    [(guild_id, user_id, role_id) for role_id in removed]
+                )
+            await db.commit()
+
+    def plan(self, member: discord.Member, table: RewardTable, level: int,
+             settings: Dict, granted: Set[int] = frozenset()) -> Optional[List[discord.Role]]:
+        """Return the member's new role list, or None if nothing changes"""
+        guild = member.guild
+        wanted, unwanted = target_reward_roles(
+            table, level, settings.get('stack_roles', False), settings.get('remove_previous_roles', True), granted
+        )
+        current_ids = {role.id for role in member.roles}
+
+        to_add = []
+        for role_id in wanted - current_ids:
+            role = guild.get_role(role_id)
+            if role is not None and role.is_assignable():
+                to_add.append(role)
+        to_remove = unwanted & current_ids
+
+        if not to_add and not to_remove:
+            return None
+        # @everyone is implicit and must not be sent back
+        kept = [role for role in member.roles if not role.is_default() and role.id not in to_remove]
+        return kept + to_add
+
+    async def reconcile(self, member: discord.Member, level: int, settings: Dict,
+                        reason: Optional[str] = None) -> bool:
+        """Bring one member's reward roles in line with ``level``; True if an edit was made"""
+        table = await self.get_table(member.guild.id)
+        if not table:
+            return False
+        current_ids = {role.id for role in member.roles}
+        # Only a member holding rewards above their level needs the grant lookup
+        held_above = table.above(level) & current_ids
+        granted = await self.granted_roles(member.guild.id, member.id, held_above) if held_above else set()
+        roles = self.plan(member, table, level, settings, granted)
+        if roles is None:
+            return False
+        await member.edit(roles=roles, reason=reason or f"Level role update (level {level})")
+
+        new_ids = {role.id for role in roles}
+        added = (new_ids - current_ids) & table.all_role_ids
+        removed = (current_ids - new_ids) & table.all_role_ids
+        if added or removed:
+            await self._record_grants(member.guild.id, member.id, added, removed)
+        return True
+
+    # ---------- guild resync ----------
+
+    async def _ensure_checkpoint_table(self, db: aiosqlite.Connection):
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS level_role_resync (
+                guild_id INTEGER PRIMARY KEY,
+                last_user_id INTEGER NOT NULL,
+                checked INTEGER NOT NULL DEFAULT 0,
+                changed INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+    def is_resyncing(self, guild_id: int) -> bool:
+        task = self._resyncs.get(guild_id)
+        return task is not None and not task.done()
+
+    async def resync_guild(self, guild: discord.Guild, settings: Dict, resume: bool = True,
+                           progress: Optional[ProgressCallback] = None) -> Tuple[int, int]:
+        """
+        Reconcile every member with a ``user_levels`` row.
+
+        Returns (checked, changed). ``progress`` is awaited after each chunk
+        with (checked, changed, total). Members who left the guild are skipped.
+        """
+        if self.is_resyncing(guild.id):
+            raise RuntimeError("A level role resync is already running for this guild")
+        task = asyncio.current_task()
+        if task is not None:
+            self._resyncs[guild.id] = task
+        try:
+            return await self._resync(guild, settings, resume, progress)
+        finally:
+            self._resyncs.pop(guild.id, None)
+
+    async def _resync(self, guild: discord.Guild, settings: Dict, resume: bool,
+                      progress: Optional[ProgressCallback]) -> Tuple[int, int]:
+        self.invalidate(guild.id)
+        table = await self.get_table(guild.id)
+
+        async with aiosqlite.connect(self.db_path) as db:
+            await self._ensure_checkpoint_table(db)
+            last_user_id, checked, changed = -1, 0, 0
+            if resume:
+                async with db.execute(
+                    "SELECT last_user_id, checked, changed FROM level_role_resync WHERE guild_id = ?", (guild.id,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                if row:
+                    last_user_id, checked, changed = row
+            async with db.execute("SELECT COUNT(*) FROM user_levels WHERE guild_id = ?", (guild.id,)) as cursor:
+                total = (await cursor.fetchone())[0]
+
+            while True:
+                async with db.execute("""
+                    SELECT user_id, level FROM user_levels
+                    WHERE guild_id = ? AND user_id > ?
+                    ORDER BY user_id ASC
+                    LIMIT ?
+                """, (guild.id, last_user_id, self.resync_chunk)) as cursor:
+                    rows = await cursor.fetchall()
+                if not rows:
+                    break
+
+                for user_id, level in rows:
+                    checked += 1
+                    member = guild.get_member(user_id)
+                    if member is None or not table:
+                        continue
+                    try:
+                        if await self.reconcile(member, level or 0, settings, reason="Level role resync"):
+                            changed += 1
+                    except discord.NotFound:
+                        continue
+
+                last_user_id = rows[-1][0]
+                await db.execute("""
+                    INSERT INTO level_role_resync (guild_id, last_user_id, checked, changed)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(guild_id) DO UPDATE SET
+                        last_user_id = excluded.last_user_id,
+                        checked = excluded.checked,
+                        changed = excluded.changed
+                """, (guild.id, last_user_id, checked, changed))
+                await db.commit()
+                if progress is not None:
+                    await progress(checked, changed, total)
+
+            await db.execute("DELETE FROM level_role_resync WHERE guild_id = ?", (guild.id,))
+            await db.commit()
+        return checked, changed
+
+
+level_role_reconciler = LevelRoleReconciler()
@@ -0,0 +1,175 @@
+"""
+Shared link / invite scanner for the automod link filters.
+
+A message is tokenized in a single regex pass that yields both generic URLs
+and Discord invites (including common obfuscations such as ``discord . gg``,
+``discord[.]gg`` and markdown links). Domain allow/deny rules are compiled
+into a reversed-label trie so a lookup costs one step per label of the host
+instead of one step per configured rule.
+"""
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Separators people use to dodge naive ``discord.gg`` matching
+_DOT = r"(?:\s*\.\s*|\s*\[\s*(?:\.|dot)\s*\]\s*|\s*\(\s*(?:\.|dot)\s*\)\s*|\s*\{\s*(?:\.|dot)\s*\}\s*)"
+# Hosts of generic URLs only accept bracketed dots - plain spacing would glue
+# a URL to the start of the next sentence.
+_HOST_DOT = r"(?:\.|\[(?:\.|dot)\]|\((?:\.|dot)\)|\{(?:\.|dot)\})"
+_SLASH = r"\s*/\s*"
+
+_TOKEN_RE = re.compile(
+    r"(?P<invite>(?:https?://)?(?:www" + _DOT + r")?"
+    r"(?:discord(?:app)?" + _DOT + r"com" + _SLASH + r"invite"
+    r"|discord" + _DOT + r"(?:gg|io|me|li)"
+    r"|dsc" + _DOT + r"gg)"
+    + _SLASH + r"(?P<code>[A-Za-z0-9-]{2,32}))"
+    r"|(?P<url>https?://(?P<host>[\w-]+(?:" + _HOST_DOT + r"[\w-]+)*)(?::\d+)?(?P<path>[/?#][^\s<>\"'`]*)?)",
+    re.IGNORECASE,
+)
+_HOST_DOT_RE = re.compile(_HOST_DOT, re.IGNORECASE)
+_TRAILING_PUNCTUATION = ".,;:!?*_~|>"
+
+ALLOW = "allow"
+DENY = "deny"
+
+# Links that were always bypassed by Anti Link (GIF hosts and Spotify)
+DEFAULT_LINK_RULES: Tuple[Tuple[str, str], ...] = (
+    ("tenor.com", ALLOW),
+    ("*.tenor.com", ALLOW),
+    ("giphy.com", ALLOW),
+    ("*.giphy.com", ALLOW),
+    ("cdn.discordapp.com", ALLOW),
+    ("media.discordapp.net", ALLOW),
+    ("open.spotify.com", ALLOW),
+)
+
+
+class LinkToken(NamedTuple):
+    kind: str  # "url" or "invite"
+    text: str
+    host: str
+    code: Optional[str] = None
+    path: str = ""
+
+
+def _strip_url_tail(url: str) -> str:
+    """Drop punctuation / markdown closers that Discord would not treat as part of a URL"""
+    while url:
+        last = url[-1]
+        if last in _TRAILING_PUNCTUATION:
+            url = url[:-1]
+        elif last == ")" and url.count("(") < url.count(")"):
+            url = url[:-1]
+        elif last == "]" and url.count("[") < url.count("]"):
+            url = url[:-1]
+        else:
+            break
+    return url
+
+
+def scan_links(text: str) -> List[LinkToken]:
+    """Return every URL and Discord invite in ``text`` in order of appearance"""
+    if not text:
+        return []
+
+    tokens: List[LinkToken] = []
+    for match in _TOKEN_RE.finditer(text):
+        if match.group("invite"):
+            tokens.append(LinkToken("invite", match.group("invite"), "discord.gg", match.group("code")))
+            continue
+
+        raw = _strip_url_tail(match.group("url"))
+        host = normalize_domain(_HOST_DOT_RE.sub(".", match.group("host")))
+        # Everything after the host (port, path, query) - bracketed dots in the host would confuse urlsplit
+        path = urlsplit("//h" + raw[match.end("host") - match.start("url"):]).path
+        tokens.append(LinkToken("url", raw, host, None, path))
+    return tokens
+
+
+def normalize_domain(domain: str) -> str:
+    """Lower-case a host and strip ``www.`` / trailing dots so lookups are stable"""
+    domain = domain.strip().lower().rstrip(".")
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain
+
+
+class _TrieNode:
+    __slots__ = ("children", "exact", "wildcard")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.exact: Optional[str] = None
+        self.wildcard: Optional[str] = None
+
+
+class DomainTrie:
+    """
+    Reversed-label domain trie.
+
+    ``example.com`` only matches that exact host, ``*.example.com`` matches any
+    subdomain of it. When several rules cover a host the most specific one
+    wins, so ``deny sub.example.com`` overrides ``allow *.example.com``.
+    """
+
+    def __init__(self, rules: Iterable[Tuple[str, str]] = ()):
+        self._root = _TrieNode()
+        self._size = 0
+        for pattern, action in rules:
+            self.add(pattern, action)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, pattern: str, action: str):
+        pattern = normalize_domain(pattern)
+        wildcard = pattern.startswith("*.")
+        if wildcard:
+            pattern = pattern[2:]
+        if not pattern:
+            return
+
+        node = self._root
+        for label in reversed(pattern.split(".")):
+            node = node.children.setdefault(label, _TrieNode())
+
+        if wildcard:
+            if node.wildcard is None:
+                self._size += 1
+            node.wildcard = action
+        else:
+            if node.exact is None:
+                self._size += 1
+            node.exact = action
+
+    def lookup(self, host: str) -> Optional[str]:
+        """Return the action of the most specific rule covering ``host``, if any"""
+        labels = normalize_domain(host).split(".")
+        node = self._root
+        result = None
+        for index in range(len(labels) - 1, -1, -1):
+            node = node.children.get(labels[index])
+            if node is None:
+                return result
+            if index == 0:
+                return node.exact if node.exact is not None else result
+            if node.wildcard is not None:
+                result = node.wildcard
+        return result
+
+
+def compile_link_rules(rows: Iterable[Tuple[str, str]], include_defaults: bool = True) -> DomainTrie:
+    """Build a trie from ``(domain, action)`` rows, guild rules taking precedence over defaults"""
+    trie = DomainTrie(DEFAULT_LINK_RULES if include_defaults else ())
+    for domain, action in rows:
+        trie.add(domain, DENY if action == DENY else ALLOW)
+    return trie
+
+
+def is_link_allowed(token: LinkToken, rules: DomainTrie) -> bool:
+    """Whether a URL token is bypassed by the compiled rules (GIF files are always allowed)"""
+    action = rules.lookup(token.host)
+    if action is not None:
+        return action == ALLOW
+    return token.path.lower().endswith(".gif")
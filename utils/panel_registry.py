@@ -0,0 +1,220 @@
+"""
+Startup restore and background upkeep of deployed ticket panels.
+
+Panels are persistent views: once ``bot.add_view(view, message_id=...)`` has
+registered a panel's select by its ``custom_id``, interactions on the old
+message are routed to it, so nothing needs to be fetched or edited to bring a
+panel back after a restart. ``restore`` reads every deployed panel and its
+categories in two queries and registers the views without any REST call.
+
+Each panel row keeps ``content_hash``, a SHA-256 of the embed and components
+the panel renders to, and ``verified_at``. A background task works through
+the panels under a request budget (``verify_rate`` calls per second):
+
+* a panel whose rendering no longer matches its stored hash (its config or
+  categories changed, or it predates the hash) is edited in place - one call,
+* any other panel not checked for ``verify_interval`` is fetched once to see
+  that the message still exists,
+* a panel whose message or channel is gone is undeployed: its view is
+  dropped and ``channel_id`` / ``message_id`` are cleared. The panel's
+  configuration and categories are kept so it can be deployed again.
+
+Panels found stale at startup are handled before routine checks; the
+comparison runs in the background so ``restore`` only builds views.
+"""
+import asyncio
+import hashlib
+import json
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiosqlite
+import discord
+
+from utils.ticket_config import CATEGORY_ORDER, CategoryConfig, PanelConfig, TicketConfigStore, fetch
+
+ViewFactory = Callable[[int, List[CategoryConfig]], discord.ui.View]
+EmbedFactory = Callable[[PanelConfig, List[CategoryConfig]], discord.Embed]
+
+# Category fields a panel's embed and select are built from; the rest keep their defaults
+PANEL_CATEGORY_COLUMNS = "category_id, panel_id, category_name, category_emoji, category_description"
+
+
+def render_hash(embed: discord.Embed, view: discord.ui.View) -> str:
+    """Hash of the message payload a panel renders to"""
+    payload = {"embed": embed.to_dict(), "components": view.to_components()}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class PanelRegistry:
+    """Registers deployed panel views and keeps their messages in line with the config"""
+
+    def __init__(self, bot, config: TicketConfigStore, build_view: ViewFactory, build_embed: EmbedFactory,
+                 verify_rate: float = 1.0, verify_interval: float = 7 * 86400,
+                 clock: Callable[[], float] = time.time):
+        self.bot = bot
+        self.config = config
+        self.db_path = config.db_path
+        self.build_view = build_view
+        self.build_embed = build_embed
+        self.verify_rate = verify_rate
+        self.verify_interval = verify_interval
+        self.clock = clock
+        self.views: Dict[int, discord.ui.View] = {}
+        # Panels found stale after a restore, verified before anything else
+        self.pending: Dict[int, None] = {}
+        self._restored: List[Tuple[PanelConfig, List[CategoryConfig]]] = []
+        self._next_call = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- lifecycle ----------
+
+    async def restore(self) -> int:
+        """Register every deployed panel's view; returns the number registered"""
+        async with aiosqlite.connect(self.db_path) as db:
+            panels = await fetch(db, PanelConfig, "SELECT * FROM ticket_panels WHERE message_id IS NOT NULL")
+            # Same order as get_panel_categories, so options line up with a fresh deploy
+            rows = await fetch(db, CategoryConfig, f"""
+                SELECT {PANEL_CATEGORY_COLUMNS} FROM ticket_categories
+                ORDER BY panel_id, {CATEGORY_ORDER}
+            """)
+        categories: Dict[int, List[CategoryConfig]] = {}
+        for category in rows:
+            categories.setdefault(category.panel_id, []).append(category)
+
+        for index, panel in enumerate(panels):
+            view = self.build_view(panel.panel_id, categories.get(panel.panel_id, []))
+            self.bot.add_view(view, message_id=panel.message_id)
+            self.views[panel.panel_id] = view
+            if index % 500 == 499:
+                await asyncio.sleep(0)  # don't hold up the gateway if already connected
+        # Hashes are compared by the verifier, off the startup path
+        self._restored = [(panel, categories.get(panel.panel_id, [])) for panel in panels]
+        return len(panels)
+
+    async def _find_stale(self, batch: int = 200):
+        """Queue restored panels whose rendering differs from their stored hash"""
+        restored, self._restored = self._restored, []
+        for index, (panel, categories) in enumerate(restored):
+            view = self.views.get(panel.panel_id)
+            if view is not None and panel.content_hash != render_hash(self.build_embed(panel, categories), view):
+                self.pending[panel.panel_id] = None
+            if index % batch == batch - 1:
+                await asyncio.sleep(0)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._verify_loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def deployed(self, panel_id: int, message_id: int, embed: discord.Embed, view: discord.ui.View):
+        """Record a panel just sent as ``message_id`` with this embed and view"""
+        self.views[panel_id] = view
+        self.pending.pop(panel_id, None)
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("""
+                UPDATE ticket_panels SET content_hash = ?, verified_at = ?
+                WHERE panel_id = ? AND message_id = ?
+            """, (render_hash(embed, view), self.clock(), panel_id, message_id))
+            await db.commit()
+
+    # ---------- verification ----------
+
+    async def _verify_loop(self):
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                if self._restored:
+                    await self._find_stale()
+                due = list(self.pending) or await self._due()
+                if not due:
+                    await asyncio.sleep(min(self.verify_interval, 3600))
+                    continue
+                for panel_id in due:
+                    await self._throttle()
+                    await self.verify(panel_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print(f"[TICKETS] Panel verification failed: {traceback.format_exc()}")
+                await asyncio.sleep(60)
+
+    async def _due(self, limit: int = 100) -> List[int]:
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute("""
+                SELECT panel_id FROM ticket_panels
+                WHERE message_id IS NOT NULL AND (verified_at IS NULL OR verified_at < ?)
+                ORDER BY verified_at LIMIT ?
+            """, (self.clock() - self.verify_interval, limit)) as cursor:
+                return [row[0] for row in await cursor.fetchall()]
+
+    async def _throttle(self):
+        now = time.monotonic()
+        if self._next_call > now:
+            await asyncio.sleep(self._next_call - now)
+        self._next_call = max(now, self._next_call) + 1 / self.verify_rate
+
+    async def verify(self, panel_id: int) -> str:
+        """
+        Check one panel against Discord with a single request. Returns
+        "edited", "ok", "pruned", "skipped" or "missing" (no such deployed panel).
+        """
+        self.pending.pop(panel_id, None)
+        # Read fresh rather than from the config cache: content_hash and
+        # verified_at are only ever written here
+        async with aiosqlite.connect(self.db_path) as db:
+            rows = await fetch(db, PanelConfig, "SELECT * FROM ticket_panels WHERE panel_id = ?", (panel_id,))
+            if not rows or rows[0].message_id is None:
+                return "missing"
+            panel = rows[0]
+            categories = await fetch(db, CategoryConfig, f"""
+                SELECT {PANEL_CATEGORY_COLUMNS} FROM ticket_categories WHERE panel_id = ?
+                ORDER BY {CATEGORY_ORDER}
+            """, (panel_id,))
+
+        embed = self.build_embed(panel, categories)
+        view = self.build_view(panel_id, categories)
+        digest = render_hash(embed, view)
+        message = self.bot.get_partial_messageable(panel.channel_id).get_partial_message(panel.message_id)
+        try:
+            if digest != panel.content_hash:
+                await message.edit(embed=embed, view=view)
+                self.views[panel_id] = view
+                result = "edited"
+            else:
+                await message.fetch()
+                result = "ok"
+        except discord.NotFound:
+            await self.prune(panel_id, panel.message_id)
+            return "pruned"
+        except discord.HTTPException as e:
+            # No access right now (or an API error); look again next interval
+            print(f"[TICKETS] Could not verify panel {panel_id}: {e}")
+            digest = panel.content_hash
+            result = "skipped"
+
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("""
+                UPDATE ticket_panels SET content_hash = ?, verified_at = ?
+                WHERE panel_id = ? AND message_id = ?
+            """, (digest, self.clock(), panel_id, panel.message_id))
+            await db.commit()
+        return result
+
+    async def prune(self, panel_id: int, message_id: int):
+        """Forget a panel's dead message; the panel itself stays configured"""
+        view = self.views.pop(panel_id, None)
+        if view is not None:
+            view.stop()
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("""
+                UPDATE ticket_panels SET channel_id = NULL, message_id = NULL, content_hash = NULL
+                WHERE panel_id = ? AND message_id = ?
+            """, (panel_id, message_id))
+            await db.commit()
+        self.config.invalidate_panel(panel_id)
@@ -0,0 +1,230 @@
+"""
+Rank card rendering off the event loop.
+
+Cards are drawn by a small process pool. Each worker loads its fonts once
+and memoizes the static layer (background, panel, bar trough) per theme, so
+a request only draws the avatar, the text and the progress bar. Avatars are
+downloaded once per avatar hash and kept as ready-made circular thumbnails in
+the parent process; workers get the small thumbnail PNG instead of the
+original image.
+"""
+import asyncio
+import io
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, NamedTuple, Optional, Tuple
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+import discord
+
+CARD_SIZE = (934, 282)
+AVATAR_SIZE = 192
+FONT_CANDIDATES = (
+    "./data/fonts/rank.ttf",
+    "./data/ship/font.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+)
+
+
+class RankCardTheme(NamedTuple):
+    background: Tuple[int, int, int] = (24, 25, 28)
+    panel: Tuple[int, int, int] = (35, 39, 42)
+    accent: Tuple[int, int, int] = (0, 111, 185)
+    trough: Tuple[int, int, int] = (72, 75, 78)
+    text: Tuple[int, int, int] = (255, 255, 255)
+    muted: Tuple[int, int, int] = (170, 172, 176)
+
+
+class RankCardData(NamedTuple):
+    name: str
+    level: int
+    rank: int
+    xp_progress: int
+    xp_needed: int
+    total_xp: int
+
+
+DEFAULT_THEME = RankCardTheme()
+
+
+# ---------- worker process ----------
+
+_fonts: Dict[int, "ImageFont.ImageFont"] = {}
+_static_layers: "OrderedDict[RankCardTheme, Image.Image]" = OrderedDict()
+_avatar_mask: Optional["Image.Image"] = None
+
+
+def _init_worker():
+    global _avatar_mask
+    for size in (24, 32, 44):
+        _font(size)
+    _avatar_mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
+    ImageDraw.Draw(_avatar_mask).ellipse((0, 0, AVATAR_SIZE - 1, AVATAR_SIZE - 1), fill=255)
+
+
+def _font(size: int):
+    font = _fonts.get(size)
+    if font is None:
+        for path in FONT_CANDIDATES:
+            if os.path.exists(path):
+                font = ImageFont.truetype(path, size)
+                break
+        else:
+            font = ImageFont.load_default(size=size)
+        _fonts[size] = font
+    return font
+
+
+def _static_layer(theme: RankCardTheme) -> "Image.Image":
+    layer = _static_layers.get(theme)
+    if layer is not None:
+        _static_layers.move_to_end(theme)
+        return layer
+
+    width, height = CARD_SIZE
+    layer = Image.new("RGBA", CARD_SIZE, theme.background + (255,))
+    draw = ImageDraw.Draw(layer)
+    draw.rounded_rectangle((16, 16, width - 16, height - 16), radius=24, fill=theme.panel + (255,))
+    draw.rounded_rectangle((256, 196, width - 48, 232), radius=18, fill=theme.trough + (255,))
+    # Ring behind the avatar
+    draw.ellipse((40, 37, 40 + AVATAR_SIZE + 16, 37 + AVATAR_SIZE + 16), fill=theme.accent + (255,))
+
+    _static_layers[theme] = layer
+    while len(_static_layers) > 16:
+        _static_layers.popitem(last=False)
+    return layer
+
+
+def _make_thumbnail(avatar_bytes: bytes) -> bytes:
+    avatar = Image.open(io.BytesIO(avatar_bytes)).convert("RGBA")
+    avatar = avatar.resize((AVATAR_SIZE, AVATAR_SIZE), Image.Resampling.LANCZOS)
+    avatar.putalpha(_avatar_mask)
+    output = io.BytesIO()
+    avatar.save(output, "PNG", compress_level=1)
+    return output.getvalue()
+
+
+def _short(value: int) -> str:
+    for divisor, suffix in ((1_000_000_000, "B"), (1_000_000, "M"), (1_000, "K")):
+        if value >= divisor:
+            return f"{value / divisor:.1f}{suffix}"
+    return str(value)
+
+
+def render_card(data: RankCardData, theme: RankCardTheme, thumbnail: Optional[bytes],
+                avatar_bytes: Optional[bytes]) -> Tuple[bytes, Optional[bytes]]:
+    """Runs in a worker: returns (png bytes, new thumbnail or None)"""
+    new_thumbnail = None
+    if thumbnail is None and avatar_bytes:
+        try:
+            thumbnail = new_thumbnail = _make_thumbnail(avatar_bytes)
+        except Exception:
+            thumbnail = None
+
+    card = _static_layer(theme).copy()
+    if thumbnail is not None:
+        avatar = Image.open(io.BytesIO(thumbnail)).convert("RGBA")
+        card.alpha_composite(avatar, (48, 45))
+
+    draw = ImageDraw.Draw(card)
+    width = CARD_SIZE[0]
+    name = data.name if len(data.name) <= 24 else data.name[:23] + "…"
+    draw.text((256, 120), name, font=_font(44), fill=theme.text + (255,), anchor="ls")
+    draw.text((width - 48, 72), f"RANK #{data.rank:,}   LEVEL {data.level:,}",
+              font=_font(32), fill=theme.accent + (255,), anchor="rs")
+    draw.text((width - 48, 180), f"{_short(data.xp_progress)} / {_short(data.xp_needed)} XP",
+              font=_font(24), fill=theme.muted + (255,), anchor="rs")
+    draw.text((256, 180), f"{_short(data.total_xp)} total XP", font=_font(24),
+              fill=theme.muted + (255,), anchor="ls")
+
+    ratio = min(1.0, max(0.0, data.xp_progress / data.xp_needed)) if data.xp_needed > 0 else 1.0
+    bar_right = 256 + int((width - 48 - 256) * ratio)
+    if bar_right - 256 >= 36:
+        draw.rounded_rectangle((256, 196, bar_right, 232), radius=18, fill=theme.accent + (255,))
+
+    output = io.BytesIO()
+    card.save(output, "PNG", compress_level=1)
+    return output.getvalue(), new_thumbnail
+
+
+# ---------- event loop side ----------
+
+class RankCardRenderer:
+    """Renders rank cards in a process pool with cached avatar thumbnails"""
+
+    def __init__(self, workers: int = 2, max_avatars: int = 1024):
+        self.workers = workers
+        self.max_avatars = max_avatars
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._avatars: "OrderedDict[str, bytes]" = OrderedDict()
+
+    @property
+    def available(self) -> bool:
+        return PIL_AVAILABLE
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, func, *args):
+        """Result of ``func(*args)`` in the pool; ``func`` must be importable by the workers"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_pool(), func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool and try once more
+            self.shutdown()
+            return await loop.run_in_executor(self._get_pool(), func, *args)
+
+    async def render(self, member: discord.abc.User, data: RankCardData,
+                     theme: RankCardTheme = DEFAULT_THEME) -> Optional[discord.File]:
+        """Return the rank card as a ``discord.File`` named rank.png, or None if it can't be drawn"""
+        if not PIL_AVAILABLE:
+            return None
+
+        asset = member.display_avatar
+        avatar_key = asset.key
+        thumbnail = self._avatars.get(avatar_key)
+        avatar_bytes = None
+        if thumbnail is not None:
+            self._avatars.move_to_end(avatar_key)
+        else:
+            try:
+                avatar_bytes = await asset.replace(size=256, static_format="png").read()
+            except (discord.HTTPException, discord.NotFound, ValueError):
+                avatar_bytes = None
+
+        try:
+            png, new_thumbnail = await self.run(render_card, data, theme, thumbnail, avatar_bytes)
+        except Exception as e:
+            print(f"[LEVELING] Rank card render failed: {e}")
+            return None
+
+        if new_thumbnail is not None:
+            self._avatars[avatar_key] = new_thumbnail
+            while len(self._avatars) > self.max_avatars:
+                self._avatars.popitem(last=False)
+        return discord.File(io.BytesIO(png), filename="rank.png")
+
+
+_renderer: Optional[RankCardRenderer] = None
+
+
+def get_rank_card_renderer() -> RankCardRenderer:
+    global _renderer
+    if _renderer is None:
+        _renderer = RankCardRenderer()
+    return _renderer
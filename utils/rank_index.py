@@ -0,0 +1,212 @@
+"""
+Per-guild order-statistics index for leveling ranks.
+
+``level rank`` used to run ``COUNT(*)`` over the guild's ``user_levels`` rows
+for every request. The index keeps every member with XP in a bucketed sorted
+list whose bucket sizes are tracked by a Fenwick tree, so "rank of user" and
+"user at rank k" are both logarithmic. It is built lazily from the database
+the first time a guild is queried and is then kept current from the XP
+ledger's change notifications.
+"""
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+import aiosqlite
+
+# Keys pack (xp DESC, user_id ASC) into one int: -xp * 2**64 + user_id
+_SHIFT = 1 << 64
+
+
+def _key(xp: int, user_id: int) -> int:
+    return -xp * _SHIFT + user_id
+
+
+def _unkey(key: int) -> Tuple[int, int]:
+    xp, user_id = divmod(key, _SHIFT)
+    return user_id, -xp
+
+
+class OrderStatisticList:
+    """Sorted list of ints split into buckets, with a Fenwick tree over bucket sizes"""
+
+    def __init__(self, values=(), load: int = 512):
+        self._load = load
+        ordered = sorted(values)
+        self._buckets: List[List[int]] = [ordered[i:i + load] for i in range(0, len(ordered), load)]
+        self._maxes: List[int] = [bucket[-1] for bucket in self._buckets]
+        self._size = len(ordered)
+        self._rebuild_tree()
+
+    def __len__(self):
+        return self._size
+
+    def _rebuild_tree(self):
+        tree = [0] + [len(bucket) for bucket in self._buckets]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, index: int, delta: int):
+        index += 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, index: int) -> int:
+        """Number of values in buckets before ``index``"""
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def add(self, value: int):
+        if not self._buckets:
+            self._buckets.append([value])
+            self._maxes.append(value)
+            self._size = 1
+            self._rebuild_tree()
+            return
+
+        pos = bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            pos -= 1
+            self._buckets[pos].append(value)
+            self._maxes[pos] = value
+        else:
+            insort(self._buckets[pos], value)
+        self._size += 1
+
+        if len(self._buckets[pos]) > self._load * 2:
+            bucket = self._buckets[pos]
+            half = len(bucket) // 2
+            self._buckets[pos:pos + 1] = [bucket[:half], bucket[half:]]
+            self._maxes[pos:pos + 1] = [bucket[half - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(pos, 1)
+
+    def remove(self, value: int) -> bool:
+        pos = bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            return False
+        bucket = self._buckets[pos]
+        index = bisect_left(bucket, value)
+        if index == len(bucket) or bucket[index] != value:
+            return False
+
+        del bucket[index]
+        self._size -= 1
+        if not bucket:
+            del self._buckets[pos]
+            del self._maxes[pos]
+            self._rebuild_tree()
+        else:
+            self._maxes[pos] = bucket[-1]
+            self._tree_add(pos, -1)
+        return True
+
+    def bisect_left(self, value: int) -> int:
+        """Number of stored values strictly less than ``value``"""
+        pos = bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            return self._size
+        return self._prefix(pos) + bisect_left(self._buckets[pos], value)
+
+    def __getitem__(self, k: int) -> int:
+        if k < 0:
+            k += self._size
+        if not 0 <= k < self._size:
+            raise IndexError("index out of range")
+
+        # Fenwick descent to the bucket holding the k-th value
+        pos = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= k:
+                pos = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return self._buckets[pos][k]
+
+
+class GuildRankIndex:
+    """Ranks for one guild; members with 0 XP are not stored, matching the SQL ranking"""
+
+    def __init__(self, rows=()):
+        self.xp: Dict[int, int] = {user_id: xp for user_id, xp in rows if xp > 0}
+        self._order = OrderStatisticList(_key(xp, user_id) for user_id, xp in self.xp.items())
+
+    def __len__(self):
+        return len(self._order)
+
+    def update(self, user_id: int, total_xp: int):
+        old = self.xp.pop(user_id, None)
+        if old is not None:
+            self._order.remove(_key(old, user_id))
+        if total_xp > 0:
+            self.xp[user_id] = total_xp
+            self._order.add(_key(total_xp, user_id))
+
+    def rank_of_xp(self, total_xp: int) -> int:
+        """1 + number of members with strictly more XP (ties share a rank)"""
+        return self._order.bisect_left(-total_xp * _SHIFT) + 1
+
+    def rank(self, user_id: int) -> int:
+        return self.rank_of_xp(self.xp.get(user_id, 0))
+
+    def at_rank(self, k: int) -> Optional[Tuple[int, int]]:
+        """(user_id, total_xp) of the k-th member (1-based) in leaderboard order"""
+        if not 1 <= k <= len(self._order):
+            return None
+        return _unkey(self._order[k - 1])
+
+
+class RankIndex:
+    """Lazily built per-guild rank indexes, kept current by an ``XPLedger``"""
+
+    def __init__(self, db_path: str, ledger=None):
+        self.db_path = db_path
+        self.ledger = ledger
+        self.guilds: Dict[int, GuildRankIndex] = {}
+        if ledger is not None:
+            ledger.listeners.append(self._on_xp_change)
+
+    def _on_xp_change(self, guild_id: int, user_id: Optional[int], total_xp: Optional[int]):
+        index = self.guilds.get(guild_id)
+        if index is None:
+            return
+        if total_xp is None:
+            # Rows were edited outside the ledger - rebuild on next use
+            self.guilds.pop(guild_id, None)
+        else:
+            index.update(user_id, total_xp)
+
+    def invalidate(self, guild_id: int):
+        self.guilds.pop(guild_id, None)
+
+    async def get(self, guild_id: int) -> GuildRankIndex:
+        index = self.guilds.get(guild_id)
+        if index is not None:
+            return index
+
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute(
+                "SELECT user_id, total_xp FROM user_levels WHERE guild_id = ? AND total_xp > 0",
+                (guild_id,)
+            )
+            rows = await cursor.fetchall()
+
+        if guild_id in self.guilds:
+            return self.guilds[guild_id]
+        index = GuildRankIndex(rows)
+        # Rows held by the ledger may be newer than what the query returned
+        if self.ledger is not None:
+            for (row_guild, user_id), row in self.ledger.rows.items():
+                if row_guild == guild_id:
+                    index.update(user_id, row.total_xp)
+        self.guilds[guild_id] = index
+        return index
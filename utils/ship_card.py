@@ -0,0 +1,88 @@
+"""
+Ship image rendering off the event loop.
+
+The ``ship`` command used to download both avatars with a blocking
+``requests.get``, draw on the event loop and save every result to one shared
+``data/ship/tmp_ship.png``. Avatars are now read through the asset API and
+the image is drawn in the rank card process pool, where each worker loads the
+template and fonts once, and sent from memory.
+"""
+import io
+import os
+from typing import Optional
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+import discord
+
+from utils.rank_card import get_rank_card_renderer
+
+SHIP_ASSETS = "./data/ship"
+
+
+# ---------- worker process ----------
+
+_ship_assets: Optional[tuple] = None
+
+
+def _load_ship_assets() -> tuple:
+    global _ship_assets
+    if _ship_assets is None:
+        template = Image.open(os.path.join(SHIP_ASSETS, "Template.png")).convert("RGBA")
+        fill = Image.open(os.path.join(SHIP_ASSETS, "Tmpl_fill.png")).convert("RGBA")
+        font_path = os.path.join(SHIP_ASSETS, "font.ttf")
+        _ship_assets = (template, fill, ImageFont.truetype(font_path, 34), ImageFont.truetype(font_path, 80))
+    return _ship_assets
+
+
+def _ship_avatar(avatar_bytes: bytes) -> "Image.Image":
+    avatar = Image.open(io.BytesIO(avatar_bytes)).convert("RGBA")
+    flattened = Image.alpha_composite(Image.new("RGBA", avatar.size, (255, 255, 255, 255)), avatar)
+    return flattened.resize((150, 150), Image.Resampling.LANCZOS)
+
+
+def render_ship(author_avatar: bytes, user_avatar: bytes, author: str, user: str, rate: int) -> bytes:
+    """Runs in a worker: the ship image for two avatars as png bytes"""
+    template, fill, small_font, big_font = _load_ship_assets()
+    red = (191, 15, 0, 255)
+    white = (255, 255, 255, 255)
+
+    image = template.copy()
+    image.paste(_ship_avatar(author_avatar), (20, 50))
+    image.paste(_ship_avatar(user_avatar), (20, 312))
+
+    overlay = Image.new("RGBA", image.size, (255, 255, 255, 0))
+    offset = (100 - rate) * 2
+    bar = fill.crop((0, offset, fill.width, fill.height))
+    overlay.paste(bar, (image.width - bar.width - 1, 154 + offset))
+    draw = ImageDraw.Draw(overlay)
+    draw.text((20, 10), str(author), font=small_font, fill=red)
+    draw.text((20, 460), str(user), font=small_font, fill=red)
+    draw.text((330, 192), f"{rate}%", font=big_font, fill=white)
+
+    output = io.BytesIO()
+    Image.alpha_composite(image, overlay).save(output, "PNG", compress_level=1)
+    return output.getvalue()
+
+
+# ---------- event loop side ----------
+
+async def render_ship_file(user1: discord.abc.User, user2: discord.abc.User, rate: int) -> Optional[discord.File]:
+    """Return the ship image as a ``discord.File`` named ship.png, or None if it can't be drawn"""
+    if not PIL_AVAILABLE:
+        return None
+    try:
+        avatars = [await user.display_avatar.replace(size=256, static_format="png").read() for user in (user1, user2)]
+    except (discord.HTTPException, discord.NotFound, ValueError):
+        return None
+
+    try:
+        png = await get_rank_card_renderer().run(render_ship, avatars[0], avatars[1], user1.name, user2.name, rate)
+    except Exception as e:
+        print(f"[SHIP] Ship image render failed: {e}")
+        return None
+    return discord.File(io.BytesIO(png), filename="ship.png")
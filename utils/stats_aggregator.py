@@ -0,0 +1,159 @@
+"""
+Write-behind hourly aggregates for the stats database.
+
+``message_stats`` and ``voice_stats`` hold one row per (guild, user, channel,
+UTC date, hour). Instead of a read-modify-write per message, increments are
+summed in memory under that key and flushed periodically as a single batch of
+``INSERT ... ON CONFLICT DO UPDATE`` increments in one transaction. A failed
+flush puts its increments back so nothing is lost or counted twice.
+
+Voice time is credited from real join/leave timestamps and split on hour
+boundaries, so a session spanning several hours lands in each hour it covered.
+"""
+import asyncio
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import aiosqlite
+
+StatsKey = Tuple[int, int, int, str, int]  # guild_id, user_id, channel_id, date, hour
+
+
+def stats_key(guild_id: int, user_id: int, channel_id: int, moment: datetime) -> StatsKey:
+    moment = moment.astimezone(timezone.utc)
+    return (guild_id, user_id, channel_id, moment.strftime("%Y-%m-%d"), moment.hour)
+
+
+def split_by_hour(start: datetime, end: datetime) -> List[Tuple[datetime, float]]:
+    """Split [start, end) into (hour start, seconds) pieces on UTC hour boundaries"""
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    pieces = []
+    cursor = start.astimezone(timezone.utc)
+    end = end.astimezone(timezone.utc)
+    while cursor < end:
+        next_hour = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        piece_end = min(end, next_hour)
+        pieces.append((cursor, (piece_end - cursor).total_seconds()))
+        cursor = piece_end
+    return pieces
+
+
+class StatsAggregator:
+    """Accumulates message and voice stats per hour and flushes them in batches"""
+
+    def __init__(self, db_path: str, flush_interval: float = 10.0, max_pending: int = 5000):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # key -> [count, characters, words, attachments, mentions]
+        self.messages: Dict[StatsKey, List[int]] = {}
+        # key -> voice seconds
+        self.voice: Dict[StatsKey, float] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._early_flush: Optional[asyncio.Task] = None
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                print(f"[STATS] Stats flush failed: {traceback.format_exc()}")
+
+    def _maybe_flush_early(self):
+        """Start a flush ahead of schedule when a burst fills the buffer"""
+        if len(self.messages) + len(self.voice) < self.max_pending:
+            return
+        if self._early_flush is None or self._early_flush.done():
+            self._early_flush = asyncio.create_task(self._flush_quietly())
+
+    async def _flush_quietly(self):
+        try:
+            await self.flush()
+        except Exception:
+            print(f"[STATS] Stats flush failed: {traceback.format_exc()}")
+
+    # ---------- recording ----------
+
+    def add_message(self, guild_id: int, user_id: int, channel_id: int, moment: datetime,
+                    characters: int = 0, words: int = 0, attachments: int = 0, mentions: int = 0):
+        key = stats_key(guild_id, user_id, channel_id, moment)
+        row = self.messages.get(key)
+        if row is None:
+            self.messages[key] = [1, characters, words, attachments, mentions]
+        else:
+            row[0] += 1
+            row[1] += characters
+            row[2] += words
+            row[3] += attachments
+            row[4] += mentions
+        self._maybe_flush_early()
+
+    def add_voice(self, guild_id: int, user_id: int, channel_id: int, start: datetime, end: datetime):
+        """Credit a voice session [start, end) to the hours it covered"""
+        for hour_start, seconds in split_by_hour(start, end):
+            key = stats_key(guild_id, user_id, channel_id, hour_start)
+            self.voice[key] = self.voice.get(key, 0.0) + seconds
+        self._maybe_flush_early()
+
+    # ---------- persistence ----------
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.messages and not self.voice:
+                return
+            messages, self.messages = self.messages, {}
+            voice, self.voice = self.voice, {}
+            try:
+                async with aiosqlite.connect(self.db_path) as db:
+                    if messages:
+                        await db.executemany("""
+                            INSERT INTO message_stats
+                            (guild_id, user_id, channel_id, date, hour, count, characters, words, attachments, mentions)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(guild_id, user_id, channel_id, date, hour) DO UPDATE SET
+                                count = count + excluded.count,
+                                characters = characters + excluded.characters,
+                                words = words + excluded.words,
+                                attachments = attachments + excluded.attachments,
+                                mentions = mentions + excluded.mentions
+                        """, [key + tuple(row) for key, row in messages.items()])
+                    if voice:
+                        await db.executemany("""
+                            INSERT INTO voice_stats
+                            (guild_id, user_id, channel_id, date, hour, duration, duration_minutes)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(guild_id, user_id, channel_id, date, hour) DO UPDATE SET
+                                duration = duration + excluded.duration,
+                                duration_minutes = duration_minutes + excluded.duration_minutes
+                        """, [key + (int(round(seconds)), seconds / 60) for key, seconds in voice.items()])
+                    await db.commit()
+            except Exception:
+                # Put the increments back so the next flush retries them
+                for key, row in messages.items():
+                    current = self.messages.get(key)
+                    if current is None:
+                        self.messages[key] = row
+                    else:
+                        for i, value in enumerate(row):
+                            current[i] += value
+                for key, seconds in voice.items():
+                    self.voice[key] = self.voice.get(key, 0.0) + seconds
+                raise
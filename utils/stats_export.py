@@ -0,0 +1,214 @@
+"""
+Streaming export of a guild's raw stats rows.
+
+Rows are read from ``message_stats`` / ``voice_stats`` and their rollup tiers
+in index order, one short keyset query per chunk (so SQLite never
+materialises or sorts the result, and no read stays open while a part is
+uploaded), encoded chunk by chunk and written to temporary part files:
+
+* CSV is gzip-compressed on the fly with one incremental compressor per part.
+* Parquet (needs pyarrow) writes one zstd-compressed row group per chunk.
+
+A part is closed before it would pass ``part_limit`` bytes, so each part can
+be uploaded on its own; every part is a complete file (CSV parts repeat the
+header). ``export_stats`` yields finished parts one at a time and deletes each
+when the caller moves on, so memory and disk use stay at about one chunk and
+one part whatever the length of the history.
+
+Hourly rows carry their hour; rows already rolled up carry ``hour`` NULL and
+``granularity`` "day" or "month" (dated on the first of the month).
+"""
+import asyncio
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import zlib
+from typing import AsyncIterator, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import aiosqlite
+
+from utils.stats_rollup import STATS_TABLES, StatsRollup
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+EXPORT_FORMATS = ("csv", "parquet")
+CHUNK_ROWS = 50_000
+# Room left under the limit for data still buffered in the compressor / the parquet footer
+PART_MARGIN = 512 * 1024
+
+
+class ExportPart(NamedTuple):
+    path: str
+    filename: str
+    rows: int
+    size: int
+
+
+def export_columns(kind: str) -> Tuple[str, ...]:
+    _, columns = STATS_TABLES[kind]
+    return ("guild_id", "user_id", "channel_id", "date", "hour", "granularity") + columns
+
+
+async def iter_rows(db_path: str, kind: str, guild_id: int,
+                    chunk_rows: int = CHUNK_ROWS) -> AsyncIterator[List[tuple]]:
+    """Chunks of a guild's rows, oldest tier first, in ``export_columns`` order"""
+    table, columns = STATS_TABLES[kind]
+    values = ", ".join(columns)
+    width = len(export_columns(kind))
+    # Each tier is walked along an index that leads with guild_id, date; the key
+    # columns make the order total so a chunk resumes right after the previous one
+    tiers = [(f"{table}_monthly", "NULL", "month", ("date", "user_id", "channel_id")),
+             (f"{table}_daily", "NULL", "day", ("date", "user_id", "channel_id")),
+             (table, "hour", "hour", ("date", "rowid"))]
+    async with aiosqlite.connect(db_path) as db:
+        for source, hour, granularity, key in tiers:
+            async with db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                  (source,)) as cursor:
+                if await cursor.fetchone() is None:
+                    continue
+            key_columns = ", ".join(key)
+            select = f"""
+                SELECT guild_id, user_id, channel_id, date, {hour}, '{granularity}', {values}, {key_columns}
+                FROM {source}
+                WHERE guild_id = ? {{after}}
+                ORDER BY {key_columns}
+                LIMIT ?
+            """
+            first = select.format(after="")
+            following = select.format(after=f"AND ({key_columns}) > ({', '.join('?' * len(key))})")
+            last = None
+            while True:
+                # One short query per chunk, finished before the chunk is handed out: a read
+                # left open while the caller uploads a part would block every writer
+                if last is None:
+                    cursor = await db.execute(first, (guild_id, chunk_rows))
+                else:
+                    cursor = await db.execute(following, (guild_id, *last, chunk_rows))
+                async with cursor:
+                    rows = await cursor.fetchall()
+                if not rows:
+                    break
+                last = rows[-1][width:]
+                yield [row[:width] for row in rows]
+                if len(rows) < chunk_rows:
+                    break
+
+
+class _CsvGzipPart:
+    """One ``.csv.gz`` part file fed chunk by chunk"""
+
+    extension = "csv.gz"
+
+    def __init__(self, path: str, columns: Sequence[str]):
+        self.file = open(path, "wb")
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # gzip container
+        self.size = 0
+        self.write(None, [columns])
+
+    def write(self, _columns, rows: Iterable[Sequence]):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        data = self.compressor.compress(buffer.getvalue().encode("utf-8"))
+        self.file.write(data)
+        self.size += len(data)
+
+    def close(self) -> int:
+        data = self.compressor.flush()
+        self.file.write(data)
+        self.file.close()
+        return self.size + len(data)
+
+
+def _parquet_type(column: str):
+    if column in ("date", "granularity"):
+        return pa.string()
+    return pa.float64() if column == "duration_minutes" else pa.int64()
+
+
+class _ParquetPart:
+    """One ``.parquet`` part file, one row group per chunk"""
+
+    extension = "parquet"
+
+    def __init__(self, path: str, columns: Sequence[str]):
+        self.file = open(path, "wb")
+        # Explicit schema: a chunk of rolled-up rows has no hours to infer a type from
+        self.schema = pa.schema([(column, _parquet_type(column)) for column in columns])
+        self.writer = pq.ParquetWriter(self.file, self.schema, compression="zstd")
+        self.size = 0
+
+    def write(self, columns: Sequence[str], rows: List[Sequence]):
+        arrays = [pa.array(values, type=field.type) for field, values in zip(self.schema, zip(*rows))]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.size = self.file.tell()
+
+    def close(self) -> int:
+        self.writer.close()
+        size = self.file.tell()
+        self.file.close()
+        return size
+
+
+async def export_stats(db_path: str, kind: str, guild_id: int, fmt: str = "csv",
+                       part_limit: int = 25 * 1024 * 1024, chunk_rows: int = CHUNK_ROWS,
+                       rollup: Optional[StatsRollup] = None,
+                       directory: Optional[str] = None) -> AsyncIterator[ExportPart]:
+    """
+    Yield finished part files for a guild's ``kind`` ("message" or "voice")
+    stats. A part's file is removed once the caller asks for the next one
+    (or stops iterating), so upload it before moving on. Passing the
+    ``rollup`` holds compaction off while rows are read, so no row is seen
+    in two tiers or in none.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}")
+    if fmt == "parquet" and not PARQUET_AVAILABLE:
+        raise RuntimeError("Parquet export needs pyarrow")
+    part_cls = _CsvGzipPart if fmt == "csv" else _ParquetPart
+    columns = export_columns(kind)
+    workdir = tempfile.mkdtemp(prefix="stats_export_", dir=directory)
+    number = 0
+    part = None
+    part_rows = 0
+    grow = 0  # largest single-chunk growth seen, to close a part before it overflows
+
+    async def finish():
+        size = await asyncio.to_thread(part.close)
+        return ExportPart(path, f"stats_{guild_id}_{kind}_{number:03d}.{part_cls.extension}", part_rows, size)
+
+    try:
+        async with rollup.hold() if rollup is not None else contextlib.nullcontext(), \
+                contextlib.aclosing(iter_rows(db_path, kind, guild_id, chunk_rows)) as chunks:
+            async for rows in chunks:
+                if part is not None and part.size + grow + PART_MARGIN > part_limit:
+                    finished = await finish()
+                    part = None
+                    yield finished
+                    os.remove(finished.path)
+                if part is None:
+                    number += 1
+                    path = os.path.join(workdir, f"{kind}_{number:03d}.{part_cls.extension}")
+                    part = part_cls(path, columns)
+                    part_rows = 0
+                before = part.size
+                # Encoding and compression are CPU-bound; keep them off the event loop
+                await asyncio.to_thread(part.write, columns, rows)
+                part_rows += len(rows)
+                grow = max(grow, part.size - before)
+        if part is not None:
+            finished = await finish()
+            part = None
+            yield finished
+    finally:
+        if part is not None:
+            part.close()
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
@@ -0,0 +1,204 @@
+"""
+Rollup tiers and retention for the stats database.
+
+``message_stats`` / ``voice_stats`` keep hourly rows. A background job moves
+rows older than ``hourly_days`` into ``*_daily`` tables (one row per guild,
+user, channel and day) and daily rows older than ``daily_days`` into
+``*_monthly`` tables (dated on the first of the month). Rows are moved, not
+copied: each moment of activity lives in exactly one tier, so sums over the
+union of the tiers are unchanged by a rollup. Every step is an
+``INSERT ... SELECT ... ON CONFLICT DO UPDATE`` increment followed by a delete
+of the source rows in the same transaction, one day (or month) at a time.
+
+``source(kind, start)`` is the query router: it returns the table - or a
+``UNION ALL`` of tiers - that covers dates from ``start`` onwards, reading
+the coarser tiers only when the range actually reaches them. Recent ranges
+(today, 7/14/30 days) stay on the hourly table. Ranges reaching into the
+monthly tier count whole months, and ``COUNT(DISTINCT date)`` there counts
+months rather than days.
+"""
+import asyncio
+import traceback
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+import aiosqlite
+
+STATS_TABLES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "message": ("message_stats", ("count", "characters", "words", "attachments", "mentions")),
+    "voice": ("voice_stats", ("duration", "duration_minutes")),
+}
+
+
+class StatsRollup:
+    """Background compaction of the hourly stats tables plus the tier router"""
+
+    def __init__(self, db_path: str, hourly_days: int = 35, daily_days: int = 400,
+                 monthly_months: Optional[int] = None, interval: float = 6 * 3600):
+        if hourly_days < 31:
+            raise ValueError("hourly_days must cover the 30-day stats ranges")
+        self.db_path = db_path
+        self.hourly_days = hourly_days
+        self.daily_days = daily_days
+        self.monthly_months = monthly_months
+        self.interval = interval
+        # (kind, tier) -> first date the tier may still hold; older rows were rolled up
+        self.floors: Dict[Tuple[str, str], str] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- lifecycle ----------
+
+    async def start(self):
+        async with aiosqlite.connect(self.db_path) as db:
+            await self.ensure_tables(db)
+            async with db.execute("SELECT kind, tier, floor FROM stats_rollup_state") as cursor:
+                for kind, tier, floor in await cursor.fetchall():
+                    self.floors[(kind, tier)] = floor
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def hold(self):
+        """Async context manager that keeps compaction from moving rows while held"""
+        return self._lock
+
+    async def _loop(self):
+        await asyncio.sleep(60)
+        while True:
+            try:
+                result = await self.compact()
+                if any(result.values()):
+                    print(f"[STATS] Rollup: {result}")
+            except Exception:
+                print(f"[STATS] Rollup failed: {traceback.format_exc()}")
+            await asyncio.sleep(self.interval)
+
+    @staticmethod
+    async def ensure_tables(db: aiosqlite.Connection):
+        for kind, (table, columns) in STATS_TABLES.items():
+            definitions = ",\n".join(f"{column} {'REAL' if column == 'duration_minutes' else 'INTEGER'} DEFAULT 0"
+                                     for column in columns)
+            for tier in ("daily", "monthly"):
+                # date leads after guild_id so range scans stay on the primary key
+                await db.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table}_{tier} (
+                        guild_id INTEGER NOT NULL,
+                        date DATE NOT NULL,
+                        user_id INTEGER NOT NULL,
+                        channel_id INTEGER NOT NULL,
+                        {definitions},
+                        PRIMARY KEY (guild_id, date, user_id, channel_id)
+                    )
+                """)
+            await db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_guild_date ON {table} (guild_id, date)")
+            # Compaction walks the hourly table by date across all guilds
+            await db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_date ON {table} (date)")
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS stats_rollup_state (
+                kind TEXT NOT NULL,
+                tier TEXT NOT NULL,
+                floor DATE NOT NULL,
+                PRIMARY KEY (kind, tier)
+            )
+        """)
+        await db.commit()
+
+    # ---------- routing ----------
+
+    def source(self, kind: str, start: Optional[str] = None) -> str:
+        """
+        SQL table expression covering ``kind`` stats from ``start`` (a
+        YYYY-MM-DD string; None for all time) up to now, with the hourly
+        table's date-level columns.
+        """
+        table, columns = STATS_TABLES[kind]
+        tiers = [table]
+        hourly_floor = self.floors.get((kind, "hourly"))
+        daily_floor = self.floors.get((kind, "daily"))
+        if hourly_floor and (start is None or start < hourly_floor):
+            tiers.append(f"{table}_daily")
+        if daily_floor and (start is None or start < daily_floor):
+            tiers.append(f"{table}_monthly")
+        if len(tiers) == 1:
+            return table
+        select = ", ".join(("guild_id", "user_id", "channel_id", "date") + columns)
+        return "(" + " UNION ALL ".join(f"SELECT {select} FROM {tier}" for tier in tiers) + ")"
+
+    # ---------- compaction ----------
+
+    async def compact(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Run one compaction pass; returns rows moved/pruned per step"""
+        now = now or datetime.now(timezone.utc)
+        today = now.date()
+        hourly_cutoff = (today - timedelta(days=self.hourly_days)).isoformat()
+        # Only whole months go to the monthly tier
+        daily_cutoff = (today - timedelta(days=self.daily_days)).replace(day=1).isoformat()
+        result = {}
+        async with self._lock:
+            async with aiosqlite.connect(self.db_path) as db:
+                for kind in STATS_TABLES:
+                    result[f"{kind}_hourly"] = await self._roll(db, kind, "hourly", hourly_cutoff)
+                    result[f"{kind}_daily"] = await self._roll(db, kind, "daily", daily_cutoff)
+                    if self.monthly_months is not None:
+                        result[f"{kind}_pruned"] = await self._prune(db, kind, today)
+        return result
+
+    async def _roll(self, db: aiosqlite.Connection, kind: str, tier: str, cutoff: str) -> int:
+        """Move ``tier`` rows dated before ``cutoff`` into the next tier"""
+        table, columns = STATS_TABLES[kind]
+        source = table if tier == "hourly" else f"{table}_daily"
+        target = f"{table}_daily" if tier == "hourly" else f"{table}_monthly"
+        # Monthly rows are dated on the first of their month
+        bucket = "date" if tier == "hourly" else "substr(date, 1, 7) || '-01'"
+        sums = ", ".join(f"SUM({column})" for column in columns)
+        increments = ", ".join(f"{column} = {column} + excluded.{column}" for column in columns)
+        column_list = ", ".join(columns)
+
+        # The router must read the target tier before any row lands there
+        if self.floors.get((kind, tier), "") < cutoff:
+            self.floors[(kind, tier)] = cutoff
+
+        moved = 0
+        while True:
+            async with db.execute(f"SELECT MIN(date) FROM {source} WHERE date < ?", (cutoff,)) as cursor:
+                oldest = (await cursor.fetchone())[0]
+            if oldest is None:
+                break
+            # One day (or month) per transaction keeps the write lock short
+            if tier == "hourly":
+                low, high = oldest, (date.fromisoformat(oldest) + timedelta(days=1)).isoformat()
+            else:
+                first = date.fromisoformat(oldest).replace(day=1)
+                low = first.isoformat()
+                high = (first + timedelta(days=32)).replace(day=1).isoformat()
+            high = min(high, cutoff)
+            await db.execute(f"""
+                INSERT INTO {target} (guild_id, date, user_id, channel_id, {column_list})
+                SELECT guild_id, {bucket}, user_id, channel_id, {sums}
+                FROM {source}
+                WHERE date >= ? AND date < ?
+                GROUP BY guild_id, {bucket}, user_id, channel_id
+                ON CONFLICT(guild_id, date, user_id, channel_id) DO UPDATE SET {increments}
+            """, (low, high))
+            cursor = await db.execute(f"DELETE FROM {source} WHERE date >= ? AND date < ?", (low, high))
+            moved += cursor.rowcount
+            await db.execute("""
+                INSERT INTO stats_rollup_state (kind, tier, floor) VALUES (?, ?, ?)
+                ON CONFLICT(kind, tier) DO UPDATE SET floor = MAX(floor, excluded.floor)
+            """, (kind, tier, cutoff))
+            await db.commit()
+        return moved
+
+    async def _prune(self, db: aiosqlite.Connection, kind: str, today: date) -> int:
+        """Drop monthly rows past the retention window"""
+        table, _ = STATS_TABLES[kind]
+        month_index = today.year * 12 + today.month - 1 - self.monthly_months
+        cutoff = date(month_index // 12, month_index % 12 + 1, 1).isoformat()
+        cursor = await db.execute(f"DELETE FROM {table}_monthly WHERE date < ?", (cutoff,))
+        await db.commit()
+        return cursor.rowcount
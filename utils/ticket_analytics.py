@@ -0,0 +1,456 @@
+"""
+Incremental ticket analytics.
+
+Ticket statistics are kept as per-day aggregates instead of being derived by
+scanning ``tickets``:
+
+* ``ticket_daily_stats`` - per guild and UTC day: tickets opened, closed and
+  claimed, first staff responses, and the summed response / resolution
+  seconds of the tickets responded to / closed that day,
+* ``ticket_staff_daily_stats`` - the same per staff member (claims, closes,
+  first responses),
+* ``ticket_latency_sketch`` - per guild, day and metric (``response`` or
+  ``resolution``), a histogram of durations in logarithmic buckets. Buckets
+  of any range of days add up, and a percentile read from them is within
+  ``ACCURACY`` (1%) of the exact one. ``ticket_latency_sketch_monthly``
+  holds the same per month, so a range reads whole months from there and
+  only the days of its first, partial month from the daily sketch.
+
+The ``record_*`` functions are the ticket lifecycle transitions: each updates
+the ticket row and the aggregates on the caller's connection, so both commit
+together. A transition that already happened (a second close, a later staff
+reply) changes nothing, so aggregates always match what a full scan of
+``tickets`` would count. ``rebuild`` recomputes them by such a scan.
+
+Timestamps are UTC strings in SQLite's ``CURRENT_TIMESTAMP`` format; durations
+are whole seconds.
+"""
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import aiosqlite
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+ACCURACY = 0.01
+GAMMA = (1 + ACCURACY) / (1 - ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+METRICS = ("response", "resolution")
+
+
+def timestamp(moment: Optional[datetime] = None) -> str:
+    """``moment`` (default now) as a UTC timestamp string"""
+    moment = moment or datetime.now(timezone.utc)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime(TIME_FORMAT)
+
+
+def _seconds(value: str) -> int:
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def duration(start: str, end: str) -> int:
+    return max(0, _seconds(end) - _seconds(start))
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "n/a"
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 86400:.1f}d"
+
+
+# ---------- latency sketch ----------
+
+def bucket(seconds: int) -> int:
+    """Sketch bucket of a duration: 0 holds zero, bucket b > 0 holds (GAMMA^(b-2), GAMMA^(b-1)]"""
+    if seconds <= 0:
+        return 0
+    return math.ceil(math.log(seconds) / _LOG_GAMMA) + 1
+
+
+def bucket_value(index: int) -> float:
+    """Representative duration of a bucket, within ACCURACY of anything in it"""
+    if index <= 0:
+        return 0.0
+    return 2 * GAMMA ** (index - 1) / (GAMMA + 1)
+
+
+def quantile(buckets: Sequence[Tuple[int, int]], q: float) -> Optional[float]:
+    """Nearest-rank quantile of (bucket, count) pairs sorted by bucket"""
+    total = sum(count for _, count in buckets)
+    if not total:
+        return None
+    rank = max(1, math.ceil(q * total))
+    seen = 0
+    for index, count in buckets:
+        seen += count
+        if seen >= rank:
+            return bucket_value(index)
+    return bucket_value(buckets[-1][0])
+
+
+# ---------- schema ----------
+
+async def create_tables(db: aiosqlite.Connection):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_daily_stats (
+            guild_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            opened INTEGER DEFAULT 0,
+            closed INTEGER DEFAULT 0,
+            claimed INTEGER DEFAULT 0,
+            responded INTEGER DEFAULT 0,
+            response_seconds INTEGER DEFAULT 0,
+            resolution_seconds INTEGER DEFAULT 0,
+            PRIMARY KEY (guild_id, date)
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_staff_daily_stats (
+            guild_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            staff_id INTEGER NOT NULL,
+            claimed INTEGER DEFAULT 0,
+            closed INTEGER DEFAULT 0,
+            responded INTEGER DEFAULT 0,
+            response_seconds INTEGER DEFAULT 0,
+            PRIMARY KEY (guild_id, date, staff_id)
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_latency_sketch (
+            guild_id INTEGER NOT NULL,
+            metric TEXT NOT NULL, -- response, resolution
+            date DATE NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER DEFAULT 0,
+            PRIMARY KEY (guild_id, metric, date, bucket)
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_latency_sketch_monthly (
+            guild_id INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            month TEXT NOT NULL, -- YYYY-MM
+            bucket INTEGER NOT NULL,
+            count INTEGER DEFAULT 0,
+            PRIMARY KEY (guild_id, metric, month, bucket)
+        )
+    """)
+
+
+async def _bump(db: aiosqlite.Connection, table: str, keys: Dict[str, object], deltas: Dict[str, int]):
+    columns = list(keys) + list(deltas)
+    await db.execute(f"""
+        INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})
+        ON CONFLICT ({", ".join(keys)}) DO UPDATE SET
+        {", ".join(f"{column} = {column} + excluded.{column}" for column in deltas)}
+    """, (*keys.values(), *deltas.values()))
+
+
+async def _sketch(db: aiosqlite.Connection, guild_id: int, metric: str, date: str, seconds: int):
+    index = bucket(seconds)
+    await _bump(db, "ticket_latency_sketch",
+                {"guild_id": guild_id, "metric": metric, "date": date, "bucket": index}, {"count": 1})
+    await _bump(db, "ticket_latency_sketch_monthly",
+                {"guild_id": guild_id, "metric": metric, "month": date[:7], "bucket": index}, {"count": 1})
+
+
+async def _drop_empty_day(db: aiosqlite.Connection, guild_id: int, date: str):
+    await db.execute("""
+        DELETE FROM ticket_daily_stats WHERE guild_id = ? AND date = ?
+        AND opened = 0 AND closed = 0 AND claimed = 0 AND responded = 0
+    """, (guild_id, date))
+
+
+# ---------- lifecycle transitions ----------
+
+async def record_open(db: aiosqlite.Connection, guild_id: int, at: str):
+    """Count a ticket just inserted with ``created_at = at``"""
+    await _bump(db, "ticket_daily_stats", {"guild_id": guild_id, "date": at[:10]}, {"opened": 1})
+
+
+async def record_discard(db: aiosqlite.Connection, ticket_id: int) -> bool:
+    """
+    Delete a ticket whose creation failed partway, undoing its ``record_open``.
+    Only a ticket nothing has happened to yet is discarded; returns whether it was.
+    """
+    async with db.execute("""
+        SELECT guild_id, created_at FROM tickets
+        WHERE ticket_id = ? AND status = 'open' AND claimed_by IS NULL AND first_response_at IS NULL
+    """, (ticket_id,)) as cursor:
+        row = await cursor.fetchone()
+    if row is None:
+        return False
+    guild_id, created_at = row
+    await db.execute("DELETE FROM tickets WHERE ticket_id = ?", (ticket_id,))
+    await _bump(db, "ticket_daily_stats", {"guild_id": guild_id, "date": created_at[:10]}, {"opened": -1})
+    await _drop_empty_day(db, guild_id, created_at[:10])
+    return True
+
+
+async def record_claim(db: aiosqlite.Connection, ticket_id: int, staff_id: int, at: str,
+                       status: Optional[str] = None) -> bool:
+    """
+    Set the ticket's claimer (and ``status``, if given). A claim by someone
+    else moves the ticket's claim from the previous claimer. Closed tickets
+    can't be claimed; returns whether the claim was made.
+    """
+    async with db.execute("SELECT guild_id, claimed_by, claimed_at FROM tickets WHERE ticket_id = ? AND status != 'closed'",
+                          (ticket_id,)) as cursor:
+        row = await cursor.fetchone()
+    if row is None:
+        return False
+    guild_id, previous_staff, previous_at = row
+    if status is None:
+        await db.execute("UPDATE tickets SET claimed_by = ?, claimed_at = ? WHERE ticket_id = ?",
+                         (staff_id, at, ticket_id))
+    else:
+        await db.execute("UPDATE tickets SET claimed_by = ?, claimed_at = ?, status = ? WHERE ticket_id = ?",
+                         (staff_id, at, status, ticket_id))
+    if previous_staff is not None and previous_at is not None:
+        previous_date = previous_at[:10]
+        await _bump(db, "ticket_daily_stats", {"guild_id": guild_id, "date": previous_date}, {"claimed": -1})
+        await _bump(db, "ticket_staff_daily_stats",
+                    {"guild_id": guild_id, "date": previous_date, "staff_id": previous_staff}, {"claimed": -1})
+        # A scan wouldn't produce rows that only held the moved claim
+        await _drop_empty_day(db, guild_id, previous_date)
+        await db.execute("""
+            DELETE FROM ticket_staff_daily_stats WHERE guild_id = ? AND date = ? AND staff_id = ?
+            AND claimed = 0 AND closed = 0 AND responded = 0
+        """, (guild_id, previous_date, previous_staff))
+    await _bump(db, "ticket_daily_stats", {"guild_id": guild_id, "date": at[:10]}, {"claimed": 1})
+    await _bump(db, "ticket_staff_daily_stats",
+                {"guild_id": guild_id, "date": at[:10], "staff_id": staff_id}, {"claimed": 1})
+    return True
+
+
+async def record_first_response(db: aiosqlite.Connection, ticket_id: int, staff_id: int, at: str) -> bool:
+    """Record a staff reply; only the first one to an open ticket counts. Returns whether it counted"""
+    cursor = await db.execute("""
+        UPDATE tickets SET first_response_at = ?, first_responder_id = ?
+        WHERE ticket_id = ? AND first_response_at IS NULL AND status != 'closed'
+    """, (at, staff_id, ticket_id))
+    if cursor.rowcount != 1:
+        return False
+    async with db.execute("SELECT guild_id, created_at FROM tickets WHERE ticket_id = ?", (ticket_id,)) as cursor:
+        guild_id, created_at = await cursor.fetchone()
+    seconds = duration(created_at, at)
+    date = at[:10]
+    await _bump(db, "ticket_daily_stats", {"guild_id": guild_id, "date": date},
+                {"responded": 1, "response_seconds": seconds})
+    await _bump(db, "ticket_staff_daily_stats", {"guild_id": guild_id, "date": date, "staff_id": staff_id},
+                {"responded": 1, "response_seconds": seconds})
+    await _sketch(db, guild_id, "response", date, seconds)
+    return True
+
+
+async def record_close(db: aiosqlite.Connection, ticket_id: int, closer_id: int, reason: str, at: str) -> bool:
+    """Close the ticket unless it already is; returns whether it was open"""
+    async with db.execute("SELECT guild_id, created_at FROM tickets WHERE ticket_id = ? AND status != 'closed'",
+                          (ticket_id,)) as cursor:
+        row = await cursor.fetchone()
+    if row is None:
+        return False
+    guild_id, created_at = row
+    seconds = duration(created_at, at)
+    await db.execute("""
+        UPDATE tickets SET status = 'closed', closed_by = ?, closed_at = ?, close_reason = ?, resolution_time = ?
+        WHERE ticket_id = ?
+    """, (closer_id, at, reason, seconds // 60, ticket_id))
+    date = at[:10]
+    await _bump(db, "ticket_daily_stats", {"guild_id": guild_id, "date": date},
+                {"closed": 1, "resolution_seconds": seconds})
+    await _bump(db, "ticket_staff_daily_stats", {"guild_id": guild_id, "date": date, "staff_id": closer_id},
+                {"closed": 1})
+    await _sketch(db, guild_id, "resolution", date, seconds)
+    return True
+
+
+# ---------- full scan ----------
+
+_DURATION = "MAX(0, CAST(strftime('%s', {end}) AS INTEGER) - CAST(strftime('%s', {start}) AS INTEGER))"
+_RESPONSE = _DURATION.format(start="created_at", end="first_response_at")
+_RESOLUTION = _DURATION.format(start="created_at", end="closed_at")
+
+
+async def rebuild(db: aiosqlite.Connection, guild_id: Optional[int] = None):
+    """Recompute the aggregates of one guild (every guild when None) from ``tickets``"""
+    await db.create_function("ticket_latency_bucket", 1, bucket, deterministic=True)
+    where, params = ("WHERE guild_id = ?", (guild_id,)) if guild_id is not None else ("", ())
+    scope = "AND guild_id = ?" if guild_id is not None else ""
+    for table in ("ticket_daily_stats", "ticket_staff_daily_stats", "ticket_latency_sketch",
+                  "ticket_latency_sketch_monthly"):
+        await db.execute(f"DELETE FROM {table} {where}", params)
+
+    # One row per (guild, day) and event; summed into the day's row
+    await db.execute(f"""
+        INSERT INTO ticket_daily_stats
+            (guild_id, date, opened, closed, claimed, responded, response_seconds, resolution_seconds)
+        SELECT guild_id, date, SUM(opened), SUM(closed), SUM(claimed), SUM(responded),
+               SUM(response_seconds), SUM(resolution_seconds)
+        FROM (
+            SELECT guild_id, date(created_at) AS date, 1 AS opened, 0 AS closed, 0 AS claimed,
+                   0 AS responded, 0 AS response_seconds, 0 AS resolution_seconds
+            FROM tickets WHERE created_at IS NOT NULL {scope}
+            UNION ALL
+            SELECT guild_id, date(closed_at), 0, 1, 0, 0, 0, {_RESOLUTION}
+            FROM tickets WHERE status = 'closed' AND closed_at IS NOT NULL {scope}
+            UNION ALL
+            SELECT guild_id, date(claimed_at), 0, 0, 1, 0, 0, 0
+            FROM tickets WHERE claimed_by IS NOT NULL AND claimed_at IS NOT NULL {scope}
+            UNION ALL
+            SELECT guild_id, date(first_response_at), 0, 0, 0, 1, {_RESPONSE}, 0
+            FROM tickets WHERE first_response_at IS NOT NULL {scope}
+        )
+        GROUP BY guild_id, date
+    """, params * 4)
+    await db.execute(f"""
+        INSERT INTO ticket_staff_daily_stats (guild_id, date, staff_id, claimed, closed, responded, response_seconds)
+        SELECT guild_id, date, staff_id, SUM(claimed), SUM(closed), SUM(responded), SUM(response_seconds)
+        FROM (
+            SELECT guild_id, date(claimed_at) AS date, claimed_by AS staff_id, 1 AS claimed, 0 AS closed,
+                   0 AS responded, 0 AS response_seconds
+            FROM tickets WHERE claimed_by IS NOT NULL AND claimed_at IS NOT NULL {scope}
+            UNION ALL
+            SELECT guild_id, date(closed_at), closed_by, 0, 1, 0, 0
+            FROM tickets WHERE status = 'closed' AND closed_at IS NOT NULL AND closed_by IS NOT NULL {scope}
+            UNION ALL
+            SELECT guild_id, date(first_response_at), first_responder_id, 0, 0, 1, {_RESPONSE}
+            FROM tickets WHERE first_response_at IS NOT NULL AND first_responder_id IS NOT NULL {scope}
+        )
+        GROUP BY guild_id, date, staff_id
+    """, params * 3)
+    await db.execute(f"""
+        INSERT INTO ticket_latency_sketch (guild_id, metric, date, bucket, count)
+        SELECT guild_id, metric, date, bucket, COUNT(*)
+        FROM (
+            SELECT guild_id, 'response' AS metric, date(first_response_at) AS date,
+                   ticket_latency_bucket({_RESPONSE}) AS bucket
+            FROM tickets WHERE first_response_at IS NOT NULL {scope}
+            UNION ALL
+            SELECT guild_id, 'resolution', date(closed_at), ticket_latency_bucket({_RESOLUTION})
+            FROM tickets WHERE status = 'closed' AND closed_at IS NOT NULL {scope}
+        )
+        GROUP BY guild_id, metric, date, bucket
+    """, params * 2)
+    await db.execute(f"""
+        INSERT INTO ticket_latency_sketch_monthly (guild_id, metric, month, bucket, count)
+        SELECT guild_id, metric, substr(date, 1, 7), bucket, SUM(count)
+        FROM ticket_latency_sketch {where}
+        GROUP BY guild_id, metric, substr(date, 1, 7), bucket
+    """, params)
+
+
+# ---------- dashboard queries ----------
+
+class TicketSummary(NamedTuple):
+    opened: int = 0
+    closed: int = 0
+    claimed: int = 0
+    responded: int = 0
+    avg_response: Optional[float] = None  # seconds
+    avg_resolution: Optional[float] = None
+    response_p50: Optional[float] = None
+    response_p90: Optional[float] = None
+    resolution_p50: Optional[float] = None
+    resolution_p90: Optional[float] = None
+
+
+class StaffSummary(NamedTuple):
+    staff_id: int
+    claimed: int
+    closed: int
+    responded: int
+    avg_response: Optional[float]
+
+
+class DayVolume(NamedTuple):
+    date: str
+    opened: int
+    closed: int
+
+
+def _next_month(start: str) -> str:
+    """First day of the month after ``start``'s"""
+    year, month = int(start[:4]), int(start[5:7]) + 1
+    if month > 12:
+        year, month = year + 1, 1
+    return f"{year:04d}-{month:02d}-01"
+
+
+async def _sketches(db: aiosqlite.Connection, guild_id: int, start: Optional[str]) -> Dict[str, List[Tuple[int, int]]]:
+    """Merged (bucket, count) pairs per metric from ``start`` on"""
+    if start is None or start.endswith("-01"):
+        # Whole months only
+        days, first_month = None, (start or "")[:7]
+    else:
+        days, first_month = _next_month(start), _next_month(start)[:7]
+    sql = """
+        SELECT metric, bucket, count FROM ticket_latency_sketch_monthly
+        WHERE guild_id = ? AND metric IN ('response', 'resolution') AND month >= ?
+    """
+    params: Tuple = (guild_id, first_month)
+    if days is not None:
+        sql += """
+        UNION ALL
+        SELECT metric, bucket, count FROM ticket_latency_sketch
+        WHERE guild_id = ? AND metric IN ('response', 'resolution') AND date >= ? AND date < ?
+        """
+        params += (guild_id, start, days)
+    sketches: Dict[str, List[Tuple[int, int]]] = {metric: [] for metric in METRICS}
+    async with db.execute(f"SELECT metric, bucket, SUM(count) FROM ({sql}) GROUP BY metric, bucket ORDER BY metric, bucket",
+                          params) as cursor:
+        for metric, index, count in await cursor.fetchall():
+            sketches[metric].append((index, count))
+    return sketches
+
+
+async def summary(db: aiosqlite.Connection, guild_id: int, start: Optional[str] = None) -> TicketSummary:
+    """Totals and latency percentiles from ``start`` (YYYY-MM-DD; None for all time)"""
+    sketches = await _sketches(db, guild_id, start)
+    start = start or "0000-00-00"
+    async with db.execute("""
+        SELECT COALESCE(SUM(opened), 0), COALESCE(SUM(closed), 0), COALESCE(SUM(claimed), 0),
+               COALESCE(SUM(responded), 0), COALESCE(SUM(response_seconds), 0), COALESCE(SUM(resolution_seconds), 0)
+        FROM ticket_daily_stats WHERE guild_id = ? AND date >= ?
+    """, (guild_id, start)) as cursor:
+        opened, closed, claimed, responded, response_seconds, resolution_seconds = await cursor.fetchone()
+    return TicketSummary(
+        opened, closed, claimed, responded,
+        response_seconds / responded if responded else None,
+        resolution_seconds / closed if closed else None,
+        quantile(sketches["response"], 0.5), quantile(sketches["response"], 0.9),
+        quantile(sketches["resolution"], 0.5), quantile(sketches["resolution"], 0.9),
+    )
+
+
+async def staff_summary(db: aiosqlite.Connection, guild_id: int, start: Optional[str] = None,
+                        limit: int = 10) -> List[StaffSummary]:
+    """Staff ranked by tickets handled (claimed + closed) from ``start``"""
+    async with db.execute("""
+        SELECT staff_id, SUM(claimed), SUM(closed), SUM(responded), SUM(response_seconds)
+        FROM ticket_staff_daily_stats WHERE guild_id = ? AND date >= ?
+        GROUP BY staff_id ORDER BY SUM(claimed) + SUM(closed) DESC, SUM(responded) DESC LIMIT ?
+    """, (guild_id, start or "0000-00-00", limit)) as cursor:
+        rows = await cursor.fetchall()
+    return [StaffSummary(staff_id, claimed, closed, responded, response_seconds / responded if responded else None)
+            for staff_id, claimed, closed, responded, response_seconds in rows]
+
+
+async def daily_volume(db: aiosqlite.Connection, guild_id: int, start: str) -> List[DayVolume]:
+    async with db.execute("""
+        SELECT date, opened, closed FROM ticket_daily_stats
+        WHERE guild_id = ? AND date >= ? ORDER BY date
+    """, (guild_id, start)) as cursor:
+        return [DayVolume(*row) for row in await cursor.fetchall()]
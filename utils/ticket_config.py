@@ -0,0 +1,404 @@
+"""
+Typed, cached ticket configuration.
+
+Panels, categories and the legacy per-guild config are read into named
+tuples built by column *name*, so the order columns have in a given database
+(tables created by an old release got later columns appended by ``ALTER``)
+no longer matters. Missing columns take the table default.
+
+``TicketConfigStore`` caches configuration per guild: the first read for a
+guild loads all of its panels and categories in two queries, and every later
+read of any of them is served from memory until the guild is invalidated.
+``TicketDatabase`` invalidates a guild on every config write; code that
+writes the config tables directly must call ``invalidate`` itself.
+``load_guilds`` / ``load_all`` fill the cache for many guilds at once.
+
+The ticket database schema is versioned with ``PRAGMA user_version``;
+``migrate`` brings a database of any earlier version up to
+``SCHEMA_VERSION``. Every step only adds what is missing, so it is also safe
+on databases created fresh at the current schema.
+"""
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+import aiosqlite
+
+from utils import ticket_analytics
+
+DEFAULT_WELCOME = 'Thank you for creating a ticket! A staff member will be with you shortly.'
+
+
+class GuildTicketConfig(NamedTuple):
+    """Row of the legacy ``ticket_config`` table"""
+    guild_id: int
+    category_id: Optional[int] = None
+    support_role_id: Optional[int] = None
+    log_channel_id: Optional[int] = None
+    welcome_message: Optional[str] = None
+    ticket_counter: int = 0
+    max_tickets_per_user: int = 1
+    auto_close_time: int = 0
+
+
+class PanelConfig(NamedTuple):
+    panel_id: int
+    guild_id: int
+    panel_name: str = 'Support Panel'
+    panel_description: Optional[str] = 'Select a ticket category below to get support.'
+    panel_color: Any = 0x00E6A7
+    channel_id: Optional[int] = None
+    message_id: Optional[int] = None
+    embed_title: Optional[str] = 'Support Tickets'
+    embed_footer: Optional[str] = None
+    embed_thumbnail: Optional[str] = None
+    embed_image: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    content_hash: Optional[str] = None
+    verified_at: Optional[float] = None
+
+
+class CategoryConfig(NamedTuple):
+    category_id: int
+    panel_id: int
+    guild_id: int
+    category_name: str
+    category_emoji: Optional[str] = '🎫'
+    category_description: Optional[str] = None
+    parent_category_id: Optional[int] = None
+    discord_category_id: Optional[int] = None
+    channel_name_format: Optional[str] = 'ticket-{user}-{number}'
+    support_roles: Optional[str] = None  # JSON array of role IDs
+    auto_add_roles: Optional[str] = None  # JSON array of role IDs
+    ping_roles: Optional[str] = None  # JSON array of role IDs
+    welcome_message: Optional[str] = DEFAULT_WELCOME
+    embed_welcome: bool = False
+    welcome_embed_data: Optional[str] = None
+    log_channel_id: Optional[int] = None
+    log_events: Optional[str] = None  # JSON array of event names
+    log_creation: bool = True
+    log_closure: bool = True
+    log_claims: bool = True
+    log_transcripts: bool = True
+    save_transcripts: bool = True
+    transcript_channel_id: Optional[int] = None
+    transcript_format: Optional[str] = 'html'
+    auto_transcript: bool = True
+    max_tickets_per_user: int = 1
+    auto_close_time: int = 0
+    auto_close_warning: int = 24
+    allow_claiming: bool = True
+    require_claiming: bool = False
+    claim_message: Optional[str] = 'This ticket has been claimed by {claimer}.'
+    user_can_close: bool = True
+    user_can_add_others: bool = False
+    user_can_add_members: bool = False
+    priority_level: int = 1
+    priority_color: Optional[int] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+
+# ---------- rows -> records ----------
+
+_layouts: Dict[Tuple[type, Tuple[str, ...]], Tuple[Optional[int], ...]] = {}
+
+
+def _layout(cls: type, columns: Tuple[str, ...]) -> Tuple[Optional[int], ...]:
+    """Row index of each field of ``cls`` (None: not in the row, use the default)"""
+    key = (cls, columns)
+    layout = _layouts.get(key)
+    if layout is None:
+        index = {column: i for i, column in enumerate(columns)}
+        layout = _layouts[key] = tuple(index.get(field) for field in cls._fields)
+    return layout
+
+
+def from_rows(cls: Type[NamedTuple], columns: Sequence[str], rows: Iterable[Sequence]) -> List[Any]:
+    layout = _layout(cls, tuple(columns))
+    defaults = cls._field_defaults
+    fields = cls._fields
+    return [cls._make(row[i] if i is not None else defaults.get(field)
+                      for i, field in zip(layout, fields)) for row in rows]
+
+
+async def fetch(db: aiosqlite.Connection, cls: Type[NamedTuple], sql: str, params: Sequence = ()) -> List[Any]:
+    """Run ``sql`` and build a ``cls`` from each row by column name"""
+    async with db.execute(sql, params) as cursor:
+        rows = await cursor.fetchall()
+        columns = [description[0] for description in cursor.description or ()]
+    return from_rows(cls, columns, rows)
+
+
+def row_dict(cursor, row: Sequence) -> Dict[str, Any]:
+    """A row as a dict keyed by column name"""
+    return {description[0]: value for description, value in zip(cursor.description, row)}
+
+
+# ---------- schema versions ----------
+
+async def _columns(db: aiosqlite.Connection, table: str) -> set:
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        return {row[1] for row in await cursor.fetchall()}
+
+
+async def _add_columns(db: aiosqlite.Connection, table: str, columns: Sequence[Tuple[str, str]]):
+    existing = await _columns(db, table)
+    for name, definition in columns:
+        if name not in existing:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+
+async def _migrate_1(db: aiosqlite.Connection):
+    """Columns added to the original ticket schema"""
+    await _add_columns(db, "tickets", [
+        ("user_id", "INTEGER"),
+        ("status", "TEXT DEFAULT 'open'"),
+    ])
+    await _add_columns(db, "ticket_panels", [
+        ("panel_name", "TEXT DEFAULT 'Support Panel'"),
+        ("panel_description", "TEXT DEFAULT 'Select a ticket category below to get support.'"),
+        ("embed_title", "TEXT DEFAULT 'Support Tickets'"),
+    ])
+    await _add_columns(db, "ticket_categories", [
+        ("discord_category_id", "INTEGER"),
+        ("user_can_add_others", "BOOLEAN DEFAULT FALSE"),
+        ("log_events", "TEXT"),
+        ("require_claiming", "BOOLEAN DEFAULT FALSE"),
+    ])
+
+
+async def _migrate_2(db: aiosqlite.Connection):
+    """Deployed panel upkeep (see utils.panel_registry)"""
+    await _add_columns(db, "ticket_panels", [("content_hash", "TEXT"), ("verified_at", "REAL")])
+    # Panels load their categories by panel_id (deploys, panel upkeep)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_ticket_categories_panel ON ticket_categories (panel_id)")
+
+
+async def _migrate_3(db: aiosqlite.Connection):
+    """Config is now loaded a guild at a time"""
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_ticket_panels_guild ON ticket_panels (guild_id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_ticket_categories_guild ON ticket_categories (guild_id)")
+
+
+async def _migrate_4(db: aiosqlite.Connection):
+    """Incremental analytics (see utils.ticket_analytics), backfilled from existing tickets"""
+    await _add_columns(db, "tickets", [("first_responder_id", "INTEGER")])
+    await ticket_analytics.create_tables(db)
+    # Dashboard queries that still read tickets: per-user counts and today's SLA breaches
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_tickets_guild_user ON tickets (guild_id, user_id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_tickets_guild_created ON tickets (guild_id, created_at)")
+    await ticket_analytics.rebuild(db)
+
+
+async def _migrate_5(db: aiosqlite.Connection):
+    """Ticket numbers are taken as the guild's highest plus one (see TicketDatabase.create_ticket)"""
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_tickets_guild_number ON tickets (guild_id, ticket_number)")
+
+
+MIGRATIONS: Tuple[Tuple[int, Callable[[aiosqlite.Connection], Awaitable[None]]], ...] = (
+    (1, _migrate_1),
+    (2, _migrate_2),
+    (3, _migrate_3),
+    (4, _migrate_4),
+    (5, _migrate_5),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+async def schema_version(db: aiosqlite.Connection) -> int:
+    async with db.execute("PRAGMA user_version") as cursor:
+        return (await cursor.fetchone())[0]
+
+
+async def migrate(db: aiosqlite.Connection) -> int:
+    """Apply every migration newer than the database; returns the resulting version"""
+    version = await schema_version(db)
+    for target, step in MIGRATIONS:
+        if version < target:
+            await step(db)
+            # PRAGMA doesn't take parameters; target is one of our own ints
+            await db.execute(f"PRAGMA user_version = {int(target)}")
+            await db.commit()
+            version = target
+    return version
+
+
+# ---------- cache ----------
+
+CATEGORY_ORDER = "priority_level DESC, category_name"
+
+
+class _GuildPanels(NamedTuple):
+    panels: Dict[int, PanelConfig]  # by panel_id, in panel_id order
+    categories: Dict[int, Tuple[CategoryConfig, ...]]  # by panel_id, in display order
+
+
+class TicketConfigStore:
+    """Per-guild cache of ticket panels, categories and the legacy guild config"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._guilds: Dict[int, _GuildPanels] = {}
+        self._guild_configs: Dict[int, GuildTicketConfig] = {}
+        self._panel_guild: Dict[int, int] = {}
+        self._categories: Dict[int, CategoryConfig] = {}
+        # Bumped by invalidation so a load that raced a write isn't cached
+        self._epoch = 0
+        self._guild_epochs: Dict[int, int] = {}
+
+    # ---------- invalidation ----------
+
+    def invalidate(self, guild_id: Optional[int] = None):
+        """Forget a guild's cached config (every guild's when None)"""
+        if guild_id is None:
+            self._epoch += 1
+            self._guilds.clear()
+            self._guild_configs.clear()
+            self._panel_guild.clear()
+            self._categories.clear()
+            return
+        self._guild_epochs[guild_id] = self._guild_epochs.get(guild_id, 0) + 1
+        self._guild_configs.pop(guild_id, None)
+        bundle = self._guilds.pop(guild_id, None)
+        if bundle is not None:
+            for categories in bundle.categories.values():
+                for category in categories:
+                    self._categories.pop(category.category_id, None)
+            for panel_id in bundle.panels:
+                self._panel_guild.pop(panel_id, None)
+
+    def invalidate_guild_config(self, guild_id: int):
+        """Forget only the guild's legacy config row"""
+        self._guild_epochs[guild_id] = self._guild_epochs.get(guild_id, 0) + 1
+        self._guild_configs.pop(guild_id, None)
+
+    def invalidate_panel(self, panel_id: int):
+        guild_id = self._panel_guild.get(panel_id)
+        if guild_id is not None:
+            self.invalidate(guild_id)
+        else:
+            # Not cached, but a load could be in flight; don't let it land
+            self._epoch += 1
+
+    def invalidate_category(self, category_id: int):
+        category = self._categories.get(category_id)
+        if category is not None:
+            self.invalidate(category.guild_id)
+        else:
+            self._epoch += 1
+
+    def _stamp(self, guild_ids: Optional[Iterable[int]] = None) -> Tuple[int, Dict[int, int]]:
+        if guild_ids is None:
+            return self._epoch, dict(self._guild_epochs)
+        return self._epoch, {guild_id: self._guild_epochs.get(guild_id, 0) for guild_id in guild_ids}
+
+    def _current(self, stamp: Tuple[int, Dict[int, int]], guild_id: int) -> bool:
+        epoch, guild_epochs = stamp
+        return epoch == self._epoch and guild_epochs.get(guild_id, 0) == self._guild_epochs.get(guild_id, 0)
+
+    # ---------- batched loading ----------
+
+    def _store(self, stamp, guild_ids: Iterable[int], panels: List[PanelConfig], categories: List[CategoryConfig]):
+        bundles: Dict[int, _GuildPanels] = {guild_id: _GuildPanels({}, {}) for guild_id in guild_ids}
+        for panel in panels:
+            bundles.setdefault(panel.guild_id, _GuildPanels({}, {})).panels[panel.panel_id] = panel
+        grouped: Dict[int, List[CategoryConfig]] = {}
+        for category in categories:
+            grouped.setdefault(category.panel_id, []).append(category)
+        for panel_id, items in grouped.items():
+            bundle = bundles.setdefault(items[0].guild_id, _GuildPanels({}, {}))
+            bundle.categories[panel_id] = tuple(items)
+        for guild_id, bundle in bundles.items():
+            if not self._current(stamp, guild_id):
+                continue
+            self._guilds[guild_id] = bundle
+            for panel_id in bundle.panels:
+                self._panel_guild[panel_id] = guild_id
+            for items in bundle.categories.values():
+                for category in items:
+                    self._categories[category.category_id] = category
+
+    async def load_guilds(self, guild_ids: Iterable[int], batch: int = 500):
+        """Load the panels and categories of many guilds, two queries per ``batch`` guilds"""
+        guild_ids = [guild_id for guild_id in dict.fromkeys(guild_ids) if guild_id not in self._guilds]
+        if not guild_ids:
+            return
+        async with aiosqlite.connect(self.db_path) as db:
+            for start in range(0, len(guild_ids), batch):
+                chunk = guild_ids[start:start + batch]
+                stamp = self._stamp(chunk)
+                marks = ", ".join("?" * len(chunk))
+                panels = await fetch(db, PanelConfig,
+                                     f"SELECT * FROM ticket_panels WHERE guild_id IN ({marks}) ORDER BY panel_id", chunk)
+                categories = await fetch(db, CategoryConfig, f"""
+                    SELECT * FROM ticket_categories WHERE guild_id IN ({marks})
+                    ORDER BY panel_id, {CATEGORY_ORDER}
+                """, chunk)
+                self._store(stamp, chunk, panels, categories)
+
+    async def load_all(self):
+        """Load every guild's panels and categories in two queries"""
+        stamp = self._stamp()
+        async with aiosqlite.connect(self.db_path) as db:
+            panels = await fetch(db, PanelConfig, "SELECT * FROM ticket_panels ORDER BY panel_id")
+            categories = await fetch(db, CategoryConfig,
+                                     f"SELECT * FROM ticket_categories ORDER BY panel_id, {CATEGORY_ORDER}")
+        self._store(stamp, (), panels, categories)
+
+    async def _guild_of(self, table: str, key: str, value: int) -> Optional[int]:
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute(f"SELECT guild_id FROM {table} WHERE {key} = ?", (value,)) as cursor:
+                row = await cursor.fetchone()
+        return row[0] if row else None
+
+    # ---------- reads ----------
+
+    async def guild_panels(self, guild_id: int) -> List[PanelConfig]:
+        bundle = self._guilds.get(guild_id)
+        if bundle is None:
+            await self.load_guilds([guild_id])
+            bundle = self._guilds.get(guild_id)
+        return list(bundle.panels.values()) if bundle else []
+
+    async def panel(self, panel_id: int) -> Optional[PanelConfig]:
+        guild_id = self._panel_guild.get(panel_id)
+        if guild_id is None:
+            guild_id = await self._guild_of("ticket_panels", "panel_id", panel_id)
+            if guild_id is None:
+                return None
+            await self.load_guilds([guild_id])
+        bundle = self._guilds.get(guild_id)
+        return bundle.panels.get(panel_id) if bundle else None
+
+    async def panel_categories(self, panel_id: int) -> List[CategoryConfig]:
+        guild_id = self._panel_guild.get(panel_id)
+        if guild_id is None:
+            # Categories can outlive their panel row; look them up by their own guild
+            guild_id = await self._guild_of("ticket_categories", "panel_id", panel_id)
+            if guild_id is None:
+                return []
+            await self.load_guilds([guild_id])
+        bundle = self._guilds.get(guild_id)
+        return list(bundle.categories.get(panel_id, ())) if bundle else []
+
+    async def category(self, category_id: int) -> Optional[CategoryConfig]:
+        category = self._categories.get(category_id)
+        if category is None:
+            guild_id = await self._guild_of("ticket_categories", "category_id", category_id)
+            if guild_id is None:
+                return None
+            await self.load_guilds([guild_id])
+            category = self._categories.get(category_id)
+        return category
+
+    async def guild_config(self, guild_id: int) -> GuildTicketConfig:
+        """The guild's legacy config; defaults if it has none"""
+        config = self._guild_configs.get(guild_id)
+        if config is None:
+            stamp = self._stamp([guild_id])
+            async with aiosqlite.connect(self.db_path) as db:
+                rows = await fetch(db, GuildTicketConfig, "SELECT * FROM ticket_config WHERE guild_id = ?", (guild_id,))
+                config = rows[0] if rows else GuildTicketConfig(guild_id)
+            if self._current(stamp, guild_id):
+                self._guild_configs[guild_id] = config
+        return config
@@ -0,0 +1,102 @@
+"""
+Queued ticket creation.
+
+A panel spammed during an announcement gets hundreds of selections within
+seconds. Creating a channel for each of them at once runs every request into
+Discord's rate limits, and two selections from the same user both pass the
+per-user ticket limit before either ticket exists. ``TicketCreationQueue``
+runs creations in arrival order per guild:
+
+* at most one creation is pending per (guild, user, panel) key; a repeated
+  selection finds the pending one instead of queueing a duplicate,
+* at most ``concurrency`` creations of a guild run at a time,
+* at most ``max_pending`` creations of a guild wait; further ones are
+  turned away until the queue drains.
+
+The caller acknowledges the interaction with the position ``submit`` returns
+and the job reports its own outcome (and cleans up after itself on failure).
+"""
+import asyncio
+import traceback
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+# (guild_id, user_id, panel_id)
+CreationKey = Tuple[int, int, Optional[int]]
+CreationJob = Callable[[], Awaitable[None]]
+
+
+class _GuildLane:
+    __slots__ = ("waiting", "workers", "busy")
+
+    def __init__(self):
+        self.waiting: Dict[CreationKey, CreationJob] = {}  # in arrival order
+        self.workers = 0
+        self.busy = 0
+
+
+class TicketCreationQueue:
+    """Per-guild FIFO of ticket creations with bounded concurrency and per-user dedup"""
+
+    def __init__(self, concurrency: int = 2, max_pending: int = 500):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._lanes: Dict[int, _GuildLane] = {}
+        self._pending: Set[CreationKey] = set()
+        self._workers: Set[asyncio.Task] = set()
+
+    def position(self, key: CreationKey) -> Optional[int]:
+        """Place of ``key`` in its guild's queue: 0 once it's being created, None if it isn't pending"""
+        if key not in self._pending:
+            return None
+        lane = self._lanes[key[0]]
+        if key not in lane.waiting:
+            return 0
+        # Waiting creations ahead of this one take the idle workers first
+        ahead = list(lane.waiting).index(key)
+        return max(0, ahead + 1 - (lane.workers - lane.busy))
+
+    def full(self, guild_id: int) -> bool:
+        lane = self._lanes.get(guild_id)
+        return lane is not None and len(lane.waiting) >= self.max_pending
+
+    def submit(self, key: CreationKey, job: CreationJob) -> int:
+        """Queue ``job`` for ``key`` (which must not be pending); returns its position"""
+        if key in self._pending:
+            raise ValueError(f"ticket creation already pending for {key}")
+        lane = self._lanes.get(key[0])
+        if lane is None:
+            lane = self._lanes[key[0]] = _GuildLane()
+        lane.waiting[key] = job
+        self._pending.add(key)
+        if lane.workers < self.concurrency:
+            lane.workers += 1
+            task = asyncio.create_task(self._drain(key[0], lane))
+            self._workers.add(task)
+            task.add_done_callback(self._workers.discard)
+        return self.position(key)
+
+    async def _drain(self, guild_id: int, lane: _GuildLane):
+        try:
+            while lane.waiting:
+                key = next(iter(lane.waiting))
+                job = lane.waiting.pop(key)
+                lane.busy += 1
+                try:
+                    await job()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    print(f"[TICKETS] Ticket creation failed: {traceback.format_exc()}")
+                finally:
+                    lane.busy -= 1
+                    self._pending.discard(key)
+        finally:
+            lane.workers -= 1
+            if not lane.workers and self._lanes.get(guild_id) is lane:
+                del self._lanes[guild_id]
+                self._pending.difference_update(lane.waiting)
+
+    def stop(self):
+        """Cancel queued and running creations"""
+        for task in list(self._workers):
+            task.cancel()
@@ -0,0 +1,163 @@
+"""
+Streaming ticket transcripts.
+
+The channel history is consumed as it is paged in from the API and each page
+of rendered messages is written straight to a byte sink (normally a
+``SpooledTemporaryFile``), so a transcript never holds more than one page of
+messages in memory. The requester's timezone is resolved once per transcript
+and every timestamp is formatted locally with it.
+
+Formats match ``ticket_categories.transcript_format``: ``html``, ``txt``
+(also accepted as ``text``) and ``json``. Attachments are written as links
+and embeds as their title/description text; nothing is downloaded.
+"""
+import html
+import json
+import tempfile
+from datetime import datetime, timezone, tzinfo
+from typing import BinaryIO, Optional, Tuple
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S %Z"
+PAGE_SIZE = 100  # messages per history request, written to the sink together
+SPOOL_SIZE = 4 * 1024 * 1024  # transcripts larger than this spill to disk
+
+
+async def resolve_timezone(bot, user) -> tzinfo:
+    """The user's configured timezone, falling back to UTC"""
+    try:
+        import pytz
+        from utils.timezone_utils import get_timezone_utils
+        name = await get_timezone_utils(bot).get_user_timezone(user.id)
+        return pytz.timezone(name) if name else timezone.utc
+    except Exception:
+        return timezone.utc
+
+
+def _embed_text(embed) -> str:
+    return " - ".join(part for part in (embed.title, embed.description) if part) or "[Embed]"
+
+
+class TextTranscript:
+    extension = "txt"
+
+    def __init__(self, tz: tzinfo = timezone.utc, time_format: str = TIME_FORMAT):
+        self.tz = tz
+        self.time_format = time_format
+
+    def timestamp(self, moment: datetime) -> str:
+        return moment.astimezone(self.tz).strftime(self.time_format)
+
+    def header(self, channel_name: str, generated: datetime) -> str:
+        return (f"Ticket Transcript - {channel_name}\n"
+                f"Generated: {self.timestamp(generated)}\n"
+                f"Channel: #{channel_name}\n"
+                + "=" * 50 + "\n\n")
+
+    def message(self, message) -> str:
+        content = message.content or "[No content]"
+        if message.attachments:
+            content += f" [Attachments: {', '.join(f'{att.filename} <{att.url}>' for att in message.attachments)}]"
+        if message.embeds:
+            content += f" [Embeds: {'; '.join(_embed_text(embed) for embed in message.embeds)}]"
+        return (f"[{self.timestamp(message.created_at)}] "
+                f"{message.author.display_name} ({message.author}): {content}\n")
+
+    def footer(self, count: int) -> str:
+        return "\n" + "=" * 50 + f"\nMessages: {count}\n"
+
+
+class HtmlTranscript(TextTranscript):
+    extension = "html"
+
+    def header(self, channel_name: str, generated: datetime) -> str:
+        name = html.escape(channel_name)
+        return ("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+                f"<title>Ticket Transcript - {name}</title>"
+                "<style>body{font-family:sans-serif;background:#313338;color:#dbdee1}"
+                ".msg{padding:4px 0}.author{font-weight:bold;color:#fff}.time{color:#949ba4;font-size:12px}"
+                ".embed{border-left:4px solid #00E6A7;padding:2px 8px;margin:2px 0}"
+                "a{color:#00a8fc}</style></head><body>\n"
+                f"<h1>Ticket Transcript - #{name}</h1>\n"
+                f"<p>Generated: {html.escape(self.timestamp(generated))}</p><hr>\n")
+
+    def message(self, message) -> str:
+        parts = [f"<div class=\"msg\"><span class=\"author\">{html.escape(message.author.display_name)}</span> "
+                 f"<span class=\"time\">{html.escape(self.timestamp(message.created_at))}</span>"
+                 f"<div>{html.escape(message.content or '')}</div>"]
+        for att in message.attachments:
+            parts.append(f"<div><a href=\"{html.escape(att.url)}\">{html.escape(att.filename)}</a></div>")
+        for embed in message.embeds:
+            parts.append(f"<div class=\"embed\">{html.escape(_embed_text(embed))}</div>")
+        parts.append("</div>\n")
+        return "".join(parts)
+
+    def footer(self, count: int) -> str:
+        return f"<hr><p>Messages: {count}</p></body></html>\n"
+
+
+class JsonTranscript(TextTranscript):
+    extension = "json"
+
+    def __init__(self, tz: tzinfo = timezone.utc, time_format: str = TIME_FORMAT):
+        super().__init__(tz, time_format)
+        self.first = True
+
+    def header(self, channel_name: str, generated: datetime) -> str:
+        return (f"{{\"channel\": {json.dumps(channel_name)}, "
+                f"\"generated\": {json.dumps(self.timestamp(generated))}, \"messages\": [\n")
+
+    def message(self, message) -> str:
+        entry = json.dumps({
+            "id": message.id,
+            "author_id": message.author.id,
+            "author": str(message.author),
+            "timestamp": self.timestamp(message.created_at),
+            "content": message.content,
+            "attachments": [{"filename": att.filename, "url": att.url} for att in message.attachments],
+            "embeds": [{"title": embed.title, "description": embed.description} for embed in message.embeds],
+        }, ensure_ascii=False)
+        separator = "" if self.first else ",\n"
+        self.first = False
+        return separator + entry
+
+    def footer(self, count: int) -> str:
+        return f"\n], \"message_count\": {count}}}\n"
+
+
+TRANSCRIPT_FORMATS = {"txt": TextTranscript, "text": TextTranscript, "html": HtmlTranscript, "json": JsonTranscript}
+
+
+async def write_transcript(channel, sink: BinaryIO, fmt: str = "txt", tz: tzinfo = timezone.utc,
+                           generated: Optional[datetime] = None, page_size: int = PAGE_SIZE) -> int:
+    """Stream ``channel``'s history into ``sink``; returns the number of messages"""
+    writer = TRANSCRIPT_FORMATS.get((fmt or "txt").lower(), TextTranscript)(tz)
+    sink.write(writer.header(channel.name, generated or datetime.now(timezone.utc)).encode("utf-8"))
+    page = []
+    count = 0
+    async for message in channel.history(limit=None, oldest_first=True):
+        page.append(writer.message(message))
+        count += 1
+        if len(page) >= page_size:
+            sink.write("".join(page).encode("utf-8"))
+            page.clear()
+    if page:
+        sink.write("".join(page).encode("utf-8"))
+    sink.write(writer.footer(count).encode("utf-8"))
+    return count
+
+
+async def build_transcript(channel, fmt: str = "txt", tz: tzinfo = timezone.utc,
+                           generated: Optional[datetime] = None) -> Tuple[BinaryIO, str, int]:
+    """
+    Render a transcript into a spooled temp file rewound to the start.
+    Returns (file, extension, message count); the caller closes the file.
+    """
+    sink = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    try:
+        count = await write_transcript(channel, sink, fmt, tz, generated)
+    except BaseException:
+        sink.close()
+        raise
+    sink.seek(0)
+    extension = TRANSCRIPT_FORMATS.get((fmt or "txt").lower(), TextTranscript).extension
+    return sink, extension, count
@@ -0,0 +1,390 @@
+"""
+Persistent cache of music search results and track metadata.
+
+Every play used to resolve its query again through yt-dlp or Lavalink, even
+for a song requested minutes earlier. ``TrackCache`` keeps what those lookups
+found in ``db/music_cache.db``:
+
+* ``cached_tracks`` - per source URL (canonical form, so youtu.be and
+  music.youtube.com links share an entry): title, duration, thumbnail,
+  uploader, extractor and, for Lavalink results, the track payload (the
+  encoded track and its info). Nothing stream-specific is stored - yt-dlp's
+  media URLs expire, the encoded track does not,
+* ``cached_queries`` - per scope and normalized query: the URLs it resolved
+  to, in order. A lookup that genuinely found nothing is stored as an empty
+  list with a short TTL (negative caching); errors and timeouts are never
+  cached.
+
+Entries expire after ``track_ttl`` / ``query_ttl`` / ``negative_ttl``. Every
+row records its size; once the rows add up to more than ``max_bytes``,
+expired rows and then the least recently used ones are deleted down to
+``LOW_WATER`` of the limit, and the pages that frees are returned to the file
+system (``auto_vacuum = INCREMENTAL``). Use times are only written back once
+per ``touch_interval``, so a hit is normally a single read.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import unicodedata
+from typing import Callable, Iterable, List, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiosqlite
+
+DB_PATH = "db/music_cache.db"
+LOW_WATER = 0.9                   # fraction of max_bytes left after an eviction
+EVICT_BATCH = 256                 # rows deleted per eviction round
+
+_YOUTUBE_HOSTS = {"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com"}
+_YOUTUBE_ID = re.compile(r"^[\w-]{11}$")
+_TRACKING_PARAMS = {"si", "feature", "ref", "fbclid", "gclid", "pp", "app"}
+
+
+class CachedTrack(NamedTuple):
+    url: str
+    title: str
+    duration: int
+    thumbnail: str
+    uploader: str
+    extractor: str
+    lavalink: Optional[dict] = None  # Lavalink track payload ({"encoded": ..., "info": ...})
+
+    def data(self) -> dict:
+        """Metadata in the shape ``Track`` is built from"""
+        return {
+            'title': self.title,
+            'webpage_url': self.url,
+            'duration': self.duration,
+            'thumbnail': self.thumbnail,
+            'uploader': self.uploader,
+            'extractor': self.extractor,
+        }
+
+
+def normalize_query(query: str) -> str:
+    """Case, width and whitespace insensitive form of a search query"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def canonical_url(url: str) -> str:
+    """One spelling per track URL: YouTube links become watch?v=<id>, tracking parameters are dropped"""
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return url
+    host = parts.hostname.lower()
+    video_id = None
+    if host == "youtu.be":
+        video_id = parts.path.strip("/").split("/")[0]
+    elif host in _YOUTUBE_HOSTS:
+        if parts.path == "/watch":
+            video_id = dict(parse_qsl(parts.query)).get("v")
+        elif parts.path.startswith(("/shorts/", "/embed/", "/live/")):
+            video_id = parts.path.split("/")[2]
+    if video_id and _YOUTUBE_ID.match(video_id):
+        return f"https://www.youtube.com/watch?v={video_id}"
+    query = urlencode([(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if key not in _TRACKING_PARAMS and not key.startswith("utm_")])
+    netloc = host if parts.port is None else f"{host}:{parts.port}"
+    return urlunsplit(("https" if parts.scheme == "https" else "http", netloc, parts.path.rstrip("/") or "/",
+                       query, ""))
+
+
+def _size(*values: str) -> int:
+    return sum(len(value.encode()) for value in values)
+
+
+def is_url(query: str) -> bool:
+    return query.strip().lower().startswith(("http://", "https://"))
+
+
+def track_from_data(data: dict, lavalink: Optional[dict] = None) -> Optional[CachedTrack]:
+    """A cache entry from yt-dlp info or ``Track`` data; None for playlists and without a page URL and title"""
+    url = data.get('webpage_url') or data.get('original_url') or ''
+    title = data.get('title')
+    if not title or not is_url(url) or 'entries' in data or data.get('_type') == 'playlist':
+        return None
+    try:
+        duration = int(float(data.get('duration') or 0))
+    except (TypeError, ValueError):
+        duration = 0
+    return CachedTrack(canonical_url(url), str(title), duration, data.get('thumbnail') or '',
+                       data.get('uploader') or data.get('author') or 'Unknown',
+                       data.get('extractor') or 'Unknown', lavalink)
+
+
+class TrackCache:
+    """Search results and track metadata, persisted with TTLs and an on-disk LRU size limit"""
+
+    def __init__(self, db_path: str = DB_PATH, max_bytes: int = 64 * 1024 * 1024,
+                 track_ttl: float = 30 * 86400, query_ttl: float = 7 * 86400,
+                 negative_ttl: float = 15 * 60, touch_interval: float = 3600,
+                 clock: Callable[[], float] = time.time):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.track_ttl = track_ttl
+        self.query_ttl = query_ttl
+        self.negative_ttl = negative_ttl
+        self.touch_interval = touch_interval
+        self.clock = clock
+        self._write_lock = asyncio.Lock()
+        self._ready = False
+        self._bytes = 0  # total size of the cached rows
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "stores": 0, "evicted": 0,
+                      "lookup_seconds": 0.0}
+
+    async def ensure_tables(self):
+        if self._ready:
+            return
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        async with aiosqlite.connect(self.db_path) as db:
+            # Only takes effect before the first table exists
+            await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            await db.execute("PRAGMA journal_mode=WAL")
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS cached_tracks (
+                    url TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    duration INTEGER NOT NULL,
+                    thumbnail TEXT NOT NULL,
+                    uploader TEXT NOT NULL,
+                    extractor TEXT NOT NULL,
+                    lavalink TEXT, -- JSON track payload
+                    stored_at REAL NOT NULL,
+                    used_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS cached_queries (
+                    key TEXT PRIMARY KEY, -- scope + normalized query
+                    urls TEXT NOT NULL, -- JSON list; empty for a lookup that found nothing
+                    expires_at REAL NOT NULL,
+                    used_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_cached_tracks_used ON cached_tracks (used_at)")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_cached_queries_used ON cached_queries (used_at)")
+            await db.commit()
+        self._ready = True
+        await self.prune()
+
+    @staticmethod
+    def _key(scope: str, query: str) -> str:
+        return f"{scope}\x1f{normalize_query(query)}"
+
+    @staticmethod
+    def _entry(row) -> CachedTrack:
+        url, title, duration, thumbnail, uploader, extractor, lavalink = row
+        return CachedTrack(url, title, duration, thumbnail, uploader, extractor,
+                           json.loads(lavalink) if lavalink else None)
+
+    # ---------- lookups ----------
+
+    async def lookup_url(self, url: str) -> Optional[CachedTrack]:
+        """Metadata cached for a track URL"""
+        await self.ensure_tables()
+        started = time.perf_counter()
+        now = self.clock()
+        async with aiosqlite.connect(self.db_path) as db:
+            entries = await self._tracks(db, [canonical_url(url)], now)
+        self.stats["lookup_seconds"] += time.perf_counter() - started
+        self.stats["hits" if entries else "misses"] += 1
+        return entries[0] if entries else None
+
+    async def lookup_query(self, scope: str, query: str) -> Optional[List[CachedTrack]]:
+        """
+        Tracks ``query`` resolved to in ``scope``: an empty list if it recently
+        found nothing, None if it isn't cached (or a track it found has since
+        been evicted)
+        """
+        await self.ensure_tables()
+        started = time.perf_counter()
+        now = self.clock()
+        key = self._key(scope, query)
+        result = None
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute("SELECT urls, used_at FROM cached_queries WHERE key = ? AND expires_at > ?",
+                                  (key, now)) as cursor:
+                row = await cursor.fetchone()
+            if row is not None:
+                urls = json.loads(row[0])
+                entries = await self._tracks(db, urls, now)
+                if len(entries) == len(urls):
+                    result = entries
+                    if now - row[1] >= self.touch_interval:
+                        async with self._write_lock:
+                            await db.execute("UPDATE cached_queries SET used_at = ? WHERE key = ?", (now, key))
+                            await db.commit()
+        self.stats["lookup_seconds"] += time.perf_counter() - started
+        if result is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["negative_hits" if not result else "hits"] += 1
+        return result
+
+    async def _tracks(self, db: aiosqlite.Connection, urls: List[str], now: float) -> List[CachedTrack]:
+        """Unexpired entries for ``urls`` in the given order; refreshes stale use times"""
+        if not urls:
+            return []
+        placeholders = ",".join("?" * len(urls))
+        async with db.execute(f"""
+            SELECT url, title, duration, thumbnail, uploader, extractor, lavalink, used_at
+            FROM cached_tracks WHERE url IN ({placeholders}) AND stored_at > ?
+        """, (*urls, now - self.track_ttl)) as cursor:
+            rows = {row[0]: row for row in await cursor.fetchall()}
+        stale = [(now, url) for url, row in rows.items() if now - row[7] >= self.touch_interval]
+        if stale:
+            async with self._write_lock:
+                await db.executemany("UPDATE cached_tracks SET used_at = ? WHERE url = ?", stale)
+                await db.commit()
+        return [self._entry(rows[url][:7]) for url in urls if url in rows]
+
+    # ---------- stores ----------
+
+    async def store(self, scope: Optional[str], query: Optional[str], tracks: Iterable[Optional[CachedTrack]]):
+        """
+        Cache ``tracks``, and as what ``query`` resolves to in ``scope`` when
+        both are given. None stands for a result that can't be cached (no page
+        URL); the query isn't cached then, since the cache couldn't reproduce it.
+        """
+        given = list(tracks)
+        tracks = [track for track in given if track is not None]
+        if len(tracks) < len(given):
+            scope = query = None
+        if not tracks and (scope is None or query is None):
+            return
+        await self.ensure_tables()
+        now = self.clock()
+        unique = {track.url: track for track in tracks}
+        async with self._write_lock:
+            async with aiosqlite.connect(self.db_path) as db:
+                old = {}
+                if unique:
+                    placeholders = ",".join("?" * len(unique))
+                    async with db.execute(f"""
+                        SELECT url, size, COALESCE(LENGTH(lavalink), 0) FROM cached_tracks WHERE url IN ({placeholders})
+                    """, tuple(unique)) as cursor:
+                        old = {row[0]: row[1:] for row in await cursor.fetchall()}
+                rows = []
+                for track in unique.values():
+                    payload = json.dumps(track.lavalink, separators=(",", ":")) if track.lavalink else None
+                    old_size, old_payload = old.get(track.url, (0, 0))
+                    # A lookup without a Lavalink payload keeps the one already cached
+                    size = _size(track.url, track.title, track.thumbnail, track.uploader, track.extractor) + \
+                        (len(payload) if payload else old_payload)
+                    self._bytes += size - old_size
+                    rows.append((track.url, track.title, track.duration, track.thumbnail, track.uploader,
+                                 track.extractor, payload, now, now, size))
+                await db.executemany("""
+                    INSERT INTO cached_tracks (url, title, duration, thumbnail, uploader, extractor,
+                                               lavalink, stored_at, used_at, size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        title = excluded.title, duration = excluded.duration,
+                        thumbnail = excluded.thumbnail, uploader = excluded.uploader,
+                        extractor = excluded.extractor,
+                        lavalink = COALESCE(excluded.lavalink, cached_tracks.lavalink),
+                        stored_at = excluded.stored_at, used_at = excluded.used_at, size = excluded.size
+                """, rows)
+                if scope is not None and query is not None:
+                    key = self._key(scope, query)
+                    urls = json.dumps([track.url for track in tracks])
+                    async with db.execute("SELECT size FROM cached_queries WHERE key = ?", (key,)) as cursor:
+                        row = await cursor.fetchone()
+                    size = _size(key, urls)
+                    self._bytes += size - (row[0] if row else 0)
+                    await db.execute("""
+                        INSERT OR REPLACE INTO cached_queries (key, urls, expires_at, used_at, size)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, (key, urls, now + (self.query_ttl if tracks else self.negative_ttl), now, size))
+                await db.commit()
+                self.stats["stores"] += 1
+                if self._bytes > self.max_bytes:
+                    await self._evict(db, now)
+
+    async def store_miss(self, scope: str, query: str):
+        """Remember that ``query`` found nothing in ``scope`` (for ``negative_ttl``)"""
+        await self.store(scope, query, [])
+
+    async def forget(self, url: str):
+        """Drop a track that turned out to be unplayable; queries that resolved to it miss from now on"""
+        await self.ensure_tables()
+        async with self._write_lock:
+            async with aiosqlite.connect(self.db_path) as db:
+                async with db.execute("DELETE FROM cached_tracks WHERE url = ? RETURNING size",
+                                      (canonical_url(url),)) as cursor:
+                    self._bytes -= sum(row[0] for row in await cursor.fetchall())
+                await db.commit()
+
+    # ---------- size limit ----------
+
+    async def _evict(self, db: aiosqlite.Connection, now: float):
+        """Expired rows first, then least recently used ones, until under LOW_WATER of max_bytes (caller holds the lock)"""
+        evicted = await self._delete_expired(db, now)
+        target = self.max_bytes * LOW_WATER
+        while self._bytes > target:
+            async with db.execute("""
+                SELECT 't', url, size, used_at FROM cached_tracks
+                UNION ALL
+                SELECT 'q', key, size, used_at FROM cached_queries
+                ORDER BY used_at LIMIT ?
+            """, (EVICT_BATCH,)) as cursor:
+                oldest = await cursor.fetchall()
+            if not oldest:
+                break
+            # Whole batches: a few rows under the target is fine, a batch per row is not
+            await db.executemany("DELETE FROM cached_tracks WHERE url = ?",
+                                 [(key,) for table, key, _, _ in oldest if table == 't'])
+            await db.executemany("DELETE FROM cached_queries WHERE key = ?",
+                                 [(key,) for table, key, _, _ in oldest if table == 'q'])
+            await db.commit()
+            self._bytes -= sum(size for _, _, size, _ in oldest)
+            evicted += len(oldest)
+        await self._vacuum(db)
+        self.stats["evicted"] += evicted
+
+    async def _delete_expired(self, db: aiosqlite.Connection, now: float) -> int:
+        """Delete expired rows and recount the cached size (caller holds the lock)"""
+        cursor = await db.execute("DELETE FROM cached_tracks WHERE stored_at <= ?", (now - self.track_ttl,))
+        removed = cursor.rowcount
+        cursor = await db.execute("DELETE FROM cached_queries WHERE expires_at <= ?", (now,))
+        removed += cursor.rowcount
+        await db.commit()
+        async with db.execute("""
+            SELECT (SELECT TOTAL(size) FROM cached_tracks) + (SELECT TOTAL(size) FROM cached_queries)
+        """) as cursor:
+            self._bytes = int((await cursor.fetchone())[0])
+        return removed
+
+    @staticmethod
+    async def _vacuum(db: aiosqlite.Connection):
+        """Give free pages back to the file system"""
+        # executescript steps the pragma to completion; a plain execute frees a single page
+        await db.executescript("PRAGMA incremental_vacuum")
+
+    async def prune(self, now: Optional[float] = None) -> int:
+        """Remove expired entries; returns rows removed"""
+        await self.ensure_tables()
+        async with self._write_lock:
+            async with aiosqlite.connect(self.db_path) as db:
+                removed = await self._delete_expired(db, now or self.clock())
+                if removed:
+                    await self._vacuum(db)
+        return removed
+
+
+_cache: Optional[TrackCache] = None
+
+
+def get_track_cache() -> TrackCache:
+    global _cache
+    if _cache is None:
+        _cache = TrackCache()
+    return _cache
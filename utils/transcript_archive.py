@@ -0,0 +1,610 @@
+"""
+Searchable archive of closed ticket transcripts.
+
+A ticket's messages are stored as one compressed JSON-lines document (zstd
+when ``zstandard`` is installed, zlib otherwise; the codec is recorded per
+blob so either can be read back). Storage is content-addressed by SHA-256 in
+``archive_blobs`` with a reference count:
+
+* identical transcript documents are stored once,
+* message bodies of ``SHARED_CONTENT_MIN`` characters or more (templates,
+  pasted logs, bot welcome messages) are stored once and referenced from the
+  document by hash,
+* attachments are downloaded at close time (up to a per-file and per-ticket
+  cap, since Discord CDN links expire) and stored once per distinct file.
+
+Message text - content, embed text and attachment names - is indexed in a
+contentless FTS5 table whose rowids point at ``archive_messages`` (guild,
+ticket, author, time, position in the document), so the index holds no second
+copy of the text. Searches are scoped to a guild through an indexed ``guild``
+token and can be narrowed by author, ticket and time.
+
+Retention is per guild (``archive_settings.retention_days``, falling back to
+the archive default); expired transcripts are removed together with their
+index rows and any blobs no other transcript references.
+
+Hashing, compression and decompression run in worker threads. A closing
+ticket's history is streamed into the archive while the channel still exists
+(``archive_channel``), a batch of records at a time, so a long ticket and its
+attachments are never held as one list of records.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import traceback
+import zlib
+from typing import Any, AsyncIterable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import aiosqlite
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+DB_PATH = "db/ticket_archive.db"
+SHARED_CONTENT_MIN = 512          # characters; longer message bodies are deduplicated
+MAX_ATTACHMENT_BYTES = 8 * 1024 * 1024
+MAX_TICKET_ATTACHMENT_BYTES = 32 * 1024 * 1024
+INDEX_BATCH = 500                 # messages per executemany while ingesting
+PACK_BATCH = 200                  # records hashed and compressed per worker thread call
+PACK_BATCH_BYTES = 4 * 1024 * 1024  # ... or fewer, once they carry this much attachment data
+
+
+class SearchHit(NamedTuple):
+    ticket_id: int
+    author_id: int
+    created_at: float
+    position: int
+    channel_name: str
+    author: str
+    text: str
+
+
+# ---------- codecs ----------
+
+# Idle zstd compressors. Setting up a context dominates small documents, so
+# contexts are reused, but a context serves one stream at a time: ingests
+# interleave at every await, so each takes its own.
+_zstd_pool: List[Any] = []
+
+
+def _acquire(codec: str):
+    if codec == "zstd":
+        return _zstd_pool.pop() if _zstd_pool else zstandard.ZstdCompressor(level=10)
+    return None
+
+
+def _release(context):
+    if context is not None:
+        _zstd_pool.append(context)
+
+
+def _compressor(codec: str, context=None):
+    if codec == "zstd":
+        return context.compressobj()
+    return zlib.compressobj(9)
+
+
+def _compress(data: bytes) -> Tuple[str, bytes]:
+    """(codec, data) - stored raw when compression doesn't pay (e.g. images)"""
+    codec = "zstd" if ZSTD_AVAILABLE else "zlib"
+    context = _acquire(codec)
+    try:
+        compressor = _compressor(codec, context)
+        packed = compressor.compress(data) + compressor.flush()
+    finally:
+        _release(context)
+    if len(packed) >= len(data):
+        return "raw", data
+    return codec, packed
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "raw":
+        return data
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return zlib.decompress(data)
+
+
+def _read_document(codec: str, data: bytes) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in _decompress(codec, data).splitlines() if line]
+
+
+def _fts_query(text: str) -> Optional[str]:
+    """User text -> FTS5 query: every word must match, no FTS syntax passes through"""
+    terms = re.findall(r"\w+", text.lower())
+    if not terms:
+        return None
+    return " AND ".join(f'text:"{term}"' for term in terms[:16])
+
+
+def message_record(message, attachments: Optional[List[dict]] = None) -> Dict[str, Any]:
+    """The archived form of a discord.Message"""
+    return {
+        "id": message.id,
+        "author_id": message.author.id,
+        "author": str(message.author),
+        "ts": message.created_at.timestamp(),
+        "content": message.content or "",
+        "attachments": attachments if attachments is not None else [
+            {"filename": att.filename, "url": att.url, "size": att.size} for att in message.attachments
+        ],
+        "embeds": [{"title": embed.title, "description": embed.description} for embed in message.embeds],
+    }
+
+
+def _searchable_text(record: Dict[str, Any]) -> str:
+    parts = [record.get("content") or ""]
+    for embed in record.get("embeds", ()):
+        parts.extend(value for value in (embed.get("title"), embed.get("description")) if value)
+    parts.extend(att["filename"] for att in record.get("attachments", ()))
+    return "\n".join(part for part in parts if part)
+
+
+class _Packer:
+    """
+    Builds one transcript document; fed a batch at a time from a worker
+    thread. Shared content and attachments are spooled to a temporary file
+    until they are written, so a ticket's attachments are not held in memory.
+    """
+
+    def __init__(self, compressor):
+        self.compressor = compressor
+        self.document_hash = hashlib.sha256()
+        self.chunks: List[bytes] = []
+        self.raw_size = 0
+        self.spool = tempfile.TemporaryFile()
+        # hash -> (kind, codec, size, spool offset, stored length, refs)
+        self.blobs: Dict[str, Tuple[str, str, int, int, int, int]] = {}
+        self.index_rows: List[Tuple[int, float, str]] = []  # author_id, created_at, text
+        self.first = self.last = None
+
+    def feed(self, records: List[Dict[str, Any]]):
+        for record in records:
+            content = record.get("content") or ""
+            text = _searchable_text(record)
+            if len(content) >= SHARED_CONTENT_MIN:
+                digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+                self._add_blob(digest, "content", content.encode("utf-8"))
+                record = dict(record, content=None, content_hash=digest)
+            attachments = []
+            for att in record.get("attachments", ()):
+                data = att.get("data")
+                if data is not None:
+                    digest = hashlib.sha256(data).hexdigest()
+                    self._add_blob(digest, "attachment", data)
+                    att = {key: value for key, value in att.items() if key != "data"}
+                    att["hash"] = digest
+                attachments.append(att)
+            record = dict(record, attachments=attachments)
+
+            line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            self.document_hash.update(line)
+            self.raw_size += len(line)
+            packed = self.compressor.compress(line)
+            if packed:
+                self.chunks.append(packed)
+            self.index_rows.append((record["author_id"], record["ts"], text))
+            self.first = record["ts"] if self.first is None else self.first
+            self.last = record["ts"]
+
+    def finish(self) -> "_Packer":
+        self.chunks.append(self.compressor.flush())
+        self.digest = self.document_hash.hexdigest()
+        self.document = b"".join(self.chunks)
+        self.chunks = []
+        return self
+
+    def blob_rows(self, codec: str):
+        """archive_blobs rows, the document first; spooled blobs are read back one at a time"""
+        yield self.digest, "document", codec, self.raw_size, self.document, 1
+        for digest, (kind, blob_codec, size, offset, length, refs) in self.blobs.items():
+            self.spool.seek(offset)
+            yield digest, kind, blob_codec, size, self.spool.read(length), refs
+
+    def close(self):
+        self.spool.close()
+
+    def _add_blob(self, digest: str, kind: str, data: bytes):
+        existing = self.blobs.get(digest)
+        if existing is not None:
+            self.blobs[digest] = existing[:5] + (existing[5] + 1,)
+            return
+        codec, packed = _compress(data)
+        offset = self.spool.seek(0, os.SEEK_END)
+        self.spool.write(packed)
+        self.blobs[digest] = (kind, codec, len(data), offset, len(packed), 1)
+
+
+class TranscriptArchive:
+    """Compressed, deduplicated, full-text searchable ticket transcripts"""
+
+    def __init__(self, db_path: str = DB_PATH, retention_days: int = 365,
+                 prune_interval: float = 24 * 3600):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self._write_lock = asyncio.Lock()
+        self._ready = False
+        self._prune_task: Optional[asyncio.Task] = None
+        self._ingests: Set[asyncio.Task] = set()
+
+    # ---------- lifecycle ----------
+
+    async def start(self):
+        await self.ensure_tables()
+        if self._prune_task is None:
+            self._prune_task = asyncio.create_task(self._prune_loop())
+
+    async def stop(self):
+        if self._prune_task is not None:
+            self._prune_task.cancel()
+            self._prune_task = None
+        # Let transcripts that are being stored finish
+        if self._ingests:
+            await asyncio.gather(*self._ingests, return_exceptions=True)
+
+    async def _prune_loop(self):
+        while True:
+            await asyncio.sleep(self.prune_interval)
+            try:
+                removed = await self.prune()
+                if removed:
+                    print(f"[TICKETS] Archive retention removed {removed} transcript(s)")
+            except Exception:
+                print(f"[TICKETS] Archive retention failed: {traceback.format_exc()}")
+
+    async def ensure_tables(self):
+        if self._ready:
+            return
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("PRAGMA journal_mode=WAL")
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS archive_blobs (
+                    hash TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL, -- document, content, attachment
+                    codec TEXT NOT NULL,
+                    raw_size INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    refs INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS archived_transcripts (
+                    ticket_id INTEGER PRIMARY KEY,
+                    guild_id INTEGER NOT NULL,
+                    channel_name TEXT,
+                    opener_id INTEGER,
+                    closed_by INTEGER,
+                    first_message_at REAL,
+                    last_message_at REAL,
+                    archived_at REAL NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    document_hash TEXT NOT NULL
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS archive_messages (
+                    id INTEGER PRIMARY KEY, -- rowid shared with archive_fts
+                    guild_id INTEGER NOT NULL,
+                    ticket_id INTEGER NOT NULL,
+                    author_id INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    position INTEGER NOT NULL
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_archive_messages_ticket
+                ON archive_messages (ticket_id, position)
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_archive_messages_author
+                ON archive_messages (guild_id, author_id, created_at)
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_archived_transcripts_guild
+                ON archived_transcripts (guild_id, archived_at)
+            """)
+            # Contentless: the text lives (compressed) in the documents only
+            await db.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS archive_fts USING fts5(
+                    guild, text, content='', tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS archive_settings (
+                    guild_id INTEGER PRIMARY KEY,
+                    retention_days INTEGER
+                )
+            """)
+            await db.commit()
+        self._ready = True
+
+    # ---------- ingest ----------
+
+    async def channel_records(self, channel) -> AsyncIterable[Dict[str, Any]]:
+        """A channel's history as message records, attachments downloaded up to the caps"""
+        budget = MAX_TICKET_ATTACHMENT_BYTES
+        async for message in channel.history(limit=None, oldest_first=True):
+            attachments = []
+            for att in message.attachments:
+                entry = {"filename": att.filename, "url": att.url, "size": att.size}
+                if att.size <= min(MAX_ATTACHMENT_BYTES, budget):
+                    try:
+                        entry["data"] = await att.read()
+                        budget -= att.size
+                    except Exception:
+                        pass  # keep the link only
+                attachments.append(entry)
+            yield message_record(message, attachments)
+
+    async def archive_channel(self, guild_id: int, ticket_id: int, channel,
+                              opener_id: Optional[int] = None, closed_by: Optional[int] = None) -> int:
+        """Archive a ticket channel's full history (attachments included); returns messages archived"""
+        return await self.ingest(guild_id, ticket_id, channel.name, self.channel_records(channel), opener_id, closed_by)
+
+    async def ingest(self, guild_id: int, ticket_id: int, channel_name: str,
+                     records: AsyncIterable[Dict[str, Any]], opener_id: Optional[int] = None,
+                     closed_by: Optional[int] = None) -> int:
+        """
+        Store a transcript from message records (see ``message_record``; an
+        attachment may carry its bytes under ``data``). Re-archiving a ticket
+        replaces the earlier copy.
+        """
+        # ``stop`` lets transcripts being stored finish
+        task = asyncio.current_task()
+        self._ingests.add(task)
+        try:
+            return await self._ingest(guild_id, ticket_id, channel_name, records, opener_id, closed_by)
+        finally:
+            self._ingests.discard(task)
+
+    async def _ingest(self, guild_id: int, ticket_id: int, channel_name: str,
+                      records: AsyncIterable[Dict[str, Any]], opener_id: Optional[int],
+                      closed_by: Optional[int]) -> int:
+        await self.ensure_tables()
+        codec = "zstd" if ZSTD_AVAILABLE else "zlib"
+        context = _acquire(codec)
+        try:
+            packer = await self._pack(_compressor(codec, context), records)
+        finally:
+            _release(context)
+        try:
+            async with self._write_lock:
+                async with aiosqlite.connect(self.db_path) as db:
+                    # WAL + NORMAL: no fsync per archived ticket, still crash-consistent
+                    await db.execute("PRAGMA synchronous=NORMAL")
+                    await self._delete_ticket(db, ticket_id)
+                    await db.executemany("""
+                        INSERT INTO archive_blobs (hash, kind, codec, raw_size, data, refs)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(hash) DO UPDATE SET refs = refs + excluded.refs
+                    """, packer.blob_rows(codec))
+                    await db.execute("""
+                        INSERT INTO archived_transcripts
+                        (ticket_id, guild_id, channel_name, opener_id, closed_by, first_message_at,
+                         last_message_at, archived_at, message_count, document_hash)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (ticket_id, guild_id, channel_name, opener_id, closed_by, packer.first, packer.last,
+                          time.time(), len(packer.index_rows), packer.digest))
+                    async with db.execute("SELECT COALESCE(MAX(id), 0) FROM archive_messages") as cursor:
+                        base = (await cursor.fetchone())[0] + 1
+                    guild_token = f"g{guild_id}"
+                    for start in range(0, len(packer.index_rows), INDEX_BATCH):
+                        batch = packer.index_rows[start:start + INDEX_BATCH]
+                        await db.executemany("""
+                            INSERT INTO archive_messages (id, guild_id, ticket_id, author_id, created_at, position)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                        """, [(base + start + i, guild_id, ticket_id, author_id, created_at, start + i)
+                              for i, (author_id, created_at, _) in enumerate(batch)])
+                        await db.executemany(
+                            "INSERT INTO archive_fts (rowid, guild, text) VALUES (?, ?, ?)",
+                            [(base + start + i, guild_token, text) for i, (_, _, text) in enumerate(batch) if text]
+                        )
+                    await db.commit()
+        finally:
+            packer.close()
+        return len(packer.index_rows)
+
+    async def _pack(self, compressor, records: AsyncIterable[Dict[str, Any]]):
+        """Compress the record stream into one document, splitting long content and attachments out"""
+        # Hashing and compression happen in a worker thread, a batch of records at a time
+        packer = _Packer(compressor)
+        try:
+            batch: List[Dict[str, Any]] = []
+            attached = 0
+            async for record in records:
+                batch.append(record)
+                attached += sum(len(att.get("data") or b"") for att in record.get("attachments", ()))
+                if len(batch) >= PACK_BATCH or attached >= PACK_BATCH_BYTES:
+                    await asyncio.to_thread(packer.feed, batch)
+                    batch, attached = [], 0
+            if batch:
+                await asyncio.to_thread(packer.feed, batch)
+            return await asyncio.to_thread(packer.finish)
+        except BaseException:
+            packer.close()
+            raise
+
+    # ---------- reading ----------
+
+    async def _blob(self, db: aiosqlite.Connection, digest: str) -> Optional[bytes]:
+        async with db.execute("SELECT codec, data FROM archive_blobs WHERE hash = ?", (digest,)) as cursor:
+            row = await cursor.fetchone()
+        return await asyncio.to_thread(_decompress, row[0], row[1]) if row else None
+
+    async def _document(self, db: aiosqlite.Connection, digest: str) -> List[Dict[str, Any]]:
+        async with db.execute("SELECT codec, data FROM archive_blobs WHERE hash = ?", (digest,)) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return []
+        return await asyncio.to_thread(_read_document, row[0], row[1])
+
+    async def _resolve(self, db: aiosqlite.Connection, record: Dict[str, Any]) -> Dict[str, Any]:
+        if record.get("content_hash"):
+            data = await self._blob(db, record["content_hash"])
+            record = dict(record, content=data.decode("utf-8") if data is not None else "")
+        return record
+
+    async def get_transcript(self, guild_id: int, ticket_id: int) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """(ticket info, message records with content resolved) or None"""
+        await self.ensure_tables()
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute(
+                "SELECT * FROM archived_transcripts WHERE guild_id = ? AND ticket_id = ?", (guild_id, ticket_id)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return None
+            records = [await self._resolve(db, record) for record in await self._document(db, row["document_hash"])]
+        return dict(row), records
+
+    async def get_attachment(self, digest: str) -> Optional[bytes]:
+        await self.ensure_tables()
+        async with aiosqlite.connect(self.db_path) as db:
+            return await self._blob(db, digest)
+
+    async def search(self, guild_id: int, query: str, author_id: Optional[int] = None,
+                     ticket_id: Optional[int] = None, since: Optional[float] = None,
+                     until: Optional[float] = None, limit: int = 10) -> List[SearchHit]:
+        """Best-matching archived messages in a guild, newest first among equal ranks"""
+        match = _fts_query(query)
+        if match is None:
+            return []
+        await self.ensure_tables()
+        conditions = ["archive_fts MATCH ?"]
+        params: List[Any] = [f'guild:"g{guild_id}" AND ({match})']
+        if author_id is not None:
+            conditions.append("m.author_id = ?")
+            params.append(author_id)
+        if ticket_id is not None:
+            conditions.append("m.ticket_id = ?")
+            params.append(ticket_id)
+        if since is not None:
+            conditions.append("m.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("m.created_at < ?")
+            params.append(until)
+        params.append(limit)
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute(f"""
+                SELECT m.ticket_id, m.author_id, m.created_at, m.position, t.channel_name, t.document_hash
+                FROM archive_fts
+                JOIN archive_messages m ON m.id = archive_fts.rowid
+                JOIN archived_transcripts t ON t.ticket_id = m.ticket_id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY archive_fts.rank, m.created_at DESC
+                LIMIT ?
+            """, params) as cursor:
+                rows = await cursor.fetchall()
+            # Each hit's text comes from its (decompressed) document, once per ticket
+            documents: Dict[str, List[Dict[str, Any]]] = {}
+            hits = []
+            for ticket, author, created_at, position, channel_name, document_hash in rows:
+                if document_hash not in documents:
+                    documents[document_hash] = await self._document(db, document_hash)
+                records = documents[document_hash]
+                record = await self._resolve(db, records[position]) if position < len(records) else {}
+                hits.append(SearchHit(ticket, author, created_at, position, channel_name or "",
+                                      record.get("author", str(author)), _searchable_text(record)))
+        return hits
+
+    # ---------- retention ----------
+
+    async def set_retention(self, guild_id: int, days: Optional[int]):
+        """Keep a guild's transcripts ``days`` days (None: archive default, 0: forever)"""
+        await self.ensure_tables()
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("""
+                INSERT INTO archive_settings (guild_id, retention_days) VALUES (?, ?)
+                ON CONFLICT(guild_id) DO UPDATE SET retention_days = excluded.retention_days
+            """, (guild_id, days))
+            await db.commit()
+
+    async def get_retention(self, guild_id: int) -> int:
+        await self.ensure_tables()
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute("SELECT retention_days FROM archive_settings WHERE guild_id = ?",
+                                  (guild_id,)) as cursor:
+                row = await cursor.fetchone()
+        return row[0] if row and row[0] is not None else self.retention_days
+
+    async def prune(self, now: Optional[float] = None) -> int:
+        """Remove transcripts past their guild's retention; returns transcripts removed"""
+        await self.ensure_tables()
+        now = now or time.time()
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute("""
+                SELECT t.ticket_id
+                FROM archived_transcripts t
+                LEFT JOIN archive_settings s ON s.guild_id = t.guild_id
+                WHERE COALESCE(s.retention_days, ?) > 0
+                  AND t.archived_at < ? - COALESCE(s.retention_days, ?) * 86400
+            """, (self.retention_days, now, self.retention_days)) as cursor:
+                expired = [row[0] for row in await cursor.fetchall()]
+        removed = 0
+        for ticket_id in expired:
+            # One ticket per transaction keeps the write lock short
+            async with self._write_lock:
+                async with aiosqlite.connect(self.db_path) as db:
+                    removed += await self._delete_ticket(db, ticket_id)
+                    await db.commit()
+        return removed
+
+    async def _delete_ticket(self, db: aiosqlite.Connection, ticket_id: int) -> int:
+        """Drop a ticket's transcript, index rows and blob references (caller commits)"""
+        async with db.execute("SELECT guild_id, document_hash FROM archived_transcripts WHERE ticket_id = ?",
+                              (ticket_id,)) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return 0
+        guild_id, document_hash = row
+        records = await self._document(db, document_hash)
+        references: Dict[str, int] = {document_hash: 1}
+        for record in records:
+            if record.get("content_hash"):
+                references[record["content_hash"]] = references.get(record["content_hash"], 0) + 1
+            for att in record.get("attachments", ()):
+                if att.get("hash"):
+                    references[att["hash"]] = references.get(att["hash"], 0) + 1
+
+        # A contentless FTS5 row is deleted by replaying the text it was indexed with
+        async with db.execute("SELECT id, position FROM archive_messages WHERE ticket_id = ?",
+                              (ticket_id,)) as cursor:
+            rows = await cursor.fetchall()
+        deletes = []
+        for rowid, position in rows:
+            if position < len(records):
+                text = _searchable_text(await self._resolve(db, records[position]))
+                if text:
+                    deletes.append((rowid, f"g{guild_id}", text))
+        await db.executemany(
+            "INSERT INTO archive_fts (archive_fts, rowid, guild, text) VALUES ('delete', ?, ?, ?)", deletes
+        )
+        await db.execute("DELETE FROM archive_messages WHERE ticket_id = ?", (ticket_id,))
+        await db.execute("DELETE FROM archived_transcripts WHERE ticket_id = ?", (ticket_id,))
+        await db.executemany("UPDATE archive_blobs SET refs = refs - ? WHERE hash = ?",
+                             [(count, digest) for digest, count in references.items()])
+        await db.executemany("DELETE FROM archive_blobs WHERE hash = ? AND refs <= 0",
+                             [(digest,) for digest in references])
+        return 1
+
+
+_archive: Optional[TranscriptArchive] = None
+
+
+def get_transcript_archive() -> TranscriptArchive:
+    global _archive
+    if _archive is None:
+        _archive = TranscriptArchive()
+    return _archive
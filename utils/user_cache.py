@@ -0,0 +1,104 @@
+"""
+Bounded LRU cache of user display names and avatars.
+
+Leaderboards render a page of user ids; members that are not in the gateway
+cache used to cost one ``fetch_user`` REST call per row. Entries are filled
+from member/user events and from previous lookups, and the remaining misses
+are fetched together under a small concurrency limit. Ids whose fetch failed
+(deleted accounts, transient API errors) are remembered for a short while so
+every leaderboard page does not retry them.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import discord
+
+
+class CachedUser(NamedTuple):
+    name: str
+    avatar_url: str
+
+
+class UserProfileCache:
+    """LRU map of user_id -> CachedUser"""
+
+    def __init__(self, max_size: int = 10000, fetch_concurrency: int = 4, negative_ttl: float = 300.0):
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[int, CachedUser]" = OrderedDict()
+        # user_id -> monotonic time until which a failed fetch is not retried
+        self._failed: Dict[int, float] = {}
+        self._fetch_semaphore = asyncio.Semaphore(fetch_concurrency)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id: int) -> Optional[CachedUser]:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self._entries.move_to_end(user_id)
+        return entry
+
+    def put(self, user) -> CachedUser:
+        """Store a discord.User / discord.Member (global name and avatar, never a guild nickname)"""
+        name = getattr(user, 'global_name', None) or user.name
+        avatar = user.avatar or user.default_avatar
+        entry = CachedUser(name, avatar.url)
+        self._failed.pop(user.id, None)
+        self._entries[user.id] = entry
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def discard(self, user_id: int):
+        self._entries.pop(user_id, None)
+        self._failed.pop(user_id, None)
+
+    def _recently_failed(self, user_id: int, now: float) -> bool:
+        expires = self._failed.get(user_id)
+        if expires is None:
+            return False
+        if expires <= now:
+            del self._failed[user_id]
+            return False
+        return True
+
+    def _mark_failed(self, user_id: int):
+        now = time.monotonic()
+        if len(self._failed) >= self.max_size:
+            self._failed = {key: expires for key, expires in self._failed.items() if expires > now}
+        self._failed[user_id] = now + self.negative_ttl
+
+    async def _fetch(self, bot, user_id: int) -> Optional[CachedUser]:
+        async with self._fetch_semaphore:
+            try:
+                return self.put(await bot.fetch_user(user_id))
+            except (discord.NotFound, discord.HTTPException):
+                self._mark_failed(user_id)
+                return None
+
+    async def resolve_many(self, bot, user_ids: Iterable[int], guild: Optional[discord.Guild] = None) -> Dict[int, CachedUser]:
+        """Resolve ids from this cache, then the gateway cache, then REST (bounded concurrency)"""
+        resolved: Dict[int, CachedUser] = {}
+        missing = []
+        now = time.monotonic()
+        for user_id in user_ids:
+            entry = self.get(user_id)
+            if entry is None:
+                user = (guild.get_member(user_id) if guild else None) or bot.get_user(user_id)
+                if user is not None:
+                    entry = self.put(user)
+            if entry is not None:
+                resolved[user_id] = entry
+            elif not self._recently_failed(user_id, now):
+                missing.append(user_id)
+
+        if missing:
+            results = await asyncio.gather(*(self._fetch(bot, user_id) for user_id in missing))
+            for user_id, entry in zip(missing, results):
+                if entry is not None:
+                    resolved[user_id] = entry
+        return resolved
@@ -0,0 +1,335 @@
+"""
+One voice session engine shared by every cog that counts voice time.
+
+The engine follows ``on_voice_state_update`` once for the whole bot and keeps
+an open session per (guild, member): the channel, the mute/deafen state and
+the moment up to which the session has been credited. Time is handed to
+subscribers as ``VoiceSegment`` batches:
+
+* when a member leaves or moves (final segment of the session),
+* when the mute/deafen state changes (the segment carries the old state),
+* every ``checkpoint_interval`` seconds for every open session, so a crash
+  loses at most one interval and long sessions show up while in progress
+  (a member who left and rejoined the same channel within that interval
+  may instead have it counted twice when their session resumes).
+
+Open sessions are checkpointed to ``voice_sessions`` in the same step. After
+a restart, and after a gateway reconnect (``on_ready`` / ``on_resumed``),
+the engine reconciles its sessions against the voice states the gateway
+reports: members who are gone are closed at the time the connection dropped,
+members found in voice are opened, and a restored session whose member is
+still in the same channel resumes (crediting the downtime only if it was
+short).
+
+Usage::
+
+    engine = get_voice_session_engine(bot)
+    engine.subscribe(self.on_voice_segments)   # async def (segments) -> None
+    await engine.start()
+    ...
+    await engine.unsubscribe(self.on_voice_segments)
+"""
+import asyncio
+import os
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import aiosqlite
+
+DB_PATH = "databases/voice_sessions.db"
+
+SessionKey = Tuple[int, int]  # guild_id, user_id
+
+
+class VoiceSegment(NamedTuple):
+    guild_id: int
+    user_id: int
+    channel_id: int
+    start: datetime
+    end: datetime
+    muted: bool
+    deafened: bool
+    bot: bool
+    final: bool  # the session ended with this segment
+
+    @property
+    def seconds(self) -> float:
+        return (self.end - self.start).total_seconds()
+
+
+SegmentHandler = Callable[[List[VoiceSegment]], Awaitable[None]]
+
+
+class _Session:
+    __slots__ = ("channel_id", "started_at", "credited_until", "muted", "deafened", "bot")
+
+    def __init__(self, channel_id: int, started_at: float, muted: bool, deafened: bool, bot: bool):
+        self.channel_id = channel_id
+        self.started_at = started_at
+        self.credited_until = started_at
+        self.muted = muted
+        self.deafened = deafened
+        self.bot = bot
+
+
+def _state_flags(state) -> Tuple[bool, bool]:
+    return bool(state.self_mute or state.mute), bool(state.self_deaf or state.deaf)
+
+
+def _utc(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+class VoiceSessionEngine:
+    """Tracks voice sessions for the whole bot and publishes their durations"""
+
+    def __init__(self, bot, db_path: str = DB_PATH, checkpoint_interval: float = 60.0,
+                 resume_gap: float = 300.0, clock: Callable[[], float] = time.time):
+        self.bot = bot
+        self.db_path = db_path
+        self.checkpoint_interval = checkpoint_interval
+        self.resume_gap = resume_gap
+        self.clock = clock
+        self.sessions: Dict[SessionKey, _Session] = {}
+        self.subscribers: List[SegmentHandler] = []
+        # Sessions loaded from the last checkpoint, matched up by the next reconcile
+        self._restored: Dict[SessionKey, _Session] = {}
+        self._disconnected_at: Optional[float] = None
+        self._checkpoint_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._started = False
+
+    # ---------- lifecycle ----------
+
+    def subscribe(self, handler: SegmentHandler):
+        if handler not in self.subscribers:
+            self.subscribers.append(handler)
+
+    async def unsubscribe(self, handler: SegmentHandler):
+        """Remove a subscriber after crediting open sessions; the last one out stops the engine"""
+        if handler in self.subscribers:
+            if self._started:
+                await self.checkpoint()
+            self.subscribers.remove(handler)
+        if not self.subscribers:
+            await self.stop()
+
+    async def start(self):
+        if self._started:
+            return
+        self._started = True
+        await self._load()
+        for event in ("on_voice_state_update", "on_ready", "on_resumed", "on_disconnect"):
+            self.bot.add_listener(getattr(self, event), event)
+        if self.bot.is_ready():
+            await self.reconcile()
+        self._checkpoint_task = asyncio.create_task(self._checkpoint_loop())
+
+    async def stop(self):
+        if not self._started:
+            return
+        self._started = False
+        if self._checkpoint_task is not None:
+            self._checkpoint_task.cancel()
+            self._checkpoint_task = None
+        for event in ("on_voice_state_update", "on_ready", "on_resumed", "on_disconnect"):
+            self.bot.remove_listener(getattr(self, event), event)
+        await self._save()
+
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            try:
+                await self.checkpoint()
+            except Exception:
+                print(f"[VOICE] Session checkpoint failed: {traceback.format_exc()}")
+
+    # ---------- gateway events ----------
+
+    async def on_voice_state_update(self, member, before, after):
+        if before.channel == after.channel and _state_flags(before) == _state_flags(after):
+            return  # stream/video/suppress changes don't affect sessions
+        now = self.clock()
+        key = (member.guild.id, member.id)
+        segments = []
+        async with self._lock:
+            session = self.sessions.get(key)
+            if after.channel is None:
+                if session is not None:
+                    segments.append(self._close(key, now))
+            elif session is None or session.channel_id != after.channel.id:
+                if session is not None:
+                    segments.append(self._close(key, now))
+                self._open(key, after.channel.id, now, *_state_flags(after), member.bot)
+            else:
+                segment = self._credit(key, session, now, final=False)
+                if segment is not None:
+                    segments.append(segment)
+                session.muted, session.deafened = _state_flags(after)
+        await self._publish(segments)
+
+    async def on_disconnect(self):
+        if self._disconnected_at is None:
+            self._disconnected_at = self.clock()
+
+    async def on_ready(self):
+        await self.reconcile()
+
+    async def on_resumed(self):
+        await self.reconcile()
+
+    # ---------- session bookkeeping ----------
+
+    def _open(self, key: SessionKey, channel_id: int, now: float, muted: bool, deafened: bool, bot: bool):
+        self.sessions[key] = _Session(channel_id, now, muted, deafened, bot)
+
+    def _credit(self, key: SessionKey, session: _Session, until: float, final: bool) -> Optional[VoiceSegment]:
+        start = session.credited_until
+        if until <= start and not final:
+            return None
+        until = max(until, start)
+        session.credited_until = until
+        return VoiceSegment(key[0], key[1], session.channel_id, _utc(start), _utc(until),
+                            session.muted, session.deafened, session.bot, final)
+
+    def _close(self, key: SessionKey, until: float) -> VoiceSegment:
+        session = self.sessions.pop(key)
+        return self._credit(key, session, until, final=True)
+
+    def current_states(self, guilds: Optional[Iterable] = None) -> Dict[SessionKey, tuple]:
+        """(guild, member) -> (channel_id, muted, deafened, bot) as the gateway cache sees it"""
+        states = {}
+        for guild in guilds if guilds is not None else self.bot.guilds:
+            for channel in list(guild.voice_channels) + list(guild.stage_channels):
+                for member in channel.members:
+                    if member.voice is None:
+                        continue
+                    states[(guild.id, member.id)] = (channel.id, *_state_flags(member.voice), member.bot)
+        return states
+
+    async def reconcile(self, states: Optional[Dict[SessionKey, tuple]] = None):
+        """
+        Bring open sessions in line with the current voice states, e.g. after
+        a restart or a gateway reconnect during which events were missed.
+        """
+        if states is None:
+            states = self.current_states()
+        now = self.clock()
+        # Members who vanished left at some point while we weren't listening
+        gone_at = self._disconnected_at or now
+        segments = []
+        async with self._lock:
+            restored, self._restored = self._restored, {}
+            for key, old in restored.items():
+                state = states.get(key)
+                if key in self.sessions or state is None or state[0] != old.channel_id:
+                    continue  # already credited up to the checkpoint
+                if now - old.credited_until > self.resume_gap:
+                    old.credited_until = now
+                self.sessions[key] = old
+
+            for key, session in list(self.sessions.items()):
+                state = states.get(key)
+                if state is None:
+                    segments.append(self._close(key, min(max(gone_at, session.credited_until), now)))
+                elif state[0] != session.channel_id:
+                    segments.append(self._close(key, min(max(gone_at, session.credited_until), now)))
+                    self._open(key, state[0], now, state[1], state[2], state[3])
+                elif (session.muted, session.deafened) != (state[1], state[2]):
+                    segment = self._credit(key, session, now, final=False)
+                    if segment is not None:
+                        segments.append(segment)
+                    session.muted, session.deafened = state[1], state[2]
+
+            for key, state in states.items():
+                if key not in self.sessions:
+                    self._open(key, state[0], now, state[1], state[2], state[3])
+            self._disconnected_at = None
+        await self._publish(segments)
+
+    # ---------- checkpoints ----------
+
+    async def checkpoint(self):
+        """Credit every open session up to now, publish it and persist the open sessions"""
+        now = self.clock()
+        if self._disconnected_at is not None:
+            # Who is still in voice is unknown until the next reconcile
+            now = self._disconnected_at
+        async with self._lock:
+            segments = []
+            for key, session in self.sessions.items():
+                segment = self._credit(key, session, now, final=False)
+                if segment is not None:
+                    segments.append(segment)
+        await self._publish(segments)
+        await self._save()
+
+    async def _publish(self, segments: List[VoiceSegment]):
+        if not segments:
+            return
+        for handler in list(self.subscribers):
+            try:
+                await handler(segments)
+            except Exception:
+                print(f"[VOICE] Segment subscriber {getattr(handler, '__qualname__', handler)} failed: "
+                      f"{traceback.format_exc()}")
+
+    async def _ensure_table(self, db: aiosqlite.Connection):
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS voice_sessions (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                channel_id INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                credited_until REAL NOT NULL,
+                muted INTEGER NOT NULL DEFAULT 0,
+                deafened INTEGER NOT NULL DEFAULT 0,
+                bot INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+
+    async def _load(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        async with aiosqlite.connect(self.db_path) as db:
+            await self._ensure_table(db)
+            await db.commit()
+            async with db.execute("""
+                SELECT guild_id, user_id, channel_id, started_at, credited_until, muted, deafened, bot
+                FROM voice_sessions
+            """) as cursor:
+                rows = await cursor.fetchall()
+        for guild_id, user_id, channel_id, started_at, credited_until, muted, deafened, bot in rows:
+            session = _Session(channel_id, started_at, bool(muted), bool(deafened), bool(bot))
+            session.credited_until = credited_until
+            self._restored[(guild_id, user_id)] = session
+
+    async def _save(self):
+        async with self._lock:
+            rows = [(guild_id, user_id, s.channel_id, s.started_at, s.credited_until, s.muted, s.deafened, s.bot)
+                    for (guild_id, user_id), s in self.sessions.items()]
+            # Restored sessions not reconciled yet stay on disk for the next try
+            rows.extend((guild_id, user_id, s.channel_id, s.started_at, s.credited_until, s.muted, s.deafened, s.bot)
+                        for (guild_id, user_id), s in self._restored.items()
+                        if (guild_id, user_id) not in self.sessions)
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("DELETE FROM voice_sessions")
+            await db.executemany("""
+                INSERT INTO voice_sessions
+                (guild_id, user_id, channel_id, started_at, credited_until, muted, deafened, bot)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            await db.commit()
+
+
+_engine: Optional[VoiceSessionEngine] = None
+
+
+def get_voice_session_engine(bot) -> VoiceSessionEngine:
+    """Return the process-wide voice session engine"""
+    global _engine
+    if _engine is None or _engine.bot is not bot:
+        _engine = VoiceSessionEngine(bot)
+    return _engine
@@ -0,0 +1,313 @@
+"""
+Write-behind XP ledger for the leveling system.
+
+Hot ``user_levels`` rows are kept in memory and XP gains are applied there,
+so a message costs no database round trip once the member's row is loaded.
+Dirty rows are flushed periodically with one batched upsert.
+
+Every gain is first appended to a journal file. The flush records the last
+journal sequence number it covered in the same transaction as the upsert, so
+on startup any entries that never reached the database are replayed exactly
+once.
+"""
+import asyncio
+import contextlib
+import os
+import traceback
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+_UPSERT_SQL = """
+    INSERT INTO user_levels (user_id, guild_id, xp, level, total_xp, messages_sent, last_xp_gain)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, guild_id) DO UPDATE SET
+        xp = excluded.xp,
+        level = excluded.level,
+        total_xp = excluded.total_xp,
+        messages_sent = excluded.messages_sent,
+        last_xp_gain = excluded.last_xp_gain
+"""
+
+
+class LedgerRow:
+    __slots__ = ("total_xp", "level", "messages_sent", "last_xp_gain", "formula", "dirty")
+
+    def __init__(self, total_xp: int = 0, level: int = 0, messages_sent: int = 0,
+                 last_xp_gain: Optional[str] = None, formula: str = "default"):
+        self.total_xp = total_xp
+        self.level = level
+        self.messages_sent = messages_sent
+        self.last_xp_gain = last_xp_gain
+        self.formula = formula
+        self.dirty = False
+
+
+class XPLedger:
+    """In-memory XP accumulator with a crash-safe journal"""
+
+    def __init__(self, db_path: str, level_from_xp: Callable[[int, str], int],
+                 xp_for_level: Callable[[int, str], int], journal_path: Optional[str] = None,
+                 flush_interval: float = 10.0, max_rows: int = 50000):
+        self.db_path = db_path
+        self.journal_path = journal_path or os.path.splitext(db_path)[0] + ".xp_journal"
+        self.level_from_xp = level_from_xp
+        self.xp_for_level = xp_for_level
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+
+        self.rows: "OrderedDict[Tuple[int, int], LedgerRow]" = OrderedDict()
+        # Called with (guild_id, user_id, total_xp) after every gain; total_xp is
+        # None when rows were edited outside the ledger and must be re-read
+        self.listeners: List[Callable[[int, Optional[int], Optional[int]], None]] = []
+        self._lock = asyncio.Lock()
+        # Cleared while a command edits user_levels directly; gains wait for it
+        # so the rows reloaded afterwards do not lose them
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._seq = 0
+        self._journal = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # ---------- lifecycle ----------
+
+    async def start(self):
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS xp_ledger_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    last_seq INTEGER NOT NULL
+                )
+            """)
+            await db.execute("INSERT OR IGNORE INTO xp_ledger_state (id, last_seq) VALUES (1, 0)")
+            await db.commit()
+        await self.replay_journal()
+        self._journal = open(self.journal_path, "a", buffering=1, encoding="utf-8")
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                print(f"[LEVELING] XP ledger flush failed: {traceback.format_exc()}")
+
+    # ---------- journal ----------
+
+    def _journal_files(self) -> List[str]:
+        rotated = self.journal_path + ".1"
+        return [path for path in (rotated, self.journal_path) if os.path.exists(path)]
+
+    async def replay_journal(self):
+        """Apply journal entries that were not covered by the last flush"""
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute("SELECT last_seq FROM xp_ledger_state WHERE id = 1")
+            row = await cursor.fetchone()
+            last_seq = row[0] if row else 0
+
+            pending: Dict[Tuple[int, int], List] = {}
+            max_seq = last_seq
+            for path in self._journal_files():
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        parts = line.split()
+                        # A torn final line from a crash is simply ignored
+                        if len(parts) != 6:
+                            continue
+                        try:
+                            seq, guild_id, user_id, xp_gain, messages = (int(value) for value in parts[:5])
+                        except ValueError:
+                            continue
+                        max_seq = max(max_seq, seq)
+                        if seq <= last_seq:
+                            continue
+                        entry = pending.setdefault((guild_id, user_id), [0, 0, None])
+                        entry[0] += xp_gain
+                        entry[1] += messages
+                        entry[2] = parts[5]
+            self._seq = max_seq
+
+            if pending:
+                formulas = {}
+                for guild_id in {guild_id for guild_id, _ in pending}:
+                    cursor = await db.execute("SELECT level_formula FROM guild_level_settings WHERE guild_id = ?", (guild_id,))
+                    result = await cursor.fetchone()
+                    formulas[guild_id] = (result[0] if result else None) or "default"
+
+                batch = []
+                for (guild_id, user_id), (xp_gain, messages, last_gain) in pending.items():
+                    cursor = await db.execute(
+                        "SELECT total_xp, messages_sent FROM user_levels WHERE guild_id = ? AND user_id = ?",
+                        (guild_id, user_id)
+                    )
+                    result = await cursor.fetchone()
+                    total_xp = (result[0] if result else 0) + xp_gain
+                    messages_sent = (result[1] if result else 0) + messages
+                    formula = formulas[guild_id]
+                    level = self.level_from_xp(total_xp, formula)
+                    batch.append((user_id, guild_id, total_xp - self.xp_for_level(level, formula),
+                                  level, total_xp, messages_sent, last_gain))
+
+                await db.executemany(_UPSERT_SQL, batch)
+                print(f"[LEVELING] Replayed XP journal for {len(batch)} members")
+
+            await db.execute("UPDATE xp_ledger_state SET last_seq = ? WHERE id = 1", (max_seq,))
+            await db.commit()
+
+        for path in self._journal_files():
+            os.remove(path)
+
+    def _append_journal(self, guild_id: int, user_id: int, xp_gain: int, messages: int, timestamp: str):
+        self._seq += 1
+        if self._journal is not None:
+            self._journal.write(f"{self._seq} {guild_id} {user_id} {xp_gain} {messages} {timestamp}\n")
+
+    # ---------- rows ----------
+
+    async def _load(self, guild_id: int, user_id: int, formula: str) -> LedgerRow:
+        key = (guild_id, user_id)
+        row = self.rows.get(key)
+        if row is not None:
+            self.rows.move_to_end(key)
+            return row
+
+        async with self._lock:
+            row = self.rows.get(key)
+            if row is not None:
+                return row
+            async with aiosqlite.connect(self.db_path) as db:
+                cursor = await db.execute(
+                    "SELECT total_xp, level, messages_sent, last_xp_gain FROM user_levels WHERE guild_id = ? AND user_id = ?",
+                    (guild_id, user_id)
+                )
+                result = await cursor.fetchone()
+            if result:
+                row = LedgerRow(result[0] or 0, result[1] or 0, result[2] or 0, result[3], formula)
+            else:
+                row = LedgerRow(formula=formula)
+                row.dirty = True
+            self.rows[key] = row
+            self._evict_clean_rows(keep=key)
+            return row
+
+    def _evict_clean_rows(self, keep: Optional[Tuple[int, int]] = None):
+        # ``keep`` is the row being loaded: it is still clean, but the caller
+        # is about to apply a gain to it
+        if len(self.rows) <= self.max_rows:
+            return
+        for key in list(self.rows.keys()):
+            if len(self.rows) <= self.max_rows:
+                break
+            if key != keep and not self.rows[key].dirty:
+                del self.rows[key]
+
+    async def get(self, guild_id: int, user_id: int, formula: str = "default") -> Dict:
+        row = await self._load(guild_id, user_id, formula)
+        return {
+            'user_id': user_id,
+            'guild_id': guild_id,
+            'xp': row.total_xp - self.xp_for_level(row.level, row.formula),
+            'level': row.level,
+            'total_xp': row.total_xp,
+            'messages_sent': row.messages_sent,
+            'last_xp_gain': row.last_xp_gain
+        }
+
+    async def add_xp(self, guild_id: int, user_id: int, xp_gain: int, formula: str,
+                     timestamp: str, messages: int = 1) -> Tuple[bool, int, int]:
+        """Apply an XP gain in memory and return (leveled_up, old_level, new_level)"""
+        while not self._writable.is_set():
+            await self._writable.wait()
+        row = await self._load(guild_id, user_id, formula)
+        self._append_journal(guild_id, user_id, xp_gain, messages, timestamp)
+
+        old_level = row.level
+        row.total_xp += xp_gain
+        row.messages_sent += messages
+        row.last_xp_gain = timestamp
+        row.formula = formula
+        row.level = self.level_from_xp(row.total_xp, formula)
+        row.dirty = True
+
+        for listener in self.listeners:
+            listener(guild_id, user_id, row.total_xp)
+        return row.level > old_level, old_level, row.level
+
+    # ---------- persistence ----------
+
+    async def flush(self):
+        async with self._lock:
+            await self._flush_locked()
+
+    async def _flush_locked(self):
+        batch = []
+        for (guild_id, user_id), row in self.rows.items():
+            if row.dirty:
+                batch.append((user_id, guild_id, row.total_xp - self.xp_for_level(row.level, row.formula),
+                              row.level, row.total_xp, row.messages_sent, row.last_xp_gain))
+                row.dirty = False
+        if not batch:
+            return
+
+        # Rotate the journal in the same synchronous step as the snapshot so
+        # the rotated file holds exactly the entries this flush covers
+        flushed_seq = self._seq
+        rotated = self.journal_path + ".1"
+        if self._journal is not None:
+            self._journal.close()
+            if not os.path.exists(rotated):
+                os.replace(self.journal_path, rotated)
+            self._journal = open(self.journal_path, "a", buffering=1, encoding="utf-8")
+
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.executemany(_UPSERT_SQL, batch)
+                await db.execute("UPDATE xp_ledger_state SET last_seq = ? WHERE id = 1", (flushed_seq,))
+                await db.commit()
+        except Exception:
+            # Keep the rows dirty so the next flush retries them
+            for user_id, guild_id, *_ in batch:
+                row = self.rows.get((guild_id, user_id))
+                if row is not None:
+                    row.dirty = True
+            raise
+
+        if os.path.exists(rotated):
+            os.remove(rotated)
+
+    @contextlib.asynccontextmanager
+    async def direct_write(self, guild_id: int, user_id: Optional[int] = None):
+        """
+        Flush pending XP and hold the ledger while a command edits
+        ``user_levels`` directly; the affected rows are reloaded afterwards.
+        XP gains arriving meanwhile wait until the rows have been evicted.
+        """
+        async with self._lock:
+            self._writable.clear()
+            try:
+                await self._flush_locked()
+                yield
+            finally:
+                self.evict(guild_id, user_id)
+                self._writable.set()
+
+    def evict(self, guild_id: int, user_id: Optional[int] = None):
+        if user_id is not None:
+            self.rows.pop((guild_id, user_id), None)
+        else:
+            for key in [key for key in self.rows if key[0] == guild_id]:
+                del self.rows[key]
+        for listener in self.listeners:
+            listener(guild_id, user_id, None)